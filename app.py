@@ -52,6 +52,7 @@ from flask_cors import CORS
 from flask_login import current_user, logout_user
 from config import ConfigClass
 from extensions import mail,login_manager,db
+from apps import query_stats
 from flask_migrate import Migrate
 from flask_oauthlib.client import OAuth
 
@@ -82,6 +83,11 @@ login_manager.init_app(app)
 # @param app: The application instance.
 db.init_app(app)
 
+## @brief Count and time the SQL of a sample of requests (Server-Timing header
+# and an `iread.sql` log line); registered first so it measures the account
+# check below too.
+query_stats.init_app(app)
+
 
 
 migrate=Migrate(app,db)
@@ -95,7 +101,7 @@ from apps.billing_webhook import billing
 from apps.media import media
 from apps.avatars import avatars
 from apps.school_storage import storage_api
-from apps.account_status import get_account_block_message
+from apps.account_status import get_request_block_message
 
 @app.route('/')
 def home():
@@ -120,7 +126,7 @@ def enforce_active_account():
     if not current_user.is_authenticated:
         return None
     try:
-        block = get_account_block_message(current_user)
+        block = get_request_block_message(current_user)
     except Exception as error:
         app.logger.exception('enforce_active_account failed for user %s: %s', current_user.get_id(), error)
         return None
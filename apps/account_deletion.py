@@ -73,8 +73,10 @@ OWNED_BY_USER = frozenset({
     ('word_progress', 'user_id'),               # vocabulary evidence and CEFR state
     ('self_reported_word', 'user_id'),
     ('user_streak', 'user_id'),
+    ('user_daily_activity', 'user_id'),         # daily goal and analytics counters
     ('user_achievement', 'user_id'),            # trophies
     ('certificate', 'user_id'),                 # Reading Passport certificates
+    ('reader_passport_snapshot', 'user_id'),    # and its precomputed totals
     ('reader_story_progress', 'user_id'),       # where they are in each story
     ('audio_book_progress', 'user_id'),         # and in each audiobook
     ('notification_user', 'user_id'),           # their notification feed
@@ -1,7 +1,25 @@
+import threading
+import time
+
+from config import ConfigClass
+from extensions import db, login_manager
 from models.shcool import Shcool
+from models.user import User
 from models.user_shcool import User_shcool
 
 
+## @brief The one user loader for every blueprint (the reader, admin and main
+# route modules each used to register an identical one, the last import
+# winning). A primary-key get, so a user already in the request's session is
+# not fetched again.
+@login_manager.user_loader
+def load_user(user_id):
+    try:
+        return db.session.get(User, int(user_id))
+    except (TypeError, ValueError):
+        return None
+
+
 def get_account_block_message(user):
     """Returns (message, http_status) if this user should be blocked from
     using the app right now, or None if they're clear to proceed.
@@ -33,3 +51,57 @@ def get_account_block_message(user):
         return ('Your school has been suspended. Contact IRead support.', 403)
 
     return None
+
+
+## @brief Staff whose school check last came back clear, per process:
+# {user_id: (account_version, monotonic expiry)}.
+#
+# The school half of get_account_block_message is a join per request for
+# every admin, assistant and teacher. A clear result is remembered against
+# the user's account_version, which suspending or reactivating the user or
+# one of their schools bumps (bump_account_versions), so the next request
+# after a suspension sees a new version and checks again at once. The expiry
+# (ACCOUNT_CHECK_CACHE_SECONDS) covers what does not bump -- a staff member
+# moved between schools. Only clear results are kept: a blocked session is
+# logged out on the spot.
+_clear_checks = {}
+_clear_checks_lock = threading.Lock()
+MAX_CLEAR_CHECKS = 10000
+
+
+def get_request_block_message(user):
+    """get_account_block_message for the per-request check, skipping the
+    school lookup while a clear result for this account version is fresh."""
+    if not user.is_active:
+        return get_account_block_message(user)
+
+    ttl = ConfigClass.ACCOUNT_CHECK_CACHE_SECONDS
+    if ttl > 0:
+        with _clear_checks_lock:
+            remembered = _clear_checks.get(user.id)
+        if remembered and remembered[0] == user.account_version and remembered[1] > time.monotonic():
+            return None
+
+    block = get_account_block_message(user)
+    if ttl > 0:
+        with _clear_checks_lock:
+            if block is None:
+                if len(_clear_checks) >= MAX_CLEAR_CHECKS:
+                    _clear_checks.clear()
+                _clear_checks[user.id] = (user.account_version, time.monotonic() + ttl)
+            else:
+                _clear_checks.pop(user.id, None)
+    return block
+
+
+def bump_account_versions(user_ids=None, school_id=None):
+    """Invalidate remembered account checks for these users, or for every
+    member of `school_id`, in every process. Part of the caller's
+    transaction."""
+    if user_ids is not None:
+        members = User.id.in_(list(user_ids))
+    else:
+        members = User.id.in_(db.select(User_shcool.user_id).where(User_shcool.shcool_id == school_id))
+    db.session.query(User).filter(members).update(
+        {User.account_version: User.account_version + 1}, synchronize_session='fetch',
+    )
@@ -78,6 +78,15 @@ from models.word_sense_suggestion import (
     WordSenseSuggestion,
 )
 from models.platform_settings import PlatformSettings
+from apps.account_status import bump_account_versions
+from apps.exports import export_response, get_export_format
+from apps import passwords
+from apps.pagination import decode_cursor, encode_cursor, keyset_page
+from apps.word_sense_search import (
+    filter_by_status as filter_word_senses_by_status,
+    lemma_search_filter,
+    word_sense_status_counts,
+)
 from apps.progress_engine import (
     get_achievement_status,
     get_progress_summary,
@@ -97,7 +106,9 @@ from apps.storage import (
     delete_by_absolute_path,
     ensure_school_tree,
     register_existing_file,
+    write_upload,
 )
+from apps.story_pages import queue_story_pages, remove_story_pages
 from config import ConfigClass
 from flask_mail import Message
 from functools import wraps
@@ -1930,19 +1941,6 @@ def require_admin_access():
         return None
     return role_denied_response()
 
-## @brief User loader function for login manager.
-#
-# This function is used by the login manager to load users from the SQL database.
-# It takes a unique user ID as input and returns the corresponding user object.
-#
-# @param user_id: The unique identifier of the user.
-# @return: The user object with the specified ID.
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-
-
 ## @brief Route to the admin dashboard to view their profile.
 #
 # This route is used by administrators to access their dashboard and view their profile details.
@@ -2015,6 +2013,15 @@ def super_dashboard():
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
+## @brief Sign-in hashing load of the web process that serves this request:
+# checks in flight, completed, turned away with a 429, and the recent average
+# check time (apps/passwords.py). Each process keeps its own numbers.
+@admin.route('/super/password-hashing', methods=['GET'])
+def super_password_hashing():
+    if not is_super_admin():
+        return jsonify({'message': 'Super admin access required'}), 403
+    return jsonify(passwords.stats()), 200
+
 ## @brief Strategic platform-wide analytics for the super admin: KPI pulse,
 # a "needs attention" action queue, growth/engagement trends over a
 # selectable range, content-health signals, and a top-schools-by-activity
@@ -2213,40 +2220,98 @@ def super_analytics():
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
+def filter_super_users_query():
+    """The super-admin user list's filters (role, approved, school_id,
+    search) from the request args, shared by the list and its export."""
+    role = request.args.get('role')
+    school_id = get_optional_school_filter_arg()
+    approved = get_optional_bool_arg('approved')
+    search = request.args.get('search')
+
+    users_query = User.query
+    if role:
+        users_query = users_query.filter(User.type == role)
+    if approved is not None:
+        # NULL approved (legacy rows) blocks login just like False does, so
+        # the pending filter has to catch it too -- see needs_attention.
+        users_query = users_query.filter(
+            User.approved.is_(True) if approved else User.approved.isnot(True)
+        )
+    if school_id:
+        users_query = users_query.join(User_shcool, User.id == User_shcool.user_id).filter(User_shcool.shcool_id == school_id)
+    if search:
+        users_query = users_query.filter(
+            (User.username.ilike(f'%{search}%')) |
+            (User.email.ilike(f'%{search}%'))
+        )
+    return users_query.distinct()
+
 @admin.route('/super/users', methods=['GET'])
 def super_get_users():
     if not is_super_admin():
         return jsonify({'message': 'Super admin access required'}), 403
     try:
-        role = request.args.get('role')
-        school_id = get_optional_school_filter_arg()
-        approved = get_optional_bool_arg('approved')
-        search = request.args.get('search')
-
-        users_query = User.query
-        if role:
-            users_query = users_query.filter(User.type == role)
-        if approved is not None:
-            # NULL approved (legacy rows) blocks login just like False does, so
-            # the pending filter has to catch it too -- see needs_attention.
-            users_query = users_query.filter(
-                User.approved.is_(True) if approved else User.approved.isnot(True)
-            )
-        if school_id:
-            users_query = users_query.join(User_shcool, User.id == User_shcool.user_id).filter(User_shcool.shcool_id == school_id)
-        if search:
-            users_query = users_query.filter(
-                (User.username.ilike(f'%{search}%')) |
-                (User.email.ilike(f'%{search}%'))
-            )
-
-        users_query = users_query.distinct().order_by(User.id.desc())
+        users_query = filter_super_users_query().order_by(User.id.desc())
         return jsonify(paginate_super_admin_query(users_query, serialize_super_user, 'users')), 200
     except ValueError as error:
         return jsonify({'message': str(error)}), 400
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
+SUPER_USER_EXPORT_FIELDS = [
+    'id', 'username', 'email', 'role', 'status', 'confirmed', 'approved', 'is_active',
+    'created_at', 'school_ids', 'school_names', 'suspended_at', 'suspended_by', 'suspended_reason',
+]
+
+def export_super_user_rows(users):
+    # One membership query per batch instead of get_user_schools_for_super's
+    # one per user.
+    schools_by_user = {}
+    memberships = (
+        db.session.query(User_shcool.user_id, Shcool.id, Shcool.name)
+        .join(Shcool, User_shcool.shcool_id == Shcool.id)
+        .filter(User_shcool.user_id.in_([user.id for user in users]))
+        .order_by(Shcool.id)
+    )
+    for user_id, school_id, school_name in memberships:
+        schools_by_user.setdefault(user_id, []).append((school_id, school_name))
+
+    rows = []
+    for user in users:
+        schools = schools_by_user.get(user.id, [])
+        rows.append({
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'role': user.type,
+            'status': 'suspended' if not user.is_active else ('approved' if user.approved else 'pending_approval'),
+            'confirmed': user.confirmed,
+            'approved': user.approved,
+            'is_active': user.is_active,
+            'created_at': user.created_at,
+            'school_ids': [school_id for school_id, _ in schools],
+            'school_names': [name for _, name in schools],
+            'suspended_at': user.suspended_at,
+            'suspended_by': user.suspended_by,
+            'suspended_reason': user.suspended_reason,
+        })
+    return rows
+
+## @brief Every user matching the /super/users filters, streamed as CSV or
+# NDJSON (`format`) -- see apps/exports.py.
+@admin.route('/super/users/export', methods=['GET'])
+def super_export_users():
+    if not is_super_admin():
+        return jsonify({'message': 'Super admin access required'}), 403
+    try:
+        fmt = get_export_format(request.args.get('format'))
+        return export_response(
+            filter_super_users_query(), [User.id], export_super_user_rows,
+            SUPER_USER_EXPORT_FIELDS, 'users', fmt, descending=True,
+        )
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
+
 @admin.route('/super/users', methods=['POST'])
 def super_create_user():
     if not is_super_admin():
@@ -2576,6 +2641,7 @@ def super_suspend_user(user_id):
         user.suspended_at = datetime.now()
         user.suspended_by = current_user.id
         user.suspended_reason = data.get('reason')
+        bump_account_versions(user_ids=[user.id])
         db.session.commit()
 
         log_admin_action('suspend', 'user', user_id, f'reason={user.suspended_reason}')
@@ -2601,6 +2667,7 @@ def super_activate_user(user_id):
         user.suspended_at = None
         user.suspended_by = None
         user.suspended_reason = None
+        bump_account_versions(user_ids=[user.id])
         db.session.commit()
 
         log_admin_action('activate', 'user', user_id)
@@ -2820,6 +2887,8 @@ def super_delete_platform_book(book_id):
         for file_path in story_paths:
             if file_path and os.path.exists(file_path):
                 os.remove(file_path)
+        for story in stories:
+            remove_story_pages(story)
         return jsonify({'message': 'Platform book deleted successfully'}), 200
     except Exception as error:
         db.session.rollback()
@@ -4220,6 +4289,50 @@ def super_get_school_invoices(school_id):
         return jsonify({'message': 'Internal server error'}), 500
 
 
+INVOICE_EXPORT_FIELDS = [
+    'id', 'school_id', 'school_name', 'number', 'status', 'subtotal_cents', 'tax_cents',
+    'total_cents', 'currency', 'seats', 'period_start', 'period_end', 'issued_at', 'due_at',
+    'paid_at', 'hosted_invoice_url', 'invoice_pdf',
+]
+
+
+def export_invoice_rows(invoices):
+    school_names = dict(
+        db.session.query(Shcool.id, Shcool.name)
+        .filter(Shcool.id.in_({invoice.shcool_id for invoice in invoices}))
+    )
+    rows = []
+    for invoice in invoices:
+        row = serialize_school_invoice(invoice)
+        row['school_id'] = invoice.shcool_id
+        row['school_name'] = school_names.get(invoice.shcool_id)
+        rows.append(row)
+    return rows
+
+
+## @brief Invoices across every school (optionally one `school_id` and/or
+# `status`), newest first, streamed as CSV or NDJSON for bookkeeping.
+@admin.route('/super/invoices/export', methods=['GET'])
+def super_export_invoices():
+    if not is_super_admin():
+        return jsonify({'message': 'Super admin access required'}), 403
+    try:
+        fmt = get_export_format(request.args.get('format'))
+        invoices_query = SchoolInvoice.query
+        school_id = get_optional_school_filter_arg()
+        if school_id:
+            invoices_query = invoices_query.filter(SchoolInvoice.shcool_id == school_id)
+        status = request.args.get('status')
+        if status:
+            invoices_query = invoices_query.filter(SchoolInvoice.status == status)
+        return export_response(
+            invoices_query, [SchoolInvoice.id], export_invoice_rows,
+            INVOICE_EXPORT_FIELDS, 'invoices', fmt, descending=True,
+        )
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
+
+
 ## @brief Void an invoice raised in error.
 @admin.route('/super/invoices/<int:invoice_id>/void', methods=['POST'])
 def super_void_invoice(invoice_id):
@@ -4482,6 +4595,21 @@ def serialize_admin_audit_log_entry(entry):
         'created_at': entry.created_at.isoformat() if entry.created_at else None
     }
 
+AUDIT_LOG_EXPORT_FIELDS = [
+    'id', 'created_at', 'actor_id', 'actor_username', 'actor_role',
+    'action', 'target_type', 'target_id', 'details',
+]
+
+def filter_audit_log_query():
+    entries_query = AdminAuditLog.query
+    action = request.args.get('action')
+    if action:
+        entries_query = entries_query.filter(AdminAuditLog.action == action)
+    target_type = request.args.get('target_type')
+    if target_type:
+        entries_query = entries_query.filter(AdminAuditLog.target_type == target_type)
+    return entries_query
+
 ## @brief Read-only feed of admin/assistant/super-admin actions (create, update,
 # delete, approve, suspend, activate) for accountability — see log_admin_action().
 @admin.route('/super/audit-log', methods=['GET'])
@@ -4489,21 +4617,30 @@ def super_get_audit_log():
     if not is_super_admin():
         return jsonify({'message': 'Super admin access required'}), 403
     try:
-        entries_query = AdminAuditLog.query
-        action = request.args.get('action')
-        if action:
-            entries_query = entries_query.filter(AdminAuditLog.action == action)
-        target_type = request.args.get('target_type')
-        if target_type:
-            entries_query = entries_query.filter(AdminAuditLog.target_type == target_type)
-
-        entries_query = entries_query.order_by(AdminAuditLog.created_at.desc())
+        entries_query = filter_audit_log_query().order_by(AdminAuditLog.created_at.desc())
         return jsonify(paginate_super_admin_query(entries_query, serialize_admin_audit_log_entry, 'entries')), 200
     except ValueError as error:
         return jsonify({'message': str(error)}), 400
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
+## @brief The whole filtered audit log, newest first, streamed as CSV or
+# NDJSON. Walked by id rather than created_at: ids are unique and rise with
+# time, so the keyset needs a single column.
+@admin.route('/super/audit-log/export', methods=['GET'])
+def super_export_audit_log():
+    if not is_super_admin():
+        return jsonify({'message': 'Super admin access required'}), 403
+    try:
+        fmt = get_export_format(request.args.get('format'))
+        return export_response(
+            filter_audit_log_query(), [AdminAuditLog.id],
+            lambda entries: [serialize_admin_audit_log_entry(entry) for entry in entries],
+            AUDIT_LOG_EXPORT_FIELDS, 'audit-log', fmt, descending=True,
+        )
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
+
 @admin.route('/super/schools/<int:school_id>/suspend', methods=['POST'])
 def super_suspend_school(school_id):
     if not is_super_admin():
@@ -4518,6 +4655,7 @@ def super_suspend_school(school_id):
         school.suspended_at = datetime.now()
         school.suspended_by = current_user.id
         school.suspended_reason = data.get('reason')
+        bump_account_versions(school_id=school.id)
         db.session.commit()
 
         log_admin_action('suspend', 'school', school_id, f'reason={school.suspended_reason}')
@@ -4543,6 +4681,7 @@ def super_activate_school(school_id):
         school.suspended_at = None
         school.suspended_by = None
         school.suspended_reason = None
+        bump_account_versions(school_id=school.id)
         db.session.commit()
 
         log_admin_action('activate', 'school', school_id)
@@ -8284,7 +8423,13 @@ def upload_admin_book_story(book_id):
         stored_filename = f'{uuid4().hex}.pdf'
         upload_dir = get_story_upload_dir(school_id, book.id)
         saved_file_path = os.path.join(upload_dir, stored_filename)
-        pdf_file.save(saved_file_path)
+        # The pre-check above only refuses early; this reserves the bytes
+        # actually read, atomically, so concurrent uploads cannot both fit
+        # into the school's last few megabytes.
+        file_size, content_sha256 = write_upload(
+            pdf_file, saved_file_path, max_bytes=max_file_size, school_id=school_id,
+            category='books/files'
+        )
 
         story = BookStory(
             book_id=book.id,
@@ -8317,14 +8462,24 @@ def upload_admin_book_story(book_id):
             title=title,
             linked_type='story',
             linked_id=story.id,
-            mime_type=story.mime_type
+            mime_type=story.mime_type,
+            content_sha256=content_sha256,
+            charged=True
         )
+        # Page count, page sizes and thumbnails are worked out after the
+        # commit, off the request.
+        queue_story_pages(story)
         db.session.commit()
 
         return jsonify({
             'message': 'Story uploaded successfully',
             'story': serialize_book_story(story)
         }), 201
+    except StorageError as storage_error:
+        db.session.rollback()
+        if saved_file_path and os.path.exists(saved_file_path):
+            os.remove(saved_file_path)
+        return jsonify({'message': str(storage_error)}), 413
     except Exception as error:
         db.session.rollback()
         if saved_file_path and os.path.exists(saved_file_path):
@@ -8376,6 +8531,7 @@ def delete_admin_book_story(story_id):
         # the freed space are one atomic change.
         delete_by_absolute_path(file_path)
         db.session.commit()
+        remove_story_pages(story)
 
         return jsonify({'message': 'Story deleted successfully'}), 200
     except Exception as error:
@@ -11344,17 +11500,29 @@ def get_scoped_book_ids(book_id_filter=None):
 
 
 def scope_word_sense_query(query, book_id_filter=None):
-    book_ids = get_scoped_book_ids(book_id_filter)
-    if book_ids is None:
-        return query
+    """Restrict a WordSense query to the senses occurring in the books the
+    caller may see.
 
-    sense_ids = [
-        row[0] for row in db.session.query(WordOccurrence.word_sense_id)
+    Built as a nested subquery rather than by materialising the school's book
+    ids and then every matching sense id into Python lists: for a school with
+    a large catalogue those lists became IN (...) clauses with tens of
+    thousands of literals on every queue page."""
+    if can_read_platform():
+        if not book_id_filter:
+            return query
+        book_ids = [book_id_filter]
+    else:
+        allowed = school_book_query().with_entities(Book.id).order_by(None)
+        if book_id_filter:
+            allowed = allowed.filter(Book.id == book_id_filter)
+        allowed = allowed.subquery()
+        book_ids = db.select(allowed.c.id)
+
+    sense_ids = (
+        db.select(WordOccurrence.word_sense_id)
         .join(Chapter, WordOccurrence.chapter_id == Chapter.id)
-        .filter(Chapter.book_id.in_(book_ids))
-        .distinct()
-        .all()
-    ]
+        .where(Chapter.book_id.in_(book_ids))
+    )
     return query.filter(WordSense.id.in_(sense_ids))
 
 
@@ -11419,44 +11587,48 @@ def serialize_word_sense(sense, viewer_school_id=None):
     }
 
 
+def filter_word_sense_queue(status, search, book_id=None):
+    query = filter_word_senses_by_status(WordSense.query, status)
+    if search:
+        query = query.filter(lemma_search_filter(search))
+    return scope_word_sense_query(query, book_id)
+
+
 @admin.route('/word-senses', methods=['GET'])
 @content_endpoint
 def list_word_senses():
+    """The CEFR review queue, ordered by lemma.
+
+    Paged by keyset: pass the `next_cursor` of one response as `cursor` to get
+    the next page. The older `page` parameter still works for frontends that
+    have not moved over, but it pays for an OFFSET scan and a COUNT, so the
+    total is only computed in that mode or when `include_total=true`."""
     try:
         page, per_page = get_super_admin_pagination_params()
         status = request.args.get('status', 'unresolved')
         search = (request.args.get('search') or '').strip().lower()
         book_id = request.args.get('book_id', type=int)
-
-        query = WordSense.query
-
-        if status == 'unresolved':
-            query = query.filter(
-                WordSense.cefr_level.is_(None),
-                WordSense.cefr_override_level.is_(None),
-                WordSense.proper_noun_excluded.is_(False),
+        cursor = decode_cursor(request.args.get('cursor'), (str, int))
+        include_total = get_optional_bool_arg('include_total')
+
+        query = filter_word_sense_queue(status, search, book_id)
+
+        total = None
+        if cursor is None and page > 1:
+            # Legacy page-number mode.
+            total = query.count()
+            senses = (
+                query.order_by(WordSense.lemma, WordSense.id)
+                .offset((page - 1) * per_page)
+                .limit(per_page + 1)
+                .all()
             )
-        elif status == 'excluded':
-            query = query.filter(WordSense.proper_noun_excluded.is_(True))
-        elif status == 'resolved':
-            query = query.filter(or_(
-                WordSense.cefr_level.isnot(None),
-                WordSense.cefr_override_level.isnot(None),
-            ))
-        # status == 'all' -> no extra filter
-
-        if search:
-            query = query.filter(WordSense.lemma.like(f'%{search}%'))
-
-        query = scope_word_sense_query(query, book_id)
-
-        total = query.count()
-        senses = (
-            query.order_by(WordSense.lemma)
-            .offset((page - 1) * per_page)
-            .limit(per_page)
-            .all()
-        )
+            anchor = senses[per_page - 1] if len(senses) > per_page else None
+            senses = senses[:per_page]
+        else:
+            senses, anchor = keyset_page(query, [WordSense.lemma, WordSense.id], per_page, after=cursor)
+            if include_total or (cursor is None and include_total is None):
+                total = query.count()
 
         # Only school admins have a single "own school" whose pending
         # suggestions are worth flagging inline — super admins use the
@@ -11468,6 +11640,7 @@ def list_word_senses():
             'total': total,
             'page': page,
             'per_page': per_page,
+            'next_cursor': encode_cursor(anchor.lemma, anchor.id) if anchor else None,
         }), 200
     except ValueError as error:
         return jsonify({'message': str(error)}), 400
@@ -11475,6 +11648,72 @@ def list_word_senses():
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
 
+
+WORD_SENSE_EXPORT_FIELDS = [
+    'id', 'lemma', 'pos', 'definition', 'synonyms', 'example_sentence', 'cefr_level',
+    'cefr_source', 'cefr_override_level', 'cefr_override_note', 'effective_cefr_level',
+    'proper_noun_excluded', 'is_unresolved', 'occurrence_count', 'book_ids',
+]
+
+
+def export_word_sense_rows(senses):
+    # serialize_word_sense loads every occurrence of every sense; the export
+    # only needs counts and book ids, grouped once per batch.
+    sense_ids = [sense.id for sense in senses]
+    occurrence_counts = dict(
+        db.session.query(WordOccurrence.word_sense_id, func.count(WordOccurrence.id))
+        .filter(WordOccurrence.word_sense_id.in_(sense_ids))
+        .group_by(WordOccurrence.word_sense_id)
+    )
+    book_ids = {}
+    sense_books = (
+        db.session.query(WordOccurrence.word_sense_id, Chapter.book_id)
+        .join(Chapter, WordOccurrence.chapter_id == Chapter.id)
+        .filter(WordOccurrence.word_sense_id.in_(sense_ids))
+        .distinct()
+        .order_by(Chapter.book_id)
+    )
+    for sense_id, book_id in sense_books:
+        book_ids.setdefault(sense_id, []).append(book_id)
+
+    return [{
+        'id': sense.id,
+        'lemma': sense.lemma,
+        'pos': sense.pos,
+        'definition': sense.definition,
+        'synonyms': sense.synonyms,
+        'example_sentence': sense.example_sentence,
+        'cefr_level': sense.cefr_level,
+        'cefr_source': sense.cefr_source,
+        'cefr_override_level': sense.cefr_override_level,
+        'cefr_override_note': sense.cefr_override_note,
+        'effective_cefr_level': sense.effective_cefr_level,
+        'proper_noun_excluded': sense.proper_noun_excluded,
+        'is_unresolved': sense.is_unresolved,
+        'occurrence_count': occurrence_counts.get(sense.id, 0),
+        'book_ids': book_ids.get(sense.id, []),
+    } for sense in senses]
+
+
+@admin.route('/word-senses/export', methods=['GET'])
+@content_endpoint
+def export_word_senses():
+    """The whole CEFR queue for the same `status` / `search` / `book_id`
+    filters, ordered by lemma and streamed as CSV or NDJSON."""
+    try:
+        fmt = get_export_format(request.args.get('format'))
+        query = filter_word_sense_queue(
+            request.args.get('status', 'unresolved'),
+            (request.args.get('search') or '').strip().lower(),
+            request.args.get('book_id', type=int),
+        )
+        return export_response(
+            query, [WordSense.lemma, WordSense.id], export_word_sense_rows,
+            WORD_SENSE_EXPORT_FIELDS, 'word-senses', fmt,
+        )
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
+
 @admin.route('/word-senses/quality', methods=['GET'])
 @content_endpoint
 def word_sense_quality():
@@ -11484,18 +11723,14 @@ def word_sense_quality():
         book_id = request.args.get('book_id', type=int)
         query = scope_word_sense_query(WordSense.query, book_id)
 
-        total = query.count()
-        resolved = query.filter(or_(
-            WordSense.cefr_level.isnot(None),
-            WordSense.cefr_override_level.isnot(None),
-        )).count()
-        excluded = query.filter(WordSense.proper_noun_excluded.is_(True)).count()
-        unresolved = total - resolved - excluded
+        counts = word_sense_status_counts(query)
+        total = counts['total']
+        unresolved = counts['unresolved']
 
         return jsonify({
             'total': total,
-            'resolved': resolved,
-            'proper_noun_excluded': excluded,
+            'resolved': counts['resolved'],
+            'proper_noun_excluded': counts['proper_noun_excluded'],
             'unresolved': unresolved,
             'unresolved_rate': round(unresolved / total, 4) if total else 0,
         }), 200
@@ -11860,6 +12095,23 @@ def get_scoped_school_ids(school_id_filter=None):
     return allowed
 
 
+def filter_reader_progress_query(search, school_id=None):
+    school_ids = get_scoped_school_ids(school_id)
+
+    query = Reader.query
+    if school_ids is not None:
+        # A subquery, not a list of ids: a large school made this an IN
+        # clause with one literal per member.
+        reader_ids = db.select(User_shcool.user_id).where(User_shcool.shcool_id.in_(school_ids))
+        query = query.filter(Reader.id.in_(reader_ids))
+    if search:
+        query = query.filter(or_(
+            Reader.username.like('%' + search + '%'),
+            Reader.email.like('%' + search + '%'),
+        ))
+    return query
+
+
 @admin.route('/reader-progress', methods=['GET'])
 @content_endpoint
 def list_reader_progress():
@@ -11868,20 +12120,7 @@ def list_reader_progress():
         search = (request.args.get('search') or '').strip().lower()
         school_id = request.args.get('school_id', type=int)
 
-        school_ids = get_scoped_school_ids(school_id)
-
-        query = Reader.query
-        if school_ids is not None:
-            reader_ids = [
-                m.user_id for m in User_shcool.query.filter(User_shcool.shcool_id.in_(school_ids)).all()
-            ]
-            query = query.filter(Reader.id.in_(reader_ids))
-        if search:
-            query = query.filter(or_(
-                Reader.username.like('%' + search + '%'),
-                Reader.email.like('%' + search + '%'),
-            ))
-
+        query = filter_reader_progress_query(search, school_id)
         total = query.count()
         readers = (
             query.order_by(Reader.username)
@@ -11901,6 +12140,31 @@ def list_reader_progress():
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
+
+READER_PROGRESS_EXPORT_FIELDS = [
+    'user_id', 'username', 'email', 'guessed_or_better', 'mastered', 'current_streak',
+    'best_streak', 'achievements_earned', 'words_i_know_count',
+]
+
+
+## @brief The reader-progress list in full, streamed as CSV or NDJSON. Each
+# row is still a per-reader summary (see serialize_reader_progress), so this
+# is the slowest of the exports, but memory stays at one batch.
+@admin.route('/reader-progress/export', methods=['GET'])
+@content_endpoint
+def export_reader_progress():
+    try:
+        fmt = get_export_format(request.args.get('format'))
+        search = (request.args.get('search') or '').strip().lower()
+        query = filter_reader_progress_query(search, request.args.get('school_id', type=int))
+        return export_response(
+            query, [Reader.username, Reader.id],
+            lambda readers: [serialize_reader_progress(reader) for reader in readers],
+            READER_PROGRESS_EXPORT_FIELDS, 'reader-progress', fmt,
+        )
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
+
 '''
 
 Show all teacher postulate
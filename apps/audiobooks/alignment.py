@@ -1,11 +1,19 @@
 import difflib
 import glob
+import logging
 import os
 import re
 import shutil
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
+from multiprocessing import get_context
+from threading import Lock
 
+import numpy as np
+
+from apps.audiobooks import alignment_cache
+from apps.storage import file_sha256
 from config import ConfigClass
 
 
@@ -20,6 +28,20 @@ CLAUSE_END_CHARS = SENTENCE_END_CHARS + (',', ';', ':')
 DEFAULT_SENTENCE_PAUSE_MS = 700
 DEFAULT_LINE_BREAK_PAUSE_MS = 1200
 
+## @brief Sample rate of the audio whisper.load_audio returns.
+WHISPER_SAMPLE_RATE = 16000
+
+## @brief Energy VAD used to cut long pages into windows (find_speech_windows).
+VAD_FRAME_MS = 30
+VAD_MIN_SILENCE_MS = 300
+VAD_PADDING_MS = 150
+VAD_MAX_PACKED_GAP_MS = 2000
+## A frame is speech when its RMS clears this fraction of the loud (95th
+# percentile) frames, and never below the absolute floor, so a quiet but clean
+# recording is not all silence and a noisy one is not all speech.
+VAD_RELATIVE_THRESHOLD = 0.1
+VAD_ABSOLUTE_FLOOR = 0.003
+
 
 class AudioAlignmentUnavailable(RuntimeError):
     pass
@@ -516,6 +538,185 @@ def run_openai_whisper_segment_fallback(model, audio, language=None):
     return fallback_result
 
 
+def transcribe_audio(whisper, model, audio, model_metadata, language=None, options=None):
+    """Transcribe one array with the timestamped retries, falling back to
+    segment-level timings on the infinite-logprob failure. Returns
+    (transcript_result, model_metadata)."""
+    try:
+        return transcribe_with_timestamped_retries(
+            whisper,
+            model,
+            audio,
+            language=language,
+            options=options,
+        ), model_metadata
+    except Exception as error:
+        if is_infinite_logprob_error(error):
+            fallback_metadata = dict(model_metadata)
+            fallback_metadata.update({
+                'provider': 'openai-whisper-segment-fallback',
+                'fallbackFrom': 'whisper-timestamped',
+                'warning': INTERPOLATED_TIMING_WARNING,
+            })
+            return run_openai_whisper_segment_fallback(model, audio, language=language), fallback_metadata
+        raise AudioAlignmentError(f'Unable to generate model alignment: {error}') from error
+
+
+def find_speech_windows(audio, max_window_seconds, sample_rate=WHISPER_SAMPLE_RATE):
+    """Cut `audio` into (start, end) sample ranges of at most
+    `max_window_seconds`, each starting and ending in silence where the audio
+    allows it. Long silences (music beds, page-turn pauses) are left out."""
+    frame = max(1, sample_rate * VAD_FRAME_MS // 1000)
+    frame_count = len(audio) // frame
+    if frame_count == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = np.asarray(audio[:frame_count * frame], dtype=np.float32).reshape(frame_count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    threshold = max(float(np.percentile(rms, 95)) * VAD_RELATIVE_THRESHOLD, VAD_ABSOLUTE_FLOOR)
+    voiced = np.flatnonzero(rms >= threshold)
+    if not len(voiced):
+        return []
+
+    # Speech regions: voiced frames, bridging pauses shorter than a silence.
+    min_gap = max(1, VAD_MIN_SILENCE_MS // VAD_FRAME_MS)
+    breaks = np.flatnonzero(np.diff(voiced) > min_gap)
+    region_starts = np.concatenate(([voiced[0]], voiced[breaks + 1]))
+    region_ends = np.concatenate((voiced[breaks], [voiced[-1]])) + 1
+
+    padding = VAD_PADDING_MS // VAD_FRAME_MS
+    max_frames = max(1, int(max_window_seconds * 1000) // VAD_FRAME_MS)
+    regions = []
+    for region_start, region_end in zip(region_starts, region_ends):
+        start = max(int(region_start) - padding, regions[-1][1] if regions else 0)
+        end = min(int(region_end) + padding, frame_count)
+        # A region too long for one window is cut at its quietest frame in
+        # the last quarter of the window, where a breath is likeliest.
+        while end - start > max_frames:
+            search_from = start + max_frames * 3 // 4
+            cut = search_from + int(np.argmin(rms[search_from:start + max_frames]))
+            regions.append((start, cut))
+            start = cut
+        regions.append((start, end))
+
+    # Neighbouring regions share a window while it stays within the limit and
+    # the pause between them is short; a long one is left out entirely.
+    max_packed_gap = VAD_MAX_PACKED_GAP_MS // VAD_FRAME_MS
+    packed = []
+    for start, end in regions:
+        if packed and end - packed[-1][0] <= max_frames and start - packed[-1][1] <= max_packed_gap:
+            packed[-1][1] = end
+        else:
+            packed.append([start, end])
+    last_sample = len(audio)
+    return [(start * frame, last_sample if end == frame_count else end * frame) for start, end in packed]
+
+
+def offset_transcript(transcript_result, offset_seconds):
+    """A copy of a window's transcript with every timestamp moved by
+    `offset_seconds`, so it reads against the whole page."""
+    def shift(item):
+        shifted = dict(item)
+        for key in ('start', 'end'):
+            if shifted.get(key) is not None:
+                shifted[key] = seconds_to_float(shifted[key]) + offset_seconds
+        return shifted
+
+    segments = []
+    for segment in transcript_result.get('segments') or []:
+        shifted = shift(segment)
+        shifted['words'] = [shift(word) for word in segment.get('words') or []]
+        segments.append(shifted)
+    return segments
+
+
+def merge_window_transcripts(window_results, offsets_seconds, model_metadata):
+    """One transcript and model metadata for a page transcribed in windows."""
+    segments = []
+    fallback_windows = 0
+    for (result, metadata), offset_seconds in zip(window_results, offsets_seconds):
+        segments.extend(offset_transcript(result, offset_seconds))
+        if metadata.get('fallbackFrom'):
+            fallback_windows += 1
+
+    merged_metadata = dict(model_metadata)
+    merged_metadata['chunks'] = len(window_results)
+    if fallback_windows:
+        merged_metadata.update({
+            'fallbackChunks': fallback_windows,
+            'warning': INTERPOLATED_TIMING_WARNING,
+        })
+    languages = [result.get('language') for result, _ in window_results if result.get('language')]
+    return {
+        'text': ' '.join(str(segment.get('text') or '').strip() for segment in segments).strip(),
+        'segments': segments,
+        'language': languages[0] if languages else None,
+    }, merged_metadata
+
+
+def transcribe_window(model_name, device, audio, model_metadata, language=None, options=None):
+    """One window of a chunked transcription. Runs in a pool worker, which
+    loads (and keeps) its own copy of the model."""
+    import whisper_timestamped as whisper
+
+    model = get_whisper_timestamped_model(model_name, device)
+    return transcribe_audio(whisper, model, audio, model_metadata, language=language, options=options)
+
+
+_window_pool = None
+_window_pool_pid = None
+_window_pool_lock = Lock()
+
+
+def get_window_pool(workers):
+    global _window_pool, _window_pool_pid
+    with _window_pool_lock:
+        if _window_pool is None or _window_pool_pid != os.getpid():
+            # spawn, not fork: a forked copy of a process that already holds
+            # torch threads can deadlock.
+            _window_pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            _window_pool_pid = os.getpid()
+        return _window_pool
+
+
+def should_chunk_transcription(audio, options=None):
+    options = options or {}
+    if options.get('chunked') is not None:
+        return bool(options.get('chunked'))
+    chunk_seconds = ConfigClass.AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS
+    return bool(chunk_seconds) and len(audio) > chunk_seconds * WHISPER_SAMPLE_RATE
+
+
+def run_chunked_transcription(audio, model_name, device, model_metadata, language=None, options=None):
+    """Transcribe `audio` window by window (see find_speech_windows) and stitch
+    the words back onto the page's timeline. Windows run in a process pool of
+    AUDIOBOOK_ALIGNMENT_WORKERS, or in this process with one worker."""
+    windows = find_speech_windows(audio, ConfigClass.AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS or 30)
+    if not windows:
+        raise AudioAlignmentError('No speech was detected in the page audio')
+    options = {key: value for key, value in (options or {}).items() if key != 'chunked'}
+    workers = max(1, ConfigClass.AUDIOBOOK_ALIGNMENT_WORKERS)
+    arguments = [
+        (model_name, device, audio[start:end], model_metadata, language, options)
+        for start, end in windows
+    ]
+    if workers == 1 or len(windows) == 1:
+        window_results = [transcribe_window(*argument) for argument in arguments]
+    else:
+        pool = get_window_pool(workers)
+        window_results = [future.result() for future in [pool.submit(transcribe_window, *argument)
+                                                         for argument in arguments]]
+    offsets = [start / WHISPER_SAMPLE_RATE for start, _ in windows]
+    return merge_window_transcripts(window_results, offsets, model_metadata)
+
+
+def get_model_settings(options=None):
+    options = options or {}
+    model_name = options.get('model') or ConfigClass.AUDIOBOOK_ALIGNMENT_MODEL
+    device = options.get('device') or ConfigClass.AUDIOBOOK_ALIGNMENT_DEVICE
+    return model_name, device
+
+
 def run_whisper_timestamped(audio_path, language=None, options=None):
     if not audio_path or not os.path.exists(audio_path):
         raise AudioAlignmentError('Audio file is missing')
@@ -530,9 +731,7 @@ def run_whisper_timestamped(audio_path, language=None, options=None):
         ) from error
 
     options = options or {}
-    model_name = options.get('model') or ConfigClass.AUDIOBOOK_ALIGNMENT_MODEL
-    device = options.get('device') or ConfigClass.AUDIOBOOK_ALIGNMENT_DEVICE
-    model = get_whisper_timestamped_model(model_name, device)
+    model_name, device = get_model_settings(options)
 
     try:
         audio = whisper.load_audio(audio_path)
@@ -550,28 +749,40 @@ def run_whisper_timestamped(audio_path, language=None, options=None):
         'device': device,
     }
 
+    if should_chunk_transcription(audio, options):
+        return run_chunked_transcription(audio, model_name, device, metadata, language=language, options=options)
+
+    model = get_whisper_timestamped_model(model_name, device)
+    return transcribe_audio(whisper, model, audio, metadata, language=language, options=options)
+
+
+def transcribe_page_audio(audio_path, language=None, options=None):
+    """run_whisper_timestamped through the transcript cache (see
+    apps/audiobooks/alignment_cache.py): identical audio with the same model
+    settings is transcribed once."""
+    if not alignment_cache.enabled(options) or not audio_path or not os.path.exists(audio_path):
+        return run_whisper_timestamped(audio_path, language=language, options=options)
+
+    model_name, device = get_model_settings(options)
+    audio_sha256 = file_sha256(audio_path)
+    key = alignment_cache.cache_key(audio_sha256, model_name, device, language=language, options=options)
+    cached = alignment_cache.load(key)
+    if cached is not None:
+        return cached
+
+    transcript_result, model_metadata = run_whisper_timestamped(audio_path, language=language, options=options)
     try:
-        return transcribe_with_timestamped_retries(
-            whisper,
-            model,
-            audio,
-            language=language,
-            options=options,
-        ), metadata
-    except Exception as error:
-        if is_infinite_logprob_error(error):
-            fallback_metadata = dict(metadata)
-            fallback_metadata.update({
-                'provider': 'openai-whisper-segment-fallback',
-                'fallbackFrom': 'whisper-timestamped',
-                'warning': INTERPOLATED_TIMING_WARNING,
-            })
-            return run_openai_whisper_segment_fallback(model, audio, language=language), fallback_metadata
-        raise AudioAlignmentError(f'Unable to generate model alignment: {error}') from error
+        alignment_cache.store(
+            key, transcript_result, model_metadata,
+            audioSha256=audio_sha256, model=model_name, device=device, language=language,
+        )
+    except (OSError, TypeError, ValueError) as error:
+        logging.warning('Caching the transcript of %s failed: %s', audio_path, error)
+    return transcript_result, model_metadata
 
 
 def generate_model_alignment(audio_path, official_text=None, audio_duration_ms=None, language=None, options=None):
-    transcript_result, model_metadata = run_whisper_timestamped(
+    transcript_result, model_metadata = transcribe_page_audio(
         audio_path,
         language=language,
         options=options
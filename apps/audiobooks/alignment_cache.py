@@ -0,0 +1,175 @@
+## @file
+# @brief On-disk cache of Whisper transcripts for audiobook page audio.
+#
+# Transcription is the expensive step of model alignment -- seconds to minutes
+# of CPU per page -- and it depends only on the audio and the model settings.
+# Re-running "generate alignment" on an unchanged page, fixing a page's
+# official text, or copying an audiobook to another school (same recordings)
+# used to repeat it every time.
+#
+# Each transcript is now stored under a key made from the audio's SHA-256, the
+# model name and device, the language and the options that change the result
+# (vad, chunking). The alignment itself is rebuilt from the cached transcript
+# against the page's current official text, which takes milliseconds, so a
+# text edit still hits the cache.
+#
+# Entries are gzipped JSON files in AUDIOBOOK_ALIGNMENT_CACHE_DIR, sharded by
+# the first two hex digits of the key. A hit refreshes the file's mtime and a
+# write evicts the least recently used entries until the cache fits in
+# AUDIOBOOK_ALIGNMENT_CACHE_MB (0 disables the cache). A request can skip it
+# with `cache: false`. scripts/alignment_cache.py prewarms, lists and prunes.
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from uuid import uuid4
+
+from apps.storage import STAGING_PREFIX, file_sha256
+from config import ConfigClass
+
+## @brief Bump when the entry layout or what goes into the key changes; older
+# entries then simply stop matching and age out.
+CACHE_FORMAT_VERSION = 1
+ENTRY_SUFFIX = '.json.gz'
+
+## @brief Transcription options that change the transcript. Anything else in
+# the request options (`cache` itself) is not part of the key.
+KEYED_OPTIONS = ('vad', 'chunked')
+
+
+def cache_dir():
+    return os.path.abspath(ConfigClass.AUDIOBOOK_ALIGNMENT_CACHE_DIR)
+
+
+def cache_limit_bytes():
+    return max(0, ConfigClass.AUDIOBOOK_ALIGNMENT_CACHE_MB) * 1024 * 1024
+
+
+def enabled(options=None):
+    return cache_limit_bytes() > 0 and (options or {}).get('cache') is not False
+
+
+def cache_key(audio_sha256, model_name, device, language=None, options=None):
+    options = options or {}
+    material = {
+        'format': CACHE_FORMAT_VERSION,
+        'audio': audio_sha256,
+        'model': model_name,
+        'device': device,
+        'language': language or None,
+        'options': {name: options.get(name) for name in KEYED_OPTIONS if options.get(name) is not None},
+        # Whether a page is chunked by default depends on this setting.
+        'chunkSeconds': ConfigClass.AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def page_cache_key(audio_path, model_name, device, language=None, options=None):
+    return cache_key(file_sha256(audio_path), model_name, device, language=language, options=options)
+
+
+def entry_path(key):
+    return os.path.join(cache_dir(), key[:2], key + ENTRY_SUFFIX)
+
+
+def load(key):
+    """(transcript_result, model_metadata) cached under `key`, or None."""
+    path = entry_path(key)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            entry = json.load(handle)
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logging.warning('Discarding unreadable alignment cache entry %s: %s', key, error)
+        remove(key)
+        return None
+    metadata = dict(entry.get('modelMetadata') or {})
+    metadata['cached'] = True
+    return entry.get('transcript') or {}, metadata
+
+
+def store(key, transcript_result, model_metadata, **details):
+    """Write an entry, then evict down to the size limit. `details` (audio
+    hash, model, ...) are kept for listing only."""
+    path = entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = dict(details)
+    entry.update({
+        'version': CACHE_FORMAT_VERSION,
+        'key': key,
+        'createdAt': datetime.now().isoformat(),
+        'transcript': transcript_result,
+        'modelMetadata': model_metadata,
+    })
+    temp_path = os.path.join(os.path.dirname(path), STAGING_PREFIX + uuid4().hex)
+    try:
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as handle:
+            json.dump(entry, handle, separators=(',', ':'), default=str)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    evict()
+    return path
+
+
+def remove(key):
+    try:
+        os.remove(entry_path(key))
+        return True
+    except OSError:
+        return False
+
+
+def entries():
+    """Every entry as (key, size, last used timestamp), least recently used
+    first."""
+    found = []
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return found
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if not entry.name.endswith(ENTRY_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            found.append((entry.name[:-len(ENTRY_SUFFIX)], stat.st_size, stat.st_mtime))
+    found.sort(key=lambda item: item[2])
+    return found
+
+
+def read_details(key):
+    with gzip.open(entry_path(key), 'rt', encoding='utf-8') as handle:
+        entry = json.load(handle)
+    entry.pop('transcript', None)
+    return entry
+
+
+def evict(limit_bytes=None):
+    """Delete least recently used entries until the cache fits. Returns the
+    number removed."""
+    limit_bytes = cache_limit_bytes() if limit_bytes is None else limit_bytes
+    current = entries()
+    total = sum(size for _, size, _ in current)
+    removed = 0
+    for key, size, _ in current:
+        if total <= limit_bytes:
+            break
+        if remove(key):
+            total -= size
+            removed += 1
+    return removed
+
+
+def clear():
+    shutil.rmtree(cache_dir(), ignore_errors=True)
@@ -0,0 +1,234 @@
+## @file
+# @brief Immutable reader bundles for published audiobooks.
+#
+# Opening a book in the reader used to serialize every page from the database,
+# each with its full alignment_json -- per-word dicts carrying the review
+# metadata, model details and confidence the reader never uses -- on every
+# open. Publishing now writes that reader view once, as a versioned JSON file
+# under the book owner's storage folder, served by the public /media route
+# with a year-long cache and ETags. A republish writes a new version under a
+# new name, so a cached copy is never stale: the book payload points readers
+# at the current one.
+#
+# Alignment is stored columnar (see encode_alignment): parallel arrays of word
+# texts, delta-encoded start times, durations and status codes, which shrink
+# well and are cheap for the player to walk. Each bundle is written alongside
+# gzip (and, when the brotli module is installed, brotli) copies, which the
+# media route hands to clients that accept them.
+import gzip
+import json
+import os
+import shutil
+from uuid import uuid4
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    ## Optional: without it bundles are precompressed with gzip only.
+    brotli = None
+
+from apps.storage import (
+    STAGING_PREFIX,
+    absolute_path,
+    owner_folder,
+    public_url,
+    relative_path_from_absolute,
+    storage_root,
+)
+
+## @brief Layout version of the bundle file itself, independent of the
+# per-book publish version. Bump when the shape below changes.
+BUNDLE_FORMAT = 1
+
+## @brief Position in this tuple is the status code stored in a bundle.
+# Append only: reordering would misread every existing bundle.
+WORD_STATUS_CODES = ('matched', 'interpolated', 'unmatched', 'manually-edited', 'not-spoken')
+
+## @brief (Content-Encoding, file suffix) of each precompressed copy, in the
+# order the media route prefers them.
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+BUNDLE_FOLDER = 'audio-books/bundles'
+
+
+def encode_alignment(alignment):
+    """The reader half of an alignment_json, columnar.
+
+    `start` holds each timed word's start as the difference from the previous
+    timed word's start, `duration` its end minus its start; both are null for
+    a word without timings (a not-spoken word). `index` is omitted when the
+    word indexes are simply 0..n-1. Review data, the transcript, model
+    details and per-word confidence are left out."""
+    if not isinstance(alignment, dict):
+        return None
+    words = alignment.get('words') or []
+    texts, starts, durations, statuses, indexes, breaks = [], [], [], [], [], []
+    previous_start = 0
+    for position, word in enumerate(words):
+        texts.append(word.get('text') or '')
+        statuses.append(WORD_STATUS_CODES.index(word.get('status')))
+        indexes.append(int(word.get('index', position)))
+        if word.get('lineBreakAfter'):
+            breaks.append(position)
+        start_ms, end_ms = word.get('startMs'), word.get('endMs')
+        if start_ms is None or end_ms is None:
+            starts.append(None)
+            durations.append(None)
+            continue
+        start_ms, end_ms = int(start_ms), int(end_ms)
+        starts.append(start_ms - previous_start)
+        durations.append(end_ms - start_ms)
+        previous_start = start_ms
+
+    encoded = {
+        'officialText': alignment.get('officialText'),
+        'audioDurationMs': alignment.get('audioDurationMs'),
+        'text': texts,
+        'start': starts,
+        'duration': durations,
+        'status': statuses,
+        'lineBreakAfter': breaks,
+    }
+    if indexes != list(range(len(indexes))):
+        encoded['index'] = indexes
+    return encoded
+
+
+def decode_alignment(encoded):
+    """Inverse of encode_alignment: the word dicts the player works with."""
+    if not encoded:
+        return None
+    indexes = encoded.get('index') or range(len(encoded['text']))
+    breaks = set(encoded.get('lineBreakAfter') or [])
+    words = []
+    previous_start = 0
+    for position, (index, text, start, duration, status) in enumerate(zip(
+        indexes, encoded['text'], encoded['start'], encoded['duration'], encoded['status'],
+    )):
+        word = {
+            'index': index,
+            'text': text,
+            'startMs': None,
+            'endMs': None,
+            'status': WORD_STATUS_CODES[status],
+            'lineBreakAfter': position in breaks,
+        }
+        if start is not None:
+            previous_start += start
+            word['startMs'] = previous_start
+            word['endMs'] = previous_start + duration
+        words.append(word)
+    return {
+        'officialText': encoded.get('officialText'),
+        'audioDurationMs': encoded.get('audioDurationMs'),
+        'words': words,
+    }
+
+
+def build_bundle(book, pages, version):
+    """The reader's view of a published book: what reader_get_audio_book
+    returns minus the per-reader progress and the editorial fields."""
+    return {
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'audio_book': {
+            'id': book.id,
+            'title': book.title,
+            'description': book.description,
+            'cover_image_url': f'/reader/audio-books/{book.id}/cover' if book.cover_image_path else None,
+            'language': book.language,
+            'level': book.level,
+            'category': book.category,
+            'book_id': book.book_id,
+            'school_id': book.shcool_id,
+            'published_at': book.published_at.isoformat() if book.published_at else None,
+            'pages_count': len(pages),
+        },
+        'word_statuses': list(WORD_STATUS_CODES),
+        'pages': [
+            {
+                'id': page.id,
+                'page_number': page.page_number,
+                'image_url': (
+                    f'/reader/audio-books/{book.id}/pages/{page.page_number}/image'
+                    if page.image_path else None
+                ),
+                'audio_url': (
+                    f'/reader/audio-books/{book.id}/pages/{page.page_number}/audio'
+                    if page.audio_path else None
+                ),
+                'official_text': page.official_text,
+                'language': page.language,
+                'audio_duration_ms': page.audio_duration_ms,
+                'image_position': page.image_position or 'above',
+                'font_size': page.font_size or 18,
+                'image_mime_type': page.image_mime_type,
+                'audio_mime_type': page.audio_mime_type,
+                'alignment': encode_alignment(page.alignment_json),
+            }
+            for page in pages
+        ],
+    }
+
+
+def bundle_directory(book):
+    return os.path.join(storage_root(), owner_folder(book.shcool_id), *BUNDLE_FOLDER.split('/'), str(book.id))
+
+
+def _write_atomically(destination, payload):
+    temp_path = os.path.join(os.path.dirname(destination), STAGING_PREFIX + uuid4().hex)
+    try:
+        with open(temp_path, 'wb') as handle:
+            handle.write(payload)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_bundle(book, pages):
+    """Write the next bundle version for `book` and point the book at it.
+
+    The compressed copies land before the plain file, so anyone who can see
+    the bundle can also see them. Does not commit; on a failed commit the
+    caller removes the files with remove_bundle_files(path)."""
+    version = (book.bundle_version or 0) + 1
+    payload = json.dumps(build_bundle(book, pages, version), separators=(',', ':'),
+                         ensure_ascii=False).encode('utf-8')
+    directory = bundle_directory(book)
+    os.makedirs(directory, exist_ok=True)
+    destination = os.path.join(directory, f'audio-book-{book.id}-v{version}-{uuid4().hex}.json')
+
+    variants = {'.gz': gzip.compress(payload, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(payload)
+    for suffix, compressed in variants.items():
+        _write_atomically(destination + suffix, compressed)
+    _write_atomically(destination, payload)
+
+    book.bundle_version = version
+    book.bundle_path = relative_path_from_absolute(destination)
+    return book.bundle_path
+
+
+def remove_bundle_files(relative_path):
+    if not relative_path:
+        return
+    path = absolute_path(relative_path)
+    for candidate in [path] + [path + suffix for _, suffix in PRECOMPRESSED_VARIANTS]:
+        if os.path.exists(candidate):
+            os.remove(candidate)
+
+
+def remove_all_bundles(book):
+    """On unpublish: withdraw every version, then forget the pointer. The
+    version counter is kept so a later publish never reuses a number."""
+    shutil.rmtree(bundle_directory(book), ignore_errors=True)
+    book.bundle_path = None
+
+
+def serialize_bundle(book):
+    if not getattr(book, 'bundle_path', None):
+        return None
+    return {'version': book.bundle_version, 'url': public_url(book.bundle_path)}
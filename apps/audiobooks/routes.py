@@ -5,18 +5,24 @@ from datetime import datetime, timezone
 from functools import wraps
 from uuid import uuid4
 
-from flask import Blueprint, abort, current_app, jsonify, request, send_file
+from flask import Blueprint, abort, current_app, jsonify, request
 from flask_login import current_user, login_required
 from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
 from apps.audiobooks.alignment import generate_model_alignment
+from apps.audiobooks.bundles import remove_all_bundles, remove_bundle_files, serialize_bundle, write_bundle
+from apps.audiobooks.waveform import analyse_page_audio, remove_peaks, resolve_peaks
+from apps.image_variants import VARIANT_FORMATS, parse_variant_request, queue_variants, resolve_variant
+from apps.protected_files import send_protected_file
+from apps.progress_buffer import audio_book_progress_buffer, ensure_flusher, write_behind_enabled
 from apps.storage import (
     assert_within_quota,
     category_dir,
     delete_by_absolute_path,
     register_existing_file,
+    write_upload,
 )
 from config import ConfigClass
 from extensions import db
@@ -390,13 +396,21 @@ def get_audio_book_upload_dir(book, asset):
     return category_dir(book.shcool_id, AUDIO_BOOK_STORAGE_CATEGORIES[asset])
 
 
-def save_uploaded_file(file_storage, upload_dir, prefix):
+## @brief Stream an asset into its bucket through the shared atomic upload
+# stage, so a dropped connection never leaves a truncated page audio behind
+# under a real name.
+#
+# @return (saved_file_path, original_filename, content_sha256)
+def save_uploaded_file(file_storage, upload_dir, prefix, max_mb=None, school_id=None, category=None,
+                       replaces_bytes=0):
     original_filename = secure_filename(file_storage.filename)
     extension = get_file_extension(file_storage)
     stored_filename = f'{prefix}-{uuid4().hex}.{extension}'
     saved_file_path = os.path.join(upload_dir, stored_filename)
-    file_storage.save(saved_file_path)
-    return saved_file_path, original_filename
+    max_bytes = max_mb * 1024 * 1024 if max_mb else None
+    _, content_sha256 = write_upload(file_storage, saved_file_path, max_bytes=max_bytes, school_id=school_id,
+                                     category=category, replaces_bytes=replaces_bytes)
+    return saved_file_path, original_filename, content_sha256
 
 
 def remove_file_if_exists(file_path):
@@ -661,9 +675,11 @@ def superseded_size(old_path):
 
 
 ## @brief Index a saved audiobook asset and drop the index row of the file it
-# replaced, keeping the school's usage figure honest across a re-upload.
+# replaced, keeping the school's usage figure honest across a re-upload. The
+# asset's size was already reserved against the quota when it was written
+# (save_uploaded_file with its category).
 def reindex_audio_book_asset(book, asset, saved_file_path, old_path, file_storage,
-                             linked_type, linked_id, title=None):
+                             linked_type, linked_id, title=None, content_sha256=None):
     if old_path:
         delete_by_absolute_path(old_path)
     return register_existing_file(
@@ -675,7 +691,9 @@ def reindex_audio_book_asset(book, asset, saved_file_path, old_path, file_storag
         title=title,
         linked_type=linked_type,
         linked_id=linked_id,
-        mime_type=file_storage.mimetype or None
+        mime_type=file_storage.mimetype or None,
+        content_sha256=content_sha256,
+        charged=True
     )
 
 
@@ -687,14 +705,19 @@ def save_cover_image(book):
         raise ValueError('Only jpg, jpeg, png, or webp cover images are allowed')
     file_size = validate_upload_size(cover_file, ConfigClass.MAX_AUDIOBOOK_IMAGE_UPLOAD_MB, 'Cover image')
     old_path = book.cover_image_path
-    assert_within_quota(book.shcool_id, file_size, replaces_bytes=superseded_size(old_path))
-    saved_file_path, _ = save_uploaded_file(cover_file, get_audio_book_upload_dir(book, 'cover'), 'cover')
+    replaces_bytes = superseded_size(old_path)
+    assert_within_quota(book.shcool_id, file_size, replaces_bytes=replaces_bytes)
+    saved_file_path, _, content_sha256 = save_uploaded_file(
+        cover_file, get_audio_book_upload_dir(book, 'cover'), 'cover',
+        max_mb=ConfigClass.MAX_AUDIOBOOK_IMAGE_UPLOAD_MB, school_id=book.shcool_id,
+        category=AUDIO_BOOK_STORAGE_CATEGORIES['cover'], replaces_bytes=replaces_bytes
+    )
     book.cover_image_path = saved_file_path
     book.cover_image_url = f'/admin/audio-books/{book.id}/cover'
-    reindex_audio_book_asset(
+    queue_variants(reindex_audio_book_asset(
         book, 'cover', saved_file_path, old_path, cover_file,
-        'audio_book', book.id, title=book.title
-    )
+        'audio_book', book.id, title=book.title, content_sha256=content_sha256
+    ))
     return saved_file_path
 
 
@@ -706,16 +729,22 @@ def save_page_image(book, page):
         raise ValueError('Only jpg, jpeg, png, or webp page images are allowed')
     file_size = validate_upload_size(image_file, ConfigClass.MAX_AUDIOBOOK_IMAGE_UPLOAD_MB, 'Page image')
     old_path = page.image_path
-    assert_within_quota(book.shcool_id, file_size, replaces_bytes=superseded_size(old_path))
-    saved_file_path, _ = save_uploaded_file(image_file, get_audio_book_upload_dir(book, 'image'), 'image')
+    replaces_bytes = superseded_size(old_path)
+    assert_within_quota(book.shcool_id, file_size, replaces_bytes=replaces_bytes)
+    saved_file_path, _, content_sha256 = save_uploaded_file(
+        image_file, get_audio_book_upload_dir(book, 'image'), 'image',
+        max_mb=ConfigClass.MAX_AUDIOBOOK_IMAGE_UPLOAD_MB, school_id=book.shcool_id,
+        category=AUDIO_BOOK_STORAGE_CATEGORIES['image'], replaces_bytes=replaces_bytes
+    )
     page.image_path = saved_file_path
     page.image_url = f'/admin/audio-books/{book.id}/pages/{page.id}/image'
     page.image_mime_type = image_file.mimetype or None
     page.image_file_size = file_size
-    reindex_audio_book_asset(
+    queue_variants(reindex_audio_book_asset(
         book, 'image', saved_file_path, old_path, image_file,
-        'audio_book_page', page.id, title='%s p.%s' % (book.title or 'Audiobook', page.page_number)
-    )
+        'audio_book_page', page.id, title='%s p.%s' % (book.title or 'Audiobook', page.page_number),
+        content_sha256=content_sha256
+    ))
     return saved_file_path
 
 
@@ -727,16 +756,26 @@ def save_page_audio(book, page):
         raise ValueError('Only mp3, wav, m4a, webm, or ogg audio files are allowed')
     file_size = validate_upload_size(audio_file, ConfigClass.MAX_AUDIOBOOK_AUDIO_UPLOAD_MB, 'Audio')
     old_path = page.audio_path
-    assert_within_quota(book.shcool_id, file_size, replaces_bytes=superseded_size(old_path))
-    saved_file_path, _ = save_uploaded_file(audio_file, get_audio_book_upload_dir(book, 'audio'), 'audio')
+    replaces_bytes = superseded_size(old_path)
+    assert_within_quota(book.shcool_id, file_size, replaces_bytes=replaces_bytes)
+    saved_file_path, _, content_sha256 = save_uploaded_file(
+        audio_file, get_audio_book_upload_dir(book, 'audio'), 'audio',
+        max_mb=ConfigClass.MAX_AUDIOBOOK_AUDIO_UPLOAD_MB, school_id=book.shcool_id,
+        category=AUDIO_BOOK_STORAGE_CATEGORIES['audio'], replaces_bytes=replaces_bytes
+    )
     page.audio_path = saved_file_path
     page.audio_url = f'/admin/audio-books/{book.id}/pages/{page.id}/audio'
     page.audio_mime_type = audio_file.mimetype or None
     page.audio_file_size = file_size
-    reindex_audio_book_asset(
+    remove_peaks(old_path)
+    audio_record = reindex_audio_book_asset(
         book, 'audio', saved_file_path, old_path, audio_file,
-        'audio_book_page', page.id, title='%s p.%s' % (book.title or 'Audiobook', page.page_number)
+        'audio_book_page', page.id, title='%s p.%s' % (book.title or 'Audiobook', page.page_number),
+        content_sha256=content_sha256
     )
+    # Exact duration and the editor's waveform, decoded once here rather than
+    # in every browser that opens the page.
+    analyse_page_audio(page, audio_record)
     return saved_file_path
 
 
@@ -765,7 +804,8 @@ def mark_audio_book_draft_for_content_change(book):
 def get_audio_book_progress(book_id):
     if not current_user.is_authenticated:
         return None
-    return AudioBookProgress.query.filter_by(user_id=current_user.id, audio_book_id=book_id).first()
+    progress = AudioBookProgress.query.filter_by(user_id=current_user.id, audio_book_id=book_id).first()
+    return audio_book_progress_buffer.overlay(progress)
 
 
 def serialize_progress(progress):
@@ -821,6 +861,8 @@ def serialize_audio_book_page(page, role='admin', include_alignment=True):
     }
     if include_alignment:
         data['alignment_json'] = page.alignment_json
+    if role != 'reader' and page.audio_path:
+        data['waveform_url'] = audio_url.rsplit('/', 1)[0] + '/waveform'
     return data
 
 
@@ -879,6 +921,9 @@ def serialize_audio_book(book, include_pages=False, role='admin'):
     }
     if role == 'reader':
         data['progress'] = serialize_progress(get_audio_book_progress(book.id))
+        data['bundle'] = serialize_bundle(book)
+    elif getattr(book, 'bundle_path', None):
+        data['bundle_version'] = book.bundle_version
     if include_pages:
         data['pages'] = [serialize_audio_book_page(page, role=role) for page in pages]
     return data
@@ -1135,6 +1180,10 @@ def parse_model_alignment_options():
         options['device'] = str(data.get('device')).strip()
     if 'vad' in data:
         options['vad'] = parse_bool_value(data.get('vad'), default=None)
+    if 'chunked' in data:
+        options['chunked'] = parse_bool_value(data.get('chunked'), default=None)
+    if 'cache' in data:
+        options['cache'] = parse_bool_value(data.get('cache'), default=None)
     return options
 
 
@@ -1293,9 +1342,22 @@ def reader_audio_books_query():
 
 
 def media_response(file_path, mimetype, missing_message):
-    if not file_path or not os.path.exists(file_path):
-        return jsonify({'message': missing_message}), 404
-    return send_file(file_path, mimetype=mimetype, as_attachment=False)
+    return send_protected_file(file_path, mimetype=mimetype, missing_message=missing_message)
+
+
+## @brief An audiobook image, or its resized copy when the request asks for
+# one with `?w=` (see apps/image_variants.py).
+def image_response(file_path, mimetype, missing_message):
+    variant = parse_variant_request(request.args, request.accept_mimetypes)
+    if variant and file_path:
+        width, fmt, negotiated = variant
+        variant_path = resolve_variant(file_path, width, fmt)
+        if variant_path:
+            response = send_protected_file(variant_path, mimetype=VARIANT_FORMATS[fmt])
+            if negotiated:
+                response.vary.add('Accept')
+            return response
+    return media_response(file_path, mimetype, missing_message)
 
 
 def handle_create_book(role):
@@ -1660,12 +1722,20 @@ def handle_publish_book(book_id, publish=True, role='admin'):
                 return jsonify({'message': 'Audiobook cannot be published', 'errors': errors}), 400
             book.status = 'published'
             book.published_at = datetime.now()
+            # Every publish writes a new immutable reader bundle version.
+            written_bundle = write_bundle(book, approved_pages_query(book).all())
             message = 'Audiobook published successfully'
         else:
             book.status = 'draft'
             book.published_at = None
+            remove_all_bundles(book)
             message = 'Audiobook unpublished successfully'
-        db.session.commit()
+        try:
+            db.session.commit()
+        except Exception:
+            if publish:
+                remove_bundle_files(written_bundle)
+            raise
         return jsonify({'message': message, 'audio_book': serialize_audio_book(book, include_pages=True, role=role)}), 200
     except ValueError as error:
         db.session.rollback()
@@ -1684,18 +1754,36 @@ def handle_media(book_id, page_id, media_type, role='admin'):
         if not page:
             return jsonify({'message': 'Audiobook page not found'}), 404
         if media_type == 'image':
-            return media_response(page.image_path, page.image_mime_type, 'Page image file not found')
+            return image_response(page.image_path, page.image_mime_type, 'Page image file not found')
         return media_response(page.audio_path, page.audio_mime_type, 'Page audio file not found')
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
 
+def handle_waveform(book_id, page_id):
+    try:
+        book = get_manageable_audio_book(book_id)
+        if not book:
+            return jsonify({'message': 'Audiobook not found'}), 404
+        page = get_book_page(book, page_id)
+        if not page:
+            return jsonify({'message': 'Audiobook page not found'}), 404
+        if not page.audio_path or not os.path.isfile(page.audio_path):
+            return jsonify({'message': 'Page audio file not found'}), 404
+        peaks_file = resolve_peaks(page.audio_path)
+        if not peaks_file:
+            return jsonify({'message': 'Waveform is not available; FFmpeg could not decode the page audio'}), 503
+        return send_protected_file(peaks_file, mimetype='application/json')
+    except Exception as error:
+        return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
+
+
 def handle_cover(book_id):
     try:
         book = get_manageable_audio_book(book_id)
         if not book:
             return jsonify({'message': 'Audiobook not found'}), 404
-        return media_response(book.cover_image_path, None, 'Cover image file not found')
+        return image_response(book.cover_image_path, None, 'Cover image file not found')
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
@@ -1834,6 +1922,13 @@ def admin_get_audio_book_page_audio(book_id, page_id):
     return handle_media(book_id, page_id, 'audio', 'admin')
 
 
+@admin_audiobooks.route('/audio-books/<int:book_id>/pages/<int:page_id>/waveform', methods=['GET'])
+@login_required
+@admin_required
+def admin_get_audio_book_page_waveform(book_id, page_id):
+    return handle_waveform(book_id, page_id)
+
+
 @teacher_audiobooks.route('/audio-books', methods=['POST'])
 @login_required
 @teacher_required
@@ -1967,6 +2062,13 @@ def teacher_get_audio_book_page_audio(book_id, page_id):
     return handle_media(book_id, page_id, 'audio', 'teacher')
 
 
+@teacher_audiobooks.route('/audio-books/<int:book_id>/pages/<int:page_id>/waveform', methods=['GET'])
+@login_required
+@teacher_required
+def teacher_get_audio_book_page_waveform(book_id, page_id):
+    return handle_waveform(book_id, page_id)
+
+
 @reader_audiobooks.route('/audio-books', methods=['GET'])
 @login_required
 def reader_list_audio_books():
@@ -1988,7 +2090,14 @@ def reader_get_audio_book(book_id):
         book = AudioBook.query.filter_by(id=book_id, active=True).first()
         if not reader_can_access_audio_book(book):
             return jsonify({'message': 'Audiobook not found'}), 404
-        return jsonify({'audio_book': serialize_audio_book(book, include_pages=True, role='reader')}), 200
+        # A player that reads the published bundle (audio_book.bundle.url)
+        # asks for include_pages=false and gets just the book and progress.
+        include_pages = parse_bool_value(request.args.get('include_pages'), default=True)
+        if include_pages is False and not book.bundle_path:
+            include_pages = True
+        return jsonify({'audio_book': serialize_audio_book(book, include_pages=include_pages, role='reader')}), 200
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
@@ -2021,7 +2130,7 @@ def reader_get_audio_book_cover(book_id):
         book = AudioBook.query.filter_by(id=book_id, active=True).first()
         if not reader_can_access_audio_book(book):
             return jsonify({'message': 'Audiobook not found'}), 404
-        return media_response(book.cover_image_path, None, 'Cover image file not found')
+        return image_response(book.cover_image_path, None, 'Cover image file not found')
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
@@ -2061,7 +2170,7 @@ def reader_get_audio_book_page_image(book_id, page_number):
         ).first()
         if not page:
             return jsonify({'message': 'Audiobook page not found'}), 404
-        return media_response(page.image_path, page.image_mime_type, 'Page image file not found')
+        return image_response(page.image_path, page.image_mime_type, 'Page image file not found')
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
@@ -2095,13 +2204,9 @@ def reader_update_audio_book_progress(book_id):
             return jsonify({'message': 'Audiobook not found'}), 404
         data = get_request_data()
 
-        progress = AudioBookProgress.query.filter_by(user_id=current_user.id, audio_book_id=book.id).first()
-        if not progress:
-            progress = AudioBookProgress(user_id=current_user.id, audio_book_id=book.id)
-            db.session.add(progress)
-
+        values = {}
         if 'current_page_number' in data or 'currentPageNumber' in data:
-            progress.current_page_number = get_positive_int(
+            values['current_page_number'] = get_positive_int(
                 data.get('current_page_number') or data.get('currentPageNumber'),
                 'current_page_number'
             )
@@ -2109,12 +2214,31 @@ def reader_update_audio_book_progress(book_id):
             current_time_ms = int(data.get('current_time_ms') or data.get('currentTimeMs') or 0)
             if current_time_ms < 0:
                 return jsonify({'message': 'current_time_ms must be greater than or equal to 0'}), 400
-            progress.current_time_ms = current_time_ms
+            values['current_time_ms'] = current_time_ms
+        now = datetime.now()
+        key = (current_user.id, book.id)
+
+        progress = AudioBookProgress.query.filter_by(user_id=current_user.id, audio_book_id=book.id).first()
+        if progress and 'completed' not in data and write_behind_enabled():
+            # A plain position report on an existing row: buffered, written
+            # with the next batch (apps/progress_buffer.py).
+            audio_book_progress_buffer.record(key, values, now)
+            ensure_flusher()
+            return jsonify({'progress': serialize_progress(audio_book_progress_buffer.overlay(progress))}), 200
+
+        if not progress:
+            progress = AudioBookProgress(user_id=current_user.id, audio_book_id=book.id)
+            db.session.add(progress)
+        # This write supersedes anything still buffered for the row.
+        for field, value in (audio_book_progress_buffer.take(key) or {}).items():
+            setattr(progress, field, value)
+        for field, value in values.items():
+            setattr(progress, field, value)
         if 'completed' in data:
             progress.completed = parse_bool_value(data.get('completed'), default=False)
             if progress.completed and not progress.completed_at:
-                progress.completed_at = datetime.now()
-        progress.updated_at = datetime.now()
+                progress.completed_at = now
+        progress.updated_at = now
         db.session.commit()
         return jsonify({'progress': serialize_progress(progress)}), 200
     except ValueError as error:
@@ -0,0 +1,221 @@
+## @file
+# @brief Exact duration and waveform peaks for audiobook page audio.
+#
+# The alignment editor needs a page's duration and a waveform to review word
+# timings against. The duration used to be whatever the client reported (or
+# the end of the last transcribed word), and the browser had to download and
+# decode the whole recording before it could draw anything.
+#
+# Uploading page audio now decodes it once with ffmpeg -- already required for
+# alignment -- to mono 16-bit PCM at DECODE_SAMPLE_RATE. The sample count gives
+# the exact duration, which replaces the reported one, and min/max peaks are
+# written next to the audio as `<audio name>.peaks.json`:
+#
+#     {"version": 1, "sampleRate": 8000, "durationMs": 61250, "bits": 8,
+#      "levels": [{"samplesPerPeak": 80, "data": [min0, max0, min1, max1, ...]},
+#                 {"samplesPerPeak": 320, ...}, {"samplesPerPeak": 1280, ...}]}
+#
+# Peaks are signed 8-bit. The finest level is one pair per 10 ms, enough to see
+# word gaps when zoomed in; the coarser ones draw the whole page without
+# touching every point. The file is indexed as a variant of the audio (charged,
+# hidden from the storage listing, deleted with it). Audio uploaded before this
+# existed gets its peaks on the first editor request for them.
+import json
+import logging
+import os
+import subprocess
+import threading
+from array import array
+from uuid import uuid4
+
+from apps.audiobooks.alignment import AudioAlignmentUnavailable, ensure_ffmpeg_available
+from apps.storage import (
+    STAGING_PREFIX,
+    VARIANT_LINK,
+    is_inside_storage,
+    register_existing_file,
+    relative_path_from_absolute,
+    remove_from_disk,
+)
+from extensions import db
+from models.school_file import SchoolFile
+
+PEAKS_FORMAT_VERSION = 1
+PEAKS_SUFFIX = '.peaks.json'
+DECODE_SAMPLE_RATE = 8000
+
+## @brief Samples per min/max pair at each level, finest first. Each is a
+# multiple of the one before, so coarser levels are folded from the finest.
+PEAK_LEVELS = (80, 320, 1280)
+
+DECODE_CHUNK_BYTES = 64 * 1024
+DECODE_TIMEOUT_SECONDS = 120
+
+
+def peaks_path(audio_path):
+    return audio_path + PEAKS_SUFFIX
+
+
+def _fold(pairs, factor):
+    folded = []
+    for start in range(0, len(pairs), factor * 2):
+        group = pairs[start:start + factor * 2]
+        folded.append(min(group[0::2]))
+        folded.append(max(group[1::2]))
+    return folded
+
+
+def compute_peaks(pcm_chunks, sample_rate=DECODE_SAMPLE_RATE, levels=PEAK_LEVELS):
+    """Peaks document for mono signed 16-bit little-endian PCM, read chunk by
+    chunk so a long recording is never held in memory whole."""
+    finest = levels[0]
+    pairs = []
+    samples = array('h')
+    leftover = b''
+    sample_count = 0
+    for chunk in pcm_chunks:
+        chunk = leftover + chunk
+        usable = len(chunk) - len(chunk) % 2
+        leftover = chunk[usable:]
+        samples.frombytes(chunk[:usable])
+        sample_count += usable // 2
+        whole = len(samples) - len(samples) % finest
+        for start in range(0, whole, finest):
+            window = samples[start:start + finest]
+            pairs.append(min(window) >> 8)
+            pairs.append(max(window) >> 8)
+        del samples[:whole]
+    if samples:
+        pairs.append(min(samples) >> 8)
+        pairs.append(max(samples) >> 8)
+
+    peaks = [{'samplesPerPeak': finest, 'data': pairs}]
+    for samples_per_peak in levels[1:]:
+        peaks.append({
+            'samplesPerPeak': samples_per_peak,
+            'data': _fold(pairs, samples_per_peak // finest),
+        })
+    return {
+        'version': PEAKS_FORMAT_VERSION,
+        'sampleRate': sample_rate,
+        'durationMs': int(round(sample_count * 1000 / sample_rate)),
+        'bits': 8,
+        'levels': peaks,
+    }
+
+
+def _decode(audio_path):
+    ffmpeg = ensure_ffmpeg_available()
+    command = [
+        ffmpeg, '-v', 'error', '-nostdin', '-i', audio_path,
+        '-ac', '1', '-ar', str(DECODE_SAMPLE_RATE), '-f', 's16le', '-',
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # stderr is drained on its own thread so a chatty decoder cannot block on
+    # a full pipe while we read stdout.
+    errors = []
+    reader = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    reader.start()
+    try:
+        while True:
+            chunk = process.stdout.read(DECODE_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+        process.wait(timeout=DECODE_TIMEOUT_SECONDS)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        reader.join(timeout=1)
+    if process.returncode != 0:
+        message = (errors[0] if errors else b'').decode('utf-8', 'replace').strip()
+        raise ValueError('ffmpeg could not decode %s: %s' % (os.path.basename(audio_path), message))
+
+
+def write_peaks(audio_path):
+    """Decode `audio_path` and write its peaks file. Returns the peaks
+    document; raises AudioAlignmentUnavailable without ffmpeg and ValueError
+    for audio ffmpeg cannot read."""
+    peaks = compute_peaks(_decode(audio_path))
+    destination = peaks_path(audio_path)
+    temp_path = os.path.join(os.path.dirname(destination), STAGING_PREFIX + uuid4().hex)
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump(peaks, handle, separators=(',', ':'))
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return peaks
+
+
+def index_peaks(audio_record, audio_path):
+    """Index the peaks file as a variant of the audio's row (uncommitted)."""
+    if audio_record is None or not is_inside_storage(audio_path):
+        return None
+    return register_existing_file(
+        audio_record.shcool_id, audio_record.category, peaks_path(audio_path),
+        uploaded_by=audio_record.uploaded_by,
+        original_filename='%s (waveform)' % audio_record.original_filename,
+        linked_type=VARIANT_LINK, linked_id=audio_record.id,
+        mime_type='application/json',
+    )
+
+
+## @brief Analyse a page's freshly saved audio: exact duration onto the page,
+# peaks file written and indexed. Does not commit.
+#
+# An upload is never refused over this: without ffmpeg, or for audio it cannot
+# decode, the reported duration is kept and the peaks are left to be made on
+# first request.
+def analyse_page_audio(page, audio_record):
+    try:
+        peaks = write_peaks(page.audio_path)
+    except (AudioAlignmentUnavailable, ValueError, OSError, subprocess.SubprocessError) as error:
+        logging.warning('Waveform analysis of audiobook page %s failed: %s', page.id, error)
+        return None
+    page.audio_duration_ms = peaks['durationMs']
+    index_peaks(audio_record, page.audio_path)
+    return peaks
+
+
+def remove_peaks(audio_path):
+    if audio_path:
+        remove_from_disk(peaks_path(audio_path))
+
+
+## @brief Striped locks, so two editors opening the same page decode it once.
+_peaks_locks = [threading.Lock() for _ in range(16)]
+
+
+def resolve_peaks(audio_path):
+    """Path of the peaks file for `audio_path`, written now if missing, or None
+    when it cannot be made here."""
+    if not audio_path or not os.path.isfile(audio_path):
+        return None
+    destination = peaks_path(audio_path)
+    if os.path.isfile(destination):
+        return destination
+    with _peaks_locks[hash(destination) % len(_peaks_locks)]:
+        if not os.path.isfile(destination):
+            try:
+                write_peaks(audio_path)
+            except (AudioAlignmentUnavailable, ValueError, OSError, subprocess.SubprocessError) as error:
+                logging.warning('Waveform analysis of %s failed: %s', audio_path, error)
+                return None
+            if is_inside_storage(audio_path):
+                _index_on_demand(audio_path)
+    return destination
+
+
+def _index_on_demand(audio_path):
+    record = SchoolFile.query.filter_by(relative_path=relative_path_from_absolute(audio_path)).first()
+    if record is None:
+        return
+    try:
+        index_peaks(record, audio_path)
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        logging.warning('Indexing the waveform of %s failed: %s', audio_path, error)
@@ -0,0 +1,70 @@
+## @file
+# @brief Work handed to a small thread pool once the current transaction
+# commits: rendering image copies after an upload, indexing a story PDF.
+#
+# run_after_commit only records the job on the session. If the transaction
+# commits the job is submitted; if it rolls back the job is dropped, so a
+# worker never goes looking for a row that was never written. Each job runs in
+# its own app context with its own session, and is expected to commit its own
+# work; a failure is logged and rolled back, never raised to the request.
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import event
+
+from config import ConfigClass
+from extensions import db
+
+_PENDING_KEY = 'after_commit_jobs'
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, ConfigClass.BACKGROUND_JOB_WORKERS), thread_name_prefix='background'
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run_job(app, job, args):
+    with app.app_context():
+        try:
+            job(*args)
+        except Exception as error:
+            db.session.rollback()
+            logging.warning('Background job %s%r failed: %s', job.__name__, args, error)
+        finally:
+            db.session.remove()
+
+
+def run_after_commit(job, *args):
+    """Call job(*args) in the background once the current transaction
+    commits. The same job with the same arguments is queued once."""
+    pending = db.session.info.setdefault(_PENDING_KEY, [])
+    if (job, args) not in pending:
+        pending.append((job, args))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _submit_pending(session):
+    jobs = session.info.pop(_PENDING_KEY, None)
+    if jobs:
+        app = current_app._get_current_object()
+        executor = _get_executor()
+        for job, args in jobs:
+            executor.submit(_run_job, app, job, args)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_pending(session):
+    session.info.pop(_PENDING_KEY, None)
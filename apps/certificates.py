@@ -8,8 +8,9 @@
 # Issuance is idempotent: the (user_id, milestone_key) unique constraint means
 # calling any of these functions repeatedly never creates a duplicate. That
 # lets us both hook issuance into gameplay (cheaply, off the already-computed
-# unlocked-achievements list) and reconcile lazily when the passport is viewed
-# or bulk-backfilled — without double-issuing.
+# unlocked-achievements list) and reconcile whenever a passport snapshot is
+# rebuilt or bulk-backfilled — without double-issuing. Newly issued
+# certificates are pushed into the reader's passport snapshot.
 from models.book import Book
 from models.certificate import Certificate
 from extensions import db
@@ -78,7 +79,9 @@ def issue_certificates_from_unlocked(user_id, unlocked):
 
     if issued:
         db.session.commit()
-    return [serialize_certificate(certificate) for certificate in issued]
+    serialized = [serialize_certificate(certificate) for certificate in issued]
+    _note_issued(user_id, serialized)
+    return serialized
 
 
 def issue_certificates_for_user(user_id, commit=True):
@@ -88,7 +91,7 @@ def issue_certificates_for_user(user_id, commit=True):
     read those rows directly rather than recomputing rollups/completion — cheap
     (O(achievements)), and correct for readers who earned milestones before
     certificates existed. Used by the backfill script and as a safety net when
-    the passport is viewed. Pass commit=False to let a caller (e.g. a dry-run
+    a passport snapshot is rebuilt. Pass commit=False to let a caller (e.g. a dry-run
     backfill) flush-and-rollback instead of persisting."""
     from models.word_progress import UserAchievement
 
@@ -120,7 +123,17 @@ def issue_certificates_for_user(user_id, commit=True):
             db.session.commit()
         else:
             db.session.flush()
-    return [serialize_certificate(certificate) for certificate in issued]
+    serialized = [serialize_certificate(certificate) for certificate in issued]
+    if commit:
+        _note_issued(user_id, serialized)
+    return serialized
+
+
+def _note_issued(user_id, serialized):
+    # Local import: the passport snapshot module builds on this one.
+    if serialized:
+        from apps.reader_passport import note_certificates
+        note_certificates(user_id, serialized)
 
 
 def serialize_certificate(certificate):
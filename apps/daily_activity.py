@@ -0,0 +1,69 @@
+## @file
+# @brief Per-reader daily activity counters (models/user_daily_activity.py).
+#
+# The writers -- submit_attempt and the game-result / practice-play routes --
+# call add_daily_activity inside their own transaction, so a counter moves
+# exactly when the row it counts is committed. The readers get a day or a
+# range of days as a handful of primary-key rows.
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models.user_daily_activity import UserDailyActivity
+
+COUNTERS = ('words_practiced', 'words_distinct', 'words_mastered', 'games_played', 'score_sum', 'time_spent_seconds')
+
+
+## @brief Add to one reader's counters for one day, creating the row on first
+# use.
+#
+# An in-place `column = column + delta` UPDATE, so concurrent requests for the
+# same reader and day serialise on the row lock instead of overwriting each
+# other. The row is only inserted when the UPDATE found nothing, in a
+# savepoint, so losing the race to a concurrent first insert just means
+# running the UPDATE against the row the other request created (the same
+# pattern as apps/storage.py's usage counters).
+def add_daily_activity(user_id, day, **deltas):
+    deltas = {name: value for name, value in deltas.items() if value}
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError('unknown activity counter(s): %s' % ', '.join(sorted(unknown)))
+    if not user_id or day is None or not deltas:
+        return
+
+    values = {name: getattr(UserDailyActivity, name) + value for name, value in deltas.items()}
+    values['updated_at'] = datetime.now()
+    statement = (
+        update(UserDailyActivity)
+        .where(UserDailyActivity.user_id == user_id, UserDailyActivity.day == day)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(statement).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserDailyActivity(user_id=user_id, day=day, **deltas))
+    except IntegrityError:
+        db.session.execute(statement)
+
+
+def get_daily_activity(user_id, day):
+    return db.session.get(UserDailyActivity, (user_id, day))
+
+
+def get_daily_activity_range(user_id, start_date, end_date):
+    """The reader's rows for `start_date`..`end_date` inclusive, by day.
+    Days with no activity have no row."""
+    return (
+        UserDailyActivity.query
+        .filter(
+            UserDailyActivity.user_id == user_id,
+            UserDailyActivity.day >= start_date,
+            UserDailyActivity.day <= end_date,
+        )
+        .order_by(UserDailyActivity.day)
+        .all()
+    )
@@ -0,0 +1,233 @@
+## @file
+# @brief Resized copies of uploaded images (covers, pack images, avatars,
+# audiobook page illustrations), so a phone rendering a thumbnail is not sent
+# a 10 MB original.
+#
+# Each raster image gets WebP and JPEG copies at the VARIANT_WIDTHS narrower
+# than itself, written next to the original as `<original name>.w<width>.<fmt>`
+# and indexed as their own SchoolFile rows (linked_type VARIANT_LINK, linked_id
+# the original's id), so they count toward the school's usage and are deleted
+# with the original.
+#
+# They are made off the request: save_upload and the audiobook asset upload
+# queue the new row, and once the upload's transaction commits a small thread
+# pool renders the copies. Anything that was never queued -- files from before
+# this existed, or written by a path that does not queue -- is rendered on the
+# first request that asks for it and kept, so each copy is made once.
+#
+# A client asks for a copy with `?w=<width>` on the file's URL, which also
+# fits srcset (`.../cover.png?w=320 320w, .../cover.png?w=640 640w`). The
+# width is rounded up to the next VARIANT_WIDTHS step and the format follows
+# the Accept header (WebP where supported) unless `fmt=` names one. Without
+# Pillow installed no copies are made and the original is always served.
+import logging
+import os
+import re
+import threading
+from uuid import uuid4
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    ## Optional: without Pillow the originals are served unresized.
+    Image = None
+    ImageOps = None
+
+from apps.background import run_after_commit
+from apps.storage import (
+    STAGING_PREFIX,
+    VARIANT_LINK,
+    absolute_path,
+    is_inside_storage,
+    is_legacy_record,
+    register_existing_file,
+    relative_path_from_absolute,
+)
+from extensions import db
+from models.school_file import SchoolFile
+
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+
+## @brief Variant formats by file suffix, with their MIME type.
+VARIANT_FORMATS = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+## @brief Originals worth resizing. SVG scales by itself; GIF would lose its
+# animation.
+SOURCE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp', 'bmp'}
+
+VARIANT_NAME_PATTERN = re.compile(r'\.w\d+\.(?:%s)$' % '|'.join(VARIANT_FORMATS))
+
+
+def available():
+    return Image is not None
+
+
+def is_variant_source(file_path):
+    name = os.path.basename(file_path or '')
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    return extension in SOURCE_EXTENSIONS and not VARIANT_NAME_PATTERN.search(name)
+
+
+def variant_path(source_path, width, fmt):
+    return '%s.w%d.%s' % (source_path, width, fmt)
+
+
+def snap_width(requested):
+    """The VARIANT_WIDTHS step that covers `requested`, or None when it is
+    wider than every step (the original is the right answer)."""
+    for width in VARIANT_WIDTHS:
+        if requested <= width:
+            return width
+    return None
+
+
+def parse_variant_request(args, accept_mimetypes):
+    """(width, fmt, negotiated) for a request's `w`/`fmt` args, or None when
+    it does not ask for a variant. `negotiated` is True when the format came
+    from the Accept header, so the response has to Vary on it."""
+    try:
+        requested = int(args.get('w') or 0)
+    except (TypeError, ValueError):
+        return None
+    width = snap_width(requested) if requested > 0 else None
+    if not width:
+        return None
+    fmt = (args.get('fmt') or '').lower().replace('jpeg', 'jpg')
+    if fmt in VARIANT_FORMATS:
+        return width, fmt, False
+    # Only an explicit image/webp counts: browsers without WebP support still
+    # send image/* or */*.
+    webp = any(value.lower() == 'image/webp' and quality > 0 for value, quality in accept_mimetypes)
+    return width, ('webp' if webp else 'jpg'), True
+
+
+def _write_image(image, destination, fmt):
+    temp_path = os.path.join(os.path.dirname(destination), STAGING_PREFIX + uuid4().hex)
+    try:
+        if fmt == 'jpg':
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.split()[-1])
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.save(temp_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(temp_path, 'WEBP', quality=WEBP_QUALITY, method=4)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def render_variants(source_path, widths=VARIANT_WIDTHS, formats=tuple(VARIANT_FORMATS)):
+    """Write the missing copies of one image. Returns [(path, width, fmt)] for
+    every copy that exists afterwards; widths at or above the original's are
+    skipped."""
+    if not available() or not is_variant_source(source_path) or not os.path.isfile(source_path):
+        return []
+    written = []
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        for width in widths:
+            if width >= original.width:
+                continue
+            height = max(1, round(original.height * width / original.width))
+            resized = None
+            for fmt in formats:
+                destination = variant_path(source_path, width, fmt)
+                if not os.path.exists(destination):
+                    if resized is None:
+                        resized = original.resize((width, height), Image.LANCZOS)
+                    _write_image(resized, destination, fmt)
+                written.append((destination, width, fmt))
+    return written
+
+
+def index_variants(record, variants):
+    """Index rendered copies of `record` (uncommitted)."""
+    for path, width, fmt in variants:
+        register_existing_file(
+            record.shcool_id, record.category, path,
+            uploaded_by=record.uploaded_by,
+            original_filename='%s (%dw)' % (record.original_filename, width),
+            linked_type=VARIANT_LINK, linked_id=record.id,
+            mime_type=VARIANT_FORMATS[fmt],
+        )
+
+
+def generate_variants(record):
+    """Render and index every copy of an indexed image. Does not commit."""
+    if is_legacy_record(record):
+        return 0
+    variants = render_variants(absolute_path(record.relative_path))
+    index_variants(record, variants)
+    return len(variants)
+
+
+# ---------------------------------------------------------------------------
+# Background rendering
+# ---------------------------------------------------------------------------
+
+def _render_job(file_id):
+    record = db.session.get(SchoolFile, file_id)
+    if record is not None and record.active:
+        generate_variants(record)
+        db.session.commit()
+
+
+def queue_variants(record):
+    """Render `record`'s copies once the current transaction commits."""
+    if not available() or record is None or not is_variant_source(record.stored_filename):
+        return
+    run_after_commit(_render_job, record.id)
+
+
+# ---------------------------------------------------------------------------
+# Serving
+# ---------------------------------------------------------------------------
+
+## @brief Striped locks, so two requests for the same missing copy render it
+# once without keeping a lock per file ever asked for.
+_render_locks = [threading.Lock() for _ in range(32)]
+
+
+def _render_lock(source_path):
+    return _render_locks[hash(source_path) % len(_render_locks)]
+
+
+def _index_on_demand(source_path, variants):
+    record = SchoolFile.query.filter_by(relative_path=relative_path_from_absolute(source_path)).first()
+    if record is None:
+        return
+    try:
+        index_variants(record, variants)
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        logging.warning('Indexing image variants of %s failed: %s', source_path, error)
+
+
+def resolve_variant(source_path, width, fmt):
+    """The copy of `source_path` to serve for (width, fmt): the existing file,
+    one rendered now (and kept, and indexed when the original is), or None to
+    serve the original."""
+    if not is_variant_source(source_path):
+        return None
+    destination = variant_path(source_path, width, fmt)
+    if os.path.isfile(destination):
+        return destination
+    if not available():
+        return None
+    with _render_lock(source_path):
+        if not os.path.isfile(destination):
+            variants = render_variants(source_path, widths=(width,), formats=(fmt,))
+            if not variants:
+                return None
+            if is_inside_storage(source_path):
+                _index_on_demand(source_path, variants)
+    return destination
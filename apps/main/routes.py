@@ -9,7 +9,7 @@ import logging
 from models.book import Book
 from models.book_pack import Book_pack
 from models.session import Session
-from models.user import User,Teacher
+from models.user import Teacher
 from models.follow_pack import Follow_pack
 from models.pack import Pack,StatusEnum
 from models.code import Code, StatusEnum as CodeStatusEnum
@@ -30,20 +30,6 @@ mail =Mail()
 login_manager.init_app(main)
 
 
-## @brief User loader function for the login manager.
-#
-# This function is used by the login manager to load a user from the database based on the provided `user_id`.
-# The function queries the `User` model to retrieve the user with the specified `user_id` using `User.query.get(int(user_id))`.
-# The loaded user will be used for authentication and authorization purposes.
-#
-# @param user_id: The unique identifier of the user.
-# @return: The user object corresponding to the provided `user_id`.
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-
 ## @brief Route for searching books with specific title and author.
 #
 # This route allows users to search for books with a specific `title` and `author`.
@@ -13,14 +13,34 @@
 # goes through apps.storage.absolute_path, which refuses anything resolving
 # outside the storage root. Without that a `..` in the URL would turn this into
 # an arbitrary-file read of the server.
+import mimetypes
 import os
 
-from flask import Blueprint, jsonify, send_file
+from flask import Blueprint, jsonify, request, send_file
 
-from apps.storage import MEDIA_URL_PREFIX, StorageError, absolute_path
+from apps.audiobooks.bundles import PRECOMPRESSED_VARIANTS
+from apps.image_variants import VARIANT_FORMATS, parse_variant_request, resolve_variant
+from apps.storage import MEDIA_URL_PREFIX, StorageError, absolute_path, storage_root
+from apps.story_pages import is_legacy_page_path
 
 media = Blueprint('media', __name__, url_prefix=MEDIA_URL_PREFIX)
 
+## @brief File types that may have precompressed siblings (`<name>.br`,
+# `<name>.gz`) written next to them -- today the audiobook reader bundles.
+# Limited to these so serving an image or an audio file costs no extra stat.
+PRECOMPRESSED_EXTENSIONS = ('.json',)
+
+
+def precompressed_variant(file_path):
+    """The best precompressed copy of `file_path` this client accepts, as
+    (path, content-encoding), or (None, None) to serve the file itself."""
+    if not file_path.endswith(PRECOMPRESSED_EXTENSIONS):
+        return None, None
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        if request.accept_encodings[encoding] and os.path.isfile(file_path + suffix):
+            return file_path + suffix, encoding
+    return None, None
+
 
 ## @brief Serve one stored file.
 #
@@ -33,13 +53,37 @@ def serve_media(relative_path):
     except StorageError:
         return jsonify({'message': 'File not found'}), 404
 
-    if not os.path.isfile(file_path):
+    # Story page cuts written here before they moved to STORY_PAGES_DIR have
+    # guessable names and belong behind /reader/stories/<id>/pages/<n>.
+    if not os.path.isfile(file_path) or is_legacy_page_path(os.path.relpath(file_path, storage_root())):
         return jsonify({'message': 'File not found'}), 404
 
+    # `?w=` asks for a resized copy of an image (apps/image_variants.py); a
+    # file that cannot have one is served as is.
+    resized = parse_variant_request(request.args, request.accept_mimetypes)
+    if resized:
+        width, fmt, negotiated = resized
+        resized_path = resolve_variant(file_path, width, fmt)
+        if resized_path:
+            response = send_file(resized_path, mimetype=VARIANT_FORMATS[fmt], as_attachment=False,
+                                 conditional=True)
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            if negotiated:
+                response.vary.add('Accept')
+            return response
+
     # conditional=True gives us ETag/If-None-Match and, importantly for the
     # audiobook player, HTTP Range support -- without it a browser cannot seek
     # within an audio file, it can only replay from the start.
-    response = send_file(file_path, as_attachment=False, conditional=True)
+    variant_path, encoding = precompressed_variant(file_path)
+    if variant_path:
+        response = send_file(variant_path, mimetype=mimetypes.guess_type(file_path)[0],
+                             as_attachment=False, conditional=True)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(file_path, as_attachment=False, conditional=True)
+    if file_path.endswith(PRECOMPRESSED_EXTENSIONS):
+        response.vary.add('Accept-Encoding')
     # These files are immutable: replacing an asset writes a new uuid name and
     # a new URL, so a long cache is safe and keeps repeat page loads off disk.
     response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
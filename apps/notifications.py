@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 import logging
 
+from apps.pagination import encode_cursor, keyset_page
 from extensions import db
 from models.book import Book
 from models.book_pack import Book_pack
@@ -148,6 +149,67 @@ def serialize_reader_notification(notification):
     }
 
 
+## @brief The key columns for decode_cursor on a feed cursor: the last
+# notification's created_at and id.
+FEED_CURSOR_PARSERS = (datetime.fromisoformat, int)
+
+
+## @brief Narrow a notification query to one type and/or unread rows.
+def filter_reader_notifications(query, notification_type=None, unread_only=False):
+    if notification_type:
+        query = query.filter(ReaderNotification.type == notification_type)
+    if unread_only:
+        query = query.filter(ReaderNotification.read_at.is_(None))
+    return query
+
+
+## @brief One page of a user's notifications, newest first.
+#
+# A keyset_page over ix_reader_notification_user_created, so a deep page
+# costs the same as the first instead of reading and discarding everything
+# before it. Expired rows are not filtered here: purge_expired_notifications
+# deletes them, which keeps the index range free of a per-row OR.
+#
+# @param after The decoded cursor (decode_cursor with FEED_CURSOR_PARSERS).
+# @return (notifications, next cursor or None when this was the last page).
+def reader_notification_feed(user_id, per_page, after=None, notification_type=None, unread_only=False):
+    query = filter_reader_notifications(
+        ReaderNotification.query.filter(ReaderNotification.user_id == user_id),
+        notification_type, unread_only,
+    )
+    notifications, anchor = keyset_page(
+        query, [ReaderNotification.created_at, ReaderNotification.id], per_page, after=after, descending=True
+    )
+    return notifications, encode_cursor(anchor.created_at, anchor.id) if anchor else None
+
+
+## @brief Delete notifications whose expires_at has passed, in batches.
+#
+# Run from cron (scripts/purge_expired_notifications.py). Each batch is
+# committed on its own, so a long backlog never holds one big delete's locks
+# and an interrupted run just leaves the rest for the next one.
+#
+# @return The number of notifications deleted.
+def purge_expired_notifications(now=None, batch_size=1000):
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        notification_ids = [
+            notification_id for (notification_id,) in
+            db.session.query(ReaderNotification.id)
+            .filter(ReaderNotification.expires_at < now)
+            .order_by(ReaderNotification.id)
+            .limit(batch_size)
+        ]
+        if not notification_ids:
+            return deleted
+        ReaderNotification.query.filter(
+            ReaderNotification.id.in_(notification_ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(notification_ids)
+
+
 def create_notifications_for_users(
     user_ids,
     notification_type,
@@ -0,0 +1,106 @@
+## @file
+# @brief Keyset ("seek") pagination helpers shared by the list endpoints that
+# outgrew OFFSET paging.
+#
+# OFFSET makes the database read and throw away every row before the page, so
+# page 500 of a large table costs 500 pages of work. A keyset cursor instead
+# remembers the sort key of the last row served and asks for rows strictly
+# after it, which an index on the same columns answers directly however deep
+# the reader has scrolled.
+#
+# Cursors are opaque to the frontends: a urlsafe base64 of the JSON-encoded
+# sort key. They are not signed -- a tampered cursor can only move the reader
+# to a different position in a list they are already allowed to see, because
+# every endpoint applies its own access scoping before the keyset filter.
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(*values):
+    """Opaque cursor for the row whose sort key is `values`."""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, parsers):
+    """Decode a cursor built by encode_cursor back into its sort key.
+
+    `parsers` is one callable per key column (str, int, datetime.fromisoformat,
+    ...), so a cursor is rejected unless it has the shape the endpoint expects.
+    Raises ValueError on anything malformed, which the routes already map to a
+    400."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError, TypeError):
+        raise ValueError('Invalid pagination cursor')
+    if not isinstance(values, list) or len(values) != len(parsers):
+        raise ValueError('Invalid pagination cursor')
+    try:
+        return tuple(parser(value) for parser, value in zip(parsers, values))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid pagination cursor')
+
+
+def keyset_filter(columns, values, descending=False):
+    """WHERE clause selecting rows strictly after `values` in the ordering
+    given by `columns` (all ascending, or all descending).
+
+    Spelled out as (a > x) OR (a = x AND b > y) rather than a row-value
+    comparison: MySQL only uses an index for the expanded form, and SQLite
+    before 3.15 does not parse tuple comparisons at all."""
+    clauses = []
+    for position, column in enumerate(columns):
+        value = values[position]
+        step = column < value if descending else column > value
+        equal_prefix = [columns[i] == values[i] for i in range(position)]
+        clauses.append(and_(*equal_prefix, step) if equal_prefix else step)
+    return or_(*clauses)
+
+
+def keyset_page(query, columns, per_page, after=None, descending=False):
+    """Fetch one page of `query` ordered by `columns`, starting after the
+    decoded cursor `after`.
+
+    Returns (rows, anchor): anchor is the last row served when another page
+    exists, else None -- the caller encodes its sort key as the next cursor.
+    Reads per_page + 1 rows so "is there more?" is answered without a COUNT."""
+    if after is not None:
+        query = query.filter(keyset_filter(columns, after, descending=descending))
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, rows[-1]
+
+
+def iter_keyset_batches(query, columns, batch_size, descending=False):
+    """Walk all of `query` in `columns` order, batch_size rows at a time.
+
+    Each batch is its own short keyset read, so a full-table walk neither
+    pays for OFFSET nor keeps one cursor (and its connection and snapshot)
+    open for the whole walk. `columns` must be unique together; the last one
+    is normally the primary key."""
+    after = None
+    while True:
+        rows, anchor = keyset_page(query, columns, batch_size, after=after, descending=descending)
+        # Read before yielding: the caller may commit or close the session
+        # between batches, expiring or detaching the anchor row.
+        after = tuple(getattr(anchor, column.key) for column in columns) if anchor is not None else None
+        if rows:
+            yield rows
+        if after is None:
+            return
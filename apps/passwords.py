@@ -0,0 +1,172 @@
+## @file
+# @brief Password and PIN checks on a bounded process pool, with backpressure
+# and rehash-on-login.
+#
+# bcrypt is deliberately slow -- ~250 ms of CPU per check at cost 12. The
+# login routes used to run it on the request thread, so when a whole school
+# signed in at the start of a lesson the checks queued behind each other in
+# one worker while everything else that worker served waited too.
+#
+# check_password / hash_password now hand the work to PASSWORD_HASH_WORKERS
+# spawned processes (0 runs it inline). Each web process admits at most
+# PASSWORD_HASH_MAX_PENDING checks at a time; past that the caller gets
+# PasswordHashingBusy, which the routes turn into a 429 with a Retry-After
+# estimated from the queue and recent check times (busy_response), so a login
+# storm is spread out by the clients instead of piling up in the server.
+# stats() reports the queue depth and timings.
+#
+# verify_and_upgrade also rehashes a stored hash whose cost differs from
+# PASSWORD_HASH_ROUNDS on a successful check, so raising the cost takes
+# effect as users sign in.
+import hmac
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import bcrypt
+from flask import jsonify
+
+from config import ConfigClass
+
+## @brief Seconds a check is assumed to take before any has been timed.
+DEFAULT_CHECK_SECONDS = 0.25
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'in_flight': 0, 'completed': 0, 'rejected': 0, 'average_seconds': DEFAULT_CHECK_SECONDS}
+
+
+class PasswordHashingBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Too many sign-ins at once, retry in %d s' % retry_after)
+        self.retry_after = retry_after
+
+
+def _to_bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def _check(pw_hash, password):
+    return hmac.compare_digest(bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # Spawned, not forked: the web process is threaded, and a forked
+            # child could inherit a lock some other thread was holding.
+            _executor = ProcessPoolExecutor(
+                max_workers=ConfigClass.PASSWORD_HASH_WORKERS, mp_context=get_context('spawn')
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def _retry_after():
+    workers = max(1, ConfigClass.PASSWORD_HASH_WORKERS)
+    return max(1, math.ceil(_stats['in_flight'] / workers * _stats['average_seconds']))
+
+
+def _run(function, *args):
+    with _stats_lock:
+        if _stats['in_flight'] >= ConfigClass.PASSWORD_HASH_MAX_PENDING:
+            _stats['rejected'] += 1
+            raise PasswordHashingBusy(_retry_after())
+        _stats['in_flight'] += 1
+    started = time.monotonic()
+    try:
+        if ConfigClass.PASSWORD_HASH_WORKERS <= 0:
+            return function(*args)
+        try:
+            return _get_executor().submit(function, *args).result()
+        except BrokenProcessPool:
+            logging.warning('Password hashing pool broke; checking inline and restarting it.')
+            _reset_executor()
+            return function(*args)
+    finally:
+        elapsed = time.monotonic() - started
+        with _stats_lock:
+            _stats['in_flight'] -= 1
+            _stats['completed'] += 1
+            _stats['average_seconds'] = _stats['average_seconds'] * 0.9 + elapsed * 0.1
+
+
+def check_password(pw_hash, password):
+    """bcrypt check of `password` against `pw_hash` off the request thread.
+    Raises PasswordHashingBusy when this process is saturated, and ValueError
+    for a malformed hash (as bcrypt itself does)."""
+    if not pw_hash or not password:
+        return False
+    return _run(_check, _to_bytes(pw_hash), _to_bytes(str(password)))
+
+
+def hash_password(password, rounds=None):
+    """New bcrypt hash (str) at PASSWORD_HASH_ROUNDS."""
+    rounds = rounds or ConfigClass.PASSWORD_HASH_ROUNDS
+    return _run(_hash, _to_bytes(str(password)), rounds).decode('utf-8')
+
+
+def hash_cost(pw_hash):
+    """The cost factor of a `$2b$12$...` hash, or None if it has none."""
+    parts = (pw_hash.decode('utf-8') if isinstance(pw_hash, bytes) else pw_hash or '').split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(pw_hash):
+    return hash_cost(pw_hash) != ConfigClass.PASSWORD_HASH_ROUNDS
+
+
+def verify_and_upgrade(user, password, field='password_hashed'):
+    """check_password against user.<field>; on success, rehash it at the
+    configured cost if it was made at another one. The caller commits."""
+    pw_hash = getattr(user, field)
+    if not check_password(pw_hash, password):
+        return False
+    if needs_rehash(pw_hash):
+        try:
+            setattr(user, field, hash_password(password))
+        except PasswordHashingBusy:
+            pass  # the next sign-in will upgrade it
+    return True
+
+
+def busy_response(error):
+    response = jsonify({'message': str(error), 'code': 'TOO_MANY_SIGN_INS', 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def stats():
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot.update({
+        'pid': os.getpid(),
+        'workers': ConfigClass.PASSWORD_HASH_WORKERS,
+        'max_pending': ConfigClass.PASSWORD_HASH_MAX_PENDING,
+        'rounds': ConfigClass.PASSWORD_HASH_ROUNDS,
+        'average_ms': int(snapshot.pop('average_seconds') * 1000),
+    })
+    return snapshot
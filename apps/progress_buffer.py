@@ -0,0 +1,191 @@
+## @file
+# @brief Write-behind buffer for reading positions (audiobook playback and
+# PDF story pages).
+#
+# The players report their position continuously -- the audiobook player
+# every few seconds of playback, the PDF reader on every page flip -- and each
+# report used to be its own commit. Positions are disposable in a way
+# completions are not: only the latest one matters, and losing the last few
+# seconds of them on a crash costs a reader a page at worst. So a position
+# update for a row that already exists is kept here, per (user, item), and
+# written in one batched UPDATE per model every PROGRESS_FLUSH_SECONDS.
+#
+# What stays synchronous, and why:
+#   - the first report for an item creates the row (and moves the passport's
+#     reading counts), so it is committed at once;
+#   - completion is a milestone other features read (passport, certificates,
+#     teacher reports), so it is committed at once, after taking whatever
+#     position was still pending for that row.
+#
+# Every pending entry carries the time it was reported, and the flush only
+# touches rows whose stamp is older, so a later write from another worker (a
+# completion, a newer position) is never rolled back by a stale one. Reads in
+# this process merge the pending values over the row via overlay(); another
+# worker's reads see the position once it is flushed.
+import atexit
+import logging
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, or_, update
+
+from config import ConfigClass
+from extensions import db
+from models.audio_book import AudioBookProgress
+from models.reader_story_progress import ReaderStoryProgress
+
+## @brief Past this many pending rows a report flushes inline instead of
+# waiting for the timer, which bounds the memory a stalled flusher can hold.
+MAX_PENDING = 5000
+
+
+class ProgressBuffer:
+    def __init__(self, model, key_columns, stamp_column, fields):
+        self.model = model
+        self.key_columns = tuple(key_columns)
+        self.stamp_column = stamp_column
+        self.fields = tuple(fields)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, values, stamp):
+        """Keep `values` (a subset of `fields`) as the latest position for
+        `key`, merged over anything already pending for it."""
+        unknown = set(values) - set(self.fields)
+        if unknown:
+            raise ValueError('Unbuffered progress fields: %s' % ', '.join(sorted(unknown)))
+        with self._lock:
+            entry = self._pending.setdefault(tuple(key), {})
+            entry.update(values)
+            entry[self.stamp_column] = stamp
+            size = len(self._pending)
+        if size > MAX_PENDING:
+            self.flush()
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._pending.get(tuple(key))
+            return dict(entry) if entry else None
+
+    def take(self, key):
+        """Remove and return what is pending for `key`, for a caller about to
+        write the row itself."""
+        with self._lock:
+            return self._pending.pop(tuple(key), None)
+
+    def overlay(self, row):
+        """`row` as the reader last reported it: a read-only copy with any
+        pending values applied, or the row itself when nothing is pending."""
+        if row is None:
+            return None
+        pending = self.peek(getattr(row, column) for column in self.key_columns)
+        if not pending:
+            return row
+        state = {column.key: getattr(row, column.key) for column in self.model.__table__.columns}
+        state.update(pending)
+        return SimpleNamespace(**state)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Write everything pending, one executemany per set of reported
+        fields. Returns the number of entries attempted; on failure they are
+        put back (under anything reported since) and the error is logged."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = self.model.__table__
+        stamp = table.c[self.stamp_column]
+        groups = {}
+        for key, values in pending.items():
+            params = {'key_' + column: value for column, value in zip(self.key_columns, key)}
+            params.update({'value_' + field: value for field, value in values.items()})
+            groups.setdefault(tuple(sorted(values)), []).append(params)
+
+        try:
+            with db.engine.begin() as connection:
+                for fields, rows in groups.items():
+                    statement = (
+                        update(table)
+                        .where(and_(*[table.c[column] == bindparam('key_' + column) for column in self.key_columns]))
+                        .where(or_(stamp.is_(None), stamp <= bindparam('value_' + self.stamp_column)))
+                        .values({field: bindparam('value_' + field) for field in fields})
+                    )
+                    connection.execute(statement, rows)
+        except Exception as error:
+            with self._lock:
+                for key, values in pending.items():
+                    newer = self._pending.get(key)
+                    self._pending[key] = {**values, **newer} if newer else values
+            logging.warning('Progress flush for %s failed (%s rows kept): %s',
+                            table.name, len(pending), error)
+            return 0
+        return len(pending)
+
+
+audio_book_progress_buffer = ProgressBuffer(
+    AudioBookProgress,
+    key_columns=('user_id', 'audio_book_id'),
+    stamp_column='updated_at',
+    fields=('current_page_number', 'current_time_ms', 'updated_at'),
+)
+
+story_progress_buffer = ProgressBuffer(
+    ReaderStoryProgress,
+    key_columns=('user_id', 'story_id'),
+    stamp_column='last_read_at',
+    fields=('current_page', 'zoom', 'last_read_at'),
+)
+
+BUFFERS = (audio_book_progress_buffer, story_progress_buffer)
+
+
+def write_behind_enabled():
+    return ConfigClass.PROGRESS_WRITE_BEHIND
+
+
+def flush_all():
+    return sum(buffer.flush() for buffer in BUFFERS)
+
+
+_flusher_lock = threading.Lock()
+_flusher_pid = None
+
+
+def _run_flusher(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                flush_all()
+            except Exception as error:
+                logging.warning('Progress flusher pass failed: %s', error)
+
+
+def _flush_at_exit(app):
+    with app.app_context():
+        flush_all()
+
+
+def ensure_flusher():
+    """Start this process's flush thread on first use. Checked per pid, so
+    every worker a pre-forking server spawns gets its own."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        app = current_app._get_current_object()
+        interval = max(1, ConfigClass.PROGRESS_FLUSH_SECONDS)
+        threading.Thread(target=_run_flusher, args=(app, interval),
+                         name='progress-flusher', daemon=True).start()
+        atexit.register(_flush_at_exit, app)
+        _flusher_pid = os.getpid()
@@ -4,10 +4,12 @@
 # the mode never affects stage, pips, or mastery, only a separate daily-run
 # ranking that lives entirely outside this module.
 from datetime import date, datetime
+from types import SimpleNamespace
 
-from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 
+from apps.daily_activity import add_daily_activity, get_daily_activity, get_daily_activity_range
+from apps.surface_forms import invalidate_book, lookup_word_sense_id
 from extensions import db
 from models.book import Book
 from models.chapter import Chapter
@@ -35,12 +37,19 @@ PIP_FIELD_BY_GAME = {
 
 HINT_TIERS = ('light', 'medium', 'heavy')
 TYPED_FROM_MEMORY = 'typed_from_memory'
+## @brief WordProgress.evidence_sources bit per evidence source. Append only:
+# the bits are stored, and migration d8f3b6a2c5e9 backfilled them.
+SOURCE_BITS = {source: 1 << index for index, source in enumerate(GAME_KEYS + (TYPED_FROM_MEMORY,))}
 CEFR_LEVELS = ('A1', 'A2', 'B1', 'B2', 'C1', 'C2')
 
 DEFAULT_DAILY_WORD_GOAL = 5
 WELCOME_BACK_GAP_DAYS = 3
 GRACE_REPLENISH_DAYS = 30
 
+## @brief Largest round the batch endpoint accepts -- a Bee Genius round is 12
+# words, so this only stops a client from posting a whole backlog at once.
+MAX_ATTEMPTS_PER_BATCH = 50
+
 WORD_COLLECTOR_TIERS = (10, 50, 100, 500, 1000)
 STEEL_TRAP_TIERS = (10, 50, 100, 500)
 TRIPLE_THREAT_TIERS = (5, 25, 100)
@@ -72,21 +81,23 @@ def _today():
 
 def resolve_word_sense_for_book(book_id, surface_form):
     """Games today only know a book_id + a raw word string — resolve that to
-    the word-sense it was ingested as (Phase 1's occurrences). Falls back to
-    a direct lemma match if no occurrence row exists yet."""
+    the word-sense it was ingested as (Phase 1's occurrences), through the
+    per-book map in apps/surface_forms.py. Falls back to a direct lemma match
+    if no occurrence row exists yet."""
     surface_form = (surface_form or '').strip()
     if not surface_form:
         raise AttemptError('word is required', 'WORD_REQUIRED')
 
-    occurrence = (
-        WordOccurrence.query
-        .join(Chapter, WordOccurrence.chapter_id == Chapter.id)
-        .filter(Chapter.book_id == book_id)
-        .filter(db.func.lower(WordOccurrence.surface_form) == surface_form.lower())
-        .first()
-    )
-    if occurrence:
-        return occurrence.word_sense
+    word_sense_id = lookup_word_sense_id(book_id, surface_form)
+    if word_sense_id is not None:
+        word_sense = db.session.get(WordSense, word_sense_id)
+        if word_sense is None:
+            # The sense was deleted or merged away since the map was built.
+            invalidate_book(book_id)
+            word_sense_id = lookup_word_sense_id(book_id, surface_form)
+            word_sense = db.session.get(WordSense, word_sense_id) if word_sense_id is not None else None
+        if word_sense:
+            return word_sense
 
     word_sense = WordSense.query.filter_by(lemma=surface_form.lower(), sense_key='').first()
     if word_sense:
@@ -102,6 +113,87 @@ def resolve_word_sense_for_book(book_id, surface_form):
 def submit_attempt(user_id, book_id, surface_form, game, mode, correct,
                     hints_used=0, heaviest_hint_tier=None, from_memory=False,
                     occurred_on=None):
+    occurred_on = occurred_on or _today()
+    word_sense, progress, previous_stage, created = _apply_attempt(
+        user_id, book_id, surface_form, game, mode, correct,
+        hints_used, heaviest_hint_tier, from_memory, occurred_on,
+    )
+    db.session.commit()
+
+    result = _attempt_result(word_sense, progress, previous_stage, correct)
+    result.update(_finish_attempts(user_id, occurred_on, correct, created or result['stage_advanced']))
+    return result
+
+
+def submit_attempt_batch(user_id, book_id, mode, attempts, game=None, occurred_on=None):
+    """Every attempt of one game round in one transaction.
+
+    Each attempt is applied exactly as submit_attempt would apply it, in
+    order, but the round is committed once and the streak, achievements,
+    certificates and near miss -- which only depend on the end state -- are
+    worked out once at the end instead of after every word. An attempt that
+    cannot be recorded (unknown word, bad hint count or tier) gets an `error` in its
+    result and the rest of the round still counts."""
+    if mode not in ('daily', 'practice'):
+        raise AttemptError('mode must be daily or practice', 'INVALID_MODE')
+    if not isinstance(attempts, list) or not attempts:
+        raise AttemptError('attempts must be a non-empty list', 'ATTEMPTS_REQUIRED')
+    if len(attempts) > MAX_ATTEMPTS_PER_BATCH:
+        raise AttemptError('at most %d attempts per round' % MAX_ATTEMPTS_PER_BATCH, 'TOO_MANY_ATTEMPTS')
+
+    occurred_on = occurred_on or _today()
+    results = []
+    recorded = 0
+    any_correct = False
+    vocabulary_changed = False
+    for attempt in attempts:
+        attempt = attempt if isinstance(attempt, dict) else {}
+        correct = bool(attempt.get('correct'))
+        try:
+            word_sense, progress, previous_stage, created = _apply_attempt(
+                user_id, book_id, attempt.get('word'), attempt.get('game') or game, mode, correct,
+                _parse_hints_used(attempt.get('hints_used')), attempt.get('heaviest_hint_tier'),
+                bool(attempt.get('from_memory', False)), occurred_on,
+            )
+        except AttemptError as error:
+            payload, status_code = attempt_error_response(error)
+            payload['status'] = status_code
+            results.append({'word': attempt.get('word'), 'error': payload})
+            continue
+        result = _attempt_result(word_sense, progress, previous_stage, correct)
+        result['word'] = attempt.get('word')
+        results.append(result)
+        recorded += 1
+        any_correct = any_correct or correct
+        vocabulary_changed = vocabulary_changed or created or result['stage_advanced']
+
+    response = {'results': results, 'recorded': recorded}
+    if not recorded:
+        # Nothing was written: no streak day is earned for a round of errors.
+        db.session.rollback()
+        response.update({'streak': None, 'unlocked_achievements': [],
+                         'new_certificates': [], 'nearest_near_miss': None})
+        return response
+
+    # _update_streak's commit is the round's single commit.
+    response.update(_finish_attempts(user_id, occurred_on, any_correct, vocabulary_changed))
+    return response
+
+
+def _parse_hints_used(value):
+    try:
+        hints_used = int(value or 0)
+    except (TypeError, ValueError):
+        raise AttemptError('hints_used must be a whole number, got %r' % (value,), 'INVALID_HINTS')
+    if hints_used < 0:
+        raise AttemptError('hints_used cannot be negative', 'INVALID_HINTS')
+    return hints_used
+
+
+def _apply_attempt(user_id, book_id, surface_form, game, mode, correct,
+                   hints_used, heaviest_hint_tier, from_memory, occurred_on):
+    """Validate one attempt and apply it to the reader's WordProgress, without
+    committing. Raises AttemptError before writing anything."""
     if game not in GAME_KEYS:
         raise AttemptError('unsupported game %r' % (game,), 'UNSUPPORTED_GAME')
     if mode not in ('daily', 'practice'):
@@ -109,10 +201,10 @@ def submit_attempt(user_id, book_id, surface_form, game, mode, correct,
     if heaviest_hint_tier is not None and heaviest_hint_tier not in HINT_TIERS:
         raise AttemptError('invalid hint tier %r' % (heaviest_hint_tier,), 'INVALID_HINT_TIER')
 
-    occurred_on = occurred_on or _today()
     word_sense = resolve_word_sense_for_book(book_id, surface_form)
 
     progress = WordProgress.query.filter_by(user_id=user_id, word_sense_id=word_sense.id).first()
+    created = progress is None
     if progress is None:
         progress = WordProgress(user_id=user_id, word_sense_id=word_sense.id, stage=STAGE_ENCOUNTERED)
         db.session.add(progress)
@@ -139,13 +231,31 @@ def submit_attempt(user_id, book_id, surface_form, game, mode, correct,
             progress.consecutive_no_hint_clears + 1 if hints_used == 0 else 0
         )
 
-        _recompute_stage(progress)
+        new_day = _record_evidence(progress, evidence)
+        add_daily_activity(user_id, occurred_on, words_practiced=1, words_distinct=int(new_day))
+        if previous_stage != STAGE_MASTERED and progress.stage == STAGE_MASTERED:
+            add_daily_activity(user_id, progress.mastered_at.date(), words_mastered=1)
 
-    db.session.commit()
+    return word_sense, progress, previous_stage, created
 
-    newly_mastered = correct and previous_stage != STAGE_MASTERED and progress.stage == STAGE_MASTERED
+
+def _attempt_result(word_sense, progress, previous_stage, correct):
+    return {
+        'word_sense_id': word_sense.id,
+        'lemma': word_sense.lemma,
+        'stage': progress.stage,
+        'stage_advanced': previous_stage != progress.stage,
+        'pip_count': progress.pip_count,
+        'newly_mastered': correct and previous_stage != STAGE_MASTERED and progress.stage == STAGE_MASTERED,
+        'cefr_level': word_sense.effective_cefr_level,
+    }
+
+
+def _finish_attempts(user_id, occurred_on, any_correct, vocabulary_changed):
+    """Streak, achievements, certificates and near miss after one or more
+    applied attempts; commits."""
     streak_state = _update_streak(user_id, occurred_on)
-    unlocked = _evaluate_achievements(user_id) if correct else []
+    unlocked = _evaluate_achievements(user_id) if any_correct else []
     # Passport certificates ride on the milestones the achievement pass just
     # unlocked (band cleared / book mastered) — no extra queries. Local import
     # avoids a circular dependency (certificates reconcile via this engine).
@@ -156,14 +266,10 @@ def submit_attempt(user_id, book_id, surface_form, game, mode, correct,
         new_certificates = []
     near_miss = find_nearest_near_miss(user_id)
 
+    from apps.reader_passport import note_attempt
+    note_attempt(user_id, vocabulary_changed, streak_state, unlocked)
+
     return {
-        'word_sense_id': word_sense.id,
-        'lemma': word_sense.lemma,
-        'stage': progress.stage,
-        'stage_advanced': previous_stage != progress.stage,
-        'pip_count': progress.pip_count,
-        'newly_mastered': newly_mastered,
-        'cefr_level': word_sense.effective_cefr_level,
         'streak': streak_state,
         'unlocked_achievements': unlocked,
         'new_certificates': new_certificates,
@@ -171,37 +277,103 @@ def submit_attempt(user_id, book_id, surface_form, game, mode, correct,
     }
 
 
-def _recompute_stage(progress):
-    evidence_rows = WordProgressEvidence.query.filter_by(word_progress_id=progress.id).all()
-    if not evidence_rows:
-        return
+def _record_evidence(progress, evidence):
+    """Fold one new (flushed) evidence row into the progress row's running
+    summary and re-apply the stage rule -- O(1) however long the word's
+    evidence log has grown. Returns whether it is the word's first evidence
+    on that day."""
+    progress.evidence_sources |= SOURCE_BITS[evidence.source]
+    progress.distinct_sources_count = bin(progress.evidence_sources).count('1')
+    progress.evidence_count += 1
+    if evidence.hints_used == 0:
+        progress.has_unaided_clear = True
+
+    last_day = progress.last_evidence_on
+    new_day = False
+    if last_day is None or evidence.occurred_on > last_day:
+        new_day = True
+        progress.distinct_days_count += 1
+        progress.last_evidence_on = evidence.occurred_on
+    elif evidence.occurred_on < last_day:
+        # Only a backdated attempt needs the log, and only that one day of it.
+        seen_that_day = db.session.query(
+            WordProgressEvidence.query
+            .filter(WordProgressEvidence.word_progress_id == progress.id)
+            .filter(WordProgressEvidence.occurred_on == evidence.occurred_on)
+            .filter(WordProgressEvidence.id != evidence.id)
+            .exists()
+        ).scalar()
+        if not seen_that_day:
+            new_day = True
+            progress.distinct_days_count += 1
+
+    _apply_stage_rule(progress)
+    return new_day
+
+
+def replay_evidence(evidence_rows):
+    """The summary columns as the evidence log says they should be -- what
+    _record_evidence has built up one row at a time."""
+    sources = 0
+    for row in evidence_rows:
+        sources |= SOURCE_BITS.get(row.source, 0)
+    return {
+        'evidence_sources': sources,
+        'distinct_sources_count': len({row.source for row in evidence_rows}),
+        'distinct_days_count': len({row.occurred_on for row in evidence_rows}),
+        'evidence_count': len(evidence_rows),
+        'last_evidence_on': max((row.occurred_on for row in evidence_rows), default=None),
+        'has_unaided_clear': any(row.hints_used == 0 for row in evidence_rows),
+    }
 
-    sources = {row.source for row in evidence_rows}
-    days = {row.occurred_on for row in evidence_rows}
-    has_unaided = any(row.hints_used == 0 for row in evidence_rows)
-    typed_from_memory_ever = TYPED_FROM_MEMORY in sources
 
-    progress.distinct_sources_count = len(sources)
-    progress.distinct_days_count = len(days)
-    progress.has_unaided_clear = has_unaided
+def _stage_for(summary):
+    """Stage the mastery rule gives a summary (a WordProgress, or a replay),
+    or None when there is no evidence to judge."""
+    if not summary.evidence_count:
+        return None
+    typed_from_memory_ever = bool(summary.evidence_sources & SOURCE_BITS[TYPED_FROM_MEMORY])
+    if summary.distinct_sources_count >= 2 and summary.distinct_days_count >= 2 and summary.has_unaided_clear:
+        return STAGE_MASTERED
+    if summary.has_unaided_clear or summary.evidence_count >= 2 or typed_from_memory_ever:
+        return STAGE_KNOWN
+    return STAGE_GUESSED
+
+
+def _apply_stage_rule(progress):
+    stage = _stage_for(progress)
+    if stage is None:
+        return
 
     now = datetime.now()
     if progress.first_guessed_at is None:
         progress.first_guessed_at = now
+    if stage == STAGE_MASTERED and progress.mastered_at is None:
+        progress.mastered_at = now
+    if stage == STAGE_KNOWN and progress.first_known_at is None:
+        progress.first_known_at = now
+    progress.stage = stage
+
+
+def check_word_progress_state(progress, evidence_rows, fix=False):
+    """Compare a progress row's summary columns and stage with a replay of
+    its evidence log. Returns {column: (stored, replayed)} for every
+    mismatch; with `fix`, the replay is written back (not committed)."""
+    expected = replay_evidence(evidence_rows)
+    mismatches = {
+        column: (getattr(progress, column), value)
+        for column, value in expected.items()
+        if getattr(progress, column) != value
+    }
+    expected_stage = _stage_for(SimpleNamespace(**expected))
+    if expected_stage is not None and progress.stage != expected_stage:
+        mismatches['stage'] = (progress.stage, expected_stage)
 
-    is_known = has_unaided or len(evidence_rows) >= 2 or typed_from_memory_ever
-    is_mastered = len(sources) >= 2 and len(days) >= 2 and has_unaided
-
-    if is_mastered:
-        progress.stage = STAGE_MASTERED
-        if progress.mastered_at is None:
-            progress.mastered_at = now
-    elif is_known:
-        progress.stage = STAGE_KNOWN
-        if progress.first_known_at is None:
-            progress.first_known_at = now
-    else:
-        progress.stage = STAGE_GUESSED
+    if fix and mismatches:
+        for column, value in expected.items():
+            setattr(progress, column, value)
+        _apply_stage_rule(progress)
+    return mismatches
 
 
 # ---------------------------------------------------------------------------
@@ -338,7 +510,7 @@ MASTERY_REQUIREMENT_COUNT = 3  # distinct sources, distinct days, one unaided cl
 
 def _mastery_gap(progress):
     """What this word still needs before it masters, straight off the rule in
-    _recompute_stage(): 2+ distinct sources, 2+ distinct days, 1+ unaided
+    _stage_for(): 2+ distinct sources, 2+ distinct days, 1+ unaided
     clear. Reads the counters cached on WordProgress, so no extra queries."""
     needs_new_game = progress.distinct_sources_count < REQUIRED_SOURCES
     needs_new_day = progress.distinct_days_count < REQUIRED_DAYS
@@ -569,9 +741,13 @@ def record_self_reported_word(user_id, surface_form):
     db.session.commit()
 
     unlocked = []
-    _award_tiers(user_id, 'word_wizard', WORD_WIZARD_TIERS, _count_word_wizard_shelf(user_id), unlocked)
+    shelf_count = _count_word_wizard_shelf(user_id)
+    _award_tiers(user_id, 'word_wizard', WORD_WIZARD_TIERS, shelf_count, unlocked)
 
-    return {'created': True, 'shelf_count': _count_word_wizard_shelf(user_id), 'unlocked_achievements': unlocked}
+    from apps.reader_passport import note_self_reported_word
+    note_self_reported_word(user_id, shelf_count, unlocked)
+
+    return {'created': True, 'shelf_count': shelf_count, 'unlocked_achievements': unlocked}
 
 
 # ---------------------------------------------------------------------------
@@ -581,13 +757,8 @@ def record_self_reported_word(user_id, surface_form):
 
 def get_daily_goal_status(user_id, goal=DEFAULT_DAILY_WORD_GOAL, on_date=None):
     on_date = on_date or _today()
-    words_today = (
-        db.session.query(WordProgressEvidence.word_progress_id)
-        .join(WordProgress, WordProgressEvidence.word_progress_id == WordProgress.id)
-        .filter(WordProgress.user_id == user_id, WordProgressEvidence.occurred_on == on_date)
-        .distinct()
-        .count()
-    )
+    activity = get_daily_activity(user_id, on_date)
+    words_today = activity.words_distinct if activity else 0
     return {'goal': goal, 'progress': words_today, 'met': words_today >= goal}
 
 
@@ -750,44 +921,15 @@ def _streak_summary(user_id):
 def get_word_progress_daily_trend(user_id, start_date, end_date):
     """Per-day evidence count and per-day newly-mastered count for a date
     range, for parent/child analytics charts. `start_date`/`end_date` are
-    `date` objects, inclusive."""
-    evidence_rows = (
-        db.session.query(WordProgressEvidence.occurred_on, func.count(WordProgressEvidence.id))
-        .join(WordProgress, WordProgress.id == WordProgressEvidence.word_progress_id)
-        .filter(
-            WordProgress.user_id == user_id,
-            WordProgressEvidence.occurred_on >= start_date,
-            WordProgressEvidence.occurred_on <= end_date,
-        )
-        .group_by(WordProgressEvidence.occurred_on)
-        .all()
-    )
-    evidence_by_day = {day: count for day, count in evidence_rows}
-
-    mastered_rows = (
-        db.session.query(func.date(WordProgress.mastered_at), func.count(WordProgress.id))
-        .filter(
-            WordProgress.user_id == user_id,
-            WordProgress.mastered_at.isnot(None),
-            func.date(WordProgress.mastered_at) >= start_date,
-            func.date(WordProgress.mastered_at) <= end_date,
-        )
-        .group_by(func.date(WordProgress.mastered_at))
-        .all()
-    )
-    mastered_by_day = {}
-    for day, count in mastered_rows:
-        day = day if isinstance(day, date) else datetime.strptime(str(day), '%Y-%m-%d').date()
-        mastered_by_day[day] = count
-
-    all_days = sorted(set(evidence_by_day) | set(mastered_by_day))
+    `date` objects, inclusive. Days without either are left out."""
     return [
         {
-            'date': day.isoformat(),
-            'words_practiced': evidence_by_day.get(day, 0),
-            'words_mastered': mastered_by_day.get(day, 0),
+            'date': activity.day.isoformat(),
+            'words_practiced': activity.words_practiced,
+            'words_mastered': activity.words_mastered,
         }
-        for day in all_days
+        for activity in get_daily_activity_range(user_id, start_date, end_date)
+        if activity.words_practiced or activity.words_mastered
     ]
 
 
@@ -0,0 +1,101 @@
+## @file
+# @brief Delivery of files that sit behind a permission check: audiobook page
+# images and audio, audiobook covers and story PDFs.
+#
+# The public /media route already answers with ETags, Last-Modified and HTTP
+# Range; these routes used a bare send_file and answered every request with
+# the whole file. A player then re-downloaded a page's audio to seek in it, a
+# PDF viewer could not fetch byte ranges to render progressively, and a
+# revisit re-sent bytes the browser already had. Every permission-checked file
+# endpoint now answers through send_protected_file, after its own access check.
+#
+# Caching differs from /media on purpose. These responses depend on who is
+# asking, so they are `private` (a shared proxy must not hand one reader's
+# file to another), and their URLs are not versioned -- replacing a page's
+# audio keeps the URL -- so the browser revalidates with the ETag after
+# PROTECTED_FILE_MAX_AGE instead of trusting its copy for a year.
+#
+# With PROTECTED_FILE_OFFLOAD set, Flask answers with only the headers and
+# the front proxy streams the bytes (nginx X-Accel-Redirect, or Apache
+# mod_xsendfile X-Sendfile), and does Range and conditional requests itself.
+# For nginx every directory served this way needs an `internal` location,
+# listed in PROTECTED_FILE_ACCEL_LOCATIONS as `<directory>=<location>` pairs:
+#
+#     location /_protected/storage/ {
+#         internal;
+#         alias /var/www/html/iread/backend/storage/;
+#     }
+#
+# A file under no listed directory is still sent by Flask.
+import os
+from urllib.parse import quote
+
+from flask import current_app, jsonify, request
+from werkzeug.utils import send_file
+
+from config import ConfigClass
+
+OFFLOAD_X_ACCEL = 'x-accel-redirect'
+OFFLOAD_X_SENDFILE = 'x-sendfile'
+
+
+def accel_locations():
+    """PROTECTED_FILE_ACCEL_LOCATIONS as (absolute directory, location) pairs,
+    longest directory first so nested roots map to their own location."""
+    pairs = []
+    for entry in (ConfigClass.PROTECTED_FILE_ACCEL_LOCATIONS or '').split(','):
+        directory, separator, location = entry.strip().partition('=')
+        if not separator or not directory or not location:
+            continue
+        pairs.append((os.path.abspath(directory.strip()), '/' + location.strip().strip('/') + '/'))
+    return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+
+def accel_redirect_uri(file_path):
+    file_path = os.path.abspath(file_path)
+    for directory, location in accel_locations():
+        if file_path.startswith(directory + os.sep):
+            relative = os.path.relpath(file_path, directory).replace(os.sep, '/')
+            return location + quote(relative)
+    return None
+
+
+def _cache_headers(response):
+    response.cache_control.public = False
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = max(0, ConfigClass.PROTECTED_FILE_MAX_AGE)
+    response.cache_control.must_revalidate = True
+    response.expires = None
+    response.vary.add('Cookie')
+    return response
+
+
+## @brief Send a file the caller has already authorised the user for.
+#
+# @param file_path: absolute path on disk, as stored on the row.
+# @param missing_message: the 404 message when the file is not there.
+def send_protected_file(file_path, mimetype=None, download_name=None, missing_message='File not found'):
+    if not file_path or not os.path.isfile(file_path):
+        return jsonify({'message': missing_message}), 404
+
+    offload = (ConfigClass.PROTECTED_FILE_OFFLOAD or '').lower()
+    accel_uri = accel_redirect_uri(file_path) if offload == OFFLOAD_X_ACCEL else None
+    if accel_uri or offload == OFFLOAD_X_SENDFILE:
+        # Headers only; the proxy reads the file and answers Range and
+        # If-None-Match itself, so no conditional handling here.
+        response = send_file(
+            file_path, request.environ, mimetype=mimetype, download_name=download_name,
+            conditional=False, etag=False, use_x_sendfile=True,
+            response_class=current_app.response_class,
+        )
+        if accel_uri:
+            del response.headers['X-Sendfile']
+            response.headers['X-Accel-Redirect'] = accel_uri
+        return _cache_headers(response)
+
+    response = send_file(
+        file_path, request.environ, mimetype=mimetype, download_name=download_name, conditional=True,
+        response_class=current_app.response_class,
+    )
+    return _cache_headers(response)
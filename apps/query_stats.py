@@ -0,0 +1,155 @@
+## @file
+# @brief Per-request SQL counts and timings, and a query-count guard for tests.
+#
+# Per-row lookups hide easily in this codebase: a serializer's
+# `User.query.get`, a relationship read inside a list loop. Each one is cheap,
+# so nothing shows up in a profile, but a page that lists 200 rows runs 201
+# queries. This module counts the statements every sampled request runs, on
+# SQLAlchemy's engine events, and reports them:
+#
+# - a `Server-Timing: db;dur=<ms>;desc="<n> queries"` header, which the
+#   browser's network panel shows next to the request;
+# - one JSON log line per sampled request on the `iread.sql` logger, with the
+#   statements that ran SQL_STATS_REPEAT_THRESHOLD or more times (the N+1
+#   suspects) listed by fingerprint, and logged at WARNING when there are any.
+#
+# SQL_STATS_SAMPLE_RATE sets the share of requests measured (0 turns it off,
+# 1 measures all). An unsampled request costs one dictionary lookup per
+# statement.
+#
+# Outside a request, `record_queries()` counts the statements a block runs and
+# `assert_max_queries(n)` fails a test whose block runs more than n, listing
+# what ran.
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import ConfigClass
+
+logger = logging.getLogger('iread.sql')
+
+## @brief Longest fingerprint kept in a log line or assertion message.
+MAX_FINGERPRINT_LENGTH = 300
+
+_recorders = ContextVar('query_recorders', default=())
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)' % (_PLACEHOLDER, _PLACEHOLDER))
+_NUMBER = re.compile(r'\b\d+\b')
+_SELECT_LIST = re.compile(r'^SELECT (?:DISTINCT )?.+? FROM ', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """The statement with whitespace collapsed, the select list elided,
+    IN-lists folded to one placeholder and inline numbers blanked, so the same
+    query issued per row counts as one and its FROM/WHERE stays readable."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _SELECT_LIST.sub('SELECT ... FROM ', statement, count=1)
+    statement = _PLACEHOLDER_LIST.sub('(?)', statement)
+    return _NUMBER.sub('N', statement)[:MAX_FINGERPRINT_LENGTH]
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[fingerprint(statement)] += 1
+
+    def repeated(self, threshold=None):
+        threshold = threshold or ConfigClass.SQL_STATS_REPEAT_THRESHOLD
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+def _active_recorders():
+    recorders = _recorders.get()
+    if has_request_context():
+        request_recorder = g.get('sql_queries')
+        if request_recorder is not None:
+            recorders = recorders + (request_recorder,)
+    return recorders
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorders = _active_recorders()
+    if not recorders:
+        return
+    started = getattr(context, 'query_started', None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    for recorder in recorders:
+        recorder.add(statement, elapsed)
+
+
+@contextmanager
+def record_queries():
+    """Count the statements run inside the block (on this thread)."""
+    recorder = QueryRecorder()
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+def describe(recorder):
+    return '\n'.join('%4d x %s' % (count, statement) for statement, count in recorder.statements.most_common())
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block runs more than `limit` statements."""
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise AssertionError('%d queries run, at most %d expected:\n%s' % (recorder.count, limit, describe(recorder)))
+
+
+def _start_request():
+    rate = ConfigClass.SQL_STATS_SAMPLE_RATE
+    if rate > 0 and (rate >= 1 or random.random() < rate):
+        g.sql_queries = QueryRecorder()
+
+
+def _finish_request(response):
+    recorder = g.pop('sql_queries', None)
+    if recorder is None:
+        return response
+    db_ms = recorder.seconds * 1000
+    response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (db_ms, recorder.count))
+    repeated = recorder.repeated()
+    entry = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'queries': recorder.count,
+        'db_ms': round(db_ms, 1),
+        'repeated': [{'count': count, 'statement': statement} for statement, count in repeated],
+    }
+    logger.log(logging.WARNING if repeated else logging.INFO, json.dumps(entry, separators=(',', ':')))
+    return response
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -3,7 +3,7 @@
 # Contains routes and functions related to user authentication.
 from datetime import date, datetime, timedelta
 import os
-from flask import Blueprint,request,jsonify,render_template, redirect,make_response,session,send_file
+from flask import Blueprint,request,jsonify,render_template, redirect,make_response,session
 from flask_bcrypt import Bcrypt
 from models.user import User,Reader,Teacher,Admin,SuperAdmin,Parent
 from models.game_result import Game_result, GameEnum
@@ -35,6 +35,8 @@ from models.book_text import Book_text
 from models.follow_session import Follow_session
 from models.audio_book import AudioBook, AudioBookPage
 from apps.account_status import get_account_block_message
+from apps.daily_activity import add_daily_activity, get_daily_activity_range
+from apps.passwords import PasswordHashingBusy, busy_response, check_password, hash_password, verify_and_upgrade
 from apps.account_deletion import (
     delete_users,
     forget_quiz_accounts,
@@ -43,7 +45,13 @@ from apps.account_deletion import (
 )
 from apps.main.email import generate_confirmed_token,reader_confirm_token,generate_email_change_token,confirm_email_change_token
 from apps.jitsi import is_online_session, serialize_jitsi_call
-from apps.notifications import serialize_reader_notification
+from apps.notifications import (
+    FEED_CURSOR_PARSERS,
+    filter_reader_notifications,
+    reader_notification_feed,
+    serialize_reader_notification,
+)
+from apps.pagination import decode_cursor
 from apps.game_calendar import (
     GameCalendarError,
     GAMES_MODE_GLOBAL,
@@ -66,9 +74,14 @@ from apps.progress_engine import (
     get_word_progress_daily_trend,
     record_self_reported_word,
     submit_attempt,
+    submit_attempt_batch,
 )
 from apps.certificates import get_certificates_for_user, issue_certificates_for_user
+from apps.protected_files import send_protected_file
+from apps.progress_buffer import ensure_flusher, story_progress_buffer, write_behind_enabled
+from apps.reader_passport import get_passport_data, note_story_progress
 from apps.storage import ensure_school_tree
+from apps.story_pages import PAGE_FORMATS, ensure_page_index, resolve_page_file
 from apps.seats import (
     SOURCE_PARENT_CODE,
     SOURCE_READER_CODE,
@@ -92,6 +105,7 @@ import uuid
 import requests
 import time
 from user_agents import parse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased
 from flask import jsonify
 from sqlalchemy import exists, and_, or_
@@ -118,16 +132,9 @@ login_manager.init_app(reader)
 
 
 def get_reader_notification_query():
-    return (
-        ReaderNotification.query
-        .filter(
-            ReaderNotification.user_id == current_user.id,
-            or_(
-                ReaderNotification.expires_at.is_(None),
-                ReaderNotification.expires_at >= datetime.utcnow()
-            )
-        )
-    )
+    # Expired notifications are deleted by purge_expired_notifications
+    # (scripts/purge_expired_notifications.py) rather than filtered here.
+    return ReaderNotification.query.filter(ReaderNotification.user_id == current_user.id)
 
 
 def parse_notification_pagination():
@@ -140,18 +147,47 @@ def parse_notification_pagination():
     return max(page, 1), min(max(per_page, 1), 100)
 
 
+def is_true_arg(name):
+    return str(request.args.get(name, '')).lower() in ['1', 'true', 'yes']
+
+
+## @brief The reader's notification feed.
+#
+# Without `before` this is the offset-paged list it has always been (`page`
+# defaults to 1, with totals). Sending `before` opts into the keyset feed:
+# `?before=` (empty) for the first page, then the previous response's
+# `next_before` for each next one. `?with_total=1` adds the total to a cursor
+# page -- a separate COUNT the feed itself does not need.
 @reader.route('/notifications', methods=['GET'])
 @login_required
 def get_reader_notifications():
     try:
         page, per_page = parse_notification_pagination()
-        query = get_reader_notification_query()
         notification_type = request.args.get('type')
-        if notification_type:
-            query = query.filter(ReaderNotification.type == notification_type)
-        if str(request.args.get('unread', '')).lower() in ['1', 'true', 'yes']:
-            query = query.filter(ReaderNotification.read_at.is_(None))
+        unread_only = is_true_arg('unread')
+        unread_count = get_reader_notification_query().filter(ReaderNotification.read_at.is_(None)).count()
+
+        if 'before' in request.args:
+            try:
+                after = decode_cursor(request.args.get('before'), FEED_CURSOR_PARSERS)
+            except ValueError as error:
+                return jsonify({'message': str(error)}), 400
+            notifications, next_before = reader_notification_feed(
+                current_user.id, per_page, after=after,
+                notification_type=notification_type, unread_only=unread_only,
+            )
+            pagination = {'per_page': per_page, 'next_before': next_before, 'has_next': next_before is not None}
+            if is_true_arg('with_total'):
+                query = filter_reader_notifications(get_reader_notification_query(), notification_type, unread_only)
+                pagination['total'] = query.order_by(None).count()
+            return jsonify({
+                'notifications': [serialize_reader_notification(notification) for notification in notifications],
+                'unread_count': unread_count,
+                'next_before': next_before,
+                'pagination': pagination,
+            }), 200
 
+        query = filter_reader_notifications(get_reader_notification_query(), notification_type, unread_only)
         total = query.order_by(None).count()
         notifications = (
             query
@@ -161,7 +197,6 @@ def get_reader_notifications():
             .all()
         )
         pages = (total + per_page - 1) // per_page if total else 0
-        unread_count = get_reader_notification_query().filter(ReaderNotification.read_at.is_(None)).count()
         return jsonify({
             'notifications': [serialize_reader_notification(notification) for notification in notifications],
             'unread_count': unread_count,
@@ -280,11 +315,6 @@ def split_words_into_stages(words, game_types, difficulty="hard"):
     return game_data
 
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-
 ## @brief Check if the email entered by the user already exists in the database.
 #
 # This function verifies if the email entered by the user already exists in the database.
@@ -717,7 +747,8 @@ def reader_follows_pack_with_book(book_id):
 def get_reader_story_progress(story_id):
     if not current_user.is_authenticated:
         return None
-    return ReaderStoryProgress.query.filter_by(user_id=current_user.id, story_id=story_id).first()
+    progress = ReaderStoryProgress.query.filter_by(user_id=current_user.id, story_id=story_id).first()
+    return story_progress_buffer.overlay(progress)
 
 def serialize_reader_story(story, include_pdf_url=False):
     progress = get_reader_story_progress(story.id)
@@ -737,6 +768,11 @@ def serialize_reader_story(story, include_pdf_url=False):
     }
     if include_pdf_url:
         story_data['pdf_url'] = f'/reader/stories/{story.id}/pdf'
+        # Indexed stories can be opened page by page: pages_url + '/<n>',
+        # with page sizes for laying the book out before any page arrives.
+        if story.page_index:
+            story_data['pages_url'] = f'/reader/stories/{story.id}/pages'
+            story_data['page_sizes'] = story.page_index.get('pages') or []
     return story_data
 
 def user_can_access_story(story):
@@ -1256,7 +1292,7 @@ def login_from_school_public_page(slug):
             User.query.filter(func.lower(User.email) == email, User.is_primary.is_(True)).first()
             or User.query.filter(func.lower(User.email) == email).first()
         )
-        if not user or not bcrypt.check_password_hash(user.password_hashed, password):
+        if not user or not verify_and_upgrade(user, password):
             return jsonify({'message': 'Invalid email or password'}), 404
         if not user.confirmed:
             return jsonify({'message': "You don't confirm your account"}), 403
@@ -1269,6 +1305,7 @@ def login_from_school_public_page(slug):
         if not user_belongs_to_school(user.id, school.id):
             return jsonify({'message': 'You are not joined to this school'}), 403
 
+        db.session.commit()
         login_user(user)
         set_selected_school_context(school.id)
         return jsonify({
@@ -1278,6 +1315,8 @@ def login_from_school_public_page(slug):
             'school': school.name,
             'dashboard_url': f'/dashboard?school_id={school.id}'
         }), 200
+    except PasswordHashingBusy as error:
+        return busy_response(error)
     except Exception as error:
         logging.error('School public page login failed: %s', error, exc_info=True)
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
@@ -1605,12 +1644,13 @@ def login_client():
         # the Parent, which always requires a PIN) -- fall back to whichever
         # row matches if none is flagged primary yet (pre-migration data).
         user = next((account for account in accounts if account.is_primary), accounts[0] if accounts else None)
-        if user and bcrypt.check_password_hash(user.password_hashed,password):
+        if user and verify_and_upgrade(user, password):
             if user.confirmed:
                 if user.approved:
                     block = get_account_block_message(user)
                     if block:
                         return jsonify({'message': block[0], 'code': 'ACCOUNT_INACTIVE'}), block[1]
+                    db.session.commit()
                     login_user(user)
                     pin_required = len(accounts) > 1
                     accountsData=[]
@@ -1632,6 +1672,8 @@ def login_client():
         else:  
             return jsonify({'message':'Invalid email or password'}),404
     
+    except PasswordHashingBusy as error:
+        return busy_response(error)
     except Exception as error:
         print(error)
         return jsonify({'message':'Internal server error','error':str(error)}),500
@@ -1642,12 +1684,13 @@ def login():
         email=request.json['email']
         password=request.json['password']
         user = User.query.filter_by(email=email, is_primary=True).first() or User.query.filter_by(email=email).first()
-        if user and bcrypt.check_password_hash(user.password_hashed,password):
+        if user and verify_and_upgrade(user, password):
             if user.confirmed:
                 if user.approved:
                     block = get_account_block_message(user)
                     if block:
                         return jsonify({'message': block[0], 'code': 'ACCOUNT_INACTIVE'}), block[1]
+                    db.session.commit()
                     login_user(user)
 
                     return jsonify({'message':'Your are logged in succesfully','role':user.type,'must_change_password':bool(user.must_change_password)}),200
@@ -1658,6 +1701,8 @@ def login():
         else:
             return jsonify({'message':'Invalid email or password'}),404
 
+    except PasswordHashingBusy as error:
+        return busy_response(error)
     except Exception as error:
         return jsonify({'message':'Internal server error','error':str(error)}),500
 
@@ -1673,12 +1718,15 @@ def change_password():
         new_password = request.json.get('new_password')
         if not current_password or not new_password:
             return jsonify({'message':'current_password and new_password are required'}),400
-        if not bcrypt.check_password_hash(current_user.password_hashed,current_password):
+        if not check_password(current_user.password_hashed,current_password):
             return jsonify({'message':'Current password is incorrect'}),403
-        current_user.password_hashed = bcrypt.generate_password_hash(new_password).decode('utf-8')
+        current_user.password_hashed = hash_password(new_password)
         current_user.must_change_password = False
         db.session.commit()
         return jsonify({'message':'Password updated successfully'}),200
+    except PasswordHashingBusy as error:
+        db.session.rollback()
+        return busy_response(error)
     except Exception as error:
         db.session.rollback()
         return jsonify({'message':'Internal server error','error':str(error)}),500
@@ -1720,7 +1768,7 @@ def select_account():
                     return jsonify({'message':'Too many incorrect PIN attempts, please try again later'}),429
 
                 pin = request.json.get('pin')
-                if not pin or not bcrypt.check_password_hash(user.pin_hash,pin):
+                if not pin or not verify_and_upgrade(user, pin, field='pin_hash'):
                     user.pin_failed_attempts = (user.pin_failed_attempts or 0) + 1
                     if user.pin_failed_attempts >= PIN_MAX_ATTEMPTS:
                         user.pin_locked_until = datetime.now() + timedelta(minutes=PIN_LOCKOUT_MINUTES)
@@ -1740,6 +1788,8 @@ def select_account():
         else:
             return jsonify({'message':'Invalid account'}),404
 
+    except PasswordHashingBusy as error:
+        return busy_response(error)
     except Exception as error:
         return jsonify({'message':'Internal server error','error':str(error)}),500
 ## @brief Upgrade a legacy single-reader household to a Parent-managed one.
@@ -1933,53 +1983,18 @@ def get_child_analytics(child_id):
             'daily': get_word_progress_daily_trend(child.id, start_date, end_date),
         }
 
-        game_rows = (
-            db.session.query(
-                Game_result.day,
-                func.count(Game_result.id),
-                func.avg(Game_result.score),
-                func.sum(Game_result.time_spent_seconds),
-            )
-            .filter(
-                Game_result.user_id == child.id,
-                Game_result.day >= start_date,
-                Game_result.day <= end_date,
-            )
-            .group_by(Game_result.day)
-            .all()
-        )
-        practice_rows = (
-            db.session.query(
-                PracticePlay.day,
-                func.count(PracticePlay.id),
-                func.avg(PracticePlay.score),
-                func.sum(PracticePlay.time_spent_seconds),
-            )
-            .filter(
-                PracticePlay.user_id == child.id,
-                PracticePlay.day >= start_date,
-                PracticePlay.day <= end_date,
-            )
-            .group_by(PracticePlay.day)
-            .all()
-        )
-        # Daily Run (Game_result, one row/day/book) and practice-mode plays
-        # (PracticePlay, unlimited rows/day) are two different tables -- merge
-        # them by day so "games played" reflects all play, not just Daily Run.
-        game_activity_by_day = {}
-        for day, played, avg_score, total_time in game_rows + practice_rows:
-            entry = game_activity_by_day.setdefault(day, {'played': 0, 'score_sum': 0.0, 'time': 0})
-            entry['played'] += played
-            entry['score_sum'] += float(avg_score or 0) * played
-            entry['time'] += int(total_time or 0)
+        # Daily Run results and practice plays, both counted into the
+        # reader's daily activity rows as they are recorded, so "games
+        # played" reflects all play from one row per day.
         game_daily = [
             {
-                'date': day.isoformat(),
-                'games_played': entry['played'],
-                'avg_score': round(entry['score_sum'] / entry['played'], 1) if entry['played'] else 0,
-                'time_spent_seconds': entry['time'],
+                'date': activity.day.isoformat(),
+                'games_played': activity.games_played,
+                'avg_score': round(activity.score_sum / activity.games_played, 1) if activity.games_played else 0,
+                'time_spent_seconds': activity.time_spent_seconds,
             }
-            for day, entry in sorted(game_activity_by_day.items())
+            for activity in get_daily_activity_range(child.id, start_date, end_date)
+            if activity.games_played
         ]
 
         quiz_daily = []
@@ -2422,18 +2437,47 @@ def get_reader_story_pdf(story_id):
         story = get_accessible_story(story_id)
         if not story:
             return jsonify({'message': 'Story not found'}), 404
-        if not story.file_path or not os.path.exists(story.file_path):
-            return jsonify({'message': 'Story PDF file not found'}), 404
-
-        return send_file(
+        return send_protected_file(
             story.file_path,
             mimetype='application/pdf',
-            as_attachment=False,
-            download_name=story.original_filename
+            download_name=story.original_filename,
+            missing_message='Story PDF file not found',
         )
     except Exception as error:
         return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
 
+@reader.route('/stories/<int:story_id>/pages/<int:page_number>', methods=['GET'])
+@login_required
+def get_reader_story_page(story_id, page_number):
+    try:
+        story = get_accessible_story(story_id)
+        if not story:
+            return jsonify({'message': 'Story not found'}), 404
+        page_format = (request.args.get('format') or 'pdf').lower()
+        if page_format not in PAGE_FORMATS:
+            return jsonify({'message': 'format must be one of: %s' % ', '.join(PAGE_FORMATS)}), 400
+        # 503 rather than 404: the story exists, this server just cannot cut
+        # it into pages, and the client should fall back to the whole PDF.
+        if not ensure_page_index(story):
+            return jsonify({
+                'message': 'Story pages are not available; use the PDF',
+                'pdf_url': f'/reader/stories/{story.id}/pdf'
+            }), 503
+        if page_number < 1 or page_number > story.page_count:
+            return jsonify({'message': 'Page not found'}), 404
+
+        file_path = resolve_page_file(story, page_number, page_format)
+        if not file_path:
+            return jsonify({'message': 'Page images are not available; use format=pdf'}), 503
+        return send_protected_file(
+            file_path,
+            mimetype=PAGE_FORMATS[page_format],
+            missing_message='Story page not found',
+        )
+    except Exception as error:
+        db.session.rollback()
+        return jsonify({'message': 'Internal server error', 'error': str(error)}), 500
+
 @reader.route('/stories/<int:story_id>/progress', methods=['PUT'])
 @login_required
 def update_reader_story_progress(story_id):
@@ -2446,11 +2490,7 @@ def update_reader_story_progress(story_id):
         current_page = data.get('current_page')
         zoom = data.get('zoom')
 
-        progress = ReaderStoryProgress.query.filter_by(user_id=current_user.id, story_id=story.id).first()
-        if not progress:
-            progress = ReaderStoryProgress(user_id=current_user.id, story_id=story.id)
-            db.session.add(progress)
-
+        values = {}
         if current_page is not None:
             try:
                 current_page = int(current_page)
@@ -2460,7 +2500,7 @@ def update_reader_story_progress(story_id):
                 return jsonify({'message': 'current_page must be greater than 0'}), 400
             if story.page_count and current_page > story.page_count:
                 current_page = story.page_count
-            progress.current_page = current_page
+            values['current_page'] = current_page
 
         if zoom is not None:
             try:
@@ -2469,9 +2509,28 @@ def update_reader_story_progress(story_id):
                 return jsonify({'message': 'zoom must be a number'}), 400
             if zoom <= 0:
                 return jsonify({'message': 'zoom must be greater than 0'}), 400
-            progress.zoom = zoom
+            values['zoom'] = zoom
+        now = datetime.now()
 
-        progress.last_read_at = datetime.now()
+        progress = ReaderStoryProgress.query.filter_by(user_id=current_user.id, story_id=story.id).first()
+        started = progress is None
+        if not started and write_behind_enabled():
+            # A page flip on a story already started: buffered, written with
+            # the next batch (apps/progress_buffer.py).
+            story_progress_buffer.record((current_user.id, story.id), values, now)
+            ensure_flusher()
+            return jsonify({'progress': serialize_reader_story(story)}), 200
+
+        if started:
+            progress = ReaderStoryProgress(user_id=current_user.id, story_id=story.id)
+            db.session.add(progress)
+        for field, value in values.items():
+            setattr(progress, field, value)
+
+        progress.last_read_at = now
+        if started:
+            # A new story in progress moves the passport's reading counts.
+            note_story_progress(current_user.id)
         db.session.commit()
         return jsonify({'progress': serialize_reader_story(story)}), 200
     except Exception as error:
@@ -2490,12 +2549,16 @@ def complete_reader_story(story_id):
         if not progress:
             progress = ReaderStoryProgress(user_id=current_user.id, story_id=story.id)
             db.session.add(progress)
+        # Completion is written now; it supersedes any buffered position.
+        for field, value in (story_progress_buffer.take((current_user.id, story.id)) or {}).items():
+            setattr(progress, field, value)
 
         if story.page_count:
             progress.current_page = story.page_count
         progress.completed = True
         progress.completed_at = datetime.now()
         progress.last_read_at = datetime.now()
+        note_story_progress(current_user.id)
         db.session.commit()
 
         return jsonify({
@@ -4323,6 +4386,8 @@ def parse_result_completed(value, default=False):
 
 
 def apply_game_result_payload(game_result, data):
+    previous_score = game_result.score or 0
+    previous_time = game_result.time_spent_seconds or 0
     if 'score' in data:
         game_result.score = data['score']
 
@@ -4335,6 +4400,12 @@ def apply_game_result_payload(game_result, data):
     if 'time_spent_seconds' in data:
         game_result.time_spent_seconds = parse_non_negative_seconds(data.get('time_spent_seconds'))
 
+    add_daily_activity(
+        game_result.user_id, game_result.day,
+        score_sum=float(game_result.score or 0) - float(previous_score),
+        time_spent_seconds=(game_result.time_spent_seconds or 0) - previous_time,
+    )
+
 
 def is_played_game_result(result):
     return result is not None
@@ -4578,7 +4649,21 @@ def create_game_result():
         )
 
         db.session.add(new_result)
-        db.session.commit()
+        try:
+            # The counter UPDATE flushes new_result first, so a lost race
+            # surfaces here as well as at commit.
+            add_daily_activity(user_id, result_day, games_played=1, score_sum=float(new_result.score or 0),
+                               time_spent_seconds=new_result.time_spent_seconds)
+            db.session.commit()
+        except IntegrityError:
+            # A double-submitted round lost the race for the day's row
+            # (uq_game_result_user_day_game_book); answer with the winner.
+            db.session.rollback()
+            existing_result = Game_result.query.filter_by(user_id=user_id, day=result_day,game=game_status,book_id=data['book_id']).first()
+            if not existing_result:
+                raise
+            result_data = serialize_game_result(existing_result, current_user_id=user_id)
+            return jsonify({'message': 'You already played the game. Do you want to continue?', 'result': result_data}), 200
 
         result_data = serialize_game_result(new_result, current_user_id=user_id)
 
@@ -4628,6 +4713,8 @@ def create_practice_play():
             time_spent_seconds=parse_non_negative_seconds(data.get('time_spent_seconds')),
         )
         db.session.add(play)
+        add_daily_activity(user_id, play.day, games_played=1, score_sum=float(play.score or 0),
+                           time_spent_seconds=play.time_spent_seconds)
         db.session.commit()
 
         return jsonify({'message': 'Practice play recorded', 'id': play.id}), 201
@@ -4707,6 +4794,44 @@ def create_word_attempt():
         return jsonify({'message': 'Internal server error', 'code': 'INTERNAL_SERVER_ERROR'}), 500
 
 
+@reader.route('/word-attempts', methods=['POST'])
+@login_required
+def create_word_attempt_batch():
+    """A whole game round at once: `{book_id, mode, game, attempts: [{word,
+    correct, hints_used, heaviest_hint_tier, from_memory, game?}, ...]}`.
+    One transaction, one streak update and one achievement / near-miss pass
+    for the round; per-word results come back in submission order."""
+    try:
+        data = request.get_json() or {}
+
+        required_fields = ['book_id', 'mode', 'attempts']
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return jsonify({
+                'message': 'Missing required fields: %s' % ', '.join(missing_fields),
+                'code': 'MISSING_FIELDS',
+            }), 400
+
+        # Always the signed-in reader: unlike /word-attempt, a body user_id
+        # is not honoured, so a round cannot be recorded for someone else.
+        result = submit_attempt_batch(
+            user_id=current_user.id,
+            book_id=data['book_id'],
+            mode=data['mode'],
+            attempts=data['attempts'],
+            game=data.get('game'),
+        )
+        return jsonify(result), 200
+    except AttemptError as error:
+        db.session.rollback()
+        payload, status_code = attempt_error_response(error)
+        return jsonify(payload), status_code
+    except Exception as error:
+        db.session.rollback()
+        logging.error('Word attempt batch submission failed: %s', error, exc_info=True)
+        return jsonify({'message': 'Internal server error', 'code': 'INTERNAL_SERVER_ERROR'}), 500
+
+
 @reader.route('/self-reported-word', methods=['POST'])
 def create_self_reported_word():
     """The 'words I already know' shelf — a typed word that isn't a tracked
@@ -4817,21 +4942,6 @@ def get_words_i_know_route():
 # achievements, and certificates.
 # ---------------------------------------------------------------------------
 
-def _count_earned_achievements(achievement_catalog):
-    earned = 0
-    total = 0
-    for entry in achievement_catalog:
-        tiers = entry.get('tiers')
-        if tiers:
-            total += len(tiers)
-            earned += sum(1 for tier in tiers if tier.get('earned'))
-        else:
-            total += 1
-            if entry.get('earned'):
-                earned += 1
-    return earned, total
-
-
 def build_reader_passport(user_id, include_email=False):
     reader = User.query.get(user_id)
     if reader is None:
@@ -4853,25 +4963,10 @@ def build_reader_passport(user_id, include_email=False):
         for membership, school in memberships
     ]
 
-    completed_stories = ReaderStoryProgress.query.filter_by(user_id=user_id, completed=True).count()
-    stories_in_progress = ReaderStoryProgress.query.filter(
-        ReaderStoryProgress.user_id == user_id,
-        ReaderStoryProgress.completed.is_(False),
-    ).count()
-    books_completed = (
-        db.session.query(func.count(func.distinct(BookStory.book_id)))
-        .join(ReaderStoryProgress, ReaderStoryProgress.story_id == BookStory.id)
-        .filter(ReaderStoryProgress.user_id == user_id, ReaderStoryProgress.completed.is_(True))
-        .scalar()
-    ) or 0
-
-    # Reconcile certificates on view so a milestone earned before certificates
-    # existed still shows up in the passport.
-    issue_certificates_for_user(user_id)
-    certificates = get_certificates_for_user(user_id)
-
-    summary = get_progress_summary(user_id)
-    earned, total = _count_earned_achievements(get_achievement_status(user_id))
+    # Everything below the identity and schools comes from the reader's
+    # precomputed snapshot: one keyed read instead of the progress summary,
+    # the achievement catalogue and a certificate reconcile on every view.
+    data = get_passport_data(user_id)
 
     reader_level = getattr(reader, 'level', None) if reader.type == 'reader' else None
 
@@ -4887,20 +4982,11 @@ def build_reader_passport(user_id, include_email=False):
             'member_since': reader.created_at.isoformat() if reader.created_at else None,
         },
         'schools': schools,
-        'reading': {
-            'stories_completed': completed_stories,
-            'stories_in_progress': stories_in_progress,
-            'books_completed': books_completed,
-        },
-        'vocabulary': {
-            'guessed_or_better': summary['guessed_or_better'],
-            'mastered': summary['mastered'],
-            'band_rollup': summary['band_rollup'],
-            'words_i_know_count': summary['words_i_know_count'],
-        },
-        'streak': summary['streak'],
-        'achievements': {'earned': earned, 'total': total},
-        'certificates': certificates,
+        'reading': data['reading'],
+        'vocabulary': data['vocabulary'],
+        'streak': data['streak'],
+        'achievements': data['achievements'],
+        'certificates': data['certificates'],
     }
     if include_email:
         passport['reader']['email'] = reader.email
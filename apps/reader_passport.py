@@ -0,0 +1,250 @@
+## @file
+# @brief The aggregate half of the Global Reading Passport (PRD §2), kept as a
+# per-reader snapshot (ReaderPassportSnapshot) instead of recomputed per view.
+#
+# Building those sections from scratch costs the progress summary, the full
+# achievement catalogue (a walk over every chapter on the platform), three
+# story counts and a certificate reconcile that may write -- on the app's home
+# screen. Now each event that moves a section refreshes only that section, in
+# the same transaction as the event:
+#
+#   submit_attempt           -> vocabulary (when a stage moved), streak,
+#                               achievements earned
+#   story started/completed  -> reading
+#   certificate issued       -> certificates
+#   word shelved             -> vocabulary.words_i_know_count, achievements
+#
+# The achievement total is the one figure no reader event moves -- it grows
+# with the catalogue -- so it is refreshed only by a full rebuild. So is
+# anything an incremental update missed (a failed hook, a row edited by hand):
+# scripts/rebuild_reader_passports.py rebuilds every snapshot older than a
+# bound, which is the staleness guarantee.
+#
+# A reader without a snapshot simply gets one built on their first view, so
+# the hooks never need to create rows.
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from apps.certificates import get_certificates_for_user, issue_certificates_for_user
+from apps.progress_engine import (
+    ACHIEVEMENT_CATALOG,
+    SINGLE_FIRE_CATALOG,
+    _count_guessed_or_better,
+    _count_mastered,
+    _count_word_wizard_shelf,
+    _streak_summary,
+    get_achievement_status,
+    get_band_rollup,
+)
+from extensions import db
+from models.book_story import BookStory
+from models.reader_passport_snapshot import ReaderPassportSnapshot
+from models.reader_story_progress import ReaderStoryProgress
+
+PASSPORT_SNAPSHOT_VERSION = 1
+
+## @brief Default staleness bound for the rebuild command.
+PASSPORT_MAX_AGE = timedelta(days=1)
+
+_CATALOG_KEYS = frozenset(
+    [entry[0] for entry in ACHIEVEMENT_CATALOG] + [entry[0] for entry in SINGLE_FIRE_CATALOG]
+)
+_CATALOG_PREFIXES = ('first_word_in_', 'band_cleared_', 'book_conqueror_')
+
+
+def count_earned_achievements(achievement_catalog):
+    earned = 0
+    total = 0
+    for entry in achievement_catalog:
+        tiers = entry.get('tiers')
+        if tiers:
+            total += len(tiers)
+            earned += sum(1 for tier in tiers if tier.get('earned'))
+        else:
+            total += 1
+            if entry.get('earned'):
+                earned += 1
+    return earned, total
+
+
+def _is_catalog_achievement(key):
+    """Whether an unlocked achievement is one get_achievement_status lists,
+    and so one the passport's earned count includes. chapter_master_* and
+    its_a_hint_now are awarded but not listed."""
+    key = key or ''
+    return key in _CATALOG_KEYS or key.startswith(_CATALOG_PREFIXES)
+
+
+def reading_section(user_id):
+    completed_stories = ReaderStoryProgress.query.filter_by(user_id=user_id, completed=True).count()
+    stories_in_progress = ReaderStoryProgress.query.filter(
+        ReaderStoryProgress.user_id == user_id,
+        ReaderStoryProgress.completed.is_(False),
+    ).count()
+    books_completed = (
+        db.session.query(func.count(func.distinct(BookStory.book_id)))
+        .join(ReaderStoryProgress, ReaderStoryProgress.story_id == BookStory.id)
+        .filter(ReaderStoryProgress.user_id == user_id, ReaderStoryProgress.completed.is_(True))
+        .scalar()
+    ) or 0
+    return {
+        'stories_completed': completed_stories,
+        'stories_in_progress': stories_in_progress,
+        'books_completed': books_completed,
+    }
+
+
+def _vocabulary_counts(user_id):
+    return {
+        'guessed_or_better': _count_guessed_or_better(user_id),
+        'mastered': _count_mastered(user_id),
+        'band_rollup': get_band_rollup(user_id),
+    }
+
+
+def compute_passport_data(user_id):
+    """Every snapshot section from scratch -- the cost the snapshot exists to
+    keep off the view."""
+    vocabulary = _vocabulary_counts(user_id)
+    vocabulary['words_i_know_count'] = _count_word_wizard_shelf(user_id)
+    earned, total = count_earned_achievements(get_achievement_status(user_id))
+    return {
+        'reading': reading_section(user_id),
+        'vocabulary': vocabulary,
+        'streak': _streak_summary(user_id),
+        'achievements': {'earned': earned, 'total': total},
+        'certificates': get_certificates_for_user(user_id),
+    }
+
+
+def rebuild_passport_snapshot(user_id):
+    """Full rebuild of one reader's snapshot, reconciling certificates first
+    so a milestone earned before certificates existed still shows up.
+
+    Flushes but does not commit."""
+    issue_certificates_for_user(user_id, commit=False)
+    data = compute_passport_data(user_id)
+    now = datetime.now()
+
+    snapshot = db.session.get(ReaderPassportSnapshot, user_id)
+    if snapshot is None:
+        snapshot = ReaderPassportSnapshot(user_id=user_id)
+        db.session.add(snapshot)
+    snapshot.version = PASSPORT_SNAPSHOT_VERSION
+    snapshot.data = data
+    snapshot.built_at = now
+    snapshot.updated_at = now
+    db.session.flush()
+    return snapshot
+
+
+def get_passport_data(user_id):
+    """The snapshot sections for a view: one keyed read, or a build (and
+    commit) on a reader's first view."""
+    snapshot = db.session.get(ReaderPassportSnapshot, user_id)
+    if snapshot is None or snapshot.version != PASSPORT_SNAPSHOT_VERSION:
+        snapshot = rebuild_passport_snapshot(user_id)
+        db.session.commit()
+    return snapshot.data
+
+
+def _update_snapshot(user_id, apply):
+    """Run `apply(data)` against the reader's snapshot, if they have one.
+
+    The row is locked for the read-modify-write so two requests for the same
+    reader cannot lose each other's update. `data` is replaced, not mutated in
+    place: a plain JSON column does not notice in-place changes. Flushes but
+    does not commit, so the update lands with the caller's transaction."""
+    snapshot = (
+        ReaderPassportSnapshot.query.filter_by(user_id=user_id)
+        .with_for_update()
+        .first()
+    )
+    if snapshot is None or snapshot.version != PASSPORT_SNAPSHOT_VERSION:
+        return
+    data = {key: (dict(value) if isinstance(value, dict) else list(value))
+            for key, value in (snapshot.data or {}).items()}
+    apply(data)
+    snapshot.data = data
+    snapshot.updated_at = datetime.now()
+    db.session.flush()
+
+
+def _commit_maintenance(user_id, what):
+    # The event itself has already been committed by the time these run; a
+    # failure here must not fail it. The rebuild command repairs the snapshot.
+    try:
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        logging.warning('Passport snapshot %s update failed for user %s: %s', what, user_id, error)
+
+
+def note_attempt(user_id, vocabulary_changed, streak, unlocked):
+    """After submit_attempt. `vocabulary_changed` is true when the attempt
+    created the word's progress row or moved its stage -- the only times the
+    word counts or the band roll-up can change."""
+    def apply(data):
+        if vocabulary_changed:
+            data['vocabulary'].update(_vocabulary_counts(user_id))
+        data['streak'] = {
+            'current_streak': streak['current_streak'],
+            'best_streak': streak['best_streak'],
+            'grace_available': streak['grace_available'],
+        }
+        newly_earned = sum(1 for entry in unlocked or [] if _is_catalog_achievement(entry.get('key')))
+        if newly_earned:
+            data['achievements']['earned'] += newly_earned
+
+    _update_snapshot(user_id, apply)
+    _commit_maintenance(user_id, 'attempt')
+
+
+def note_self_reported_word(user_id, shelf_count, unlocked):
+    def apply(data):
+        data['vocabulary']['words_i_know_count'] = shelf_count
+        newly_earned = sum(1 for entry in unlocked or [] if _is_catalog_achievement(entry.get('key')))
+        if newly_earned:
+            data['achievements']['earned'] += newly_earned
+
+    _update_snapshot(user_id, apply)
+    _commit_maintenance(user_id, 'shelf')
+
+
+def note_story_progress(user_id):
+    """Before the caller commits a story being started or completed; the
+    counts are recomputed, which is cheap and keyed on the reader."""
+    def apply(data):
+        data['reading'] = reading_section(user_id)
+
+    _update_snapshot(user_id, apply)
+
+
+def note_certificates(user_id, certificates):
+    """After certificates were issued and committed; `certificates` are
+    serialized, newest first like get_certificates_for_user."""
+    if not certificates:
+        return
+
+    def apply(data):
+        known = {entry.get('id') for entry in data['certificates']}
+        fresh = [entry for entry in certificates if entry.get('id') not in known]
+        data['certificates'] = fresh + data['certificates']
+
+    _update_snapshot(user_id, apply)
+    _commit_maintenance(user_id, 'certificate')
+
+
+def stale_snapshot_user_ids(max_age=PASSPORT_MAX_AGE, limit=None):
+    """Readers whose snapshot was last fully rebuilt before `max_age` ago (or
+    under another snapshot version), oldest first."""
+    cutoff = datetime.now() - max_age
+    query = db.session.query(ReaderPassportSnapshot.user_id).filter(
+        (ReaderPassportSnapshot.built_at < cutoff)
+        | (ReaderPassportSnapshot.version != PASSPORT_SNAPSHOT_VERSION)
+    ).order_by(ReaderPassportSnapshot.built_at, ReaderPassportSnapshot.user_id)
+    if limit:
+        query = query.limit(limit)
+    return [user_id for (user_id,) in query]
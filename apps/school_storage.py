@@ -11,7 +11,7 @@
 # admin can never name another school's id. Super-admins additionally get the
 # platform folder and a cross-school overview, since they own platform assets
 # and are the ones who raise a school's quota.
-import os
+from datetime import datetime
 
 from flask import Blueprint, jsonify, request
 from flask_login import current_user, login_required
@@ -23,19 +23,23 @@ from apps.admin.routes import (
     admin_required,
     can_manage_content,
     get_current_school_id,
+    get_optional_bool_arg,
     is_super_admin,
     log_admin_action,
 )
+from apps.pagination import decode_cursor, encode_cursor, keyset_page
 from apps.storage import (
+    VARIANT_LINK,
     StorageError,
-    absolute_path,
     delete_file,
     ensure_school_tree,
     owner_folder,
+    quota_bytes,
     save_upload,
     serialize_categories,
     serialize_file,
     usage_summary,
+    usage_totals_by_owner,
     validate_category,
 )
 from config import ConfigClass
@@ -128,7 +132,18 @@ def get_storage_usage():
 # Paginated because a school with a full audiobook library has thousands of
 # files, and the image pickers open straight onto this listing.
 #
-# Query: category, q (search), page, per_page, kind (image|audio|document).
+# Paged by keyset on (created_at, id), newest first: pass the `next_cursor` of
+# one response as `cursor` to get the next page, which the listing index
+# answers directly however deep the admin scrolls. `page` still works for
+# frontends that have not moved over, at the cost of an OFFSET scan. The total
+# (a COUNT) is returned on the first page and in page mode, or whenever
+# `include_total=true`.
+#
+# Search is a prefix match on the original filename or the title, so it stays
+# an index range scan instead of a full scan per keystroke.
+#
+# Query: category, q (search), cursor, page, per_page, include_total,
+# kind (image|audio|document), missing (true|false).
 @storage_api.route('/files', methods=['GET'])
 @login_required
 @admin_assistant_or_content_required
@@ -144,6 +159,8 @@ def list_storage_files():
             query = query.filter(SchoolFile.shcool_id.is_(None))
         else:
             query = query.filter(SchoolFile.shcool_id == school_id)
+        # Resized copies are managed with their original, not listed apart.
+        query = query.filter(or_(SchoolFile.linked_type.is_(None), SchoolFile.linked_type != VARIANT_LINK))
 
         category = (request.args.get('category') or '').strip()
         if category:
@@ -167,12 +184,15 @@ def list_storage_files():
 
         search = (request.args.get('q') or '').strip()
         if search:
-            pattern = '%%%s%%' % search
             query = query.filter(or_(
-                SchoolFile.original_filename.ilike(pattern),
-                SchoolFile.title.ilike(pattern)
+                SchoolFile.original_filename.startswith(search, autoescape=True),
+                SchoolFile.title.startswith(search, autoescape=True)
             ))
 
+        missing = get_optional_bool_arg('missing')
+        if missing is not None:
+            query = query.filter(SchoolFile.missing.is_(missing))
+
         try:
             page = max(int(request.args.get('page') or 1), 1)
         except (TypeError, ValueError):
@@ -182,14 +202,30 @@ def list_storage_files():
         except (TypeError, ValueError):
             per_page = DEFAULT_PER_PAGE
         per_page = min(max(per_page, 1), MAX_PER_PAGE)
-
-        pagination = query.order_by(SchoolFile.created_at.desc(), SchoolFile.id.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        cursor = decode_cursor(request.args.get('cursor'), (datetime.fromisoformat, int))
+        include_total = get_optional_bool_arg('include_total')
+
+        sort_key = [SchoolFile.created_at, SchoolFile.id]
+        total = None
+        if cursor is None and page > 1:
+            # Legacy page-number mode.
+            total = query.count()
+            items = (
+                query.order_by(SchoolFile.created_at.desc(), SchoolFile.id.desc())
+                .offset((page - 1) * per_page)
+                .limit(per_page + 1)
+                .all()
+            )
+            anchor = items[per_page - 1] if len(items) > per_page else None
+            items = items[:per_page]
+        else:
+            items, anchor = keyset_page(query, sort_key, per_page, after=cursor, descending=True)
+            if include_total or (cursor is None and include_total is None):
+                total = query.count()
 
         # One lookup for the uploader names shown in the table, rather than a
         # relationship access per row (this list is up to 100 rows deep).
-        uploader_ids = {item.uploaded_by for item in pagination.items if item.uploaded_by}
+        uploader_ids = {item.uploaded_by for item in items if item.uploaded_by}
         uploaders = {}
         if uploader_ids:
             uploaders = {
@@ -198,27 +234,21 @@ def list_storage_files():
             }
 
         files = []
-        for record in pagination.items:
+        for record in items:
             data = serialize_file(record)
             data['uploaded_by_name'] = uploaders.get(record.uploaded_by)
-            # Reported so the UI can flag a row whose bytes have vanished (a
-            # manual deletion on the server) instead of rendering a silently
-            # broken thumbnail. Legacy rows point outside the storage tree by
-            # design, so the existence check does not apply to them -- running it
-            # anyway would mark every one of them "missing".
-            if data['is_legacy']:
-                data['missing'] = False
-            else:
-                data['missing'] = not os.path.isfile(absolute_path(record.relative_path))
             files.append(data)
 
         return jsonify({
             'files': files,
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page if total is not None else None,
+            'next_cursor': encode_cursor(anchor.created_at, anchor.id) if anchor else None
         }), 200
+    except ValueError as error:
+        return jsonify({'message': str(error)}), 400
     except Exception as error:
         return jsonify({'message': 'Unable to list files: %s' % error}), 500
 
@@ -387,28 +417,33 @@ def list_school_storage():
         return jsonify({'message': 'Only a platform administrator can view this.'}), 403
 
     try:
+        # One read of the running totals for every owner, instead of a usage
+        # summary (and its own queries) per school.
+        totals = usage_totals_by_owner()
         rows = []
         for school in Shcool.query.order_by(Shcool.name.asc()).all():
-            summary = usage_summary(school.id)
+            folder = owner_folder(school.id)
+            used, file_count = totals.get(folder, (0, 0))
+            limit = quota_bytes(school.id, school=school)
             rows.append({
                 'school_id': school.id,
                 'school_name': school.name,
-                'folder': owner_folder(school.id),
-                'quota_mb': summary['quota_bytes'] // (1024 * 1024),
+                'folder': folder,
+                'quota_mb': limit // (1024 * 1024),
                 'quota_override_mb': school.storage_quota_mb,
-                'used_bytes': summary['used_bytes'],
-                'quota_bytes': summary['quota_bytes'],
-                'percent_used': summary['percent_used'],
-                'file_count': summary['file_count']
+                'used_bytes': used,
+                'quota_bytes': limit,
+                'percent_used': round((used / limit) * 100, 2) if limit else 0,
+                'file_count': file_count
             })
 
-        platform_summary = usage_summary(None)
+        platform_used, platform_files = totals.get(owner_folder(None), (0, 0))
         return jsonify({
             'schools': rows,
             'platform': {
                 'folder': owner_folder(None),
-                'used_bytes': platform_summary['used_bytes'],
-                'file_count': platform_summary['file_count']
+                'used_bytes': platform_used,
+                'file_count': platform_files
             },
             'default_quota_mb': ConfigClass.SCHOOL_STORAGE_QUOTA_MB
         }), 200
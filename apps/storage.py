@@ -17,18 +17,23 @@
 # and what URL the file is reachable at. Route modules call in here rather than
 # touching `os` directly, so a new upload endpoint cannot accidentally skip the
 # quota check or write outside a school's own folder.
+import hashlib
 import mimetypes
 import os
 import re
+import tempfile
+from datetime import datetime
 from uuid import uuid4
 
 from flask import request
-from sqlalchemy import func
+from sqlalchemy import func, or_, update
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
 from config import ConfigClass
 from extensions import db
 from models.school_file import STORAGE_CATEGORIES, SchoolFile
+from models.school_storage_usage import USAGE_TOTAL_CATEGORY, SchoolStorageUsage
 from models.shcool import Shcool
 
 ## @brief Raised for any caller mistake worth showing an admin verbatim --
@@ -110,6 +115,23 @@ MEDIA_URL_PATTERN = re.compile(
     r'^(?:https?://[^/]+)?' + re.escape(MEDIA_URL_PREFIX) + r'/(?P<path>.+)$'
 )
 
+## @brief Read size for streaming an upload to disk. Big enough that hashing
+# and writing are not dominated by per-call overhead, small enough that a
+# whole class uploading at once holds only a few MB of buffers per worker.
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+## @brief Name prefix of an upload still being written. The file sits next to
+# its final destination (so the closing rename is atomic), and the indexing
+# script skips anything carrying this prefix rather than counting a half-written
+# file against the school.
+STAGING_PREFIX = '.upload-'
+
+## @brief linked_type of a resized copy of an image (apps/image_variants.py);
+# linked_id is the original's SchoolFile id. Variants are charged to the
+# school like any file, hidden from the storage manager's listing, and
+# deleted with their original.
+VARIANT_LINK = 'variant'
+
 
 def storage_root():
     return os.path.abspath(ConfigClass.SCHOOL_STORAGE_DIR)
@@ -246,50 +268,169 @@ def category_max_mb(category):
 
 
 ## @brief A school's disk allowance in bytes.
-def quota_bytes(school_id):
+#
+# @param school: the already-loaded Shcool row, when the caller has it, to
+#        save the lookup (the super-admin overview walks every school).
+def quota_bytes(school_id, school=None):
     quota_mb = None
     if school_id is not None:
-        school = Shcool.query.get(school_id)
+        if school is None:
+            school = Shcool.query.get(school_id)
         quota_mb = school.storage_quota_mb if school else None
     if quota_mb is None:
         quota_mb = ConfigClass.SCHOOL_STORAGE_QUOTA_MB
     return int(quota_mb) * BYTES_PER_MB
 
 
-## @brief Total indexed bytes currently held by a school.
+def _quota_exceeded(limit):
+    return StorageError(
+        'This upload would exceed the school storage limit of %s MB. '
+        'Delete unused files or ask for a larger allowance.'
+        % (limit // BYTES_PER_MB)
+    )
+
+
+## @brief Add to one usage counter row, creating it on first use.
+#
+# A plain `bytes = bytes + delta` UPDATE, so concurrent writers to the same row
+# serialise on its row lock instead of overwriting each other's read-modify-
+# write. The row is only inserted when the UPDATE found nothing; the insert runs
+# in a savepoint so that losing the race to a concurrent first insert just means
+# retrying the UPDATE against the row the other request created.
+def _add_to_usage_row(school_id, category, delta_bytes, delta_count):
+    owner = owner_folder(school_id)
+    statement = (
+        update(SchoolStorageUsage)
+        .where(SchoolStorageUsage.owner == owner, SchoolStorageUsage.category == category)
+        .values(
+            bytes=SchoolStorageUsage.bytes + int(delta_bytes),
+            file_count=SchoolStorageUsage.file_count + int(delta_count),
+            updated_at=datetime.now()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(statement).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(SchoolStorageUsage(
+                owner=owner,
+                category=category,
+                shcool_id=school_id,
+                bytes=int(delta_bytes),
+                file_count=int(delta_count)
+            ))
+    except IntegrityError:
+        db.session.execute(statement)
+
+
+## @brief Move an owner's usage counters by a signed amount.
+#
+# Adjusts both the category row and the owner's total row. Called by every
+# function here that adds, removes or resizes an index row; the caller's
+# transaction carries the counter change together with the school_file change.
+def adjust_usage(school_id, category, delta_bytes, delta_count=0):
+    if not delta_bytes and not delta_count:
+        return
+    _add_to_usage_row(school_id, category, delta_bytes, delta_count)
+    _add_to_usage_row(school_id, USAGE_TOTAL_CATEGORY, delta_bytes, delta_count)
+
+
+## @brief Reserve space for a new file against the quota, atomically.
+#
+# The check and the reservation are one conditional UPDATE on the owner's total
+# row: it only matches while the new total stays within the limit. Two uploads
+# racing for a school's last few megabytes therefore cannot both pass, which a
+# read-then-write check could not promise.
+def charge_usage(school_id, category, size, replaces_bytes=0):
+    limit = quota_bytes(school_id)
+    owner = owner_folder(school_id)
+    size = int(size)
+    headroom = limit - size + int(replaces_bytes or 0)
+    if headroom < 0:
+        raise _quota_exceeded(limit)
+
+    statement = (
+        update(SchoolStorageUsage)
+        .where(
+            SchoolStorageUsage.owner == owner,
+            SchoolStorageUsage.category == USAGE_TOTAL_CATEGORY,
+            SchoolStorageUsage.bytes <= headroom
+        )
+        .values(
+            bytes=SchoolStorageUsage.bytes + size,
+            file_count=SchoolStorageUsage.file_count + 1,
+            updated_at=datetime.now()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if not db.session.execute(statement).rowcount:
+        if used_bytes(school_id) > headroom:
+            raise _quota_exceeded(limit)
+        # No total row yet: this is the owner's first file.
+        _add_to_usage_row(school_id, USAGE_TOTAL_CATEGORY, size, 1)
+    _add_to_usage_row(school_id, category, size, 1)
+
+
+## @brief What an index row currently contributes to its owner's usage.
+def _usage_contribution(record):
+    if not record.active:
+        return None
+    return record.shcool_id, record.category, int(record.file_size or 0)
+
+
+def _apply_contribution(contribution, sign):
+    if contribution:
+        school_id, category, size = contribution
+        adjust_usage(school_id, category, sign * size, sign)
+
+
+## @brief Total bytes currently held by a school, from its usage counter.
 def used_bytes(school_id):
-    total = db.session.query(func.coalesce(func.sum(SchoolFile.file_size), 0)).filter(
-        SchoolFile.shcool_id == school_id,
-        SchoolFile.active.is_(True)
+    total = db.session.query(SchoolStorageUsage.bytes).filter(
+        SchoolStorageUsage.owner == owner_folder(school_id),
+        SchoolStorageUsage.category == USAGE_TOTAL_CATEGORY
     ).scalar()
     return int(total or 0)
 
 
+## @brief Running totals for every owner, keyed by owner folder.
+#
+# @return {owner_folder: (bytes, file_count)} -- one query for the super-admin
+#         overview, however many schools there are.
+def usage_totals_by_owner():
+    rows = db.session.query(
+        SchoolStorageUsage.owner,
+        SchoolStorageUsage.bytes,
+        SchoolStorageUsage.file_count
+    ).filter(SchoolStorageUsage.category == USAGE_TOTAL_CATEGORY).all()
+    return {owner: (int(total or 0), int(count or 0)) for owner, total, count in rows}
+
+
 ## @brief Per-category and overall usage for the storage manager.
 #
 # Reports every category, including empty ones, so the UI can render a stable
 # set of sections rather than one that appears and disappears with content.
 def usage_summary(school_id):
-    rows = db.session.query(
-        SchoolFile.category,
-        func.count(SchoolFile.id),
-        func.coalesce(func.sum(SchoolFile.file_size), 0)
-    ).filter(
-        SchoolFile.shcool_id == school_id,
-        SchoolFile.active.is_(True)
-    ).group_by(SchoolFile.category).all()
+    rows = SchoolStorageUsage.query.filter(
+        SchoolStorageUsage.owner == owner_folder(school_id)
+    ).all()
 
     by_category = {category: {'file_count': 0, 'bytes': 0} for category in STORAGE_CATEGORIES}
-    for category, file_count, total_bytes in rows:
+    total = 0
+    file_count = 0
+    for row in rows:
+        if row.category == USAGE_TOTAL_CATEGORY:
+            total = int(row.bytes or 0)
+            file_count = int(row.file_count or 0)
+            continue
         # A category that was removed from STORAGE_CATEGORIES after files were
         # written to it still counts against the quota, so keep it visible
         # rather than silently dropping its bytes from the total.
-        entry = by_category.setdefault(category, {'file_count': 0, 'bytes': 0})
-        entry['file_count'] = int(file_count or 0)
-        entry['bytes'] = int(total_bytes or 0)
+        entry = by_category.setdefault(row.category, {'file_count': 0, 'bytes': 0})
+        entry['file_count'] = int(row.file_count or 0)
+        entry['bytes'] = int(row.bytes or 0)
 
-    total = sum(entry['bytes'] for entry in by_category.values())
-    file_count = sum(entry['file_count'] for entry in by_category.values())
     limit = quota_bytes(school_id)
 
     return {
@@ -311,8 +452,75 @@ def usage_summary(school_id):
     }
 
 
+## @brief Rebuild the usage counters from the school_file index.
+#
+# The repair path for counter drift, run by the indexing script. The owners'
+# existing counter rows are locked first, so an upload landing mid-rebuild
+# waits for it rather than having its increment overwritten.
+#
+# @param school_ids: owners to rebuild (None inside the list means the platform
+#        folder); None rebuilds every owner.
+# @return [(owner, category, old_bytes, new_bytes, old_count, new_count)] for
+#         every counter that changed.
+def recompute_usage(school_ids=None):
+    ledger_query = SchoolStorageUsage.query
+    file_query = db.session.query(
+        SchoolFile.shcool_id,
+        SchoolFile.category,
+        func.count(SchoolFile.id),
+        func.coalesce(func.sum(SchoolFile.file_size), 0)
+    ).filter(SchoolFile.active.is_(True))
+
+    if school_ids is not None:
+        owners = [owner_folder(school_id) for school_id in school_ids]
+        ledger_query = ledger_query.filter(SchoolStorageUsage.owner.in_(owners))
+        ids = [school_id for school_id in school_ids if school_id is not None]
+        scope = [SchoolFile.shcool_id.in_(ids)] if ids else []
+        if None in school_ids:
+            scope.append(SchoolFile.shcool_id.is_(None))
+        file_query = file_query.filter(or_(*scope))
+
+    existing = {
+        (row.owner, row.category): row
+        for row in ledger_query.with_for_update().all()
+    }
+
+    expected = {}
+    for school_id, category, file_count, total_bytes in file_query.group_by(
+        SchoolFile.shcool_id, SchoolFile.category
+    ).all():
+        owner = owner_folder(school_id)
+        for bucket in (category, USAGE_TOTAL_CATEGORY):
+            entry = expected.setdefault((owner, bucket), [school_id, 0, 0])
+            entry[1] += int(total_bytes or 0)
+            entry[2] += int(file_count or 0)
+
+    changes = []
+    for key in set(existing) | set(expected):
+        owner, category = key
+        school_id, new_bytes, new_count = expected.get(key, [None, 0, 0])
+        row = existing.get(key)
+        old_bytes = int(row.bytes or 0) if row else 0
+        old_count = int(row.file_count or 0) if row else 0
+        if row is not None and old_bytes == new_bytes and old_count == new_count:
+            continue
+        if row is None:
+            if not new_bytes and not new_count:
+                continue
+            row = SchoolStorageUsage(owner=owner, category=category, shcool_id=school_id)
+            db.session.add(row)
+        row.bytes = new_bytes
+        row.file_count = new_count
+        changes.append((owner, category, old_bytes, new_bytes, old_count, new_count))
+    db.session.flush()
+    return sorted(changes)
+
+
 ## @brief Reject an upload that would take the school over its allowance.
 #
+# A read-only pre-check for routes that want to refuse before writing any
+# bytes. The authoritative, race-free check is the reservation in charge_usage.
+#
 # @param replaces_bytes: size of a file this upload supersedes, which is about
 #        to be freed. Without it, replacing a 9 MB image in a school sitting at
 #        its limit would be refused even though the net change is a decrease.
@@ -320,17 +528,17 @@ def assert_within_quota(school_id, incoming_bytes, replaces_bytes=0):
     limit = quota_bytes(school_id)
     projected = used_bytes(school_id) - int(replaces_bytes or 0) + int(incoming_bytes)
     if projected > limit:
-        raise StorageError(
-            'This upload would exceed the school storage limit of %s MB. '
-            'Delete unused files or ask for a larger allowance.'
-            % (limit // BYTES_PER_MB)
-        )
+        raise _quota_exceeded(limit)
 
 
-## @brief Check an uploaded file against its category's rules.
+## @brief Check an uploaded file's name and type against its category's rules.
+#
+# Size is deliberately not checked here: a client-declared length cannot be
+# trusted, so the limit is enforced on the bytes actually read, while they are
+# streamed to disk (see stage_upload).
 #
-# @return (extension, size_in_bytes)
-def validate_upload(file_storage, category):
+# @return the lowercased extension.
+def validate_upload_type(file_storage, category):
     rules = CATEGORY_RULES[validate_category(category)]
     if file_storage is None or not (file_storage.filename or '').strip():
         raise StorageError('No file was selected.')
@@ -341,15 +549,138 @@ def validate_upload(file_storage, category):
             '%s only accepts these file types: %s'
             % (rules['label'], ', '.join(sorted(rules['extensions'])))
         )
+    return extension
+
+
+## @brief SHA-256 of a file already on disk, read in upload-sized chunks.
+def file_sha256(absolute_file_path):
+    digest = hashlib.sha256()
+    with open(absolute_file_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(UPLOAD_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+## @brief Stream an upload into a temporary file beside its destination.
+#
+# Reads the request stream in chunks, hashing and counting as it goes, and
+# stops as soon as the byte count passes `max_bytes` -- so an oversized file is
+# refused after max_bytes of work rather than after it has all been written.
+# The temporary file lives in `directory` so that place_staged_upload's rename
+# never crosses a filesystem boundary and is therefore atomic: a request that
+# dies mid-upload leaves a `.upload-*` file behind, never a truncated asset
+# under a real name.
+#
+# @return (temp_path, size_in_bytes, sha256_hex)
+def stage_upload(file_storage, directory, max_bytes=None):
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=STAGING_PREFIX, suffix='.part', dir=directory)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        stream = file_storage.stream
+        try:
+            stream.seek(0)
+        except (AttributeError, OSError):
+            # A non-seekable stream is already at its start.
+            pass
+        with os.fdopen(fd, 'wb') as handle:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise StorageError(
+                        'This file is too large. The limit is %s MB.' % (max_bytes // BYTES_PER_MB)
+                    )
+                digest.update(chunk)
+                handle.write(chunk)
+            handle.flush()
+            os.fsync(handle.fileno())
+        # mkstemp creates owner-only files; published assets must stay readable
+        # by the web server the same way file_storage.save() left them.
+        os.chmod(temp_path, 0o644)
+    except BaseException:
+        remove_from_disk(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+
+## @brief An existing, intact file in the same school with identical content.
+#
+# Legacy rows are skipped: they live outside the storage root, and a hard link
+# into them would tie a new asset to a tree that is due to be retired. The size
+# on disk is re-checked so a file truncated since it was indexed is never
+# adopted as the source of a new one.
+def find_identical_file(school_id, content_sha256, size):
+    candidates = SchoolFile.query.filter(
+        SchoolFile.shcool_id == school_id,
+        SchoolFile.content_sha256 == content_sha256,
+        SchoolFile.file_size == size,
+        SchoolFile.active.is_(True)
+    ).order_by(SchoolFile.id).limit(5).all()
+    for candidate in candidates:
+        if is_legacy_record(candidate):
+            continue
+        try:
+            candidate_path = absolute_path(candidate.relative_path)
+            if os.path.getsize(candidate_path) == size:
+                return candidate_path
+        except (OSError, StorageError):
+            continue
+    return None
 
-    max_mb = category_max_mb(category)
-    size = uploaded_file_size(file_storage)
-    if size <= 0:
-        raise StorageError('This file is empty.')
-    if size > max_mb * BYTES_PER_MB:
-        raise StorageError('This file is too large. The limit is %s MB.' % max_mb)
 
-    return extension, size
+## @brief Move a staged upload to its final name.
+#
+# With SCHOOL_STORAGE_DEDUP_HARDLINKS on, content the school already holds is
+# hard-linked instead, and the staged copy dropped: both rows keep their own
+# path and their own lifecycle (deleting one only removes a link), but the
+# bytes are stored once. Any failure to link -- a filesystem without hard
+# links, a cross-device layout -- falls back to the plain rename.
+#
+# @return True when the destination was deduplicated by a hard link.
+def place_staged_upload(temp_path, destination, school_id=None, content_sha256=None, size=None):
+    if ConfigClass.SCHOOL_STORAGE_DEDUP_HARDLINKS and content_sha256:
+        twin_path = find_identical_file(school_id, content_sha256, size)
+        if twin_path:
+            try:
+                os.link(twin_path, destination)
+                remove_from_disk(temp_path)
+                return True
+            except OSError:
+                pass
+    os.replace(temp_path, destination)
+    return False
+
+
+## @brief Stream an upload to an exact destination path, atomically.
+#
+# For routes that pick their own path (story PDFs, audiobook assets) but
+# should get the same guarantees as save_upload: size enforced while reading,
+# no partial file under the real name, and a content hash to index.
+#
+# @param category: when given, the bytes actually read are reserved against
+#        school_id's quota (charge_usage) before the file is placed, exactly as
+#        save_upload does; the caller then indexes it with
+#        register_existing_file(..., charged=True) in the same transaction.
+# @param replaces_bytes: see assert_within_quota.
+# @return (size_in_bytes, sha256_hex)
+def write_upload(file_storage, destination, max_bytes=None, school_id=None, category=None,
+                 replaces_bytes=0):
+    temp_path, size, content_sha256 = stage_upload(
+        file_storage, os.path.dirname(destination), max_bytes=max_bytes
+    )
+    try:
+        if category:
+            charge_usage(school_id, validate_category(category), size, replaces_bytes=replaces_bytes)
+        place_staged_upload(temp_path, destination, school_id=school_id,
+                            content_sha256=content_sha256, size=size)
+    except BaseException:
+        remove_from_disk(temp_path)
+        raise
+    return size, content_sha256
 
 
 def _stored_filename(category, extension):
@@ -371,15 +702,16 @@ def resolve_mime_type(file_storage, stored_filename):
 
 ## @brief Store an uploaded file in a school's folder and index it.
 #
-# The single entry point for new uploads: it validates, enforces the quota,
-# writes the bytes and records the SchoolFile row. The row is added to the
+# The single entry point for new uploads: it validates, streams the bytes to a
+# staging file while hashing them, reserves the real size against the quota,
+# moves the file into place and records the SchoolFile row. The row is added to the
 # session but not committed, so a caller that also updates the entity pointing
 # at the file (a book cover, a pack image) commits both together and cannot end
 # up with one without the other.
 #
-# On any failure after the bytes land on disk the partial file is removed --
-# otherwise a rolled-back transaction would leave an orphan consuming quota
-# that nothing in the index can account for.
+# On any failure the staged or placed file is removed -- otherwise a
+# rolled-back transaction would leave an orphan consuming quota that nothing in
+# the index can account for.
 #
 # @param school_id: owning school, or None for a platform asset.
 # @param category: one of STORAGE_CATEGORIES.
@@ -388,18 +720,26 @@ def resolve_mime_type(file_storage, stored_filename):
 # @param title: optional admin-facing label.
 # @param linked_type/linked_id: what the file is attached to, if known.
 # @param replaces_bytes: see assert_within_quota.
-# @return the uncommitted SchoolFile row.
+# @return the uncommitted SchoolFile row (and uncommitted usage counters).
 def save_upload(school_id, category, file_storage, uploaded_by=None, title=None,
                 linked_type=None, linked_id=None, replaces_bytes=0):
-    extension, size = validate_upload(file_storage, category)
-    assert_within_quota(school_id, size, replaces_bytes=replaces_bytes)
+    extension = validate_upload_type(file_storage, category)
+    max_mb = category_max_mb(category)
 
     directory = category_dir(school_id, category)
     stored_filename = _stored_filename(category, extension)
     destination = os.path.join(directory, stored_filename)
-    file_storage.save(destination)
 
+    temp_path, size, content_sha256 = stage_upload(
+        file_storage, directory, max_bytes=max_mb * BYTES_PER_MB
+    )
     try:
+        if size <= 0:
+            raise StorageError('This file is empty.')
+        charge_usage(school_id, category, size, replaces_bytes=replaces_bytes)
+        place_staged_upload(temp_path, destination, school_id=school_id,
+                            content_sha256=content_sha256, size=size)
+
         record = SchoolFile(
             shcool_id=school_id,
             category=category,
@@ -408,17 +748,24 @@ def save_upload(school_id, category, file_storage, uploaded_by=None, title=None,
             original_filename=secure_filename(file_storage.filename) or stored_filename,
             mime_type=resolve_mime_type(file_storage, stored_filename),
             file_size=size,
+            content_sha256=content_sha256,
             uploaded_by=uploaded_by,
             title=(title or '').strip() or None,
             linked_type=linked_type,
-            linked_id=linked_id
+            linked_id=linked_id,
+            missing=False,
+            verified_at=datetime.now()
         )
         db.session.add(record)
         db.session.flush()
-        return record
-    except Exception:
+    except BaseException:
+        remove_from_disk(temp_path)
         remove_from_disk(destination)
         raise
+    # Local import: the variant pipeline builds on this module.
+    from apps.image_variants import queue_variants
+    queue_variants(record)
+    return record
 
 
 ## @brief Index a file that was written to the tree by other code.
@@ -430,21 +777,40 @@ def save_upload(school_id, category, file_storage, uploaded_by=None, title=None,
 #
 # Idempotent by relative_path, so re-running the indexing script over an
 # existing tree updates sizes rather than creating duplicate rows.
+#
+# @param content_sha256: the hash write_upload returned, when the caller has
+#        it. Not computed here: the indexing script registers whole trees, and
+#        re-reading every byte on each run would dominate its cost.
+# @param charged: the file was written by write_upload with a category, so its
+#        size is already on the usage counters and must not be added again.
 def register_existing_file(school_id, category, absolute_file_path, uploaded_by=None,
                            original_filename=None, title=None, linked_type=None,
-                           linked_id=None, mime_type=None):
+                           linked_id=None, mime_type=None, content_sha256=None,
+                           charged=False):
     validate_category(category)
     relative = relative_path_from_absolute(absolute_file_path)
     record = SchoolFile.query.filter_by(relative_path=relative).first()
-    size = os.path.getsize(absolute_file_path) if os.path.exists(absolute_file_path) else 0
+    present = os.path.exists(absolute_file_path)
+    size = os.path.getsize(absolute_file_path) if present else 0
     stored_filename = os.path.basename(absolute_file_path)
     guessed_mime = mime_type or mimetypes.guess_type(stored_filename)[0] or 'application/octet-stream'
 
     if record:
+        before = _usage_contribution(record)
         record.file_size = size
         record.active = True
         record.category = category
         record.shcool_id = school_id
+        record.missing = not present
+        record.verified_at = datetime.now()
+        after = _usage_contribution(record)
+        if charged:
+            _apply_contribution(before, -1)
+        elif before != after:
+            _apply_contribution(before, -1)
+            _apply_contribution(after, 1)
+        if content_sha256:
+            record.content_sha256 = content_sha256
         if title:
             record.title = title
         if linked_type:
@@ -460,13 +826,18 @@ def register_existing_file(school_id, category, absolute_file_path, uploaded_by=
         original_filename=original_filename or stored_filename,
         mime_type=guessed_mime,
         file_size=size,
+        content_sha256=content_sha256,
         uploaded_by=uploaded_by,
         title=(title or '').strip() or None,
         linked_type=linked_type,
-        linked_id=linked_id
+        linked_id=linked_id,
+        missing=not present,
+        verified_at=datetime.now()
     )
     db.session.add(record)
     db.session.flush()
+    if not charged:
+        adjust_usage(school_id, category, size, 1)
     return record
 
 
@@ -486,12 +857,23 @@ def remove_from_disk(absolute_file_path):
     return False
 
 
-## @brief Delete an indexed file: bytes then row.
+## @brief Delete an indexed file: bytes, row, and its share of the usage.
 def delete_file(record):
+    _delete_variants(record)
     remove_from_disk(absolute_path(record.relative_path))
+    _apply_contribution(_usage_contribution(record), -1)
     db.session.delete(record)
 
 
+def _delete_variants(record):
+    if record.id is None:
+        return
+    for variant in SchoolFile.query.filter_by(linked_type=VARIANT_LINK, linked_id=record.id).all():
+        remove_from_disk(absolute_path(variant.relative_path))
+        _apply_contribution(_usage_contribution(variant), -1)
+        db.session.delete(variant)
+
+
 ## @brief True when a path lies inside the storage tree.
 #
 # Legacy rows (written before storage management, under the old uploads roots)
@@ -511,8 +893,9 @@ def is_inside_storage(absolute_file_path):
 # than by SchoolFile id. Handles both new files inside the storage tree and
 # legacy ones outside it, so those routes need no branching of their own.
 #
-# The row is deleted but not committed -- the caller is already in a
-# transaction removing the owning entity, and both should land together.
+# The row is deleted (and its usage released) but not committed -- the caller
+# is already in a transaction removing the owning entity, and both should land
+# together.
 def delete_by_absolute_path(absolute_file_path):
     if not absolute_file_path:
         return False
@@ -520,6 +903,8 @@ def delete_by_absolute_path(absolute_file_path):
         relative = relative_path_from_absolute(absolute_file_path)
         record = SchoolFile.query.filter_by(relative_path=relative).first()
         if record:
+            _delete_variants(record)
+            _apply_contribution(_usage_contribution(record), -1)
             db.session.delete(record)
     return remove_from_disk(absolute_file_path)
 
@@ -582,10 +967,15 @@ def serialize_file(record):
         'url': None if legacy else public_url(record.relative_path),
         'mime_type': record.mime_type,
         'file_size': int(record.file_size or 0),
+        'content_sha256': record.content_sha256,
         'uploaded_by': record.uploaded_by,
         'linked_type': record.linked_type,
         'linked_id': record.linked_id,
         'active': record.active,
+        # From the last integrity scan, not a live check. Legacy rows point
+        # outside the storage tree by design and are never flagged.
+        'missing': False if legacy else bool(record.missing),
+        'verified_at': record.verified_at.isoformat() if record.verified_at else None,
         'created_at': record.created_at.isoformat() if record.created_at else None,
         'updated_at': record.updated_at.isoformat() if record.updated_at else None
     }
@@ -0,0 +1,568 @@
+## @file
+# Bulk reconciliation of the school_file index against the disk, used by
+# scripts/index_school_storage.py.
+#
+# The first version of the script walked the whole tree on one thread and,
+# per file, ran a SchoolFile lookup and a getsize before deciding what to do.
+# On a tree of several hundred GB that is hours of round trips, and an
+# interrupted run started again from zero. The work is now split into units --
+# one owner folder of the storage tree, or one top-level folder of a legacy
+# tree -- and each unit:
+#
+#   1. is scanned with os.scandir by a thread pool, one task per directory,
+#      while the main thread is still writing the previous unit;
+#   2. has its existing index rows loaded in one range query into a dict keyed
+#      by relative_path;
+#   3. is diffed in memory, and the differences written as batched INSERTs and
+#      UPDATEs instead of one statement per file;
+#   4. is committed together with its recomputed usage counters, and then
+#      recorded in a checkpoint file, so a rerun skips every unit already done.
+#
+# Only the scanning runs on worker threads. The session is not thread-safe, so
+# every database statement stays on the main thread.
+import json
+import mimetypes
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from apps.audiobooks.waveform import PEAKS_SUFFIX
+from apps.image_variants import VARIANT_NAME_PATTERN
+from apps.storage import (
+    LEGACY_PATH_PREFIX,
+    PLATFORM_FOLDER,
+    STAGING_PREFIX,
+    VARIANT_LINK,
+    StorageError,
+    absolute_path,
+    owner_folder,
+    recompute_usage,
+    school_id_from_folder,
+    storage_root,
+)
+from extensions import db
+from models.school_file import STORAGE_CATEGORIES, SchoolFile
+
+## @brief Rows per INSERT / UPDATE batch.
+BULK_BATCH_SIZE = 1000
+
+CHECKPOINT_VERSION = 1
+
+## @brief How long an existence check is trusted before the integrity scan
+# looks at the row again.
+VERIFY_MAX_AGE = timedelta(hours=24)
+
+## @brief Where a legacy file lands in the new category scheme, chosen by the
+# tree it came from and (for audiobooks) the asset folder in its path.
+LEGACY_AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.webm', '.ogg', '.aac'}
+LEGACY_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp'}
+
+## @brief One file found on disk.
+#
+# `path` is relative to the directory that was scanned, forward-slashed.
+ScannedFile = namedtuple('ScannedFile', 'path name size')
+
+## @brief One unit of reconciliation work.
+#
+# key:           stable name recorded in the checkpoint ('storage:school_12').
+# school_id:     owner, None for the platform.
+# directories:   (absolute directory, recursive, tag) triples to scan; the tag
+#                is handed back with each file so the unit can categorise it.
+# index_prefix:  relative_path prefix every row of this unit starts with.
+# source_tree:   None for the storage tree, else 'stories' / 'audio-books'.
+ReconcileUnit = namedtuple(
+    'ReconcileUnit', 'key school_id directories index_prefix source_tree'
+)
+
+
+def categorize_legacy_file(source_tree, file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    if source_tree == 'stories':
+        # The story tree only ever held PDFs.
+        return 'books/files'
+    # Audiobook tree: a cover lives under a 'cover' folder, page assets under
+    # 'pages'. Fall back on the extension when the path shape is unfamiliar.
+    normalized = file_path.replace(os.sep, '/').lower()
+    if '/cover' in normalized:
+        return 'books/covers'
+    if extension in LEGACY_AUDIO_EXTENSIONS:
+        return 'stories/audio'
+    if extension in LEGACY_IMAGE_EXTENSIONS:
+        return 'stories/images'
+    return 'general'
+
+
+## @brief Owning school for the first path segment of a legacy tree.
+#
+# Legacy layout is `<root>/<school_id or "platform">/<book_id>/...`, so the
+# first path segment carries the owner.
+def legacy_school_id(first_segment):
+    if first_segment == PLATFORM_FOLDER:
+        return None
+    try:
+        return int(first_segment)
+    except (TypeError, ValueError):
+        return None
+
+
+def legacy_relative_path(school_id, source_tree, path_in_tree):
+    # Legacy files live outside the storage root, so they have no
+    # storage-relative path and cannot be indexed by it. Record them under a
+    # reserved prefix that encodes the owner and origin, so the rows are
+    # unique, re-runnable, and clearly not servable via /media.
+    return '%s%s/%s/%s' % (LEGACY_PATH_PREFIX, owner_folder(school_id), source_tree, path_in_tree)
+
+
+class IndexStats:
+    FIELDS = ('scanned', 'created', 'refreshed', 'pruned', 'dead', 'bytes_indexed')
+
+    def __init__(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def restore(self, values):
+        for field in self.FIELDS:
+            setattr(self, field, int((values or {}).get(field, 0)))
+
+    def report(self, pruned_enabled):
+        print('\n--- summary ---')
+        print('files scanned:      %s' % self.scanned)
+        print('new rows indexed:   %s' % self.created)
+        print('existing refreshed: %s' % self.refreshed)
+        print('rows with no file:  %s' % self.dead)
+        if pruned_enabled:
+            print('rows pruned:        %s' % self.pruned)
+        print('indexed on disk:    %.2f MB' % (self.bytes_indexed / (1024 * 1024)))
+
+
+## @brief Progress record that lets an interrupted run resume.
+#
+# Holds the keys of the units already committed, the running totals, and the
+# options the run was started with. A checkpoint written for different options
+# (another --school, --prune toggled) is ignored rather than trusted, because
+# the set of units it lists no longer means the same thing.
+class Checkpoint:
+    def __init__(self, path, options):
+        self.path = path
+        self.options = options
+        self.done = set()
+        self.stats = {}
+
+    def load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError):
+            return False
+        if payload.get('version') != CHECKPOINT_VERSION or payload.get('options') != self.options:
+            return False
+        self.done = set(payload.get('done') or [])
+        self.stats = payload.get('stats') or {}
+        return True
+
+    def mark_done(self, key, stats):
+        self.done.add(key)
+        self.stats = stats.to_dict()
+        self._write()
+
+    def _write(self):
+        payload = {
+            'version': CHECKPOINT_VERSION,
+            'options': self.options,
+            'done': sorted(self.done),
+            'stats': self.stats,
+            'updated_at': datetime.now().isoformat(),
+        }
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump(payload, handle)
+        # Atomic swap: an interruption mid-write leaves the previous checkpoint.
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        for path in (self.path, self.path + '.tmp'):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def scan_directory(directory, recursive, tag):
+    """Every regular file under `directory`, as (tag, ScannedFile) pairs.
+
+    Runs on a worker thread: touches the filesystem only, never the session."""
+    found = []
+    pending = [(directory, '')]
+    while pending:
+        current, prefix = pending.pop()
+        try:
+            entries = list(os.scandir(current))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith(STAGING_PREFIX):
+                # An upload still streaming in, or one abandoned by a dead
+                # request; neither is an asset the school owns.
+                continue
+            try:
+                if entry.is_dir():
+                    if recursive:
+                        pending.append((entry.path, prefix + entry.name + '/'))
+                    continue
+                if not entry.is_file():
+                    continue
+                size = entry.stat().st_size
+            except OSError:
+                # Removed between the listing and the stat.
+                continue
+            found.append((tag, ScannedFile(prefix + entry.name, entry.name, size)))
+    return found
+
+
+def storage_units(only_school=None):
+    root = storage_root()
+    if not os.path.isdir(root):
+        print('Storage root does not exist yet: %s' % root)
+        return []
+
+    units = []
+    for folder_name in sorted(os.listdir(root)):
+        if not os.path.isdir(os.path.join(root, folder_name)):
+            continue
+        try:
+            school_id = school_id_from_folder(folder_name)
+        except StorageError:
+            print('  skipping unrecognised folder: %s' % folder_name)
+            continue
+        if only_school is not None and school_id != only_school:
+            continue
+        directories = [
+            (os.path.join(root, folder_name, *category.split('/')), False, category)
+            for category in STORAGE_CATEGORIES
+        ]
+        units.append(ReconcileUnit(
+            'storage:%s' % folder_name, school_id, directories, folder_name + '/', None
+        ))
+    return units
+
+
+def legacy_units(upload_root, source_tree, only_school=None):
+    upload_root = os.path.abspath(upload_root)
+    if not os.path.isdir(upload_root):
+        return []
+    root = storage_root()
+    if upload_root == root or upload_root.startswith(root + os.sep):
+        # Already covered by the storage-tree walk; indexing it twice would
+        # double-count every file toward the school's usage.
+        print('[legacy %s] inside the storage root, already indexed' % source_tree)
+        return []
+
+    units = []
+    loose_files = False
+    for name in sorted(os.listdir(upload_root)):
+        path = os.path.join(upload_root, name)
+        if not os.path.isdir(path):
+            loose_files = True
+            continue
+        school_id = legacy_school_id(name)
+        if only_school is not None and school_id != only_school:
+            continue
+        units.append(ReconcileUnit(
+            'legacy:%s:%s' % (source_tree, name), school_id, [(path, True, name)],
+            legacy_relative_path(school_id, source_tree, name + '/'), source_tree,
+        ))
+    if loose_files and only_school is None:
+        # Files sitting directly in the legacy root have no owner segment and
+        # are treated as platform files, as they always were.
+        units.append(ReconcileUnit(
+            'legacy:%s:' % source_tree, None, [(upload_root, False, '')],
+            legacy_relative_path(None, source_tree, ''), source_tree,
+        ))
+    return units
+
+
+def load_index(prefix):
+    """Existing rows whose relative_path starts with `prefix`, keyed by path.
+
+    One range query on the unique relative_path index instead of one lookup
+    per file."""
+    rows = db.session.query(
+        SchoolFile.id, SchoolFile.relative_path, SchoolFile.file_size, SchoolFile.active,
+        SchoolFile.missing
+    ).filter(SchoolFile.relative_path.startswith(prefix, autoescape=True))
+    return {row.relative_path: row for row in rows}
+
+
+def _batches(items, size=BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _new_row(unit, relative, scanned, category, now):
+    row = {
+        'shcool_id': unit.school_id,
+        'category': category,
+        'relative_path': relative,
+        'stored_filename': scanned.name,
+        'original_filename': scanned.name,
+        'mime_type': None,
+        'file_size': scanned.size,
+        'title': None,
+        'linked_type': None,
+        'active': True,
+        'missing': False,
+        'verified_at': now,
+        'created_at': now,
+        'updated_at': now,
+    }
+    if unit.source_tree is None:
+        row['mime_type'] = mimetypes.guess_type(scanned.name)[0] or 'application/octet-stream'
+    else:
+        row['title'] = 'Legacy %s file' % unit.source_tree
+        row['linked_type'] = 'legacy'
+    if VARIANT_NAME_PATTERN.search(scanned.name) or scanned.name.endswith(PEAKS_SUFFIX):
+        # A resized copy or waveform made on demand before its original was
+        # indexed: kept out of the listing like any other variant.
+        row['linked_type'] = VARIANT_LINK
+    return row
+
+
+def _insert_rows(rows):
+    """Batched INSERT, tolerating rows a live upload indexed meanwhile.
+
+    The index was read before the scan finished, so a file uploaded in between
+    can already have its row. Such a batch is retried without the rows that
+    now exist, instead of failing the whole unit on the unique constraint."""
+    for batch in _batches(rows):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(SchoolFile), batch)
+        except IntegrityError:
+            taken = {
+                path for (path,) in db.session.query(SchoolFile.relative_path).filter(
+                    SchoolFile.relative_path.in_([row['relative_path'] for row in batch])
+                )
+            }
+            remaining = [row for row in batch if row['relative_path'] not in taken]
+            if remaining:
+                db.session.execute(insert(SchoolFile), remaining)
+
+
+def reconcile_unit(unit, scanned, stats, dry_run=False, prune=False, verbose=True):
+    """Diff one unit's scan against its index rows and write the difference."""
+    index = load_index(unit.index_prefix)
+    now = datetime.now()
+    new_rows = []
+    refreshes = []
+    seen = set()
+
+    for tag, found in scanned:
+        if unit.source_tree is None:
+            relative = unit.index_prefix + tag + '/' + found.path
+            category = tag
+        else:
+            path_in_tree = (tag + '/' + found.path) if tag else found.path
+            relative = legacy_relative_path(unit.school_id, unit.source_tree, path_in_tree)
+            category = categorize_legacy_file(unit.source_tree, '/' + path_in_tree)
+        seen.add(relative)
+        stats.scanned += 1
+        stats.bytes_indexed += found.size
+
+        existing = index.get(relative)
+        if existing is not None:
+            # Legacy rows were only ever refreshed on size; storage-tree rows
+            # are also reactivated.
+            stale = existing.file_size != found.size
+            if unit.source_tree is None:
+                stale = stale or not existing.active
+            if stale:
+                if verbose:
+                    print('  refresh %s (%s bytes)' % (relative, found.size))
+                stats.refreshed += 1
+            if stale or existing.missing:
+                change = {'id': existing.id, 'file_size': found.size, 'updated_at': now,
+                          'missing': False, 'verified_at': now}
+                if unit.source_tree is None:
+                    change['active'] = True
+                refreshes.append(change)
+            continue
+
+        if verbose:
+            print('  index   %s (%s bytes) -> %s' % (relative, found.size, category))
+        stats.created += 1
+        new_rows.append(_new_row(unit, relative, found, category, now))
+
+    dead_ids = []
+    if unit.source_tree is None:
+        for relative, row in index.items():
+            if not row.active or relative in seen:
+                continue
+            stats.dead += 1
+            if verbose:
+                print('  missing %s (row #%s, %s bytes)' % (relative, row.id, row.file_size))
+            dead_ids.append(row.id)
+
+    if dry_run:
+        return
+    _insert_rows(new_rows)
+    for batch in _batches(refreshes):
+        db.session.execute(update(SchoolFile), batch)
+    for batch in _batches(dead_ids):
+        if prune:
+            db.session.execute(
+                delete(SchoolFile).where(SchoolFile.id.in_(batch)).execution_options(synchronize_session=False)
+            )
+            stats.pruned += len(batch)
+        else:
+            # Kept, but flagged, so the storage manager shows it as missing.
+            db.session.execute(
+                update(SchoolFile).where(SchoolFile.id.in_(batch))
+                .values(missing=True, verified_at=now)
+                .execution_options(synchronize_session=False)
+            )
+    # Rows were written past the ORM, so the owner's counters are rebuilt from
+    # the index rather than adjusted row by row; same transaction as the rows.
+    recompute_usage([unit.school_id])
+
+
+def _files_per_second(count, started_at):
+    return count / max(time.monotonic() - started_at, 1e-6)
+
+
+def _scan_unit(pool, unit):
+    return [pool.submit(scan_directory, directory, recursive, tag)
+            for directory, recursive, tag in unit.directories]
+
+
+def reconcile_units(units, stats, checkpoint=None, workers=4, dry_run=False,
+                    prune=False, verbose=True):
+    """Scan and reconcile `units`, committing and checkpointing each one.
+
+    Scans for up to `workers` units run ahead of the unit being written, so the
+    disk and the database are busy at the same time.
+
+    @return the keys of the units reconciled (or skipped as already done)."""
+    completed = []
+    todo = deque()
+    for unit in units:
+        if checkpoint is not None and unit.key in checkpoint.done:
+            completed.append(unit.key)
+            continue
+        todo.append(unit)
+    if checkpoint is not None and completed:
+        print('resuming: %s of %s units already done' % (len(completed), len(units)))
+
+    run_started = time.monotonic()
+    run_scanned = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        in_flight = deque()
+
+        def fill():
+            while todo and len(in_flight) < max(1, workers):
+                unit = todo.popleft()
+                in_flight.append((unit, _scan_unit(pool, unit)))
+
+        fill()
+        while in_flight:
+            unit, futures = in_flight.popleft()
+            unit_started = time.monotonic()
+            scanned = []
+            for future in futures:
+                scanned.extend(future.result())
+            fill()
+
+            before = stats.scanned
+            reconcile_unit(unit, scanned, stats, dry_run=dry_run, prune=prune, verbose=verbose)
+            if not dry_run:
+                db.session.commit()
+                if checkpoint is not None:
+                    checkpoint.mark_done(unit.key, stats)
+            completed.append(unit.key)
+
+            unit_files = stats.scanned - before
+            run_scanned += unit_files
+            print('[%s] %s files in %.1fs (%.0f files/s) -- run: %s files, %.0f files/s'
+                  % (unit.key, unit_files, time.monotonic() - unit_started,
+                     _files_per_second(unit_files, unit_started),
+                     run_scanned, _files_per_second(run_scanned, run_started)))
+    return completed
+
+
+def _file_exists(relative_path):
+    try:
+        return os.path.isfile(absolute_path(relative_path))
+    except StorageError:
+        return False
+
+
+## @brief Re-check that indexed files still exist, least recently verified first.
+#
+# The storage manager used to stat every listed row on every page load; on
+# network-attached storage that was most of the request. This moves the check
+# off the request path: run from cron (scripts/verify_school_storage.py), it
+# stats rows in batches on a thread pool and records the answer in
+# SchoolFile.missing / verified_at, which is all the listing reads.
+#
+# Rows never checked come first, then the oldest checks, so repeated bounded
+# runs sweep the whole index. Legacy rows are skipped: they point outside the
+# storage tree by design.
+#
+# @param limit: at most this many rows per run, so one run stays bounded.
+# @param max_age: rows verified more recently than this are left alone.
+# @param only_school: a school id, or None for every owner.
+# @return counts: checked, missing (now absent), recovered (back after being
+#         flagged).
+def verify_files(limit=5000, max_age=VERIFY_MAX_AGE, only_school=None, workers=8,
+                 batch_size=500, dry_run=False):
+    counts = {'checked': 0, 'missing': 0, 'recovered': 0}
+    cutoff = datetime.now() - max_age
+    seen_ids = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while counts['checked'] < limit:
+            query = db.session.query(
+                SchoolFile.id, SchoolFile.relative_path, SchoolFile.missing, SchoolFile.updated_at
+            ).filter(
+                SchoolFile.active.is_(True),
+                ~SchoolFile.relative_path.startswith(LEGACY_PATH_PREFIX, autoescape=True),
+                or_(SchoolFile.verified_at.is_(None), SchoolFile.verified_at < cutoff),
+            )
+            if only_school is not None:
+                query = query.filter(SchoolFile.shcool_id == only_school)
+            if dry_run and seen_ids:
+                # Nothing is written in a dry run, so exclude what was already
+                # looked at instead of relying on verified_at moving forward.
+                query = query.filter(SchoolFile.id.notin_(seen_ids))
+            rows = query.order_by(SchoolFile.verified_at, SchoolFile.id).limit(
+                min(batch_size, limit - counts['checked'])
+            ).all()
+            if not rows:
+                break
+
+            present = list(pool.map(_file_exists, [row.relative_path for row in rows]))
+            now = datetime.now()
+            changes = []
+            for row, exists in zip(rows, present):
+                seen_ids.add(row.id)
+                if not exists and not row.missing:
+                    counts['missing'] += 1
+                elif exists and row.missing:
+                    counts['recovered'] += 1
+                # updated_at is passed through unchanged: a check is not an
+                # edit, and the column's onupdate would otherwise bump it.
+                changes.append({'id': row.id, 'missing': not exists, 'verified_at': now,
+                                'updated_at': row.updated_at})
+            counts['checked'] += len(rows)
+
+            if not dry_run:
+                db.session.execute(update(SchoolFile), changes)
+                db.session.commit()
+    return counts
@@ -0,0 +1,220 @@
+## @file
+# @brief Page index, single-page fetch and thumbnails for story PDFs.
+#
+# The reader used to download a story's whole PDF before it could show page 1
+# -- slow on a school network, and wasted when resuming at page 30. Each PDF is
+# now parsed once after upload: its page count goes on the story (page_count)
+# and the size of every page on page_index, so the reader can lay out the book
+# before any page arrives. /reader/stories/<id>/pages/<n> then serves one page
+# on its own:
+#
+#   format=pdf        a single-page PDF cut from the original (default)
+#   format=thumbnail  a small JPEG of the page, for the page strip
+#   format=image      a reading-size JPEG, for first paint while the PDF loads
+#
+# Derived files sit in STORY_PAGES_DIR/<story id>/, outside the storage root:
+# /media serves that root without a session, and the page names are
+# guessable, so under it any story could be read page by page without the
+# access check. They are not indexed or charged: they are derived from the
+# PDF, which already is. Each is written on the first request for it and
+# kept; the upload also queues a background job that indexes the PDF and
+# renders every thumbnail, so those are usually ready before a reader asks.
+#
+# Parsing and cutting pages needs pypdf; images need `pdftoppm` (poppler-utils)
+# on PATH or in STORY_PDF_RENDERER_DIR. Without pypdf nothing is indexed and
+# readers keep using the full PDF; without pdftoppm only format=pdf is served.
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from datetime import datetime
+from uuid import uuid4
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pragma: no cover
+    ## Optional: without pypdf stories are served as whole PDFs only.
+    PdfReader = None
+    PdfWriter = None
+
+from apps.background import run_after_commit
+from apps.storage import STAGING_PREFIX, owner_folder, storage_root
+from config import ConfigClass
+from extensions import db
+from models.book_story import BookStory
+
+## @brief Layout version of BookStory.page_index.
+PAGE_INDEX_VERSION = 1
+
+## @brief Where the page files used to be written, under each owner folder of
+# the storage root. /media refuses it; remove_story_pages still clears it.
+LEGACY_PAGES_FOLDER = 'books/pages'
+
+## @brief What a page can be fetched as, with its MIME type.
+PAGE_FORMATS = {'pdf': 'application/pdf', 'thumbnail': 'image/jpeg', 'image': 'image/jpeg'}
+
+## @brief Rendered width in pixels of each image format.
+PAGE_IMAGE_WIDTHS = {'thumbnail': 200, 'image': 1024}
+JPEG_QUALITY = 75
+RENDER_TIMEOUT_SECONDS = 60
+
+
+def available():
+    return PdfReader is not None
+
+
+def renderer_path():
+    directory = ConfigClass.STORY_PDF_RENDERER_DIR
+    return (directory and shutil.which('pdftoppm', path=directory)) or shutil.which('pdftoppm')
+
+
+def pages_directory(story):
+    return os.path.join(os.path.abspath(ConfigClass.STORY_PAGES_DIR), str(story.id))
+
+
+def legacy_pages_directory(story):
+    return os.path.join(storage_root(), owner_folder(story.shcool_id), *LEGACY_PAGES_FOLDER.split('/'), str(story.id))
+
+
+def is_legacy_page_path(relative_path):
+    """Whether a path relative to the storage root is inside some owner's
+    books/pages/ folder."""
+    parts = [part.lower() for part in relative_path.replace(os.sep, '/').split('/')]
+    return parts[1:3] == LEGACY_PAGES_FOLDER.split('/')
+
+
+def page_file_path(story, page_number, fmt):
+    if fmt == 'pdf':
+        name = 'page-%04d.pdf' % page_number
+    else:
+        name = 'page-%04d.w%d.jpg' % (page_number, PAGE_IMAGE_WIDTHS[fmt])
+    return os.path.join(pages_directory(story), name)
+
+
+def _open_pdf(file_path):
+    reader = PdfReader(file_path)
+    if reader.is_encrypted and not reader.decrypt(''):
+        raise ValueError('PDF is password protected')
+    return reader
+
+
+def read_page_index(file_path):
+    """{'version', 'pages': [{'width', 'height'}]} for a PDF, in points, as
+    displayed (crop box, page rotation applied)."""
+    pages = []
+    for page in _open_pdf(file_path).pages:
+        width, height = float(page.cropbox.width), float(page.cropbox.height)
+        if (page.rotation or 0) % 180:
+            width, height = height, width
+        pages.append({'width': round(width, 2), 'height': round(height, 2)})
+    return {'version': PAGE_INDEX_VERSION, 'pages': pages}
+
+
+def index_story(story):
+    """Parse `story`'s PDF into page_count and page_index. Does not commit.
+
+    A PDF that cannot be parsed is marked as tried (pages_indexed_at set,
+    page_index left empty) so it is not re-parsed on every request."""
+    if not available() or not story.file_path or not os.path.isfile(story.file_path):
+        return False
+    story.pages_indexed_at = datetime.now()
+    try:
+        story.page_index = read_page_index(story.file_path)
+    except Exception as error:
+        logging.warning('Indexing pages of story %s failed: %s', story.id, error)
+        story.page_index = None
+        return False
+    story.page_count = len(story.page_index['pages'])
+    return True
+
+
+def ensure_page_index(story):
+    """True when `story` has a page index, indexing it now if it was never
+    tried. Commits when it indexes."""
+    if story.page_index is None and story.pages_indexed_at is None:
+        index_story(story)
+        db.session.commit()
+    return bool(story.page_index)
+
+
+def _staging_path(destination):
+    return os.path.join(os.path.dirname(destination), STAGING_PREFIX + uuid4().hex)
+
+
+def write_page_pdf(story, page_number, destination):
+    writer = PdfWriter()
+    writer.add_page(_open_pdf(story.file_path).pages[page_number - 1])
+    temp_path = _staging_path(destination)
+    try:
+        with open(temp_path, 'wb') as handle:
+            writer.write(handle)
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def render_page_image(story, page_number, width, destination):
+    renderer = renderer_path()
+    if not renderer:
+        return False
+    prefix = _staging_path(destination)
+    command = [
+        renderer, '-f', str(page_number), '-l', str(page_number), '-singlefile',
+        '-jpeg', '-jpegopt', 'quality=%d' % JPEG_QUALITY,
+        '-scale-to-x', str(width), '-scale-to-y', '-1',
+        story.file_path, prefix,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=RENDER_TIMEOUT_SECONDS)
+        os.replace(prefix + '.jpg', destination)
+    finally:
+        if os.path.exists(prefix + '.jpg'):
+            os.remove(prefix + '.jpg')
+    return True
+
+
+## @brief Striped locks, so two readers opening the same page cut or render it
+# once.
+_page_locks = [threading.Lock() for _ in range(32)]
+
+
+def resolve_page_file(story, page_number, fmt):
+    """Path of page `page_number` of an indexed story as `fmt`, written now if
+    missing, or None when this server cannot produce that format."""
+    destination = page_file_path(story, page_number, fmt)
+    if os.path.isfile(destination):
+        return destination
+    with _page_locks[hash(destination) % len(_page_locks)]:
+        if not os.path.isfile(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if fmt == 'pdf':
+                written = available() and write_page_pdf(story, page_number, destination)
+            else:
+                written = render_page_image(story, page_number, PAGE_IMAGE_WIDTHS[fmt], destination)
+            if not written:
+                return None
+    return destination
+
+
+def remove_story_pages(story):
+    shutil.rmtree(pages_directory(story), ignore_errors=True)
+    shutil.rmtree(legacy_pages_directory(story), ignore_errors=True)
+
+
+def _process_job(story_id):
+    story = db.session.get(BookStory, story_id)
+    if story is None or not story.active or not ensure_page_index(story):
+        return
+    if renderer_path():
+        for page_number in range(1, story.page_count + 1):
+            resolve_page_file(story, page_number, 'thumbnail')
+
+
+def queue_story_pages(story):
+    """Index `story`'s PDF and render its thumbnails once the current
+    transaction commits."""
+    if available():
+        run_after_commit(_process_job, story.id)
@@ -0,0 +1,93 @@
+## @file
+# @brief Per-book map from a word as games send it to the word sense it was
+# ingested as, behind progress_engine.resolve_word_sense_for_book.
+#
+# Every word attempt used to find its sense with lower(surface_form) over the
+# book's occurrences -- a scan per attempt, since no index serves lower(). The
+# occurrence rows now carry surface_form_normalized (indexed with the chapter),
+# and each process keeps the whole map for the books being played, built with
+# one query the first time a book is needed:
+#
+#     {normalized surface form: word_sense_id}
+#
+# The map only ever answers "yes, this sense": a word it does not know falls
+# through to an indexed lookup, so occurrences ingested by another process
+# are still found (and the stale map is dropped). Code that changes a book's
+# occurrences -- ingestion, moving occurrences between senses -- calls
+# invalidate_book() so this process rebuilds on next use; a sense deleted
+# elsewhere is noticed when its id no longer loads.
+import threading
+from collections import OrderedDict
+
+from config import ConfigClass
+from extensions import db
+from models.chapter import Chapter
+from models.word_occurrence import WordOccurrence, normalize_surface_form
+
+_maps = OrderedDict()
+_lock = threading.Lock()
+
+
+def _build(book_id):
+    rows = (
+        db.session.query(WordOccurrence.surface_form_normalized, WordOccurrence.word_sense_id)
+        .join(Chapter, WordOccurrence.chapter_id == Chapter.id)
+        .filter(Chapter.book_id == book_id)
+        .order_by(WordOccurrence.id)
+    )
+    surface_map = {}
+    for surface_form, word_sense_id in rows:
+        if surface_form:
+            surface_map.setdefault(surface_form, word_sense_id)
+    return surface_map
+
+
+def book_surface_forms(book_id):
+    """The book's {normalized surface form: word_sense_id}, from memory when
+    this process has it."""
+    limit = ConfigClass.WORD_SURFACE_CACHE_BOOKS
+    if limit <= 0:
+        return _build(book_id)
+    with _lock:
+        surface_map = _maps.get(book_id)
+        if surface_map is not None:
+            _maps.move_to_end(book_id)
+            return surface_map
+    surface_map = _build(book_id)
+    with _lock:
+        _maps[book_id] = surface_map
+        while len(_maps) > limit:
+            _maps.popitem(last=False)
+    return surface_map
+
+
+def lookup_word_sense_id(book_id, surface_form):
+    """word_sense_id of `surface_form` in the book, or None."""
+    surface_form = normalize_surface_form(surface_form)
+    word_sense_id = book_surface_forms(book_id).get(surface_form)
+    if word_sense_id is not None:
+        return word_sense_id
+
+    # Indexed cold path: occurrences added since the map was built.
+    word_sense_id = (
+        db.session.query(WordOccurrence.word_sense_id)
+        .join(Chapter, WordOccurrence.chapter_id == Chapter.id)
+        .filter(WordOccurrence.surface_form_normalized == surface_form)
+        .filter(Chapter.book_id == book_id)
+        .order_by(WordOccurrence.id)
+        .limit(1)
+        .scalar()
+    )
+    if word_sense_id is not None:
+        invalidate_book(book_id)
+    return word_sense_id
+
+
+def invalidate_book(book_id=None):
+    """Drop one book's map, or every map when book_id is None (e.g. after
+    merging word senses, which can touch any book)."""
+    with _lock:
+        if book_id is None:
+            _maps.clear()
+        else:
+            _maps.pop(book_id, None)
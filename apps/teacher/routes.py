@@ -24,7 +24,9 @@ from apps.storage import (
     category_dir,
     delete_by_absolute_path,
     register_existing_file,
+    write_upload,
 )
+from apps.story_pages import queue_story_pages, remove_story_pages
 from extensions import db
 from config import ConfigClass
 from werkzeug.utils import secure_filename
@@ -322,7 +324,13 @@ def upload_teacher_book_story(book_id):
         stored_filename = f'{uuid4().hex}.pdf'
         upload_dir = get_story_upload_dir(school_id, book.id)
         saved_file_path = os.path.join(upload_dir, stored_filename)
-        pdf_file.save(saved_file_path)
+        # The pre-check above only refuses early; this reserves the bytes
+        # actually read, atomically, so concurrent uploads cannot both fit
+        # into the school's last few megabytes.
+        file_size, content_sha256 = write_upload(
+            pdf_file, saved_file_path, max_bytes=max_file_size, school_id=school_id,
+            category='books/files'
+        )
 
         story = BookStory(
             book_id=book.id,
@@ -353,14 +361,24 @@ def upload_teacher_book_story(book_id):
             title=title,
             linked_type='story',
             linked_id=story.id,
-            mime_type=story.mime_type
+            mime_type=story.mime_type,
+            content_sha256=content_sha256,
+            charged=True
         )
+        # Page count, page sizes and thumbnails are worked out after the
+        # commit, off the request.
+        queue_story_pages(story)
         db.session.commit()
 
         return jsonify({
             'message': 'Story uploaded successfully',
             'story': serialize_book_story(story)
         }), 201
+    except StorageError as storage_error:
+        db.session.rollback()
+        if saved_file_path and os.path.exists(saved_file_path):
+            os.remove(saved_file_path)
+        return jsonify({'message': str(storage_error)}), 413
     except Exception as error:
         db.session.rollback()
         if saved_file_path and os.path.exists(saved_file_path):
@@ -411,6 +429,7 @@ def delete_teacher_book_story(story_id):
         # is released; done before the commit so both land together.
         delete_by_absolute_path(file_path)
         db.session.commit()
+        remove_story_pages(story)
 
         return jsonify({'message': 'Story deleted successfully'}), 200
     except Exception as error:
@@ -7,6 +7,7 @@ import re
 
 import spacy
 
+from apps.surface_forms import invalidate_book
 from extensions import db
 from models.book_text import Book_text
 from models.chapter import Chapter
@@ -130,6 +131,7 @@ def ingest_book_vocabulary_list(book_id):
             occurrences_created += int(occ_created)
 
     db.session.commit()
+    invalidate_book(book_id)
     return {
         'terms': terms,
         'tokens': tokens,
@@ -0,0 +1,114 @@
+## @file
+# @brief Search, status filtering and status counts for the word-sense review
+# queue (/admin/word-senses and /admin/word-senses/quality).
+#
+# The queue used to filter with `lemma LIKE '%term%'`, which no B-tree index
+# can answer, so every keystroke in the search box scanned the whole
+# dictionary. On MySQL the lemma now carries a FULLTEXT index built with the
+# ngram parser (migration b6d2e8f4a1c3), which answers substring searches from
+# the index. Where that index is missing -- SQLite in tests, or a database the
+# migration has not reached yet -- search falls back to a prefix match, which
+# the plain ix_word_sense_lemma index still serves.
+from sqlalchemy import case, func, inspect, or_
+from sqlalchemy.dialects.mysql import match
+
+from extensions import db
+from models.word_sense import WordSense
+
+LEMMA_FULLTEXT_INDEX = 'ft_word_sense_lemma'
+
+## @brief MySQL's default ngram_token_size. A search shorter than one token
+# cannot be answered by the ngram index at all, so it takes the prefix path.
+NGRAM_TOKEN_SIZE = 2
+
+STATUS_UNRESOLVED = 'unresolved'
+STATUS_EXCLUDED = 'excluded'
+STATUS_RESOLVED = 'resolved'
+STATUS_ALL = 'all'
+
+_fulltext_available = {}
+
+
+def has_lemma_fulltext_index():
+    """Whether the current database can answer MATCH ... AGAINST on lemma.
+
+    Checked once per engine and remembered: the index only appears through a
+    migration, and a migration is followed by a deploy restart anyway."""
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _fulltext_available:
+        available = False
+        if engine.dialect.name == 'mysql':
+            try:
+                indexes = inspect(engine).get_indexes(WordSense.__tablename__)
+                available = any(index['name'] == LEMMA_FULLTEXT_INDEX for index in indexes)
+            except Exception:
+                available = False
+        _fulltext_available[key] = available
+    return _fulltext_available[key]
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def lemma_search_filter(search, use_fulltext=None):
+    """Filter clause for the search box. `search` is already lowercased.
+
+    The FULLTEXT path quotes the term as a boolean-mode phrase, so with the
+    ngram parser it matches the same substrings the old LIKE did. The fallback
+    is a prefix match: it gives up mid-word hits, but stays an index range scan
+    instead of a full scan."""
+    if use_fulltext is None:
+        use_fulltext = has_lemma_fulltext_index()
+
+    if use_fulltext and len(search) >= NGRAM_TOKEN_SIZE:
+        phrase = '"%s"' % search.replace('"', ' ')
+        return match(WordSense.lemma, against=phrase).in_boolean_mode()
+    return WordSense.lemma.like(escape_like(search) + '%', escape='\\')
+
+
+def _resolved_clause():
+    return or_(
+        WordSense.cefr_level.isnot(None),
+        WordSense.cefr_override_level.isnot(None),
+    )
+
+
+def filter_by_status(query, status):
+    if status == STATUS_UNRESOLVED:
+        return query.filter(
+            WordSense.cefr_level.is_(None),
+            WordSense.cefr_override_level.is_(None),
+            WordSense.proper_noun_excluded.is_(False),
+        )
+    if status == STATUS_EXCLUDED:
+        return query.filter(WordSense.proper_noun_excluded.is_(True))
+    if status == STATUS_RESOLVED:
+        return query.filter(_resolved_clause())
+    # STATUS_ALL (or anything unrecognised) -> no extra filter
+    return query
+
+
+def word_sense_status_counts(query):
+    """Total, resolved and excluded counts for an already-scoped WordSense
+    query, in one aggregate pass instead of three COUNTs.
+
+    Resolved and excluded are counted independently, exactly as the three
+    separate COUNTs did, so a sense that is both stays in both figures."""
+    row = (
+        query.order_by(None)
+        .with_entities(
+            func.count(WordSense.id),
+            func.sum(case((_resolved_clause(), 1), else_=0)),
+            func.sum(case((WordSense.proper_noun_excluded.is_(True), 1), else_=0)),
+        )
+        .one()
+    )
+    total, resolved, excluded = (int(value or 0) for value in row)
+    return {
+        'total': total,
+        'resolved': resolved,
+        'proper_noun_excluded': excluded,
+        'unresolved': total - resolved - excluded,
+    }
@@ -137,6 +137,34 @@ class ConfigClass:
     MAX_MEDIA_IMAGE_UPLOAD_MB = int(os.environ.get('MAX_MEDIA_IMAGE_UPLOAD_MB') or 10)
     MAX_MEDIA_AUDIO_UPLOAD_MB = int(os.environ.get('MAX_MEDIA_AUDIO_UPLOAD_MB') or 50)
     MAX_MEDIA_DOCUMENT_UPLOAD_MB = int(os.environ.get('MAX_MEDIA_DOCUMENT_UPLOAD_MB') or 50)
+    ## @brief Store identical content uploaded twice by the same school once,
+    # as hard links. Off by default: it needs a filesystem with hard-link
+    # support under SCHOOL_STORAGE_DIR, and backups that preserve links (rsync
+    # -H) -- a backup tool that does not would quietly re-expand every copy.
+    SCHOOL_STORAGE_DEDUP_HARDLINKS = (os.environ.get('SCHOOL_STORAGE_DEDUP_HARDLINKS') or '').lower() in ('1', 'true', 'yes')
+    ## @brief Permission-checked file routes (audiobook media, story PDFs; see
+    # apps/protected_files.py). Seconds a browser may reuse its private copy
+    # before revalidating with the ETag.
+    PROTECTED_FILE_MAX_AGE = int(os.environ.get('PROTECTED_FILE_MAX_AGE') or 300)
+    ## @brief Hand the byte streaming of those routes to the front proxy:
+    # 'x-accel-redirect' (nginx, needs PROTECTED_FILE_ACCEL_LOCATIONS) or
+    # 'x-sendfile' (Apache mod_xsendfile). Empty: Flask sends the file.
+    PROTECTED_FILE_OFFLOAD = (os.environ.get('PROTECTED_FILE_OFFLOAD') or '').strip().lower()
+    ## @brief `<directory>=<internal location>` pairs, comma separated, e.g.
+    # `/var/www/html/iread/backend/storage=/_protected/storage`.
+    PROTECTED_FILE_ACCEL_LOCATIONS = os.environ.get('PROTECTED_FILE_ACCEL_LOCATIONS') or ''
+    ## @brief Threads per process running work queued to follow a commit
+    # (apps/background.py): resized image copies, story PDF page indexes.
+    BACKGROUND_JOB_WORKERS = int(os.environ.get('BACKGROUND_JOB_WORKERS') or 2)
+    ## @brief Folder holding poppler's pdftoppm, used to render story page
+    # thumbnails (apps/story_pages.py). Empty means look it up on PATH.
+    STORY_PDF_RENDERER_DIR = os.environ.get('STORY_PDF_RENDERER_DIR') or ''
+    ## @brief Where single-page cuts and thumbnails of story PDFs are kept.
+    # Outside SCHOOL_STORAGE_DIR on purpose: everything under that is served
+    # by the public /media route, and these are only for readers who pass the
+    # story's access check. Add it to PROTECTED_FILE_ACCEL_LOCATIONS to have
+    # the front proxy send them.
+    STORY_PAGES_DIR = os.environ.get('STORY_PAGES_DIR') or os.path.join(os.getcwd(), 'cache', 'story-pages')
     ## @brief Legacy upload roots. New uploads go to SCHOOL_STORAGE_DIR, but
     # rows written before the migration still hold absolute paths under these,
     # so they stay configured for reads.
@@ -145,9 +173,51 @@ class ConfigClass:
     AUDIOBOOK_UPLOAD_DIR = os.environ.get('AUDIOBOOK_UPLOAD_DIR') or os.path.join(os.getcwd(), 'uploads', 'audio-books')
     MAX_AUDIOBOOK_IMAGE_UPLOAD_MB = int(os.environ.get('MAX_AUDIOBOOK_IMAGE_UPLOAD_MB') or 10)
     MAX_AUDIOBOOK_AUDIO_UPLOAD_MB = int(os.environ.get('MAX_AUDIOBOOK_AUDIO_UPLOAD_MB') or 50)
+    ## @brief Buffer reading-position reports (audiobook playback, PDF story
+    # pages) in memory and write them in batches every PROGRESS_FLUSH_SECONDS
+    # (apps/progress_buffer.py). Completions are always written immediately.
+    # On by default; set to 0 to commit every report again.
+    PROGRESS_WRITE_BEHIND = (os.environ.get('PROGRESS_WRITE_BEHIND') or '1').lower() in ('1', 'true', 'yes')
+    PROGRESS_FLUSH_SECONDS = int(os.environ.get('PROGRESS_FLUSH_SECONDS') or 5)
+    ## @brief Books whose surface form -> word sense map each process keeps in
+    # memory for word attempts (apps/surface_forms.py), least recently used
+    # dropped first. 0 turns the map off.
+    WORD_SURFACE_CACHE_BOOKS = int(os.environ.get('WORD_SURFACE_CACHE_BOOKS') or 256)
+    ## @brief Seconds a staff member's clear school-suspension check is reused
+    # before being re-run (apps/account_status.py); suspensions take effect at
+    # once regardless. 0 checks on every request.
+    ACCOUNT_CHECK_CACHE_SECONDS = int(os.environ.get('ACCOUNT_CHECK_CACHE_SECONDS') or 300)
+    ## @brief Processes running bcrypt for sign-ins and PIN checks
+    # (apps/passwords.py); 0 checks on the request thread. Past
+    # PASSWORD_HASH_MAX_PENDING checks in flight per web process, sign-ins get
+    # a 429 with Retry-After. Hashes at another cost than PASSWORD_HASH_ROUNDS
+    # are rehashed on the next successful sign-in.
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 32)
+    PASSWORD_HASH_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS') or 12)
+    ## @brief Share of requests whose SQL is counted and timed
+    # (apps/query_stats.py): a Server-Timing header plus a JSON line on the
+    # `iread.sql` logger, at WARNING when a statement ran
+    # SQL_STATS_REPEAT_THRESHOLD or more times. 0 turns it off, 1 measures all.
+    SQL_STATS_SAMPLE_RATE = float(os.environ.get('SQL_STATS_SAMPLE_RATE') or 0.01)
+    SQL_STATS_REPEAT_THRESHOLD = int(os.environ.get('SQL_STATS_REPEAT_THRESHOLD') or 5)
     AUDIOBOOK_ALIGNMENT_MODEL = os.environ.get('AUDIOBOOK_ALIGNMENT_MODEL') or 'base'
     AUDIOBOOK_ALIGNMENT_DEVICE = os.environ.get('AUDIOBOOK_ALIGNMENT_DEVICE') or 'cpu'
     AUDIOBOOK_FFMPEG_DIR = os.environ.get('AUDIOBOOK_FFMPEG_DIR') or ''
+    ## @brief Pages longer than this many seconds are split on silence and
+    # transcribed window by window (apps/audiobooks/alignment.py); 0 turns
+    # chunking off unless a request asks for it.
+    AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS = int(os.environ.get('AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS') or 30)
+    ## @brief Processes transcribing those windows in parallel. Each loads its
+    # own copy of the model, so memory grows with it; 1 runs them in turn.
+    AUDIOBOOK_ALIGNMENT_WORKERS = int(os.environ.get('AUDIOBOOK_ALIGNMENT_WORKERS') or 1)
+    ## @brief Whisper transcripts keyed by audio hash and model settings
+    # (apps/audiobooks/alignment_cache.py), least recently used evicted past
+    # the size limit. 0 MB turns the cache off.
+    AUDIOBOOK_ALIGNMENT_CACHE_DIR = (
+        os.environ.get('AUDIOBOOK_ALIGNMENT_CACHE_DIR') or os.path.join(os.getcwd(), 'cache', 'alignment')
+    )
+    AUDIOBOOK_ALIGNMENT_CACHE_MB = int(os.environ.get('AUDIOBOOK_ALIGNMENT_CACHE_MB') or 512)
     AUDIOBOOK_SENTENCE_PAUSE_MS = int(os.environ.get('AUDIOBOOK_SENTENCE_PAUSE_MS') or 700)
     AUDIOBOOK_LINE_BREAK_PAUSE_MS = int(os.environ.get('AUDIOBOOK_LINE_BREAK_PAUSE_MS') or 1200)
     CALL_JWT_SECRET = os.environ.get('CALL_JWT_SECRET') or 'intellect'
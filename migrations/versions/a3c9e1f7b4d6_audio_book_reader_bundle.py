@@ -0,0 +1,31 @@
+"""audio book reader bundle
+
+Publishing an audiobook now writes an immutable reader bundle under the
+storage root; the book records which version is current. Existing published
+books get theirs on their next publish.
+
+Revision ID: a3c9e1f7b4d6
+Revises: f1a7d3c9b5e2
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e1f7b4d6'
+down_revision = 'f1a7d3c9b5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('audio_book', sa.Column('bundle_version', sa.Integer(), nullable=False,
+                                          server_default='0'))
+    op.add_column('audio_book', sa.Column('bundle_path', sa.String(length=500), nullable=True))
+
+
+def downgrade():
+    op.drop_column('audio_book', 'bundle_path')
+    op.drop_column('audio_book', 'bundle_version')
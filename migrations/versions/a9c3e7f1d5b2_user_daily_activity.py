@@ -0,0 +1,77 @@
+"""user daily activity
+
+Per-reader per-day counters for the daily goal, the word-progress trend and
+the parent analytics chart, built here from the existing evidence, mastery,
+Daily Run and practice history.
+
+Revision ID: a9c3e7f1d5b2
+Revises: f2b6d8a4c1e7
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e7f1d5b2'
+down_revision = 'f2b6d8a4c1e7'
+branch_labels = None
+depends_on = None
+
+
+## @brief One INSERT ... SELECT: each source aggregated per reader and day,
+# stacked with UNION ALL and summed into one row per (user_id, day).
+BACKFILL = '''
+INSERT INTO user_daily_activity
+    (user_id, day, words_practiced, words_distinct, words_mastered,
+     games_played, score_sum, time_spent_seconds, updated_at)
+SELECT user_id, day, SUM(practiced), SUM(distinct_words), SUM(mastered),
+       SUM(played), SUM(score), SUM(seconds), CURRENT_TIMESTAMP
+FROM (
+    SELECT wp.user_id AS user_id, e.occurred_on AS day,
+           COUNT(*) AS practiced, COUNT(DISTINCT e.word_progress_id) AS distinct_words,
+           0 AS mastered, 0 AS played, 0 AS score, 0 AS seconds
+    FROM word_progress_evidence e
+    JOIN word_progress wp ON wp.id = e.word_progress_id
+    GROUP BY wp.user_id, e.occurred_on
+    UNION ALL
+    SELECT user_id, DATE(mastered_at), 0, 0, COUNT(*), 0, 0, 0
+    FROM word_progress
+    WHERE mastered_at IS NOT NULL
+    GROUP BY user_id, DATE(mastered_at)
+    UNION ALL
+    SELECT user_id, day, 0, 0, 0, COUNT(*), COALESCE(SUM(score), 0), COALESCE(SUM(time_spent_seconds), 0)
+    FROM game_result
+    WHERE user_id IS NOT NULL AND day IS NOT NULL
+    GROUP BY user_id, day
+    UNION ALL
+    SELECT user_id, day, 0, 0, 0, COUNT(*), COALESCE(SUM(score), 0), COALESCE(SUM(time_spent_seconds), 0)
+    FROM practice_play
+    WHERE day IS NOT NULL
+    GROUP BY user_id, day
+) activity
+GROUP BY user_id, day
+'''
+
+
+def upgrade():
+    op.create_table(
+        'user_daily_activity',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('words_practiced', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('words_distinct', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('words_mastered', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('games_played', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('score_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('time_spent_seconds', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    op.drop_table('user_daily_activity')
@@ -0,0 +1,52 @@
+"""word sense search indexes
+
+The /admin/word-senses review queue searched with `lemma LIKE '%term%'`,
+which no B-tree index can serve. On MySQL, lemma gets a FULLTEXT index built
+with the ngram parser so substring search is answered from the index; other
+backends keep using the prefix fallback in apps/word_sense_search.py.
+
+word_occurrence gains (chapter_id, word_sense_id): the school-scoped queue
+resolves "senses in these books" as chapter -> occurrence -> sense, and the
+existing unique key leads with word_sense_id, so it cannot serve that walk.
+
+Revision ID: b6d2e8f4a1c3
+Revises: a1c4e7b930d2
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2e8f4a1c3'
+down_revision = 'a1c4e7b930d2'
+branch_labels = None
+depends_on = None
+
+
+def index_exists(table_name, index_name):
+    inspector = sa.inspect(op.get_bind())
+    return any(index['name'] == index_name for index in inspector.get_indexes(table_name))
+
+
+def upgrade():
+    if not index_exists('word_occurrence', 'ix_word_occurrence_chapter_sense'):
+        op.create_index(
+            'ix_word_occurrence_chapter_sense',
+            'word_occurrence',
+            ['chapter_id', 'word_sense_id'],
+            unique=False
+        )
+
+    # FULLTEXT ... WITH PARSER is MySQL-only DDL; elsewhere the search module
+    # detects the missing index and takes its prefix path.
+    if op.get_bind().dialect.name == 'mysql' and not index_exists('word_sense', 'ft_word_sense_lemma'):
+        op.execute('CREATE FULLTEXT INDEX ft_word_sense_lemma ON word_sense (lemma) WITH PARSER ngram')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'mysql' and index_exists('word_sense', 'ft_word_sense_lemma'):
+        op.drop_index('ft_word_sense_lemma', table_name='word_sense')
+    if index_exists('word_occurrence', 'ix_word_occurrence_chapter_sense'):
+        op.drop_index('ix_word_occurrence_chapter_sense', table_name='word_occurrence')
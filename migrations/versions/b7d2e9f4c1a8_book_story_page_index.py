@@ -0,0 +1,30 @@
+"""book story page index
+
+Story PDFs are now parsed once after upload; the story keeps its page count
+(already a column) and the size of each page. Existing stories are indexed by
+scripts/index_story_pages.py or on the first page request.
+
+Revision ID: b7d2e9f4c1a8
+Revises: a3c9e1f7b4d6
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e9f4c1a8'
+down_revision = 'a3c9e1f7b4d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('book_story', sa.Column('page_index', sa.JSON(), nullable=True))
+    op.add_column('book_story', sa.Column('pages_indexed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('book_story', 'pages_indexed_at')
+    op.drop_column('book_story', 'page_index')
@@ -0,0 +1,34 @@
+"""word occurrence normalized surface form
+
+Word attempts resolved their word with lower(surface_form), which no index
+can serve, so every attempt scanned the book's occurrences. The normalized
+form is now stored (trimmed, lower-cased) and indexed with the chapter.
+
+Revision ID: c4e8a2f6d9b1
+Revises: b7d2e9f4c1a8
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2f6d9b1'
+down_revision = 'b7d2e9f4c1a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('word_occurrence', sa.Column('surface_form_normalized', sa.String(length=100), nullable=True))
+    op.execute('UPDATE word_occurrence SET surface_form_normalized = LOWER(TRIM(surface_form))')
+    op.create_index(
+        'ix_word_occurrence_surface_chapter', 'word_occurrence',
+        ['surface_form_normalized', 'chapter_id'], unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_word_occurrence_surface_chapter', table_name='word_occurrence')
+    op.drop_column('word_occurrence', 'surface_form_normalized')
@@ -0,0 +1,39 @@
+"""school file content hash
+
+school_file.content_sha256 records the SHA-256 computed while an upload is
+streamed to disk. NULL for rows indexed from an existing tree -- those were
+never read end to end, and hashing the whole store inside a migration would
+hold the deploy for hours.
+
+(shcool_id, content_sha256) serves the per-school duplicate lookup behind the
+optional hard-link deduplication.
+
+Revision ID: c4e9a2d7f3b8
+Revises: b6d2e8f4a1c3
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e9a2d7f3b8'
+down_revision = 'b6d2e8f4a1c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('school_file', sa.Column('content_sha256', sa.String(length=64), nullable=True))
+    op.create_index(
+        'ix_school_file_school_sha256',
+        'school_file',
+        ['shcool_id', 'content_sha256'],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_school_file_school_sha256', table_name='school_file')
+    op.drop_column('school_file', 'content_sha256')
@@ -0,0 +1,38 @@
+"""reader notification feed index
+
+(user_id, created_at, id) for the keyset-paginated notification feed, and a
+first purge of expired notifications now that the feed no longer filters
+them out per query (scripts/purge_expired_notifications.py takes over from
+here).
+
+Revision ID: c7e1a9d3f5b8
+Revises: a9c3e7f1d5b2
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1a9d3f5b8'
+down_revision = 'a9c3e7f1d5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.get_bind().execute(
+        sa.text('DELETE FROM reader_notification WHERE expires_at < :now'),
+        {'now': datetime.utcnow()},
+    )
+    op.create_index(
+        'ix_reader_notification_user_created', 'reader_notification',
+        ['user_id', 'created_at', 'id'], unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_reader_notification_user_created', table_name='reader_notification')
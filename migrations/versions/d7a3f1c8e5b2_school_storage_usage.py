@@ -0,0 +1,84 @@
+"""school storage usage counters
+
+school_storage_usage keeps running byte and file counts per owner folder and
+storage category, plus a '*' total row per owner, so the quota check on every
+upload and the usage views stop summing school_file each time.
+
+Backfilled here from the active school_file rows, so the counters are correct
+from the moment the new code starts reading them.
+
+Revision ID: d7a3f1c8e5b2
+Revises: c4e9a2d7f3b8
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f1c8e5b2'
+down_revision = 'c4e9a2d7f3b8'
+branch_labels = None
+depends_on = None
+
+
+def owner_folder(school_id):
+    return 'platform' if school_id is None else 'school_%s' % int(school_id)
+
+
+def upgrade():
+    usage = op.create_table(
+        'school_storage_usage',
+        sa.Column('owner', sa.String(length=40), nullable=False),
+        sa.Column('category', sa.String(length=40), nullable=False),
+        sa.Column('shcool_id', sa.Integer(), nullable=True),
+        sa.Column('file_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['shcool_id'], ['shcool.id']),
+        sa.PrimaryKeyConstraint('owner', 'category')
+    )
+    op.create_index('ix_school_storage_usage_shcool_id', 'school_storage_usage', ['shcool_id'])
+
+    school_file = sa.table(
+        'school_file',
+        sa.column('shcool_id', sa.Integer()),
+        sa.column('category', sa.String()),
+        sa.column('file_size', sa.BigInteger()),
+        sa.column('active', sa.Boolean()),
+    )
+    rows = op.get_bind().execute(
+        sa.select(
+            school_file.c.shcool_id,
+            school_file.c.category,
+            sa.func.count(),
+            sa.func.coalesce(sa.func.sum(school_file.c.file_size), 0)
+        )
+        .where(school_file.c.active == sa.true())
+        .group_by(school_file.c.shcool_id, school_file.c.category)
+    ).fetchall()
+
+    now = datetime.now()
+    counters = {}
+    for school_id, category, file_count, total_bytes in rows:
+        for bucket in (category, '*'):
+            entry = counters.setdefault((owner_folder(school_id), bucket), {
+                'owner': owner_folder(school_id),
+                'category': bucket,
+                'shcool_id': school_id,
+                'file_count': 0,
+                'bytes': 0,
+                'updated_at': now,
+            })
+            entry['file_count'] += int(file_count or 0)
+            entry['bytes'] += int(total_bytes or 0)
+    if counters:
+        op.bulk_insert(usage, list(counters.values()))
+
+
+def downgrade():
+    op.drop_index('ix_school_storage_usage_shcool_id', table_name='school_storage_usage')
+    op.drop_table('school_storage_usage')
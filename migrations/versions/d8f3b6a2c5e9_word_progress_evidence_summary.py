@@ -0,0 +1,62 @@
+"""word progress evidence summary
+
+Every correct attempt used to re-read the word's whole evidence log to work
+out its stage. WordProgress now keeps what the stage rule needs -- a bitmask
+of evidence sources, the evidence count and the latest evidence day, next to
+the existing distinct counts -- and each attempt advances it in place. This
+backfills all four summaries from the log once.
+
+SOURCE_BITS mirrors apps/progress_engine.py at the time of writing.
+
+Revision ID: d8f3b6a2c5e9
+Revises: c4e8a2f6d9b1
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b6a2c5e9'
+down_revision = 'c4e8a2f6d9b1'
+branch_labels = None
+depends_on = None
+
+SOURCE_BITS = {
+    'bee-genius': 1,
+    'word-explorer': 2,
+    'think-word': 4,
+    'intellect-link': 8,
+    'typed_from_memory': 16,
+}
+
+EVIDENCE = 'FROM word_progress_evidence e WHERE e.word_progress_id = word_progress.id'
+
+
+def upgrade():
+    op.add_column('word_progress', sa.Column('evidence_sources', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('word_progress', sa.Column('evidence_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('word_progress', sa.Column('last_evidence_on', sa.Date(), nullable=True))
+
+    op.execute(
+        'UPDATE word_progress SET '
+        'evidence_count = (SELECT COUNT(*) %(e)s), '
+        'last_evidence_on = (SELECT MAX(e.occurred_on) %(e)s), '
+        'distinct_sources_count = (SELECT COUNT(DISTINCT e.source) %(e)s), '
+        'distinct_days_count = (SELECT COUNT(DISTINCT e.occurred_on) %(e)s)' % {'e': EVIDENCE}
+    )
+    op.execute(
+        'UPDATE word_progress SET has_unaided_clear = (SELECT COUNT(*) %s AND e.hints_used = 0) > 0' % EVIDENCE
+    )
+    for source, bit in SOURCE_BITS.items():
+        op.execute(sa.text(
+            'UPDATE word_progress SET evidence_sources = evidence_sources + %d '
+            'WHERE EXISTS (SELECT 1 %s AND e.source = :source)' % (bit, EVIDENCE)
+        ).bindparams(source=source))
+
+
+def downgrade():
+    op.drop_column('word_progress', 'last_evidence_on')
+    op.drop_column('word_progress', 'evidence_count')
+    op.drop_column('word_progress', 'evidence_sources')
@@ -0,0 +1,27 @@
+"""user account version
+
+Stamp bumped when a user's or their school's suspension changes, so the
+per-request account check can reuse a clear result until it changes.
+
+Revision ID: e3a7c5f1b9d2
+Revises: d8f3b6a2c5e9
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c5f1b9d2'
+down_revision = 'd8f3b6a2c5e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('account_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('user', 'account_version')
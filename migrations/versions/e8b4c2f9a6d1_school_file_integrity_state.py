@@ -0,0 +1,50 @@
+"""school file integrity state and listing indexes
+
+school_file.missing / verified_at hold the result of the last existence check,
+written by scripts/verify_school_storage.py, so the storage manager's listing
+reads the flag instead of stat-ing every row on every page load.
+
+Also indexes the listing itself: (shcool_id, active, created_at, id) for the
+keyset-paged, newest-first walk, and (shcool_id, original_filename) /
+(shcool_id, title) for its prefix search.
+
+Existing rows start as not missing and never verified; the first scan visits
+them before anything it has already seen.
+
+Revision ID: e8b4c2f9a6d1
+Revises: d7a3f1c8e5b2
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4c2f9a6d1'
+down_revision = 'd7a3f1c8e5b2'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ('ix_school_file_listing', ['shcool_id', 'active', 'created_at', 'id']),
+    ('ix_school_file_school_filename', ['shcool_id', 'original_filename']),
+    ('ix_school_file_school_title', ['shcool_id', 'title']),
+    ('ix_school_file_verified_at', ['verified_at']),
+)
+
+
+def upgrade():
+    op.add_column('school_file', sa.Column('missing', sa.Boolean(), nullable=False,
+                                           server_default=sa.false()))
+    op.add_column('school_file', sa.Column('verified_at', sa.DateTime(), nullable=True))
+    for name, columns in INDEXES:
+        op.create_index(name, 'school_file', columns, unique=False)
+
+
+def downgrade():
+    for name, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name='school_file')
+    op.drop_column('school_file', 'verified_at')
+    op.drop_column('school_file', 'missing')
@@ -0,0 +1,41 @@
+"""reader passport snapshot
+
+Precomputed aggregate sections of the Global Reading Passport, one row per
+reader, so /reader/passport is a keyed read. Created empty: a reader's first
+view builds their row, and scripts/rebuild_reader_passports.py can fill them
+ahead of time.
+
+Revision ID: f1a7d3c9b5e2
+Revises: e8b4c2f9a6d1
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7d3c9b5e2'
+down_revision = 'e8b4c2f9a6d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'reader_passport_snapshot',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index(op.f('ix_reader_passport_snapshot_built_at'), 'reader_passport_snapshot',
+                    ['built_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_reader_passport_snapshot_built_at'), table_name='reader_passport_snapshot')
+    op.drop_table('reader_passport_snapshot')
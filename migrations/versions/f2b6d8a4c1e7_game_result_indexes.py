@@ -0,0 +1,72 @@
+"""game result indexes
+
+Composite indexes for the Daily Run and practice lookups, and the
+one-row-per-reader/day/game/book rule as a unique constraint.
+
+Revision ID: f2b6d8a4c1e7
+Revises: e3a7c5f1b9d2
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b6d8a4c1e7'
+down_revision = 'e3a7c5f1b9d2'
+branch_labels = None
+depends_on = None
+
+DELETE_BATCH = 1000
+
+
+def _duplicate_game_result_ids(bind):
+    # Keep the completed row of each duplicate group (else the newest) and
+    # return the rest. Rows with a NULL key column never collide under the
+    # constraint, so they are left alone.
+    rows = bind.execute(sa.text(
+        'SELECT id, user_id, day, game, book_id, completed FROM game_result '
+        'WHERE user_id IS NOT NULL AND day IS NOT NULL AND book_id IS NOT NULL '
+        'ORDER BY user_id, day, game, book_id'
+    ))
+    kept = {}
+    extra = []
+    for row in rows:
+        key = (row.user_id, row.day, row.game, row.book_id)
+        rank = (bool(row.completed), row.id)
+        if key not in kept:
+            kept[key] = rank
+            continue
+        if rank > kept[key]:
+            extra.append(kept[key][1])
+            kept[key] = rank
+        else:
+            extra.append(row.id)
+    return extra
+
+
+def upgrade():
+    bind = op.get_bind()
+    extra = _duplicate_game_result_ids(bind)
+    for start in range(0, len(extra), DELETE_BATCH):
+        bind.execute(
+            sa.text('DELETE FROM game_result WHERE id IN :ids').bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': extra[start:start + DELETE_BATCH]},
+        )
+
+    with op.batch_alter_table('game_result') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_game_result_user_day_game_book', ['user_id', 'day', 'game', 'book_id']
+        )
+    op.create_index('ix_game_result_book_game_day', 'game_result', ['book_id', 'game', 'day'], unique=False)
+    op.create_index('ix_game_result_day', 'game_result', ['day'], unique=False)
+    op.create_index('ix_practice_play_user_day', 'practice_play', ['user_id', 'day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_practice_play_user_day', table_name='practice_play')
+    op.drop_index('ix_game_result_day', table_name='game_result')
+    op.drop_index('ix_game_result_book_game_day', table_name='game_result')
+    with op.batch_alter_table('game_result') as batch_op:
+        batch_op.drop_constraint('uq_game_result_user_day_game_book', type_='unique')
@@ -26,6 +26,10 @@ class AudioBook(db.Model):
     created_by_id = db.Column(db.Integer, db.ForeignKey(User.id), nullable=False, index=True)
     created_by_role = db.Column(db.String(30), nullable=False)
     published_at = db.Column(db.DateTime, nullable=True)
+    ## Reader bundle written at publish time (apps/audiobooks/bundles.py):
+    # the version counts publishes, the path is relative to the storage root.
+    bundle_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    bundle_path = db.Column(db.String(500), nullable=True)
     active = db.Column(db.Boolean, nullable=False, default=True, index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
@@ -23,6 +23,10 @@ class BookStory(db.Model):
     mime_type = db.Column(db.String(100), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
     page_count = db.Column(db.Integer, nullable=True)
+    ## Page sizes of the PDF, written once after upload by
+    # apps/story_pages.py: {'version', 'pages': [{'width', 'height'}, ...]}.
+    page_index = db.Column(db.JSON, nullable=True)
+    pages_indexed_at = db.Column(db.DateTime, nullable=True)
     active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
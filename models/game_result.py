@@ -26,7 +26,19 @@ class Game_result(db.Model):
     completed = db.Column(db.Boolean, default=False)
     words_learned = db.Column(db.JSON,default=[])
     time_spent_seconds = db.Column(db.Integer, default=0)
- 
+
+    ## @brief Daily Run keeps one row per reader, day, game and book (the
+    # create route upserts it), so the lookup key is also the constraint; its
+    # (user_id, day) prefix serves the per-reader date ranges of the parent
+    # and school analytics. (book_id, game, day) serves the per-book daily
+    # leaderboard and the book-wide totals; day alone the platform-wide
+    # activity ranges.
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'game', 'book_id', name='uq_game_result_user_day_game_book'),
+        db.Index('ix_game_result_book_game_day', 'book_id', 'game', 'day'),
+        db.Index('ix_game_result_day', 'day'),
+    )
+
     def __repr__(self):
         return '<Game_result %s>' % self.game
 
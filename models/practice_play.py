@@ -26,5 +26,10 @@ class PracticePlay(db.Model):
     time_spent_seconds = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+    ## @brief The analytics chart reads one child's plays over a date range.
+    __table_args__ = (
+        db.Index('ix_practice_play_user_day', 'user_id', 'day'),
+    )
+
     def __repr__(self):
         return '<PracticePlay %s>' % self.game
@@ -40,6 +40,9 @@ class ReaderNotification(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'dedupe_key', name='uq_reader_notification_user_dedupe'),
+        # The feed: one reader's notifications, newest first, read from a
+        # (created_at, id) keyset cursor (apps/notifications.py).
+        db.Index('ix_reader_notification_user_created', 'user_id', 'created_at', 'id'),
     )
 
     def __repr__(self):
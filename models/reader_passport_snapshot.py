@@ -0,0 +1,38 @@
+## @file
+# @class ReaderPassportSnapshot
+from datetime import datetime
+
+from extensions import db
+from models.user import User
+
+
+##
+# @brief The precomputed aggregate half of a reader's Global Reading Passport.
+#
+# The passport is shown on the app home screen, and assembling it from scratch
+# means the progress summary, the full achievement catalogue (which walks every
+# chapter on the platform), three story counts and a certificate reconcile. This
+# row holds the result, so a view is one keyed read.
+#
+# `data` holds the 'reading', 'vocabulary', 'streak', 'achievements' and
+# 'certificates' sections exactly as the passport serves them. It is kept
+# current by the events that change it (apps/reader_passport.py: an attempt, a
+# story started or completed, a certificate issued, a word shelved) and rebuilt
+# in full by scripts/rebuild_reader_passports.py, which bounds how stale any
+# part that is not maintained incrementally can get. Identity and school
+# memberships are not copied here; the view reads them live.
+class ReaderPassportSnapshot(db.Model):
+    __tablename__ = 'reader_passport_snapshot'
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
+    ## @brief Shape of `data`. A snapshot from another version is rebuilt
+    # rather than served.
+    version = db.Column(db.Integer, nullable=False, default=1)
+    data = db.Column(db.JSON, nullable=False)
+    ## @brief Last full rebuild; what the rebuild command's --max-age reads.
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    user = db.relationship(User, backref=db.backref('passport_snapshot', uselist=False, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return '<ReaderPassportSnapshot user=%s built=%s>' % (self.user_id, self.built_at)
@@ -50,6 +50,11 @@ class SchoolFile(db.Model):
     ## @brief Size in bytes. BigInteger because a school's audio library
     # summed over a term can exceed the 2 GB an Integer column tops out at.
     file_size = db.Column(db.BigInteger, nullable=False, default=0)
+    ## @brief Hex SHA-256 of the bytes, computed while the upload streamed to
+    # disk. NULL for files indexed from an existing tree. Lets an integrity
+    # check compare against the disk without trusting mtimes, and lets a school
+    # re-uploading the same asset be deduplicated (see storage.place_staged_upload).
+    content_sha256 = db.Column(db.String(64), nullable=True)
     uploaded_by = db.Column(db.Integer, db.ForeignKey(User.id), nullable=True)
     ## @brief Optional admin-supplied label, shown in the storage manager
     # instead of the raw filename when set.
@@ -63,9 +68,30 @@ class SchoolFile(db.Model):
     # referenced by an old row is kept inactive rather than removed, so the
     # storage manager can explain a broken image instead of showing nothing.
     active = db.Column(db.Boolean, nullable=False, default=True)
+    ## @brief Whether the bytes were absent the last time anything looked.
+    # Written by the integrity scan (scripts/verify_school_storage.py) and the
+    # reconciler, and read by the storage manager, so listing a page does not
+    # stat every file on what may be network-attached storage.
+    missing = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    ## @brief When `missing` was last established: at upload, or by the last
+    # scan that reached this row. NULL means never checked; the scan visits
+    # those first.
+    verified_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
+    __table_args__ = (
+        db.Index('ix_school_file_school_sha256', 'shcool_id', 'content_sha256'),
+        # The storage manager's listing: one owner's active files, newest
+        # first, paged by keyset on (created_at, id).
+        db.Index('ix_school_file_listing', 'shcool_id', 'active', 'created_at', 'id'),
+        # Prefix search in the same listing, one index per searched column.
+        db.Index('ix_school_file_school_filename', 'shcool_id', 'original_filename'),
+        db.Index('ix_school_file_school_title', 'shcool_id', 'title'),
+        # The integrity scan's "least recently verified first" walk.
+        db.Index('ix_school_file_verified_at', 'verified_at'),
+    )
+
     school = db.relationship(Shcool, backref='storage_files')
     uploader = db.relationship(User, backref='uploaded_storage_files')
 
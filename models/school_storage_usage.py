@@ -0,0 +1,46 @@
+## @file
+# @class SchoolStorageUsage
+from datetime import datetime
+
+from extensions import db
+from models.shcool import Shcool
+
+## @brief The pseudo-category of an owner's running total row.
+USAGE_TOTAL_CATEGORY = '*'
+
+
+##
+# @brief Running storage usage per owner folder and category.
+#
+# school_file is the source of truth; this is a counter kept beside it so the
+# quota check on every upload, the /storage/usage view and the super-admin
+# overview read a handful of rows instead of summing the whole index. Every
+# write to school_file that changes what counts (a new file, a deletion, a size
+# refresh, a reactivation) adjusts these counters in the same transaction, so
+# they commit or roll back together.
+#
+# Each owner has one row per category plus a '*' row holding the owner's
+# total. The total row is what the quota is enforced against: charging an
+# upload is a single conditional UPDATE on it, which makes "check the quota,
+# then reserve the space" atomic under concurrent uploads without an explicit
+# lock.
+#
+# Keyed by the owner folder name ('school_12', 'platform') rather than by
+# shcool_id, because the platform owner has no school id and a nullable column
+# cannot take part in a primary key. shcool_id is kept alongside for joins.
+#
+# Drift (a file deleted by hand, a row edited in SQL) is repaired with
+# `python scripts/index_school_storage.py --reconcile-usage`.
+class SchoolStorageUsage(db.Model):
+    __tablename__ = 'school_storage_usage'
+    owner = db.Column(db.String(40), primary_key=True)
+    category = db.Column(db.String(40), primary_key=True)
+    shcool_id = db.Column(db.Integer, db.ForeignKey(Shcool.id), nullable=True, index=True)
+    file_count = db.Column(db.BigInteger, nullable=False, default=0)
+    ## @brief BigInteger for the same reason as SchoolFile.file_size: a
+    # school's total passes the 2 GB an Integer can hold.
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return '<SchoolStorageUsage %s/%s %s bytes>' % (self.owner, self.category, self.bytes)
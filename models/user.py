@@ -37,6 +37,10 @@ class User(db.Model, UserMixin):
     suspended_at = db.Column(db.DateTime, nullable=True)
     suspended_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     suspended_reason = db.Column(db.String(500), nullable=True)
+    # Bumped whenever this account's or its school's suspension changes, so
+    # the per-request account check's remembered result stops matching (see
+    # apps/account_status.py).
+    account_version = db.Column(db.Integer, nullable=False, default=0)
     # Whether this reader has answered the "who is this account for?" prompt
     # shown after their first login. Existing rows are backfilled True by the
     # migration (nothing to ask them); only freshly self-registered readers
@@ -0,0 +1,40 @@
+## @file
+# @class UserDailyActivity
+from datetime import datetime
+
+from extensions import db
+from models.user import User
+
+
+##
+# @brief One reader's activity totals for one day.
+#
+# The daily word goal, the word-progress trend and the parent analytics chart
+# used to aggregate the evidence log, word_progress.mastered_at, game_result
+# and practice_play on every view. These counters are kept as the events
+# happen instead (apps/daily_activity.py), so those views read one row per
+# day:
+#
+# - `words_practiced`: correct clears (evidence rows) that day;
+# - `words_distinct`: distinct words with a correct clear that day -- the
+#   daily goal;
+# - `words_mastered`: words that reached Mastered that day;
+# - `games_played`, `score_sum`, `time_spent_seconds`: Daily Run results and
+#   practice plays dated that day (the average score is score_sum /
+#   games_played).
+#
+# Migration a9c3e7f1d5b2 built the rows from the existing history.
+class UserDailyActivity(db.Model):
+    __tablename__ = 'user_daily_activity'
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    words_practiced = db.Column(db.Integer, nullable=False, default=0)
+    words_distinct = db.Column(db.Integer, nullable=False, default=0)
+    words_mastered = db.Column(db.Integer, nullable=False, default=0)
+    games_played = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    time_spent_seconds = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return '<UserDailyActivity user=%s day=%s>' % (self.user_id, self.day)
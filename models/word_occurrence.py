@@ -2,11 +2,18 @@
 # @class WordOccurrence
 from datetime import datetime
 
+from sqlalchemy.orm import validates
+
 from extensions import db
 from models.chapter import Chapter
 from models.word_sense import WordSense
 
 
+def normalize_surface_form(surface_form):
+    """The form games' words are matched on: trimmed and lower-cased."""
+    return (surface_form or '').strip().lower()
+
+
 ##
 # @brief Many-to-many link recording that a word-sense occurs in a chapter,
 # keeping the printed surface form and the example line for that occurrence.
@@ -18,6 +25,10 @@ class WordOccurrence(db.Model):
     word_sense_id = db.Column(db.Integer, db.ForeignKey(WordSense.id), nullable=False, index=True)
     chapter_id = db.Column(db.Integer, db.ForeignKey(Chapter.id), nullable=False, index=True)
     surface_form = db.Column(db.String(100), nullable=False)
+    # normalize_surface_form(surface_form), kept in step by the validator
+    # below so word-attempt resolution can use an index instead of
+    # lower(surface_form).
+    surface_form_normalized = db.Column(db.String(100), nullable=True)
     example_line = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
 
@@ -26,7 +37,16 @@ class WordOccurrence(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('word_sense_id', 'chapter_id', name='uq_word_occurrence_sense_chapter'),
+        # chapter -> sense walk behind the school-scoped word-sense queue.
+        db.Index('ix_word_occurrence_chapter_sense', 'chapter_id', 'word_sense_id'),
+        # word -> sense lookup behind resolve_word_sense_for_book.
+        db.Index('ix_word_occurrence_surface_chapter', 'surface_form_normalized', 'chapter_id'),
     )
 
+    @validates('surface_form')
+    def _normalize_surface_form(self, key, value):
+        self.surface_form_normalized = normalize_surface_form(value)
+        return value
+
     def __repr__(self):
         return '<WordOccurrence sense=%s chapter=%s>' % (self.word_sense_id, self.chapter_id)
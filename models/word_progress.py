@@ -33,10 +33,16 @@ class WordProgress(db.Model):
     pip_think_word = db.Column(db.Boolean, nullable=False, default=False)
     pip_intellect_link = db.Column(db.Boolean, nullable=False, default=False)
 
-    # Cached from WordProgressEvidence — recomputed on every correct attempt.
+    # Running summary of WordProgressEvidence, advanced by each correct
+    # attempt without re-reading the log (progress_engine._record_evidence);
+    # scripts/check_word_progress_state.py replays the log to verify it.
     distinct_sources_count = db.Column(db.Integer, nullable=False, default=0)
     distinct_days_count = db.Column(db.Integer, nullable=False, default=0)
     has_unaided_clear = db.Column(db.Boolean, nullable=False, default=False)
+    # Bit per evidence source (progress_engine.SOURCE_BITS).
+    evidence_sources = db.Column(db.Integer, nullable=False, default=0)
+    evidence_count = db.Column(db.Integer, nullable=False, default=0)
+    last_evidence_on = db.Column(db.Date, nullable=True)
     consecutive_no_hint_clears = db.Column(db.Integer, nullable=False, default=0)
 
     first_encountered_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
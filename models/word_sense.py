@@ -48,6 +48,9 @@ class WordSense(db.Model):
     overridden_by = db.relationship('User', foreign_keys=[cefr_override_by])
     enrichment_updater = db.relationship('User', foreign_keys=[enrichment_updated_by])
 
+    # On MySQL, lemma also carries the ngram FULLTEXT index ft_word_sense_lemma
+    # (migration b6d2e8f4a1c3). It is left out of the model because it is
+    # MySQL-only DDL; apps/word_sense_search.py checks for it at runtime.
     __table_args__ = (
         db.UniqueConstraint('lemma', 'pos', 'sense_key', name='uq_word_sense_lemma_pos_sense'),
     )
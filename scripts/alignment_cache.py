@@ -0,0 +1,128 @@
+"""
+Inspect, prewarm and prune the audiobook transcript cache.
+
+Model alignment caches each Whisper transcript by audio hash and model settings
+(apps/audiobooks/alignment_cache.py), so the expensive step runs once per
+recording. Prewarming transcribes pages ahead of time -- after importing a
+batch of books, say -- so editors never wait on it:
+
+    python scripts/alignment_cache.py stats
+    python scripts/alignment_cache.py list --limit 20
+    python scripts/alignment_cache.py prewarm                  # every active page
+    python scripts/alignment_cache.py prewarm --book 42 --dry-run
+    python scripts/alignment_cache.py prune --max-mb 256
+    python scripts/alignment_cache.py clear
+
+prewarm uses the configured model and device, with the same defaults as the
+"generate alignment" button, and skips pages already cached.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from config import ConfigClass
+from models.audio_book import AudioBook, AudioBookPage
+from apps.audiobooks import alignment_cache
+from apps.audiobooks.alignment import AudioAlignmentError, get_model_settings, transcribe_page_audio
+
+
+def print_stats():
+    entries = alignment_cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print('Cache: %s' % alignment_cache.cache_dir())
+    print('  %d entr%s, %.1f MB of %d MB' % (
+        len(entries), 'y' if len(entries) == 1 else 'ies', total / 1024 / 1024,
+        ConfigClass.AUDIOBOOK_ALIGNMENT_CACHE_MB,
+    ))
+    if entries:
+        print('  least recently used: %s' % datetime.fromtimestamp(entries[0][2]).isoformat(timespec='seconds'))
+        print('  most recently used:  %s' % datetime.fromtimestamp(entries[-1][2]).isoformat(timespec='seconds'))
+
+
+def print_entries(limit):
+    for key, size, used in reversed(alignment_cache.entries()[-limit:] if limit else alignment_cache.entries()):
+        try:
+            details = alignment_cache.read_details(key)
+        except (OSError, ValueError):
+            details = {}
+        print('%s  %6.1f KB  used %s  model=%s/%s  language=%s  audio=%s' % (
+            key[:16], size / 1024, datetime.fromtimestamp(used).isoformat(timespec='seconds'),
+            details.get('model'), details.get('device'), details.get('language'),
+            (details.get('audioSha256') or '')[:16],
+        ))
+
+
+def prewarm(book_id, dry_run):
+    query = (
+        AudioBookPage.query
+        .join(AudioBook, AudioBook.id == AudioBookPage.audio_book_id)
+        .filter(AudioBook.active.is_(True), AudioBookPage.active.is_(True), AudioBookPage.audio_path.isnot(None))
+    )
+    if book_id:
+        query = query.filter(AudioBookPage.audio_book_id == book_id)
+    model_name, device = get_model_settings()
+
+    transcribed = cached = failed = 0
+    for page in query.order_by(AudioBookPage.audio_book_id, AudioBookPage.page_number).all():
+        if not os.path.isfile(page.audio_path):
+            continue
+        language = page.language or page.audio_book.language
+        key = alignment_cache.page_cache_key(page.audio_path, model_name, device, language=language)
+        if os.path.exists(alignment_cache.entry_path(key)):
+            cached += 1
+            continue
+        if dry_run:
+            print('  would transcribe book %s page %s' % (page.audio_book_id, page.page_number))
+            transcribed += 1
+            continue
+        try:
+            transcribe_page_audio(page.audio_path, language=language)
+        except AudioAlignmentError as error:
+            print('  book %s page %s: %s' % (page.audio_book_id, page.page_number, error))
+            failed += 1
+            continue
+        print('  book %s page %s transcribed' % (page.audio_book_id, page.page_number))
+        transcribed += 1
+
+    if dry_run:
+        print('DRY RUN — nothing transcribed. Would transcribe %d page(s); %d already cached.' % (transcribed, cached))
+    else:
+        print('Done. Transcribed %d page(s), %d already cached, %d failed.' % (transcribed, cached, failed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect, prewarm and prune the audiobook transcript cache.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='Entry count and size.')
+    list_parser = commands.add_parser('list', help='Entries, most recently used first.')
+    list_parser.add_argument('--limit', type=int, default=50, help='At most this many (0 for all).')
+    prewarm_parser = commands.add_parser('prewarm', help='Transcribe pages that are not cached yet.')
+    prewarm_parser.add_argument('--book', type=int, help='Only pages of this audiobook id.')
+    prewarm_parser.add_argument('--dry-run', action='store_true',
+                                help='List the pages that would be transcribed without running the model.')
+    prune_parser = commands.add_parser('prune', help='Evict least recently used entries down to a size.')
+    prune_parser.add_argument('--max-mb', type=int, help='Target size (default AUDIOBOOK_ALIGNMENT_CACHE_MB).')
+    commands.add_parser('clear', help='Delete every entry.')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        print_stats()
+    elif args.command == 'list':
+        print_entries(args.limit)
+    elif args.command == 'prune':
+        limit = args.max_mb * 1024 * 1024 if args.max_mb is not None else None
+        print('Evicted %d entr(ies).' % alignment_cache.evict(limit))
+    elif args.command == 'clear':
+        alignment_cache.clear()
+        print('Cleared %s' % alignment_cache.cache_dir())
+    else:
+        with app.app_context():
+            prewarm(args.book, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
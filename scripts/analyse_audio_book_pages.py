@@ -0,0 +1,82 @@
+"""
+Measure the exact duration of audiobook page audio uploaded before waveform
+analysis existed, and write its waveform peaks.
+
+Uploads are analysed as they arrive (apps/audiobooks/waveform.py); older pages
+keep the duration their client reported, and get peaks only when the editor
+first asks. Run this once after deploying:
+
+    python scripts/analyse_audio_book_pages.py                # all books
+    python scripts/analyse_audio_book_pages.py --book 42
+    python scripts/analyse_audio_book_pages.py --dry-run
+
+A measured duration shorter than the page's existing word timings is reported
+and not written, so an approved alignment never becomes invalid. Each page is
+committed on its own. Needs FFmpeg (see AUDIOBOOK_FFMPEG_DIR).
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from models.audio_book import AudioBookPage
+from models.school_file import SchoolFile
+from apps.audiobooks.waveform import index_peaks, peaks_path, write_peaks
+from apps.storage import is_inside_storage, relative_path_from_absolute
+
+
+def alignment_end_ms(page):
+    alignment = page.alignment_json if isinstance(page.alignment_json, dict) else {}
+    return max([word.get('endMs') or 0 for word in alignment.get('words') or []] or [0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure audiobook page audio and write waveform peaks.')
+    parser.add_argument('--book', type=int, help='Only pages of this audiobook id.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List the pages that would be analysed without decoding anything.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        query = AudioBookPage.query.filter(AudioBookPage.active.is_(True), AudioBookPage.audio_path.isnot(None))
+        if args.book:
+            query = query.filter(AudioBookPage.audio_book_id == args.book)
+
+        analysed = skipped = 0
+        for page in query.order_by(AudioBookPage.audio_book_id, AudioBookPage.page_number).all():
+            if not os.path.isfile(page.audio_path):
+                print('  book %s page %s: audio file missing' % (page.audio_book_id, page.page_number))
+                skipped += 1
+                continue
+            if os.path.isfile(peaks_path(page.audio_path)):
+                continue
+            if args.dry_run:
+                print('  would analyse book %s page %s' % (page.audio_book_id, page.page_number))
+                analysed += 1
+                continue
+
+            duration_ms = write_peaks(page.audio_path)['durationMs']
+            if duration_ms >= alignment_end_ms(page):
+                page.audio_duration_ms = duration_ms
+            else:
+                print('  book %s page %s: measured %s ms is shorter than its word timings; duration kept'
+                      % (page.audio_book_id, page.page_number, duration_ms))
+            if is_inside_storage(page.audio_path):
+                audio_record = SchoolFile.query.filter_by(
+                    relative_path=relative_path_from_absolute(page.audio_path)
+                ).first()
+                index_peaks(audio_record, page.audio_path)
+            db.session.commit()
+            analysed += 1
+
+        if args.dry_run:
+            print('DRY RUN — nothing written. Would analyse %d page(s).' % analysed)
+        else:
+            print('Done. Analysed %d page(s), %d skipped.' % (analysed, skipped))
+
+
+if __name__ == '__main__':
+    main()
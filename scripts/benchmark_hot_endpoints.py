@@ -0,0 +1,421 @@
+"""
+Benchmark the hot reader, teacher and super-admin endpoints against a seeded
+synthetic platform, and write the results as JSON that can be diffed across
+commits.
+
+The platform is generated from --seed, so two runs with the same options
+build the same schools, readers, packs, books, vocabulary and years of
+Game_result / WordProgress / evidence history:
+
+    python scripts/benchmark_hot_endpoints.py --output bench-before.json
+    git checkout my-branch
+    python scripts/benchmark_hot_endpoints.py --output bench-after.json
+    diff bench-before.json bench-after.json
+
+    python scripts/benchmark_hot_endpoints.py --readers-per-school 200 --days 1095
+    python scripts/benchmark_hot_endpoints.py --reuse --only passport,word_attempt
+
+Each endpoint is called --warmup times unmeasured, then --requests times
+through the Flask test client as the right kind of user, recording latency
+(p50 / p95 / max) and statements per call (apps/query_stats.py). Latency is
+in-process: no network, no WSGI server, so compare runs from the same machine.
+Any non-2xx response stops the run with a non-zero exit and the response
+body, rather than timing an error page.
+
+The database is --database-url (default: a SQLite file in the temp
+directory). It is dropped and re-seeded unless --reuse is given, and the
+configured production database is refused. /reader/word-attempt writes, so
+only a freshly seeded run starts from exactly the same data.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+
+from config import ConfigClass
+
+## @brief Every seeded account's password; nobody signs in (calls set the
+# session directly), so it is hashed once at the lowest cost.
+BENCHMARK_PASSWORD = b'benchmark'
+INSERT_BATCH = 5000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark hot endpoints on a synthetic platform.')
+    parser.add_argument('--database-url',
+                        default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'iread-benchmark.db'),
+                        help='Database to seed and benchmark (never the configured one).')
+    parser.add_argument('--reuse', action='store_true', help='Benchmark the existing data instead of re-seeding.')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the data and the calls (default 1).')
+    parser.add_argument('--schools', type=int, default=5)
+    parser.add_argument('--readers-per-school', type=int, default=40)
+    parser.add_argument('--teachers-per-school', type=int, default=2)
+    parser.add_argument('--packs-per-school', type=int, default=4)
+    parser.add_argument('--books', type=int, default=30)
+    parser.add_argument('--books-per-pack', type=int, default=5)
+    parser.add_argument('--vocabulary', type=int, default=3000, help='Distinct word senses across all books.')
+    parser.add_argument('--words-per-book', type=int, default=200)
+    parser.add_argument('--days', type=int, default=730, help='Days of play history (default two years).')
+    parser.add_argument('--play-rate', type=float, default=0.3,
+                        help='Chance a reader plays a Daily Run game on a given day.')
+    parser.add_argument('--words-per-reader', type=int, default=150,
+                        help='Word-progress rows per reader; each gets 1-4 evidence rows.')
+    parser.add_argument('--requests', type=int, default=50, help='Measured calls per endpoint.')
+    parser.add_argument('--warmup', type=int, default=3, help='Unmeasured calls per endpoint first.')
+    parser.add_argument('--only', help='Comma-separated endpoint names to run (default all).')
+    parser.add_argument('--output', help='Write the JSON here instead of stdout.')
+    return parser.parse_args()
+
+
+def insert_rows(db, table, rows):
+    for start in range(0, len(rows), INSERT_BATCH):
+        db.session.execute(table.insert(), rows[start:start + INSERT_BATCH])
+
+
+def seed_platform(db, args, rng):
+    """Drop every table, recreate the schema and fill it; returns row counts."""
+    from apps.progress_engine import check_word_progress_state
+    from models.book import Book
+    from models.book_pack import Book_pack
+    from models.chapter import Chapter
+    from models.game_result import GameEnum, Game_result
+    from models.pack import Pack
+    from models.shcool import Shcool
+    from models.user import Reader, SuperAdmin, Teacher, User
+    from models.user_shcool import User_shcool
+    from models.word_occurrence import WordOccurrence, normalize_surface_form
+    from models.word_progress import GAME_KEYS, WordProgress, WordProgressEvidence
+    from models.word_sense import WordSense
+
+    db.drop_all()
+    db.create_all()
+    today = date.today()
+    now = datetime.now()
+    counts = {}
+    password_hash = bcrypt.hashpw(BENCHMARK_PASSWORD, bcrypt.gensalt(rounds=4)).decode('utf-8')
+
+    def user_row(user_id, kind, name):
+        return {'id': user_id, 'username': name, 'email': '%s@bench.test' % name,
+                'password_hashed': password_hash, 'type': kind, 'confirmed': True, 'approved': True,
+                'is_primary': True, 'is_active': True}
+
+    users = [user_row(1, 'super_admin', 'super')]
+    super_admins = [{'id': 1}]
+    teachers, readers, memberships, schools = [], [], [], []
+    school_readers = {}
+    next_user_id = 2
+    for school_id in range(1, args.schools + 1):
+        schools.append({'id': school_id, 'name': 'Bench school %d' % school_id, 'is_active': True})
+        for number in range(args.teachers_per_school):
+            users.append(user_row(next_user_id, 'teacher', 's%d-teacher%d' % (school_id, number)))
+            teachers.append({'id': next_user_id, 'description': 'Benchmark teacher', 'study_level': 'any'})
+            memberships.append({'user_id': next_user_id, 'shcool_id': school_id, 'is_default': True})
+            next_user_id += 1
+        school_readers[school_id] = []
+        for number in range(args.readers_per_school):
+            users.append(user_row(next_user_id, 'reader', 's%d-reader%d' % (school_id, number)))
+            readers.append({'id': next_user_id, 'level': 'A1'})
+            memberships.append({'user_id': next_user_id, 'shcool_id': school_id, 'is_default': True})
+            school_readers[school_id].append(next_user_id)
+            next_user_id += 1
+    insert_rows(db, Shcool.__table__, schools)
+    insert_rows(db, User.__table__, users)
+    insert_rows(db, SuperAdmin.__table__, super_admins)
+    insert_rows(db, Teacher.__table__, teachers)
+    insert_rows(db, Reader.__table__, readers)
+    insert_rows(db, User_shcool.__table__, memberships)
+    counts.update(shcool=len(schools), user=len(users), user_shcool=len(memberships))
+
+    senses = [{'id': sense_id, 'lemma': 'word%d' % sense_id, 'pos': 'NOUN', 'sense_key': '',
+               'cefr_level': rng.choice(('A1', 'A2', 'B1', 'B2', 'C1'))}
+              for sense_id in range(1, args.vocabulary + 1)]
+    insert_rows(db, WordSense.__table__, senses)
+    books, chapters, occurrences = [], [], []
+    book_words = {}
+    for book_id in range(1, args.books + 1):
+        books.append({'id': book_id, 'title': 'Bench book %d' % book_id, 'author': 'Bench',
+                      'is_platform_book': True, 'active': True, 'archived': False})
+        chapters.append({'id': book_id, 'book_id': book_id, 'chapter_index': 0})
+        words = rng.sample(range(1, args.vocabulary + 1), min(args.words_per_book, args.vocabulary))
+        book_words[book_id] = words
+        for sense_id in words:
+            surface = 'word%d' % sense_id
+            occurrences.append({'word_sense_id': sense_id, 'chapter_id': book_id, 'surface_form': surface,
+                                'surface_form_normalized': normalize_surface_form(surface)})
+    insert_rows(db, Book.__table__, books)
+    insert_rows(db, Chapter.__table__, chapters)
+    insert_rows(db, WordOccurrence.__table__, occurrences)
+    counts.update(book=len(books), word_sense=len(senses), word_occurrence=len(occurrences))
+
+    packs, pack_books = [], []
+    school_books = {}
+    for school_id in range(1, args.schools + 1):
+        school_books[school_id] = set()
+        for number in range(args.packs_per_school):
+            pack_id = len(packs) + 1
+            packs.append({'id': pack_id, 'title': 'S%d pack %d' % (school_id, number), 'shcool_id': school_id,
+                          'public': True, 'active': True, 'is_global_pack': False, 'currency': 'EUR'})
+            for book_id in rng.sample(range(1, args.books + 1), min(args.books_per_pack, args.books)):
+                pack_books.append({'pack_id': pack_id, 'book_id': book_id})
+                school_books[school_id].add(book_id)
+    insert_rows(db, Pack.__table__, packs)
+    insert_rows(db, Book_pack.__table__, pack_books)
+    counts.update(pack=len(packs), book_pack=len(pack_books))
+
+    games = list(GameEnum)
+    results = []
+    for school_id, reader_ids in school_readers.items():
+        shelf = sorted(school_books[school_id])
+        for user_id in reader_ids:
+            for offset in range(args.days):
+                if rng.random() >= args.play_rate:
+                    continue
+                results.append({'user_id': user_id, 'book_id': rng.choice(shelf), 'game': rng.choice(games),
+                                'day': today - timedelta(days=offset), 'score': rng.randint(0, 100),
+                                'completed': rng.random() < 0.8, 'words_learned': [],
+                                'time_spent_seconds': rng.randint(30, 600)})
+    insert_rows(db, Game_result.__table__, results)
+    counts['game_result'] = len(results)
+
+    progress_rows, evidence_rows = [], []
+    for school_id, reader_ids in school_readers.items():
+        vocabulary = sorted({sense_id for book_id in school_books[school_id] for sense_id in book_words[book_id]})
+        for user_id in reader_ids:
+            for sense_id in rng.sample(vocabulary, min(args.words_per_reader, len(vocabulary))):
+                progress_id = len(progress_rows) + 1
+                evidence = [SimpleNamespace(
+                    word_progress_id=progress_id, source=rng.choice(GAME_KEYS),
+                    mode=rng.choice(('daily', 'practice')),
+                    occurred_on=today - timedelta(days=rng.randrange(args.days)),
+                    hints_used=rng.choice((0, 0, 1, 2)), heaviest_hint_tier=None,
+                ) for _ in range(rng.randint(1, 4))]
+                progress = SimpleNamespace(
+                    stage='encountered', evidence_sources=0, distinct_sources_count=0, distinct_days_count=0,
+                    evidence_count=0, last_evidence_on=None, has_unaided_clear=False,
+                    first_guessed_at=None, first_known_at=None, mastered_at=None,
+                )
+                check_word_progress_state(progress, evidence, fix=True)
+                row = dict(vars(progress), id=progress_id, user_id=user_id, word_sense_id=sense_id,
+                           first_encountered_at=now)
+                for key in GAME_KEYS:
+                    row['pip_' + key.replace('-', '_')] = any(item.source == key for item in evidence)
+                progress_rows.append(row)
+                evidence_rows.extend(vars(item) for item in evidence)
+    insert_rows(db, WordProgress.__table__, progress_rows)
+    insert_rows(db, WordProgressEvidence.__table__, evidence_rows)
+    counts.update(word_progress=len(progress_rows), word_progress_evidence=len(evidence_rows))
+
+    db.session.commit()
+    return counts
+
+
+def load_platform(db):
+    """What the endpoint calls pick from, read back from the database."""
+    from models.book_pack import Book_pack
+    from models.game_result import Game_result
+    from models.pack import Pack
+    from models.user import User
+    from models.user_shcool import User_shcool
+    from models.word_occurrence import WordOccurrence
+    from models.chapter import Chapter
+
+    members = db.session.query(User.id, User.type, User_shcool.shcool_id).join(
+        User_shcool, User_shcool.user_id == User.id).all()
+    school_books = {}
+    for school_id, book_id in db.session.query(Pack.shcool_id, Book_pack.book_id).join(
+            Book_pack, Book_pack.pack_id == Pack.id):
+        school_books.setdefault(school_id, set()).add(book_id)
+    words = {}
+    for book_id, surface in db.session.query(Chapter.book_id, WordOccurrence.surface_form).join(
+            WordOccurrence, WordOccurrence.chapter_id == Chapter.id):
+        words.setdefault(book_id, []).append(surface)
+    platform = SimpleNamespace(
+        super_admin_id=db.session.query(User.id).filter(User.type == 'super_admin').scalar(),
+        readers=[(user_id, school_id) for user_id, kind, school_id in members if kind == 'reader'],
+        teachers=[user_id for user_id, kind, _ in members if kind == 'teacher'],
+        school_books={school_id: sorted(book_ids) for school_id, book_ids in school_books.items()},
+        words={book_id: sorted(surfaces) for book_id, surfaces in words.items()},
+        last_day=db.session.query(db.func.max(Game_result.day)).scalar() or date.today(),
+    )
+    db.session.remove()
+    return platform
+
+
+## @brief name -> function(platform, rng) returning (user_id, method, path,
+# json body or None) for one call.
+def endpoint_calls():
+    from models.word_progress import GAME_KEYS
+
+    def reader_and_book(platform, rng):
+        user_id, school_id = rng.choice(platform.readers)
+        return user_id, rng.choice(platform.school_books[school_id])
+
+    def word_attempt(platform, rng):
+        user_id, book_id = reader_and_book(platform, rng)
+        return user_id, 'POST', '/reader/word-attempt', {
+            'book_id': book_id, 'word': rng.choice(platform.words[book_id]), 'game': rng.choice(GAME_KEYS),
+            'mode': 'practice', 'correct': rng.random() < 0.7, 'hints_used': rng.choice((0, 0, 1)),
+        }
+
+    def passport(platform, rng):
+        return rng.choice(platform.readers)[0], 'GET', '/reader/passport', None
+
+    def game_leaderboard(platform, rng):
+        user_id, book_id = reader_and_book(platform, rng)
+        day = platform.last_day - timedelta(days=rng.randrange(30))
+        return user_id, 'GET', '/reader/game-leaderboard?game=%s&book_id=%d&day=%s' % (
+            rng.choice(GAME_KEYS), book_id, day.isoformat()), None
+
+    def packs_by_school(platform, rng):
+        user_id, school_id = rng.choice(platform.readers)
+        return user_id, 'GET', '/reader/get_packs_by_school?school=%d&all=1' % school_id, None
+
+    def super_analytics(platform, rng):
+        return platform.super_admin_id, 'GET', '/admin/super/analytics?range=%s' % rng.choice(
+            ('30d', '3m', '12m')), None
+
+    def teacher_reader_progress(platform, rng):
+        return rng.choice(platform.teachers), 'GET', '/teacher/reader-progress?page=1&per_page=20', None
+
+    return {
+        'word_attempt': word_attempt,
+        'passport': passport,
+        'game_leaderboard': game_leaderboard,
+        'packs_by_school': packs_by_school,
+        'super_analytics': super_analytics,
+        'teacher_reader_progress': teacher_reader_progress,
+    }
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+## @brief Call one endpoint --warmup + --requests times and summarise it.
+#
+# Runs outside any app context on purpose: each test-client request then
+# pushes, and tears down, its own, so Flask-Login's per-context user cache
+# and the request's session cannot leak from one call into the next.
+#
+# Exits on the first non-2xx response -- the latency of an error page is
+# not a result worth reporting.
+def run_endpoint(app, name, make_call, platform, rng, args):
+    from apps.query_stats import record_queries
+
+    client = app.test_client()
+    signed_in = None
+    latencies, query_counts, statuses = [], [], {}
+    for number in range(args.warmup + args.requests):
+        user_id, method, path, body = make_call(platform, rng)
+        if user_id != signed_in:
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+            signed_in = user_id
+        with record_queries() as recorder:
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            elapsed = time.perf_counter() - started
+        if not 200 <= response.status_code < 300:
+            sys.exit('%s: %s %s as user %s returned %d: %s' % (
+                name, method, path, user_id, response.status_code, response.get_data(as_text=True)[:500]))
+        if number < args.warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        query_counts.append(recorder.count)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    return {
+        'requests': len(latencies),
+        'status': statuses,
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'max_ms': round(max(latencies), 2),
+        'queries_p50': percentile(query_counts, 0.5),
+        'queries_max': max(query_counts),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    if args.database_url == ConfigClass.SQLALCHEMY_DATABASE_URI:
+        sys.exit('Refusing to seed the configured database; pass a throwaway --database-url.')
+    if args.requests < 1:
+        sys.exit('--requests must be at least 1.')
+
+    # The app builds its engine from ConfigClass when it is imported, so the
+    # benchmark database has to be set first. Sampled request logging is
+    # switched off; the calls are measured directly.
+    ConfigClass.SQLALCHEMY_DATABASE_URI = args.database_url
+    ConfigClass.SQL_STATS_SAMPLE_RATE = 0.0
+    from app import app
+    from extensions import db
+
+    # The session cookie is scoped to .iread.education; the test client
+    # talks to localhost.
+    app.config['SESSION_COOKIE_DOMAIN'] = None
+    calls = endpoint_calls()
+    names = args.only.split(',') if args.only else list(calls)
+    unknown = sorted(set(names) - set(calls))
+    if unknown:
+        sys.exit('Unknown endpoint(s): %s (known: %s)' % (', '.join(unknown), ', '.join(calls)))
+
+    rng = random.Random(args.seed)
+    # Only seeding and loading run in an app context of their own; the calls
+    # below must not (see run_endpoint).
+    with app.app_context():
+        seeded = None
+        if not args.reuse:
+            started = time.perf_counter()
+            seeded = seed_platform(db, args, rng)
+            print('Seeded in %.1f s: %s' % (time.perf_counter() - started, seeded), file=sys.stderr)
+        platform = load_platform(db)
+        database = db.engine.dialect.name
+    if not platform.readers or not platform.teachers:
+        sys.exit('No seeded readers/teachers found; run without --reuse first.')
+
+    results = {}
+    for name in names:
+        results[name] = run_endpoint(app, name, calls[name], platform, random.Random('%d:%s' % (args.seed, name)),
+                                     args)
+        print('%-24s p50 %8.2f ms  p95 %8.2f ms  queries %d' % (
+            name, results[name]['p50_ms'], results[name]['p95_ms'], results[name]['queries_p50']),
+            file=sys.stderr)
+
+    report = {
+        'commit': current_commit(),
+        'database': database,
+        'options': {key: value for key, value in vars(args).items() if key not in ('output', 'database_url')},
+        'seeded': seeded,
+        'endpoints': results,
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Write reader bundles for published audiobooks that do not have one yet.
+
+Publishing writes a book's bundle (apps/audiobooks/bundles.py); books published
+before bundles existed keep being served page by page from the database until
+they get one. Run this once after deploying, or with --all to republish every
+bundle after a bundle format change:
+
+    python scripts/build_audio_book_bundles.py                # missing only
+    python scripts/build_audio_book_bundles.py --book 42
+    python scripts/build_audio_book_bundles.py --all
+    python scripts/build_audio_book_bundles.py --dry-run
+
+Each book is committed on its own. A new bundle is a new version; the previous
+one is left on disk for readers that still hold its URL.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from models.audio_book import AudioBook
+from apps.audiobooks.bundles import remove_bundle_files, write_bundle
+from apps.audiobooks.routes import approved_pages_query
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write reader bundles for published audiobooks.')
+    parser.add_argument('--book', type=int, help='Only this audiobook id.')
+    parser.add_argument('--all', action='store_true',
+                        help='Write a new version even for books that already have a bundle.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List the books that would get a bundle without writing anything.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        query = AudioBook.query.filter_by(active=True, status='published')
+        if args.book:
+            query = query.filter(AudioBook.id == args.book)
+        if not args.all:
+            query = query.filter(AudioBook.bundle_path.is_(None))
+
+        written = 0
+        for book in query.order_by(AudioBook.id).all():
+            if args.dry_run:
+                print('  would bundle audiobook %s (%s)' % (book.id, book.title))
+                written += 1
+                continue
+            path = write_bundle(book, approved_pages_query(book).all())
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                remove_bundle_files(path)
+                raise
+            print('  audiobook %s -> v%s' % (book.id, book.bundle_version))
+            written += 1
+
+        if args.dry_run:
+            print('DRY RUN — nothing written. Would bundle %d audiobook(s).' % written)
+        else:
+            print('Done. Wrote %d bundle(s).' % written)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Verify the evidence summary kept on each WordProgress row against its
+evidence log.
+
+Correct attempts advance WordProgress's summary (sources, days, evidence
+count, unaided clear) in place instead of re-reading the log
+(apps/progress_engine.py _record_evidence). This replays the log for every
+row and reports any whose summary or stage disagrees:
+
+    python scripts/check_word_progress_state.py               # report only
+    python scripts/check_word_progress_state.py --user 1152
+    python scripts/check_word_progress_state.py --fix         # write the replay
+
+Rows are read in batches of --batch-size, so a large table is checked in
+constant memory; with --fix each batch is committed on its own.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from models.word_progress import WordProgress, WordProgressEvidence
+from apps.pagination import iter_keyset_batches
+from apps.progress_engine import check_word_progress_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay word-progress evidence and compare the stored summaries.')
+    parser.add_argument('--user', type=int, help='Only check this user id.')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Progress rows read per batch (default 1000).')
+    parser.add_argument('--fix', action='store_true',
+                        help='Overwrite mismatched rows with the replayed values.')
+    parser.add_argument('--verbose', action='store_true', help='Print every mismatch.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        query = WordProgress.query
+        if args.user:
+            query = query.filter(WordProgress.user_id == args.user)
+
+        checked = mismatched = 0
+        for batch in iter_keyset_batches(query, [WordProgress.id], args.batch_size):
+            evidence_by_progress = {progress.id: [] for progress in batch}
+            evidence_rows = WordProgressEvidence.query.filter(
+                WordProgressEvidence.word_progress_id.in_(list(evidence_by_progress))
+            )
+            for row in evidence_rows:
+                evidence_by_progress[row.word_progress_id].append(row)
+
+            for progress in batch:
+                checked += 1
+                mismatches = check_word_progress_state(progress, evidence_by_progress[progress.id], fix=args.fix)
+                if not mismatches:
+                    continue
+                mismatched += 1
+                if args.verbose:
+                    print('  progress %s (user %s, sense %s): %s' % (
+                        progress.id, progress.user_id, progress.word_sense_id,
+                        ', '.join('%s stored %r, replayed %r' % (column, stored, replayed)
+                                  for column, (stored, replayed) in sorted(mismatches.items())),
+                    ))
+            if args.fix:
+                db.session.commit()
+            db.session.close()
+
+        if args.fix:
+            print('Done. Checked %d row(s), fixed %d.' % (checked, mismatched))
+        else:
+            print('Checked %d row(s), %d disagree with their evidence log.' % (checked, mismatched))
+            if mismatched:
+                print('Rerun with --fix to write the replayed values.')
+    return 1 if mismatched and not args.fix else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
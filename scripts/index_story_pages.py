@@ -0,0 +1,74 @@
+"""
+Index story PDFs uploaded before page indexing existed, and render their
+thumbnails.
+
+Uploads are indexed in the background (apps/story_pages.py); older stories are
+otherwise indexed on the first page request, without thumbnails. Run this once
+after deploying, or with --retry to try again the PDFs that failed to parse:
+
+    python scripts/index_story_pages.py                # never indexed only
+    python scripts/index_story_pages.py --story 42
+    python scripts/index_story_pages.py --retry
+    python scripts/index_story_pages.py --dry-run
+
+Each story is committed on its own. Needs pypdf; thumbnails also need pdftoppm.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from models.book_story import BookStory
+from apps.story_pages import available, index_story, renderer_path, resolve_page_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index story PDFs and render their thumbnails.')
+    parser.add_argument('--story', type=int, help='Only this story id.')
+    parser.add_argument('--retry', action='store_true',
+                        help='Also retry stories whose PDF could not be parsed before.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List the stories that would be indexed without writing anything.')
+    args = parser.parse_args()
+
+    if not available():
+        print('pypdf is not installed; nothing can be indexed.')
+        return 1
+
+    with app.app_context():
+        query = BookStory.query.filter_by(active=True).filter(BookStory.page_index.is_(None))
+        if args.story:
+            query = query.filter(BookStory.id == args.story)
+        if not args.retry:
+            query = query.filter(BookStory.pages_indexed_at.is_(None))
+        render = renderer_path() is not None
+
+        indexed = 0
+        for story in query.order_by(BookStory.id).all():
+            if args.dry_run:
+                print('  would index story %s (%s)' % (story.id, story.title))
+                indexed += 1
+                continue
+            if not index_story(story):
+                db.session.commit()
+                print('  story %s: PDF missing or could not be parsed' % story.id)
+                continue
+            db.session.commit()
+            if render:
+                for page_number in range(1, story.page_count + 1):
+                    resolve_page_file(story, page_number, 'thumbnail')
+            print('  story %s -> %s page(s)' % (story.id, story.page_count))
+            indexed += 1
+
+        if args.dry_run:
+            print('DRY RUN — nothing written. Would index %d story PDF(s).' % indexed)
+        else:
+            print('Done. Indexed %d story PDF(s)%s.' % (indexed, '' if render else ' (no pdftoppm: no thumbnails)'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
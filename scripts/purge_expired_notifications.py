@@ -0,0 +1,47 @@
+"""
+Delete reader notifications whose expires_at has passed.
+
+/reader/notifications no longer filters expired notifications out on every
+request; this removes them instead. Run it from cron / Task Scheduler, e.g.
+hourly:
+
+    python scripts/purge_expired_notifications.py
+    python scripts/purge_expired_notifications.py --batch-size 500
+    python scripts/purge_expired_notifications.py --dry-run     # count only
+
+Each batch is committed on its own, so an interrupted run loses nothing and a
+rerun picks up whatever is left.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models.reader_notification import ReaderNotification
+from apps.notifications import purge_expired_notifications
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete expired reader notifications.')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Delete and commit this many notifications at a time (default 1000).')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report how many notifications have expired without deleting them.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.dry_run:
+            expired = ReaderNotification.query.filter(ReaderNotification.expires_at < datetime.utcnow()).count()
+            print('DRY RUN — %s expired notification(s) would be deleted.' % expired)
+            return 0
+
+        deleted = purge_expired_notifications(batch_size=max(args.batch_size, 1))
+        print('Deleted %s expired notification(s).' % deleted)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
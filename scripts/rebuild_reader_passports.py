@@ -0,0 +1,79 @@
+"""
+Rebuild Global Reading Passport snapshots (reader_passport_snapshot).
+
+/reader/passport serves a per-reader snapshot that gameplay, story progress and
+certificate issuance keep current as they happen. The parts no reader event
+moves (the achievement total, which grows with the catalogue) and anything an
+update missed are refreshed here. Run it from cron / Task Scheduler, e.g.
+nightly, and no snapshot is ever older than --max-age-hours:
+
+    python scripts/rebuild_reader_passports.py                    # stale ones
+    python scripts/rebuild_reader_passports.py --max-age-hours 6
+    python scripts/rebuild_reader_passports.py --user 1152        # one reader
+    python scripts/rebuild_reader_passports.py --all              # every reader,
+                                                                  # snapshot or not
+    python scripts/rebuild_reader_passports.py --dry-run
+
+A rebuild also reconciles certificates, like backfill_certificates.py. Each
+reader is committed on its own, so an interrupted run loses nothing and a rerun
+continues with whatever is still stale.
+"""
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from models.user import Reader
+from apps.reader_passport import (
+    PASSPORT_MAX_AGE,
+    rebuild_passport_snapshot,
+    stale_snapshot_user_ids,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild reader passport snapshots.')
+    parser.add_argument('--user', type=int, help='Only rebuild this reader id.')
+    parser.add_argument('--all', action='store_true',
+                        help='Rebuild every reader, including those with no snapshot yet.')
+    parser.add_argument('--max-age-hours', type=float,
+                        default=PASSPORT_MAX_AGE.total_seconds() / 3600,
+                        help='Rebuild snapshots last rebuilt longer ago than this (default 24).')
+    parser.add_argument('--limit', type=int, help='Rebuild at most this many readers.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Rebuild, report, then roll back without persisting.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.user:
+            reader_ids = [args.user]
+        elif args.all:
+            reader_ids = [reader_id for (reader_id,) in db.session.query(Reader.id).order_by(Reader.id)]
+            if args.limit:
+                reader_ids = reader_ids[:args.limit]
+        else:
+            reader_ids = stale_snapshot_user_ids(
+                max_age=timedelta(hours=args.max_age_hours), limit=args.limit
+            )
+
+        rebuilt = 0
+        for user_id in reader_ids:
+            rebuild_passport_snapshot(user_id)
+            if args.dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+            rebuilt += 1
+
+        if args.dry_run:
+            print('DRY RUN — rolled back. Would rebuild %d passport snapshot(s).' % rebuilt)
+        else:
+            print('Done. Rebuilt %d passport snapshot(s).' % rebuilt)
+
+
+if __name__ == '__main__':
+    main()
@@ -107,6 +107,19 @@ MARKERS = {
     'd1b4f7c3a982': ('column', 'shcool', 'trial_seats'),
     'e2c8b4d1f036': ('table', 'school_file'),
     'a1c4e7b930d2': ('table', 'global_game_calendar_entry'),
+    'b6d2e8f4a1c3': ('index', 'word_occurrence', 'ix_word_occurrence_chapter_sense'),
+    'c4e9a2d7f3b8': ('column', 'school_file', 'content_sha256'),
+    'd7a3f1c8e5b2': ('table', 'school_storage_usage'),
+    'e8b4c2f9a6d1': ('column', 'school_file', 'verified_at'),
+    'f1a7d3c9b5e2': ('table', 'reader_passport_snapshot'),
+    'a3c9e1f7b4d6': ('column', 'audio_book', 'bundle_path'),
+    'b7d2e9f4c1a8': ('column', 'book_story', 'page_index'),
+    'c4e8a2f6d9b1': ('column', 'word_occurrence', 'surface_form_normalized'),
+    'd8f3b6a2c5e9': ('column', 'word_progress', 'evidence_sources'),
+    'e3a7c5f1b9d2': ('column', 'user', 'account_version'),
+    'f2b6d8a4c1e7': ('index', 'practice_play', 'ix_practice_play_user_day'),
+    'a9c3e7f1d5b2': ('table', 'user_daily_activity'),
+    'c7e1a9d3f5b8': ('index', 'reader_notification', 'ix_reader_notification_user_created'),
 }
 
 EXIT_OK = 0
@@ -0,0 +1,64 @@
+"""
+Re-check that the files in the school_file index still exist on disk.
+
+The storage manager flags a file whose bytes have vanished (deleted by hand on
+the server, lost in a restore) from SchoolFile.missing rather than checking the
+disk on every page load. This keeps that flag current. Intended to run from
+cron / Task Scheduler, e.g. hourly:
+
+    python scripts/verify_school_storage.py
+
+Each run checks at most --limit rows, least recently verified first, so a large
+index is swept over several runs without any one of them running long. Rows
+verified within --max-age-hours are skipped.
+
+    python scripts/verify_school_storage.py --school 12 --dry-run
+    python scripts/verify_school_storage.py --limit 50000 --workers 16
+
+Missing files are only reported here. Release their quota with
+`python scripts/index_school_storage.py --prune`.
+"""
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from apps.storage_index import VERIFY_MAX_AGE, verify_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify indexed storage files exist on disk.')
+    parser.add_argument('--limit', type=int, default=5000,
+                        help='Check at most this many rows (default 5000).')
+    parser.add_argument('--max-age-hours', type=float,
+                        default=VERIFY_MAX_AGE.total_seconds() / 3600,
+                        help='Skip rows verified more recently than this (default 24).')
+    parser.add_argument('--school', type=int,
+                        help='Only check this school id.')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Threads checking files (default 8).')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would change without writing anything.')
+    args = parser.parse_args()
+
+    with app.app_context():
+        counts = verify_files(
+            limit=args.limit,
+            max_age=timedelta(hours=args.max_age_hours),
+            only_school=args.school,
+            workers=args.workers,
+            dry_run=args.dry_run,
+        )
+    if args.dry_run:
+        print('DRY RUN -- nothing was written.')
+    print('rows checked     : %s' % counts['checked'])
+    print('newly missing    : %s' % counts['missing'])
+    print('back on disk     : %s' % counts['recovered'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
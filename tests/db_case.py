@@ -0,0 +1,28 @@
+import unittest
+
+from flask import Flask
+
+from extensions import db
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """A bare Flask app bound to an in-memory SQLite database, with its app
+    context pushed for the whole test.
+
+    `tables` limits the schema to those tables (create_all/drop_all); None
+    creates every table the imported models define. Subclasses seed their
+    rows after calling super().setUp()."""
+    tables = None
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.metadata.create_all(db.engine, tables=self.tables)
+
+    def tearDown(self):
+        db.session.remove()
+        db.metadata.drop_all(db.engine, tables=self.tables)
+        self.context.pop()
@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+from apps import account_status
+from config import ConfigClass
+from extensions import db
+from models.shcool import Shcool
+from models.user import Teacher
+from models.user_shcool import User_shcool
+from tests.db_case import DatabaseTestCase
+
+
+class AccountCheckCacheTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        account_status._clear_checks.clear()
+
+        self.school = Shcool(name='North')
+        teacher = Teacher(username='teacher', email='t@example.com', password_hashed='x',
+                          description='', study_level='')
+        db.session.add_all([self.school, teacher])
+        db.session.flush()
+        db.session.add(User_shcool(user_id=teacher.id, shcool_id=self.school.id))
+        db.session.commit()
+        self.teacher_id = teacher.id
+        self.school_id = self.school.id
+
+        self.school_lookups = 0
+        event.listen(db.engine, 'before_cursor_execute', self.count_school_lookups)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.count_school_lookups)
+        account_status._clear_checks.clear()
+        super().tearDown()
+
+    def count_school_lookups(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('SELECT') and 'JOIN user_shcool' in statement:
+            self.school_lookups += 1
+
+    def request_check(self):
+        # A fresh session per "request", like Flask-SQLAlchemy's.
+        db.session.remove()
+        return account_status.get_request_block_message(account_status.load_user(str(self.teacher_id)))
+
+    def test_a_clear_check_is_reused_until_the_school_is_suspended(self):
+        self.assertIsNone(self.request_check())
+        self.assertIsNone(self.request_check())
+        self.assertEqual(self.school_lookups, 1)
+
+        school = db.session.get(Shcool, self.school_id)
+        school.is_active = False
+        account_status.bump_account_versions(school_id=school.id)
+        db.session.commit()
+
+        self.assertEqual(self.request_check()[1], 403)
+        self.assertEqual(self.school_lookups, 2)
+
+    def test_cache_can_be_turned_off(self):
+        with patch.object(ConfigClass, 'ACCOUNT_CHECK_CACHE_SECONDS', 0):
+            self.request_check()
+            self.request_check()
+        self.assertEqual(self.school_lookups, 2)
+        self.assertIsNone(account_status.load_user('not-an-id'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from apps.audiobooks import alignment, alignment_cache
+from config import ConfigClass
+
+TRANSCRIPT = {
+    'language': 'en',
+    'segments': [{'words': [
+        {'text': 'Hello', 'start': 0.1, 'end': 0.4},
+        {'text': 'world', 'start': 0.5, 'end': 0.9},
+    ]}],
+}
+METADATA = {'provider': 'whisper-timestamped', 'id': 'base', 'device': 'cpu'}
+
+
+class AlignmentCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.patches = [
+            patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_CACHE_DIR', os.path.join(self.root, 'cache')),
+            patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_CACHE_MB', 1),
+            patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_MODEL', 'base'),
+            patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_DEVICE', 'cpu'),
+        ]
+        for active_patch in self.patches:
+            active_patch.start()
+        self.audio_path = os.path.join(self.root, 'page.mp3')
+        with open(self.audio_path, 'wb') as handle:
+            handle.write(b'ID3' + b'narration' * 50)
+
+    def tearDown(self):
+        for active_patch in self.patches:
+            active_patch.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_identical_audio_is_transcribed_once_and_realigned_against_new_text(self):
+        copy_path = os.path.join(self.root, 'copied-to-another-school.mp3')
+        shutil.copyfile(self.audio_path, copy_path)
+
+        with patch.object(alignment, 'run_whisper_timestamped', return_value=(TRANSCRIPT, METADATA)) as run:
+            first = alignment.generate_model_alignment(self.audio_path, 'Hello world', language='en')
+            second = alignment.generate_model_alignment(copy_path, 'Hello, world!', language='en')
+            alignment.generate_model_alignment(self.audio_path, 'Hello world', language='fr')
+            alignment.generate_model_alignment(self.audio_path, 'Hello world', language='en',
+                                               options={'cache': False})
+
+        self.assertEqual(run.call_count, 3)
+        self.assertNotIn('cached', first['model'])
+        self.assertTrue(second['model']['cached'])
+        self.assertEqual(second['officialText'], 'Hello, world!')
+        self.assertEqual([word['startMs'] for word in second['words']], [100, 500])
+
+    def test_model_settings_are_part_of_the_key(self):
+        digest = 'a' * 64
+        base = alignment_cache.cache_key(digest, 'base', 'cpu', 'en')
+        self.assertEqual(base, alignment_cache.cache_key(digest, 'base', 'cpu', 'en', {'cache': True}))
+        self.assertNotEqual(base, alignment_cache.cache_key(digest, 'small', 'cpu', 'en'))
+        self.assertNotEqual(base, alignment_cache.cache_key(digest, 'base', 'cpu', 'en', {'vad': True}))
+        with patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS', 60):
+            self.assertNotEqual(base, alignment_cache.cache_key(digest, 'base', 'cpu', 'en'))
+
+    def test_least_recently_used_entries_are_evicted_past_the_limit(self):
+        padding = {'padding': os.urandom(260 * 1024).hex()}
+        keys = ['%064x' % number for number in range(3)]
+        for offset, key in enumerate(keys):
+            alignment_cache.store(key, padding, METADATA)
+            stamp = time.time() - 100 + offset
+            os.utime(alignment_cache.entry_path(key), (stamp, stamp))
+        # Reading the oldest makes it the most recently used.
+        self.assertIsNotNone(alignment_cache.load(keys[0]))
+
+        alignment_cache.store('%064x' % 3, padding, METADATA)
+
+        remaining = [key for key, _, _ in alignment_cache.entries()]
+        self.assertNotIn(keys[1], remaining)
+        self.assertIn(keys[0], remaining)
+        self.assertLessEqual(sum(size for _, size, _ in alignment_cache.entries()), 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from flask import Flask
+
+from apps.audiobooks import bundles
+from apps.media import media
+from config import ConfigClass
+
+
+def make_page(page_number, words):
+    return SimpleNamespace(
+        id=page_number, page_number=page_number,
+        image_path='/tmp/page.png', audio_path='/tmp/page.mp3',
+        official_text=' '.join(word['text'] for word in words), language='en',
+        audio_duration_ms=5000, image_position='above', font_size=20,
+        image_mime_type='image/png', audio_mime_type='audio/mpeg',
+        alignment_json={
+            'version': 1,
+            'officialText': ' '.join(word['text'] for word in words),
+            'audioDurationMs': 5000,
+            'words': words,
+            'review': {'requiresReview': False, 'reviewedById': 4},
+            'model': {'name': 'base'},
+        },
+    )
+
+
+WORDS = [
+    {'index': 0, 'text': 'The', 'startMs': 120, 'endMs': 300, 'status': 'matched', 'confidence': 0.9},
+    {'index': 1, 'text': 'fox', 'startMs': 310, 'endMs': 720, 'status': 'manually-edited',
+     'lineBreakAfter': True},
+    {'index': 2, 'text': 'ran', 'startMs': None, 'endMs': None, 'status': 'not-spoken'},
+    {'index': 3, 'text': 'away.', 'startMs': 900, 'endMs': 1400, 'status': 'interpolated'},
+]
+
+
+class AlignmentEncodingTest(unittest.TestCase):
+    def test_columnar_alignment_round_trips_the_reader_fields(self):
+        encoded = bundles.encode_alignment(make_page(1, WORDS).alignment_json)
+
+        self.assertEqual(encoded['start'], [120, 190, None, 590])
+        self.assertEqual(encoded['duration'], [180, 410, None, 500])
+        self.assertEqual(encoded['lineBreakAfter'], [1])
+        self.assertNotIn('index', encoded)
+        self.assertNotIn('review', encoded)
+
+        decoded = bundles.decode_alignment(encoded)
+        for original, word in zip(WORDS, decoded['words']):
+            self.assertEqual(word['text'], original['text'])
+            self.assertEqual((word['startMs'], word['endMs']), (original['startMs'], original['endMs']))
+            self.assertEqual(word['status'], original['status'])
+            self.assertEqual(word['lineBreakAfter'], bool(original.get('lineBreakAfter')))
+        self.assertEqual(decoded['audioDurationMs'], 5000)
+
+    def test_gapped_indexes_are_kept(self):
+        words = [dict(WORDS[0], index=0), dict(WORDS[1], index=4)]
+        encoded = bundles.encode_alignment({'words': words})
+        self.assertEqual(encoded['index'], [0, 4])
+        self.assertEqual([word['index'] for word in bundles.decode_alignment(encoded)['words']], [0, 4])
+
+
+class BundleDeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.patches = [
+            patch.object(ConfigClass, 'SCHOOL_STORAGE_DIR', self.root),
+            patch.object(ConfigClass, 'PUBLIC_MEDIA_BASE_URL', 'https://api.test'),
+        ]
+        for active_patch in self.patches:
+            active_patch.start()
+        self.app = Flask(__name__)
+        self.app.register_blueprint(media)
+        self.client = self.app.test_client()
+        self.book = SimpleNamespace(
+            id=7, title='Fox', description='', cover_image_path=None, language='en', level=None,
+            category=None, book_id=None, shcool_id=3, published_at=datetime(2026, 10, 1),
+            bundle_version=0, bundle_path=None,
+        )
+
+    def tearDown(self):
+        for active_patch in self.patches:
+            active_patch.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_each_publish_writes_a_new_immutable_version(self):
+        first = bundles.write_bundle(self.book, [make_page(1, WORDS)])
+        self.assertTrue(first.startswith('school_3/audio-books/bundles/7/'))
+        self.assertTrue(os.path.isfile(os.path.join(self.root, first + '.gz')))
+
+        second = bundles.write_bundle(self.book, [make_page(1, WORDS), make_page(2, WORDS)])
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.book.bundle_version, 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.root, first)))
+        self.assertEqual(bundles.serialize_bundle(self.book)['url'], 'https://api.test/media/' + second)
+
+        with open(os.path.join(self.root, second), 'rb') as handle:
+            bundle = json.load(handle)
+        self.assertEqual((bundle['version'], bundle['audio_book']['pages_count']), (2, 2))
+        self.assertNotIn('review', json.dumps(bundle))
+
+        bundles.remove_all_bundles(self.book)
+        self.assertIsNone(self.book.bundle_path)
+        self.assertFalse(os.path.exists(os.path.join(self.root, first)))
+
+    def test_media_route_serves_the_precompressed_copy_with_validators(self):
+        path = bundles.write_bundle(self.book, [make_page(1, WORDS)])
+        url = '/media/' + path
+
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertEqual(json.loads(gzip.decompress(response.data))['version'], 1)
+
+        cached = self.client.get(url, headers={'Accept-Encoding': 'gzip',
+                                               'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        plain = self.client.get(url, headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(json.loads(plain.data)['version'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
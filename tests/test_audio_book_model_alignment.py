@@ -1,10 +1,17 @@
 import unittest
+from unittest.mock import patch
 
+import numpy as np
+
+from apps.audiobooks import alignment as alignment_module
 from apps.audiobooks.alignment import (
+    WHISPER_SAMPLE_RATE,
     AudioAlignmentError,
     build_alignment_from_audio_transcript,
     build_alignment_from_transcript,
+    find_speech_windows,
 )
+from config import ConfigClass
 
 
 class AudioBookModelAlignmentTest(unittest.TestCase):
@@ -167,5 +174,67 @@ class AudioBookModelAlignmentTest(unittest.TestCase):
         self.assertEqual(alignment['officialText'], 'Well, hello!')
 
 
+def tone(seconds, amplitude=0.3):
+    samples = np.arange(int(seconds * WHISPER_SAMPLE_RATE), dtype=np.float32)
+    return (amplitude * np.sin(2 * np.pi * 220 * samples / WHISPER_SAMPLE_RATE)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * WHISPER_SAMPLE_RATE), dtype=np.float32)
+
+
+class ChunkedTranscriptionTest(unittest.TestCase):
+    def test_windows_follow_speech_and_skip_long_silence(self):
+        audio = np.concatenate([silence(1), tone(4), silence(0.5), tone(3), silence(10), tone(5), silence(1)])
+
+        windows = find_speech_windows(audio, max_window_seconds=10)
+
+        seconds = [(start / WHISPER_SAMPLE_RATE, end / WHISPER_SAMPLE_RATE) for start, end in windows]
+        self.assertEqual(len(seconds), 2)
+        # The first two phrases share a window; the 10 s gap is left out.
+        self.assertAlmostEqual(seconds[0][0], 0.85, delta=0.05)
+        self.assertAlmostEqual(seconds[0][1], 8.65, delta=0.05)
+        self.assertAlmostEqual(seconds[1][0], 18.35, delta=0.05)
+        self.assertLessEqual(seconds[1][1], len(audio) / WHISPER_SAMPLE_RATE)
+        self.assertEqual(find_speech_windows(silence(5), max_window_seconds=10), [])
+
+    def test_continuous_speech_is_cut_within_the_window_limit(self):
+        audio = tone(25)
+        windows = find_speech_windows(audio, max_window_seconds=10)
+        self.assertGreaterEqual(len(windows), 3)
+        self.assertEqual((windows[0][0], windows[-1][1]), (0, len(audio)))
+        for (start, end), (next_start, _) in zip(windows, windows[1:]):
+            self.assertEqual(end, next_start)
+        self.assertTrue(all(end - start <= 10 * WHISPER_SAMPLE_RATE for start, end in windows))
+
+    def test_window_transcripts_are_stitched_onto_the_page_timeline(self):
+        audio = np.concatenate([tone(2), silence(6), tone(2)])
+        calls = []
+
+        def fake_window(model_name, device, window_audio, metadata, language=None, options=None):
+            calls.append((len(window_audio), options))
+            fallback = len(calls) == 2
+            words = [{'text': 'word%d' % len(calls), 'start': 0.2, 'end': 0.6}]
+            window_metadata = dict(metadata, fallbackFrom='whisper-timestamped') if fallback else metadata
+            return {'language': 'en', 'segments': [{'text': 'w', 'start': 0.1, 'end': 0.7, 'words': words}]}, \
+                window_metadata
+
+        with patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_CHUNK_SECONDS', 5), \
+                patch.object(ConfigClass, 'AUDIOBOOK_ALIGNMENT_WORKERS', 1), \
+                patch.object(alignment_module, 'transcribe_window', side_effect=fake_window):
+            self.assertTrue(alignment_module.should_chunk_transcription(audio))
+            result, metadata = alignment_module.run_chunked_transcription(
+                audio, 'base', 'cpu', {'provider': 'whisper-timestamped'}, options={'chunked': True, 'vad': False}
+            )
+
+        self.assertEqual([options for _, options in calls], [{'vad': False}, {'vad': False}])
+        self.assertEqual(metadata['chunks'], 2)
+        self.assertEqual(metadata['fallbackChunks'], 1)
+        alignment = build_alignment_from_audio_transcript(result, language='en', model_metadata=metadata)
+        starts = [word['startMs'] for word in alignment['words']]
+        self.assertEqual(starts[0], 200)
+        self.assertAlmostEqual(starts[1], 8000 - 150 + 200, delta=40)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+from array import array
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from apps import storage
+from apps.audiobooks import waveform
+from apps.audiobooks.alignment import AudioAlignmentUnavailable
+from extensions import db
+from models.school_file import SchoolFile
+from tests.test_storage_upload import StorageTestCase, make_upload
+
+
+def pcm(samples):
+    return array('h', samples).tobytes()
+
+
+class PeaksTest(unittest.TestCase):
+    def test_peaks_and_duration_come_from_the_decoded_samples(self):
+        samples = [0] * 80 + [256 * 100, -256 * 50] * 40 + [512] * 80 + [-256 * 128] * 10
+        payload = pcm(samples)
+        # Odd chunk boundaries split samples across reads.
+        chunks = [payload[start:start + 33] for start in range(0, len(payload), 33)]
+
+        peaks = waveform.compute_peaks(chunks, levels=(80, 160))
+
+        self.assertEqual(peaks['durationMs'], round(len(samples) * 1000 / 8000))
+        finest, coarse = peaks['levels']
+        self.assertEqual(finest['data'], [0, 0, -50, 100, 2, 2, -128, -128])
+        self.assertEqual(coarse, {'samplesPerPeak': 160, 'data': [-50, 100, -128, 2]})
+
+
+class PageAudioAnalysisTest(StorageTestCase):
+    def save_audio(self):
+        record = storage.save_upload(1, 'stories/audio', make_upload(b'ID3' + b'a' * 200, 'page.mp3', 'audio/mpeg'))
+        page = SimpleNamespace(id=5, audio_path=storage.absolute_path(record.relative_path), audio_duration_ms=900)
+        return record, page
+
+    def test_upload_analysis_sets_the_duration_and_indexes_the_peaks(self):
+        record, page = self.save_audio()
+        with patch.object(waveform, '_decode', return_value=iter([pcm([1000] * 12000)])):
+            waveform.analyse_page_audio(page, record)
+        db.session.commit()
+
+        self.assertEqual(page.audio_duration_ms, 1500)
+        peaks = SchoolFile.query.filter_by(linked_type=storage.VARIANT_LINK).one()
+        self.assertEqual((peaks.linked_id, peaks.mime_type), (record.id, 'application/json'))
+
+        storage.delete_by_absolute_path(page.audio_path)
+        db.session.commit()
+        self.assertEqual(SchoolFile.query.count(), 0)
+        self.assertFalse(os.path.exists(waveform.peaks_path(page.audio_path)))
+
+    def test_without_ffmpeg_the_upload_keeps_its_reported_duration(self):
+        record, page = self.save_audio()
+        with patch.object(waveform, 'ensure_ffmpeg_available', side_effect=AudioAlignmentUnavailable('no ffmpeg')):
+            self.assertIsNone(waveform.analyse_page_audio(page, record))
+            self.assertIsNone(waveform.resolve_peaks(page.audio_path))
+        self.assertEqual(page.audio_duration_ms, 900)
+        self.assertEqual(SchoolFile.query.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
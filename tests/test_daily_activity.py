@@ -0,0 +1,96 @@
+import unittest
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from apps import certificates, reader_passport  # noqa: F401 -- attempts write their tables
+from apps.daily_activity import add_daily_activity, get_daily_activity
+from apps.progress_engine import get_daily_goal_status, get_word_progress_daily_trend, submit_attempt
+from extensions import db
+from models.book import Book
+from models.chapter import Chapter
+from models.user import User
+from models.word_occurrence import WordOccurrence
+from models.word_progress import STAGE_MASTERED
+from models.word_sense import WordSense
+from tests.db_case import DatabaseTestCase
+
+
+class DailyActivityTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User(username='reader', email='reader@example.com', password_hashed='x')
+        book = Book(title='Fox', author='A. Author')
+        db.session.add_all([self.user, book])
+        db.session.flush()
+        chapter = Chapter(book_id=book.id, chapter_index=1)
+        senses = [WordSense(lemma=lemma, pos='NOUN', sense_key='', cefr_level='A1') for lemma in ('fox', 'den')]
+        db.session.add(chapter)
+        db.session.add_all(senses)
+        db.session.flush()
+        for sense in senses:
+            db.session.add(WordOccurrence(word_sense_id=sense.id, chapter_id=chapter.id, surface_form=sense.lemma))
+        db.session.commit()
+        self.book_id = book.id
+
+        self.evidence_reads = 0
+        event.listen(db.engine, 'before_cursor_execute', self.count_evidence_reads)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.count_evidence_reads)
+        super().tearDown()
+
+    def count_evidence_reads(self, conn, cursor, statement, parameters, context, executemany):
+        if 'FROM word_progress_evidence' in statement:
+            self.evidence_reads += 1
+
+    def attempt(self, word, game, on, hints_used=0):
+        return submit_attempt(self.user.id, self.book_id, word, game, 'practice', True,
+                              hints_used=hints_used, occurred_on=on)
+
+    def test_attempts_count_practiced_and_distinct_words(self):
+        today = date.today()
+        self.attempt('fox', 'bee-genius', today, hints_used=1)
+        self.attempt('fox', 'think-word', today, hints_used=1)
+        self.attempt('den', 'bee-genius', today, hints_used=1)
+        self.attempt('fox', 'bee-genius', today - timedelta(days=1), hints_used=1)
+
+        activity = get_daily_activity(self.user.id, today)
+        self.assertEqual((activity.words_practiced, activity.words_distinct), (3, 2))
+        self.assertEqual(get_daily_activity(self.user.id, today - timedelta(days=1)).words_distinct, 1)
+
+        self.evidence_reads = 0
+        self.assertEqual(get_daily_goal_status(self.user.id, goal=2), {'goal': 2, 'progress': 2, 'met': True})
+        self.assertEqual(self.evidence_reads, 0)
+
+    def test_trend_reports_mastery_on_the_day_it_happened(self):
+        today = date.today()
+        self.attempt('fox', 'bee-genius', today - timedelta(days=1), hints_used=1)
+        result = self.attempt('fox', 'word-explorer', today)
+        self.assertEqual(result['stage'], STAGE_MASTERED)
+
+        self.evidence_reads = 0
+        trend = get_word_progress_daily_trend(self.user.id, today - timedelta(days=6), today)
+        self.assertEqual(self.evidence_reads, 0)
+        self.assertEqual(trend, [
+            {'date': (today - timedelta(days=1)).isoformat(), 'words_practiced': 1, 'words_mastered': 0},
+            {'date': today.isoformat(), 'words_practiced': 1, 'words_mastered': 1},
+        ])
+
+    def test_add_daily_activity_creates_then_adds_to_the_row(self):
+        today = date.today()
+        add_daily_activity(self.user.id, today, games_played=1, score_sum=40, time_spent_seconds=90)
+        add_daily_activity(self.user.id, today, games_played=1, score_sum=10, time_spent_seconds=0)
+        db.session.commit()
+        db.session.expire_all()
+
+        activity = get_daily_activity(self.user.id, today)
+        self.assertEqual((activity.games_played, activity.score_sum, activity.time_spent_seconds), (2, 50, 90))
+        self.assertEqual(activity.words_practiced, 0)
+        with self.assertRaises(ValueError):
+            add_daily_activity(self.user.id, today, stars=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
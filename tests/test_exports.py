@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import unittest
+
+from flask import request
+
+from apps import exports
+from extensions import db
+from models.admin_audit_log import AdminAuditLog
+from tests.db_case import DatabaseTestCase
+
+FIELDS = ['id', 'actor_username', 'action', 'details']
+
+
+def audit_rows(entries):
+    return [{
+        'id': entry.id,
+        'actor_username': entry.actor_username,
+        'action': entry.action,
+        'details': entry.details,
+    } for entry in entries]
+
+
+class StreamingExportTest(DatabaseTestCase):
+    tables = [AdminAuditLog.__table__]
+
+    def setUp(self):
+        super().setUp()
+        for number in range(7):
+            db.session.add(AdminAuditLog(actor_username='admin%d' % number, action='update',
+                                         target_type='user', details='row %d' % number))
+        db.session.add(AdminAuditLog(actor_username='=HYPERLINK("x")', action='delete',
+                                     target_type='user', details='-1, "quoted"'))
+        db.session.commit()
+
+        @self.app.route('/export')
+        def export():
+            query = AdminAuditLog.query
+            if request.args.get('action'):
+                query = query.filter(AdminAuditLog.action == request.args['action'])
+            fmt = exports.get_export_format(request.args.get('format'))
+            return exports.export_response(query, [AdminAuditLog.id], audit_rows, FIELDS,
+                                           'audit-log', fmt, descending=True)
+
+    def test_every_row_is_streamed_across_batches_in_key_order(self):
+        chunks = list(exports.iter_export(AdminAuditLog.query, [AdminAuditLog.id], audit_rows,
+                                          FIELDS, 'ndjson', descending=True, batch_size=3))
+
+        self.assertEqual(len(chunks), 3)
+        ids = [json.loads(line)['id'] for chunk in chunks for line in chunk.splitlines()]
+        self.assertEqual(ids, list(range(8, 0, -1)))
+
+    def test_csv_download_escapes_formulas_and_keeps_filters(self):
+        response = self.app.test_client().get('/export?action=delete')
+
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment; filename="audit-log.csv"', response.headers['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(rows, [FIELDS, ['8', '\'=HYPERLINK("x")', 'delete', '\'-1, "quoted"']])
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            exports.get_export_format('xlsx')
+        self.assertEqual(exports.get_export_format(None), 'csv')
+        self.assertEqual(exports.csv_cell(['a', 'b']), 'a;b')
+        self.assertEqual(exports.csv_cell(None), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
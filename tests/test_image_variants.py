@@ -0,0 +1,105 @@
+import io
+import os
+import re
+import unittest
+from unittest.mock import patch
+
+from werkzeug.datastructures import MIMEAccept
+
+from apps import background, image_variants, storage
+from apps.media import media
+from extensions import db
+from models.school_file import SchoolFile
+from tests.test_storage_upload import StorageTestCase, make_upload
+
+
+class VariantRequestTest(unittest.TestCase):
+    def test_widths_snap_up_and_formats_follow_accept(self):
+        webp = MIMEAccept([('image/webp', 1), ('image/*', 0.8)])
+        plain = MIMEAccept([('image/*', 1)])
+
+        self.assertEqual(image_variants.parse_variant_request({'w': '300'}, webp), (320, 'webp', True))
+        self.assertEqual(image_variants.parse_variant_request({'w': '300'}, plain), (320, 'jpg', True))
+        self.assertEqual(image_variants.parse_variant_request({'w': '10', 'fmt': 'jpeg'}, webp),
+                         (160, 'jpg', False))
+        self.assertIsNone(image_variants.parse_variant_request({'w': '5000'}, webp))
+        self.assertIsNone(image_variants.parse_variant_request({'w': 'wide'}, webp))
+        self.assertIsNone(image_variants.parse_variant_request({}, webp))
+
+    def test_only_raster_originals_have_variants(self):
+        self.assertTrue(image_variants.is_variant_source('/s/cover.png'))
+        self.assertFalse(image_variants.is_variant_source('/s/logo.svg'))
+        self.assertFalse(image_variants.is_variant_source('/s/cover.png.w320.webp'))
+
+
+class ImageVariantStorageTest(StorageTestCase):
+    def add_variant(self, record, width=320, fmt='webp', payload=b'v' * 40):
+        path = image_variants.variant_path(storage.absolute_path(record.relative_path), width, fmt)
+        with open(path, 'wb') as handle:
+            handle.write(payload)
+        image_variants.index_variants(record, [(path, width, fmt)])
+        return path
+
+    def test_committed_uploads_are_handed_to_the_render_pool(self):
+        with patch.object(image_variants, 'available', return_value=True), \
+                patch.object(background, '_get_executor') as executor:
+            record = storage.save_upload(1, 'books/covers', make_upload(b'\x89PNG' + b'x' * 100))
+            executor.return_value.submit.assert_not_called()
+            db.session.commit()
+
+        submitted = executor.return_value.submit.call_args[0]
+        self.assertEqual(submitted[2:], (image_variants._render_job, (record.id,)))
+
+    def test_variants_are_charged_and_deleted_with_their_original(self):
+        record = storage.save_upload(1, 'books/covers', make_upload(b'\x89PNG' + b'x' * 100))
+        path = self.add_variant(record)
+        db.session.commit()
+        self.assertEqual(storage.used_bytes(1), 104 + 40)
+        variant = SchoolFile.query.filter_by(linked_type=storage.VARIANT_LINK).one()
+        self.assertEqual((variant.linked_id, variant.mime_type), (record.id, 'image/webp'))
+
+        storage.delete_file(record)
+        db.session.commit()
+
+        self.assertEqual(SchoolFile.query.count(), 0)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(storage.used_bytes(1), 0)
+
+    def test_media_route_serves_an_existing_variant(self):
+        record = storage.save_upload(1, 'books/covers', make_upload(b'\x89PNG' + b'x' * 100))
+        self.add_variant(record, fmt='jpg', payload=b'small jpeg')
+        db.session.commit()
+        self.app.register_blueprint(media)
+        client = self.app.test_client()
+        url = '/media/' + record.relative_path
+
+        response = client.get(url + '?w=300', headers={'Accept': 'image/*'})
+        self.assertEqual(response.data, b'small jpeg')
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertIn('Accept', response.headers['Vary'])
+
+        # No WebP copy and no way to render one here: the original is served.
+        with patch.object(image_variants, 'available', return_value=False):
+            response = client.get(url + '?w=300&fmt=webp')
+        self.assertEqual(response.data, b'\x89PNG' + b'x' * 100)
+
+    @unittest.skipUnless(image_variants.available(), 'Pillow is not installed')
+    def test_variants_are_rendered_below_the_original_width(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGBA', (700, 350), (10, 120, 200, 128)).save(buffer, 'PNG')
+        record = storage.save_upload(1, 'books/covers', make_upload(buffer.getvalue()))
+
+        self.assertEqual(image_variants.generate_variants(record), 6)
+        db.session.commit()
+
+        widths = sorted({int(re.search(r'\.w(\d+)\.', name).group(1))
+                         for name in self.category_entries() if image_variants.VARIANT_NAME_PATTERN.search(name)})
+        self.assertEqual(widths, [160, 320, 640])
+        with Image.open(image_variants.variant_path(storage.absolute_path(record.relative_path), 320, 'jpg')) as copy:
+            self.assertEqual(copy.size, (320, 160))
+
+
+if __name__ == '__main__':
+    unittest.main()
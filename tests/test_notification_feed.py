@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import event
+
+from apps.notifications import FEED_CURSOR_PARSERS, purge_expired_notifications, reader_notification_feed
+from apps.pagination import decode_cursor, encode_cursor
+from apps.reader.routes import reader
+from extensions import db
+from models.code import Code  # noqa: F401 -- Pack's relationship target
+from models.reader_notification import ReaderNotification
+from models.user import User
+from tests.db_case import DatabaseTestCase
+
+NOW = datetime(2026, 10, 19, 12, 0, 0)
+
+
+class NotificationFeedTest(DatabaseTestCase):
+    tables = [ReaderNotification.__table__]
+
+    def setUp(self):
+        super().setUp()
+
+        # Pairs share a created_at, so paging has to break ties on id.
+        for number in range(9):
+            db.session.add(ReaderNotification(
+                user_id=1, type='daily_game' if number % 3 == 0 else 'pack_book_added',
+                title='n%d' % number, message='m', created_at=NOW - timedelta(minutes=number // 2),
+            ))
+        db.session.add(ReaderNotification(user_id=2, type='daily_game', title='other', message='m', created_at=NOW))
+        db.session.commit()
+
+    def walk(self, **filters):
+        titles, cursor = [], None
+        while True:
+            page, next_before = reader_notification_feed(1, 4, after=decode_cursor(cursor, FEED_CURSOR_PARSERS), **filters)
+            titles.extend(notification.title for notification in page)
+            if next_before is None:
+                return titles
+            cursor = next_before
+
+    def test_cursor_pages_cover_the_feed_once_newest_first(self):
+        expected = [notification.title for notification in ReaderNotification.query.filter_by(user_id=1).order_by(
+            ReaderNotification.created_at.desc(), ReaderNotification.id.desc())]
+        self.assertEqual(self.walk(), expected)
+        self.assertEqual(len(expected), 9)
+        self.assertEqual(self.walk(notification_type='daily_game'), ['n0', 'n3', 'n6'])
+
+    def test_feed_reads_the_user_created_index(self):
+        notification = ReaderNotification.query.filter_by(title='n4').one()
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record_statement)
+        try:
+            reader_notification_feed(1, 4, after=(notification.created_at, notification.id))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record_statement)
+
+        statement, parameters = statements[-1]
+        plan = [row[3] for row in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+        self.assertTrue(any('INDEX ix_reader_notification_user_created' in detail for detail in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in plan), plan)
+
+    def test_bad_cursors_are_rejected(self):
+        for value in ('2026-10-19T12:00:00,4', encode_cursor(NOW), encode_cursor('yesterday', 4),
+                      encode_cursor(NOW, 'x')):
+            with self.assertRaises(ValueError):
+                decode_cursor(value, FEED_CURSOR_PARSERS)
+
+    def test_purge_deletes_only_expired_notifications(self):
+        db.session.add_all([
+            ReaderNotification(user_id=1, type='daily_game', title='old', message='m', expires_at=NOW - timedelta(hours=1)),
+            ReaderNotification(user_id=2, type='daily_game', title='older', message='m', expires_at=NOW - timedelta(days=2)),
+            ReaderNotification(user_id=1, type='daily_game', title='live', message='m', expires_at=NOW + timedelta(hours=1)),
+        ])
+        db.session.commit()
+
+        self.assertEqual(purge_expired_notifications(now=NOW, batch_size=1), 2)
+        titles = {title for (title,) in db.session.query(ReaderNotification.title)}
+        self.assertIn('live', titles)
+        self.assertFalse(titles & {'old', 'older'})
+        self.assertEqual(len(titles), 11)
+
+    def test_route_keeps_page_paging_unless_before_is_sent(self):
+        self.app.register_blueprint(reader)
+        client = self.app.test_client()
+        signed_in = patch('flask_login.utils._get_user', return_value=User(id=1, username='reader', is_active=True))
+        signed_in.start()
+        self.addCleanup(signed_in.stop)
+
+        response = client.get('/reader/notifications?per_page=4')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['pagination']['page'], 1)
+        self.assertEqual(response.json['pagination']['total'], 9)
+        self.assertNotIn('next_before', response.json)
+
+        titles, before = [], ''
+        while before is not None:
+            response = client.get('/reader/notifications', query_string={'per_page': 4, 'before': before})
+            self.assertEqual(response.status_code, 200)
+            titles.extend(notification['title'] for notification in response.json['notifications'])
+            before = response.json['next_before']
+        self.assertEqual(titles, self.walk())
+        self.assertEqual(client.get('/reader/notifications?before=nonsense').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch
+
+import bcrypt
+from flask import Flask
+
+from apps import passwords
+from config import ConfigClass
+
+
+class StoredUser:
+    def __init__(self, password, rounds):
+        self.password_hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        self.pin_hash = None
+
+
+class PasswordHashingTest(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            patch.object(ConfigClass, 'PASSWORD_HASH_WORKERS', 0),
+            patch.object(ConfigClass, 'PASSWORD_HASH_MAX_PENDING', 4),
+            patch.object(ConfigClass, 'PASSWORD_HASH_ROUNDS', 5),
+        ]
+        for active_patch in self.patches:
+            active_patch.start()
+
+    def tearDown(self):
+        for active_patch in self.patches:
+            active_patch.stop()
+
+    def test_checks_match_flask_bcrypt_hashes(self):
+        user = StoredUser('s3cret', 4)
+
+        self.assertTrue(passwords.check_password(user.password_hashed, 's3cret'))
+        self.assertFalse(passwords.check_password(user.password_hashed, 'wrong'))
+        self.assertFalse(passwords.check_password(None, 's3cret'))
+        self.assertFalse(passwords.check_password(user.password_hashed, ''))
+
+    def test_successful_check_rehashes_at_the_configured_cost(self):
+        user = StoredUser('s3cret', 4)
+        old_hash = user.password_hashed
+
+        self.assertFalse(passwords.verify_and_upgrade(user, 'wrong'))
+        self.assertEqual(user.password_hashed, old_hash)
+        self.assertTrue(passwords.verify_and_upgrade(user, 's3cret'))
+        self.assertEqual(passwords.hash_cost(user.password_hashed), 5)
+        self.assertTrue(passwords.check_password(user.password_hashed, 's3cret'))
+
+        upgraded = user.password_hashed
+        self.assertTrue(passwords.verify_and_upgrade(user, 's3cret'))
+        self.assertEqual(user.password_hashed, upgraded)
+
+    def test_saturated_process_answers_429_with_retry_after(self):
+        user = StoredUser('s3cret', 4)
+        rejected = passwords.stats()['rejected']
+
+        with patch.object(ConfigClass, 'PASSWORD_HASH_MAX_PENDING', 0):
+            with self.assertRaises(passwords.PasswordHashingBusy) as raised:
+                passwords.check_password(user.password_hashed, 's3cret')
+
+        with Flask(__name__).app_context():
+            response = passwords.busy_response(raised.exception)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(response.get_json()['code'], 'TOO_MANY_SIGN_INS')
+        self.assertEqual(passwords.stats()['rejected'], rejected + 1)
+        self.assertEqual(passwords.stats()['in_flight'], 0)
+
+    def test_pool_checks_off_the_request_process(self):
+        user = StoredUser('s3cret', 4)
+
+        with patch.object(ConfigClass, 'PASSWORD_HASH_WORKERS', 1):
+            try:
+                self.assertTrue(passwords.check_password(user.password_hashed, 's3cret'))
+                self.assertFalse(passwords.check_password(user.password_hashed, 'wrong'))
+            finally:
+                executor = passwords._executor
+                passwords._reset_executor()
+                if executor is not None:
+                    executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
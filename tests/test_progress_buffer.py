@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from apps.progress_buffer import ProgressBuffer, story_progress_buffer
+from extensions import db
+from models.book import Book
+from models.book_story import BookStory
+from models.reader_story_progress import ReaderStoryProgress
+from models.user import User
+from tests.db_case import DatabaseTestCase
+
+
+class ProgressBufferTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        user = User(username='reader', email='reader@example.com', password_hashed='x')
+        book = Book(title='Fox', author='A. Author')
+        db.session.add_all([user, book])
+        db.session.flush()
+        story = BookStory(
+            book_id=book.id, uploaded_by=user.id, title='Fox story',
+            original_filename='fox.pdf', stored_filename='fox.pdf', file_path='/tmp/fox.pdf',
+            mime_type='application/pdf', file_size=1, page_count=20,
+        )
+        db.session.add(story)
+        db.session.flush()
+        self.started = datetime.now() - timedelta(minutes=5)
+        db.session.add(ReaderStoryProgress(user_id=user.id, story_id=story.id, last_read_at=self.started))
+        db.session.commit()
+        self.key = (user.id, story.id)
+        self.buffer = ProgressBuffer(
+            ReaderStoryProgress, ('user_id', 'story_id'), 'last_read_at',
+            ('current_page', 'zoom', 'last_read_at'),
+        )
+
+    def tearDown(self):
+        story_progress_buffer.take(self.key)
+        super().tearDown()
+
+    def stored(self):
+        db.session.expire_all()
+        return db.session.get(ReaderStoryProgress, self.key)
+
+    def test_reports_coalesce_into_one_write_of_the_latest_position(self):
+        now = datetime.now()
+        self.buffer.record(self.key, {'current_page': 2}, now - timedelta(seconds=2))
+        self.buffer.record(self.key, {'current_page': 3, 'zoom': 1.5}, now - timedelta(seconds=1))
+        self.buffer.record(self.key, {'current_page': 4}, now)
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(self.stored().current_page, 1)
+
+        # Reads merge what has not been written yet.
+        view = self.buffer.overlay(self.stored())
+        self.assertEqual((view.current_page, view.zoom, view.last_read_at), (4, 1.5, now))
+
+        self.assertEqual(self.buffer.flush(), 1)
+        row = self.stored()
+        self.assertEqual((row.current_page, row.zoom, row.last_read_at), (4, 1.5, now))
+        self.assertEqual(len(self.buffer), 0)
+        self.assertIs(self.buffer.overlay(row), row)
+
+    def test_flush_never_overwrites_a_newer_write(self):
+        self.buffer.record(self.key, {'current_page': 5}, datetime.now() - timedelta(minutes=1))
+        row = self.stored()
+        row.current_page = 20
+        row.completed = True
+        row.last_read_at = datetime.now()
+        db.session.commit()
+
+        self.buffer.flush()
+
+        row = self.stored()
+        self.assertEqual((row.current_page, row.completed), (20, True))
+
+    def test_a_synchronous_write_takes_the_pending_position(self):
+        self.buffer.record(self.key, {'zoom': 2.0}, datetime.now())
+        self.assertEqual(self.buffer.take(self.key)['zoom'], 2.0)
+        self.assertIsNone(self.buffer.peek(self.key))
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_keeps_entries_under_newer_reports(self):
+        now = datetime.now()
+        self.buffer.record(self.key, {'current_page': 6, 'zoom': 1.25}, now - timedelta(seconds=1))
+        with patch.object(db.engine, 'begin', side_effect=RuntimeError('database away')):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.buffer.record(self.key, {'current_page': 7}, now)
+
+        self.buffer.flush()
+
+        row = self.stored()
+        self.assertEqual((row.current_page, row.zoom), (7, 1.25))
+
+    def test_unknown_fields_are_refused(self):
+        with self.assertRaises(ValueError):
+            self.buffer.record(self.key, {'completed': True}, datetime.now())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from apps.protected_files import send_protected_file
+from config import ConfigClass
+
+
+class ProtectedFileDeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'stories', 'page 1.mp3')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as handle:
+            handle.write(bytes(range(256)) * 4)
+
+        self.app = Flask(__name__)
+        self.app.add_url_rule('/file', 'file', lambda: send_protected_file(
+            self.path, mimetype='audio/mpeg', missing_message='Page audio file not found'))
+        self.app.add_url_rule('/gone', 'gone', lambda: send_protected_file(
+            os.path.join(self.root, 'gone.mp3'), missing_message='Page audio file not found'))
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_range_and_revalidation_are_answered(self):
+        response = self.client.get('/file')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response.headers)
+        cache_control = response.headers['Cache-Control']
+        self.assertIn('private', cache_control)
+        self.assertIn('must-revalidate', cache_control)
+        self.assertNotIn('public', cache_control)
+
+        partial = self.client.get('/file', headers={'Range': 'bytes=256-511'})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, bytes(range(256)))
+        self.assertEqual(partial.headers['Content-Range'], 'bytes 256-511/1024')
+
+        cached = self.client.get('/file', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_missing_file_keeps_the_json_404(self):
+        response = self.client.get('/gone')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['message'], 'Page audio file not found')
+
+    def test_nginx_offload_sends_headers_only(self):
+        with patch.object(ConfigClass, 'PROTECTED_FILE_OFFLOAD', 'x-accel-redirect'), \
+                patch.object(ConfigClass, 'PROTECTED_FILE_ACCEL_LOCATIONS', '%s=/_protected/uploads' % self.root):
+            response = self.client.get('/file', headers={'Range': 'bytes=0-9'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/_protected/uploads/stories/page%201.mp3')
+        self.assertNotIn('X-Sendfile', response.headers)
+        self.assertEqual(response.mimetype, 'audio/mpeg')
+        self.assertEqual(response.data, b'')
+
+    def test_unmapped_file_is_sent_by_flask_even_with_nginx_offload(self):
+        with patch.object(ConfigClass, 'PROTECTED_FILE_OFFLOAD', 'x-accel-redirect'), \
+                patch.object(ConfigClass, 'PROTECTED_FILE_ACCEL_LOCATIONS', '/elsewhere=/_protected/other'):
+            response = self.client.get('/file')
+        self.assertNotIn('X-Accel-Redirect', response.headers)
+        self.assertEqual(len(response.data), 1024)
+
+    def test_apache_offload_names_the_file(self):
+        with patch.object(ConfigClass, 'PROTECTED_FILE_OFFLOAD', 'x-sendfile'):
+            response = self.client.get('/file')
+        self.assertEqual(response.headers['X-Sendfile'], self.path)
+        self.assertEqual(response.data, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from datetime import date, timedelta
+
+from sqlalchemy import event, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+
+from extensions import db
+from models.code import Code  # noqa: F401 -- Pack's relationship target
+from models.game_result import GameEnum, Game_result
+from models.practice_play import PracticePlay
+from models.user_daily_activity import UserDailyActivity
+from models.user_shcool import User_shcool
+from tests.db_case import DatabaseTestCase
+
+TABLES = [Game_result.__table__, PracticePlay.__table__, UserDailyActivity.__table__]
+TODAY = date(2026, 10, 19)
+
+
+class HotQueryPlanTest(DatabaseTestCase):
+    """The Daily Run and analytics queries, shaped as the routes build them,
+    run through SQLite's EXPLAIN QUERY PLAN over a seeded table. A table read
+    that is not an index SEARCH fails the test, so an index a query relies on
+    cannot be dropped, or a filter reordered off it, without notice."""
+
+    tables = TABLES + [User_shcool.__table__]
+
+    def setUp(self):
+        super().setUp()
+
+        games = list(GameEnum)
+        for user_id in range(1, 41):
+            for offset in range(10):
+                day = TODAY - timedelta(days=offset)
+                for book_id in range(1, 7):
+                    db.session.add(Game_result(user_id=user_id, book_id=book_id, day=day,
+                                               game=games[(user_id + offset) % len(games)],
+                                               score=offset, completed=offset % 2 == 0))
+                db.session.add(PracticePlay(user_id=user_id, book_id=1, day=day, game=GameEnum.BEE))
+                db.session.add(UserDailyActivity(user_id=user_id, day=day, games_played=7, score_sum=offset * 6))
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        super().tearDown()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append((statement, parameters))
+
+    def plan(self, run_query):
+        del self.statements[:]
+        run_query()
+        self.assertEqual(len(self.statements), 1)
+        statement, parameters = self.statements[0]
+        del self.statements[:]
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[3] for row in rows]
+
+    def sqlite_index_name(self, table, name):
+        # SQLite names the index behind a UNIQUE constraint itself
+        # (sqlite_autoindex_<table>_N); find it by the constraint's columns.
+        constraint = next((constraint for constraint in db.metadata.tables[table].constraints
+                           if constraint.name == name), None)
+        if constraint is None:
+            return name
+        columns = [column.name for column in constraint.columns]
+        connection = db.session.connection()
+        for index in connection.exec_driver_sql('PRAGMA index_list(%s)' % table):
+            indexed = [row[2] for row in connection.exec_driver_sql('PRAGMA index_info(%s)' % index[1])]
+            if indexed == columns:
+                return index[1]
+        return name
+
+    def assert_searches(self, run_query, table, index=None):
+        details = self.plan(run_query)
+        reads = [detail for detail in details if ' %s ' % table in detail + ' ']
+        self.assertTrue(reads, details)
+        for detail in reads:
+            self.assertTrue(detail.startswith('SEARCH'), 'full scan: %s' % details)
+        if index is None:
+            return
+        index = self.sqlite_index_name(table, index)
+        self.assertTrue(any('INDEX %s ' % index in detail for detail in reads), details)
+
+    def test_daily_run_row_lookup(self):
+        # /game-result/status, create_game_result, /daily-run-suggestions
+        self.assert_searches(
+            lambda: Game_result.query.filter_by(user_id=7, day=TODAY, game=GameEnum.BEE, book_id=1).first(),
+            'game_result', 'uq_game_result_user_day_game_book',
+        )
+
+    def test_daily_leaderboard(self):
+        self.assert_searches(
+            lambda: Game_result.query.filter(
+                Game_result.book_id == 1,
+                Game_result.game == GameEnum.BEE,
+                Game_result.day == TODAY,
+                or_(Game_result.completed.is_(True), Game_result.score > 0, Game_result.time_spent_seconds > 0),
+            ).all(),
+            'game_result', 'ix_game_result_book_game_day',
+        )
+
+    def test_book_totals(self):
+        # /game-leaderboard and /game-results-all
+        self.assert_searches(
+            lambda: db.session.query(Game_result.user_id, func.sum(Game_result.score))
+            .filter_by(game=GameEnum.BEE, book_id=1)
+            .group_by(Game_result.user_id).order_by(func.sum(Game_result.score).desc()).all(),
+            'game_result', 'ix_game_result_book_game_day',
+        )
+
+    def test_child_analytics_range(self):
+        # get_child_analytics, the daily goal and the word-progress trend read
+        # the counters by primary key.
+        start, end = TODAY - timedelta(days=6), TODAY
+        self.assert_searches(
+            lambda: UserDailyActivity.query.filter(
+                UserDailyActivity.user_id == 7, UserDailyActivity.day >= start, UserDailyActivity.day <= end,
+            ).order_by(UserDailyActivity.day).all(),
+            'user_daily_activity',
+        )
+
+    def test_school_and_platform_activity_ranges(self):
+        start = TODAY - timedelta(days=3)
+        self.assert_searches(
+            lambda: db.session.query(Game_result.game, func.count(Game_result.id)).filter(
+                Game_result.user_id.in_([3, 4, 5]), Game_result.day >= start, Game_result.day <= TODAY,
+            ).group_by(Game_result.game).all(),
+            'game_result', 'uq_game_result_user_day_game_book',
+        )
+        self.assert_searches(
+            lambda: Game_result.query.filter(Game_result.day >= TODAY).with_entities(Game_result.day).all(),
+            'game_result', 'ix_game_result_day',
+        )
+
+    def test_one_daily_run_row_per_reader_day_game_book(self):
+        db.session.add(Game_result(user_id=7, book_id=1, day=TODAY, game=GameEnum.BEE))
+        db.session.add(Game_result(user_id=7, book_id=1, day=TODAY, game=GameEnum.BEE))
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
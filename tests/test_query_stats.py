@@ -0,0 +1,68 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from flask import jsonify
+
+from apps import query_stats
+from config import ConfigClass
+from extensions import db
+from models.admin_audit_log import AdminAuditLog
+from tests.db_case import DatabaseTestCase
+
+
+class QueryStatsTest(DatabaseTestCase):
+    tables = [AdminAuditLog.__table__]
+
+    def setUp(self):
+        super().setUp()
+        query_stats.init_app(self.app)
+        for number in range(6):
+            db.session.add(AdminAuditLog(actor_username='admin%d' % number, action='update', target_type='user'))
+        db.session.commit()
+        self.ids = [entry.id for entry in AdminAuditLog.query.all()]
+        db.session.expire_all()
+
+        @self.app.route('/entries')
+        def entries():
+            # One lookup per row: the shape the N+1 report is there to catch.
+            return jsonify([db.session.get(AdminAuditLog, entry_id).actor_username for entry_id in self.ids])
+
+    def test_assert_max_queries_reports_the_repeated_statement(self):
+        with query_stats.assert_max_queries(1):
+            AdminAuditLog.query.filter(AdminAuditLog.id.in_(self.ids)).all()
+
+        with self.assertRaises(AssertionError) as raised:
+            with query_stats.assert_max_queries(2):
+                for entry_id in self.ids:
+                    AdminAuditLog.query.filter(AdminAuditLog.id == entry_id).first()
+        self.assertIn('6 queries run, at most 2 expected', str(raised.exception))
+        self.assertIn('   6 x SELECT', str(raised.exception))
+
+    def test_in_lists_and_literals_share_a_fingerprint(self):
+        self.assertEqual(
+            query_stats.fingerprint('SELECT a FROM t WHERE id IN (?, ?, ?)\n LIMIT 10'),
+            query_stats.fingerprint('SELECT a FROM t WHERE id IN (?) LIMIT 20'),
+        )
+
+    def test_sampled_request_gets_server_timing_and_a_log_line(self):
+        with patch.object(ConfigClass, 'SQL_STATS_SAMPLE_RATE', 1.0):
+            with self.assertLogs('iread.sql', level='WARNING') as logs:
+                response = self.app.test_client().get('/entries')
+
+        self.assertRegex(response.headers['Server-Timing'], r'^db;dur=[\d.]+;desc="6 queries"$')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['endpoint'], entry['status'], entry['queries']), ('entries', 200, 6))
+        self.assertEqual(entry['repeated'][0]['count'], 6)
+        self.assertIn('FROM admin_audit_logs', entry['repeated'][0]['statement'])
+
+    def test_unsampled_requests_are_left_alone(self):
+        with patch.object(ConfigClass, 'SQL_STATS_SAMPLE_RATE', 0.0):
+            response = self.app.test_client().get('/entries')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
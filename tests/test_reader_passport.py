@@ -0,0 +1,136 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+from apps.progress_engine import record_self_reported_word, submit_attempt, submit_attempt_batch
+from apps.reader_passport import (
+    compute_passport_data,
+    get_passport_data,
+    note_story_progress,
+    stale_snapshot_user_ids,
+)
+from extensions import db
+from models.book import Book
+from models.book_story import BookStory
+from models.chapter import Chapter
+from models.reader_passport_snapshot import ReaderPassportSnapshot
+from models.reader_story_progress import ReaderStoryProgress
+from models.user import User
+from models.word_occurrence import WordOccurrence
+from models.word_sense import WordSense
+from tests.db_case import DatabaseTestCase
+
+
+class ReaderPassportSnapshotTest(DatabaseTestCase):
+    """The snapshot must read exactly as a from-scratch build would, after
+    every kind of event that maintains it."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.user = User(username='reader', email='reader@example.com', password_hashed='x')
+        book = Book(title='Fox', author='A. Author')
+        db.session.add_all([self.user, book])
+        db.session.flush()
+        chapter = Chapter(book_id=book.id, chapter_index=0)
+        sense = WordSense(lemma='fox', pos='NOUN', sense_key='', cefr_level='A1')
+        db.session.add_all([chapter, sense])
+        db.session.flush()
+        db.session.add(WordOccurrence(word_sense_id=sense.id, chapter_id=chapter.id, surface_form='fox'))
+        self.story = BookStory(
+            book_id=book.id, uploaded_by=self.user.id, title='Fox story',
+            original_filename='fox.pdf', stored_filename='fox.pdf', file_path='/tmp/fox.pdf',
+            mime_type='application/pdf', file_size=1,
+        )
+        db.session.add(self.story)
+        db.session.commit()
+        self.book_id = book.id
+
+    def snapshot_data(self):
+        db.session.expire_all()
+        return db.session.get(ReaderPassportSnapshot, self.user.id).data
+
+    def test_first_view_builds_the_snapshot_and_later_views_read_it(self):
+        self.assertIsNone(db.session.get(ReaderPassportSnapshot, self.user.id))
+        data = get_passport_data(self.user.id)
+        self.assertEqual(data, compute_passport_data(self.user.id))
+        self.assertEqual(data['achievements']['earned'], 0)
+
+    def test_attempts_keep_the_snapshot_equal_to_a_rebuild(self):
+        get_passport_data(self.user.id)
+        today = date.today()
+        submit_attempt(self.user.id, self.book_id, 'fox', 'bee-genius', 'practice', True,
+                       occurred_on=today - timedelta(days=1))
+        submit_attempt(self.user.id, self.book_id, 'fox', 'word-explorer', 'practice', True,
+                       occurred_on=today)
+
+        data = self.snapshot_data()
+        self.assertEqual(data['vocabulary']['mastered'], 1)
+        # Mastering the only A1 word clears the band and the book: both
+        # certificates were pushed into the snapshot as they were issued.
+        self.assertEqual(len(data['certificates']), 2)
+        expected = compute_passport_data(self.user.id)
+        self.assertEqual(sorted(c['serial'] for c in data['certificates']),
+                         sorted(c['serial'] for c in expected['certificates']))
+        data.pop('certificates')
+        expected.pop('certificates')
+        self.assertEqual(data, expected)
+
+    def test_a_batched_round_applies_each_word_and_finishes_once(self):
+        get_passport_data(self.user.id)
+        result = submit_attempt_batch(self.user.id, self.book_id, 'practice', [
+            {'word': 'fox', 'correct': True},
+            {'word': 'wolf', 'correct': True},
+            {'word': 'Fox', 'correct': True, 'game': 'word-explorer', 'hints_used': 1},
+        ], game='bee-genius')
+
+        self.assertEqual(result['recorded'], 2)
+        first, missing, second = result['results']
+        self.assertEqual((first['stage'], first['pip_count']), ('known', 1))
+        self.assertEqual(missing['error']['code'], 'WORD_NOT_RESOLVED')
+        self.assertFalse(second['stage_advanced'])
+        self.assertEqual(result['streak']['current_streak'], 1)
+        self.assertEqual([entry['key'] for entry in result['unlocked_achievements']], ['no_hints'])
+        self.assertEqual(self.snapshot_data(), compute_passport_data(self.user.id))
+
+    def test_a_bad_hint_count_fails_only_its_own_attempt(self):
+        result = submit_attempt_batch(self.user.id, self.book_id, 'practice', [
+            {'word': 'fox', 'correct': True, 'hints_used': 'x'},
+            {'word': 'fox', 'correct': True, 'hints_used': -1},
+            {'word': 'fox', 'correct': True, 'hints_used': '2'},
+        ], game='bee-genius')
+
+        self.assertEqual(result['recorded'], 1)
+        bad, negative, good = result['results']
+        self.assertEqual((bad['error']['code'], bad['error']['status']), ('INVALID_HINTS', 400))
+        self.assertEqual(negative['error']['code'], 'INVALID_HINTS')
+        self.assertEqual(good['stage'], 'guessed')
+        self.assertEqual(result['streak']['current_streak'], 1)
+
+    def test_story_and_shelf_events_refresh_their_sections(self):
+        get_passport_data(self.user.id)
+        db.session.add(ReaderStoryProgress(user_id=self.user.id, story_id=self.story.id))
+        note_story_progress(self.user.id)
+        db.session.commit()
+        self.assertEqual(self.snapshot_data()['reading']['stories_in_progress'], 1)
+
+        progress = ReaderStoryProgress.query.one()
+        progress.completed = True
+        progress.completed_at = datetime.now()
+        note_story_progress(self.user.id)
+        db.session.commit()
+        record_self_reported_word(self.user.id, 'hello')
+
+        self.assertEqual(self.snapshot_data(), compute_passport_data(self.user.id))
+
+    def test_stale_snapshots_are_listed_for_rebuild(self):
+        get_passport_data(self.user.id)
+        self.assertEqual(stale_snapshot_user_ids(), [])
+
+        snapshot = db.session.get(ReaderPassportSnapshot, self.user.id)
+        snapshot.built_at = datetime.now() - timedelta(days=2)
+        db.session.commit()
+        self.assertEqual(stale_snapshot_user_ids(), [self.user.id])
+
+
+if __name__ == '__main__':
+    unittest.main()
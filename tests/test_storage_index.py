@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+from apps import storage
+from apps.storage_index import (
+    Checkpoint,
+    IndexStats,
+    legacy_units,
+    reconcile_units,
+    storage_units,
+    verify_files,
+)
+from config import ConfigClass
+from extensions import db
+from models.school_file import SchoolFile
+from models.school_storage_usage import SchoolStorageUsage
+from models.shcool import Shcool
+from models.user import User
+from tests.db_case import DatabaseTestCase
+
+
+class StorageTreeTestCase(DatabaseTestCase):
+    tables = [User.__table__, Shcool.__table__, SchoolFile.__table__, SchoolStorageUsage.__table__]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.legacy_root = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        super().setUp()
+        db.session.add_all([Shcool(id=1, name='School One'), Shcool(id=2, name='School Two')])
+        db.session.commit()
+
+        self.patch = patch.object(ConfigClass, 'SCHOOL_STORAGE_DIR', self.root)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        super().tearDown()
+        for path in (self.root, self.legacy_root, os.path.dirname(self.checkpoint_path)):
+            shutil.rmtree(path, ignore_errors=True)
+
+    def write(self, directory, name, size):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as handle:
+            handle.write(b'x' * size)
+        return path
+
+    def run_units(self, units, checkpoint=None, prune=False):
+        stats = IndexStats()
+        reconcile_units(units, stats, checkpoint=checkpoint, workers=2, prune=prune, verbose=False)
+        return stats
+
+
+class StorageIndexTest(StorageTreeTestCase):
+    def test_new_files_are_indexed_in_bulk_with_counters(self):
+        self.write(storage.category_dir(1, 'books/covers'), 'a.png', 100)
+        self.write(storage.category_dir(1, 'stories/audio'), 'b.mp3', 300)
+        self.write(storage.category_dir(2, 'general'), 'c.txt', 50)
+        self.write(storage.category_dir(1, 'books/covers'), storage.STAGING_PREFIX + 'half', 999)
+
+        stats = self.run_units(storage_units())
+
+        self.assertEqual((stats.scanned, stats.created), (3, 3))
+        cover = SchoolFile.query.filter_by(relative_path='school_1/books/covers/a.png').one()
+        self.assertEqual((cover.shcool_id, cover.category, cover.file_size), (1, 'books/covers', 100))
+        self.assertEqual(cover.mime_type, 'image/png')
+        self.assertEqual(storage.used_bytes(1), 400)
+        self.assertEqual(storage.used_bytes(2), 50)
+
+        # A second run finds nothing to do.
+        again = self.run_units(storage_units())
+        self.assertEqual((again.created, again.refreshed), (0, 0))
+        self.assertEqual(SchoolFile.query.count(), 3)
+
+    def test_changed_sizes_are_refreshed_and_dead_rows_pruned(self):
+        path = self.write(storage.category_dir(1, 'books/files'), 'story.pdf', 100)
+        gone = self.write(storage.category_dir(1, 'books/files'), 'gone.pdf', 70)
+        self.run_units(storage_units())
+        self.write(os.path.dirname(path), 'story.pdf', 250)
+        os.remove(gone)
+
+        stats = self.run_units(storage_units(), prune=True)
+
+        self.assertEqual((stats.refreshed, stats.dead, stats.pruned), (1, 1, 1))
+        self.assertFalse(SchoolFile.query.one().missing)
+        self.assertEqual(SchoolFile.query.one().file_size, 250)
+        self.assertEqual(storage.used_bytes(1), 250)
+
+    def test_rerun_resumes_after_the_last_committed_unit(self):
+        self.write(storage.category_dir(1, 'general'), 'a.txt', 10)
+        self.write(storage.category_dir(2, 'general'), 'b.txt', 20)
+        options = {'school': None}
+
+        first = Checkpoint(self.checkpoint_path, options)
+        units = storage_units()
+        self.run_units(units[:1], checkpoint=first)
+
+        resumed = Checkpoint(self.checkpoint_path, options)
+        self.assertTrue(resumed.load())
+        self.assertEqual(resumed.done, {'storage:school_1'})
+        with patch('apps.storage_index.reconcile_unit') as reconcile_unit:
+            completed = reconcile_units(units[:1], IndexStats(), checkpoint=resumed, verbose=False)
+        reconcile_unit.assert_not_called()
+        self.assertEqual(completed, ['storage:school_1'])
+
+        self.run_units(units, checkpoint=resumed)
+        self.assertEqual(SchoolFile.query.count(), 2)
+
+        # Different options never reuse the old progress.
+        self.assertFalse(Checkpoint(self.checkpoint_path, {'school': 2}).load())
+
+    def test_legacy_tree_is_indexed_under_its_owner(self):
+        self.write(os.path.join(self.legacy_root, '1', '7', 'cover'), 'front.jpg', 40)
+        self.write(os.path.join(self.legacy_root, '1', '7', 'pages'), 'p1.mp3', 60)
+        self.write(os.path.join(self.legacy_root, 'platform', '3'), 'page.png', 5)
+
+        stats = self.run_units(legacy_units(self.legacy_root, 'audio-books'))
+
+        self.assertEqual(stats.created, 3)
+        cover = SchoolFile.query.filter_by(
+            relative_path=storage.LEGACY_PATH_PREFIX + 'school_1/audio-books/1/7/cover/front.jpg'
+        ).one()
+        self.assertEqual((cover.category, cover.linked_type), ('books/covers', 'legacy'))
+        self.assertEqual(storage.used_bytes(1), 100)
+        self.assertEqual(storage.used_bytes(None), 5)
+
+
+class IntegrityScanTest(StorageTreeTestCase):
+    def test_scan_flags_missing_files_and_clears_returning_ones(self):
+        kept = self.write(storage.category_dir(1, 'general'), 'kept.txt', 10)
+        lost = self.write(storage.category_dir(1, 'general'), 'lost.txt', 10)
+        self.run_units(storage_units())
+        SchoolFile.query.update({SchoolFile.verified_at: None})
+        db.session.commit()
+        os.remove(lost)
+
+        counts = verify_files(limit=10, batch_size=1, workers=2)
+
+        self.assertEqual(counts, {'checked': 2, 'missing': 1, 'recovered': 0})
+        flags = {row.stored_filename: row.missing for row in SchoolFile.query}
+        self.assertEqual(flags, {'kept.txt': False, 'lost.txt': True})
+        # Both were just verified, so an immediate rerun has nothing to do.
+        self.assertEqual(verify_files()['checked'], 0)
+
+        self.write(os.path.dirname(kept), 'lost.txt', 10)
+        counts = verify_files(max_age=timedelta(0))
+        self.assertEqual(counts['recovered'], 1)
+        self.assertFalse(SchoolFile.query.filter_by(stored_filename='lost.txt').one().missing)
+
+    def test_reconciler_flags_unpruned_dead_rows(self):
+        lost = self.write(storage.category_dir(1, 'general'), 'lost.txt', 10)
+        self.run_units(storage_units())
+        os.remove(lost)
+
+        self.run_units(storage_units())
+
+        self.assertTrue(SchoolFile.query.one().missing)
+
+    def test_dry_run_scan_writes_nothing(self):
+        self.write(storage.category_dir(1, 'general'), 'a.txt', 10)
+        self.run_units(storage_units())
+        SchoolFile.query.update({SchoolFile.verified_at: None})
+        db.session.commit()
+
+        counts = verify_files(batch_size=1, dry_run=True)
+
+        self.assertEqual(counts['checked'], 1)
+        self.assertIsNone(SchoolFile.query.one().verified_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from werkzeug.datastructures import FileStorage
+
+from apps import background, storage
+from config import ConfigClass
+from extensions import db
+from models.school_file import SchoolFile
+from models.school_storage_usage import SchoolStorageUsage
+from models.shcool import Shcool
+from models.user import User
+from tests.db_case import DatabaseTestCase
+
+
+def make_upload(payload, filename='cover.png', mimetype='image/png'):
+    return FileStorage(stream=io.BytesIO(payload), filename=filename, content_type=mimetype)
+
+
+class StorageTestCase(DatabaseTestCase):
+    tables = [User.__table__, Shcool.__table__, SchoolFile.__table__, SchoolStorageUsage.__table__]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        super().setUp()
+        db.session.add(Shcool(id=1, name='School One'))
+        db.session.commit()
+
+        # Jobs queued on commit (image copies) are recorded, not run: a worker
+        # thread would share the in-memory connection with the test.
+        self.patches = [
+            patch.object(background, '_get_executor'),
+            patch.object(ConfigClass, 'SCHOOL_STORAGE_DIR', self.root),
+            patch.object(ConfigClass, 'PUBLIC_MEDIA_BASE_URL', 'https://api.test'),
+            patch.object(ConfigClass, 'MAX_MEDIA_IMAGE_UPLOAD_MB', 1),
+        ]
+        for active_patch in self.patches:
+            active_patch.start()
+
+    def tearDown(self):
+        for active_patch in self.patches:
+            active_patch.stop()
+        super().tearDown()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def category_entries(self):
+        return sorted(os.listdir(storage.category_dir(1, 'books/covers')))
+
+
+class StreamingUploadTest(StorageTestCase):
+    def test_upload_is_hashed_and_placed_without_leftovers(self):
+        payload = b'\x89PNG' + b'x' * 5000
+        record = storage.save_upload(1, 'books/covers', make_upload(payload))
+
+        self.assertEqual(record.file_size, len(payload))
+        self.assertEqual(record.content_sha256, hashlib.sha256(payload).hexdigest())
+        self.assertEqual(self.category_entries(), [record.stored_filename])
+        with open(storage.absolute_path(record.relative_path), 'rb') as handle:
+            self.assertEqual(handle.read(), payload)
+
+    def test_oversized_upload_is_refused_mid_stream_and_cleaned_up(self):
+        payload = b'x' * (storage.BYTES_PER_MB + 1)
+        with self.assertRaises(storage.StorageError):
+            storage.save_upload(1, 'books/covers', make_upload(payload))
+        self.assertEqual(self.category_entries(), [])
+        self.assertEqual(SchoolFile.query.count(), 0)
+
+    def test_empty_upload_is_refused(self):
+        with self.assertRaises(storage.StorageError):
+            storage.save_upload(1, 'books/covers', make_upload(b''))
+        self.assertEqual(self.category_entries(), [])
+
+    def test_identical_content_is_hard_linked_when_dedup_is_on(self):
+        payload = b'same bytes' * 100
+        with patch.object(ConfigClass, 'SCHOOL_STORAGE_DEDUP_HARDLINKS', True):
+            first = storage.save_upload(1, 'books/covers', make_upload(payload))
+            second = storage.save_upload(1, 'books/covers', make_upload(payload))
+
+        first_path = storage.absolute_path(first.relative_path)
+        second_path = storage.absolute_path(second.relative_path)
+        self.assertNotEqual(first_path, second_path)
+        self.assertTrue(os.path.samefile(first_path, second_path))
+
+        # Deleting one copy leaves the other intact.
+        storage.delete_file(first)
+        with open(second_path, 'rb') as handle:
+            self.assertEqual(handle.read(), payload)
+
+    def test_identical_content_is_copied_when_dedup_is_off(self):
+        payload = b'same bytes' * 100
+        first = storage.save_upload(1, 'books/covers', make_upload(payload))
+        second = storage.save_upload(1, 'books/covers', make_upload(payload))
+        self.assertFalse(os.path.samefile(
+            storage.absolute_path(first.relative_path),
+            storage.absolute_path(second.relative_path),
+        ))
+
+
+class StorageUsageCounterTest(StorageTestCase):
+    """The running usage counters must track every index change exactly as a
+    fresh SUM over school_file would."""
+
+    def test_counters_follow_uploads_and_deletions(self):
+        first = storage.save_upload(1, 'books/covers', make_upload(b'a' * 300))
+        storage.save_upload(1, 'packs/images', make_upload(b'b' * 200))
+        db.session.commit()
+
+        summary = storage.usage_summary(1)
+        self.assertEqual(summary['used_bytes'], 500)
+        self.assertEqual(summary['file_count'], 2)
+        by_category = {entry['category']: entry['bytes'] for entry in summary['categories']}
+        self.assertEqual(by_category['books/covers'], 300)
+        self.assertEqual(by_category['packs/images'], 200)
+
+        storage.delete_file(first)
+        db.session.commit()
+        self.assertEqual(storage.used_bytes(1), 200)
+        self.assertEqual(storage.recompute_usage(), [])
+
+    def test_upload_over_quota_is_refused_without_charging(self):
+        db.session.get(Shcool, 1).storage_quota_mb = 1
+        db.session.commit()
+        storage.save_upload(1, 'books/covers', make_upload(b'a' * (storage.BYTES_PER_MB - 100)))
+        db.session.commit()
+
+        with self.assertRaises(storage.StorageError):
+            storage.save_upload(1, 'books/covers', make_upload(b'b' * 200))
+        db.session.rollback()
+
+        self.assertEqual(storage.used_bytes(1), storage.BYTES_PER_MB - 100)
+        self.assertEqual(SchoolFile.query.count(), 1)
+        self.assertEqual(len(self.category_entries()), 1)
+
+    def test_registering_an_existing_row_moves_only_the_difference(self):
+        path = os.path.join(storage.category_dir(1, 'books/files'), 'story.pdf')
+        with open(path, 'wb') as handle:
+            handle.write(b'x' * 100)
+        storage.register_existing_file(1, 'books/files', path)
+        with open(path, 'wb') as handle:
+            handle.write(b'x' * 250)
+        storage.register_existing_file(1, 'books/files', path)
+        db.session.commit()
+
+        self.assertEqual(storage.used_bytes(1), 250)
+        self.assertEqual(storage.usage_summary(1)['file_count'], 1)
+
+        storage.delete_by_absolute_path(path)
+        db.session.commit()
+        self.assertEqual(storage.used_bytes(1), 0)
+
+    def test_written_assets_are_charged_once_and_refused_over_quota(self):
+        db.session.get(Shcool, 1).storage_quota_mb = 1
+        db.session.commit()
+        directory = storage.category_dir(1, 'books/files')
+        first = os.path.join(directory, 'first.pdf')
+        storage.write_upload(make_upload(b'a' * (storage.BYTES_PER_MB - 100), 'first.pdf'), first,
+                             school_id=1, category='books/files')
+        storage.register_existing_file(1, 'books/files', first, charged=True)
+        db.session.commit()
+        self.assertEqual(storage.used_bytes(1), storage.BYTES_PER_MB - 100)
+        self.assertEqual(storage.recompute_usage([1]), [])
+
+        # The pre-check a route runs first passes; the write's own charge,
+        # made after the bytes are counted, is what refuses it.
+        storage.assert_within_quota(1, 50)
+        second = os.path.join(directory, 'second.pdf')
+        with self.assertRaises(storage.StorageError):
+            storage.write_upload(make_upload(b'b' * 200, 'second.pdf'), second, school_id=1, category='books/files')
+        db.session.rollback()
+        self.assertFalse(os.path.exists(second))
+        self.assertEqual(sorted(os.listdir(directory)), ['first.pdf'])
+        self.assertEqual(storage.used_bytes(1), storage.BYTES_PER_MB - 100)
+
+    def test_recompute_repairs_drift(self):
+        storage.save_upload(1, 'books/covers', make_upload(b'a' * 300))
+        db.session.commit()
+        storage.adjust_usage(1, 'books/covers', 999, 3)
+        db.session.commit()
+
+        changes = storage.recompute_usage([1])
+        db.session.commit()
+
+        self.assertTrue(changes)
+        self.assertEqual(storage.used_bytes(1), 300)
+        self.assertEqual(storage.recompute_usage([1]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
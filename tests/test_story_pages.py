@@ -0,0 +1,136 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from apps import background, story_pages
+from apps.media import media
+from config import ConfigClass
+from extensions import db
+from models.book import Book
+from models.book_story import BookStory
+from models.user import User
+from tests.db_case import DatabaseTestCase
+
+INDEX = {'version': 1, 'pages': [{'width': 200.0, 'height': 300.0}, {'width': 300.0, 'height': 200.0}]}
+
+
+def make_pdf(page_count):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for number in range(page_count):
+        writer.add_blank_page(width=200 + number, height=300)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class StoryPagesTest(DatabaseTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.storage_root = os.path.join(self.root, 'storage')
+        self.pages_root = os.path.join(self.root, 'story-pages')
+        self.storage_patch = patch.multiple(ConfigClass, SCHOOL_STORAGE_DIR=self.storage_root,
+                                            STORY_PAGES_DIR=self.pages_root)
+        self.storage_patch.start()
+        super().setUp()
+
+        self.pdf_path = os.path.join(self.root, 'story.pdf')
+        with open(self.pdf_path, 'wb') as handle:
+            handle.write(make_pdf(3) if story_pages.available() else b'%PDF-1.4\n')
+        user = User(username='teacher', email='teacher@example.com', password_hashed='x')
+        book = Book(title='Fox', author='A. Author')
+        db.session.add_all([user, book])
+        db.session.flush()
+        self.story = BookStory(
+            book_id=book.id, shcool_id=None, uploaded_by=user.id, title='Fox story',
+            original_filename='fox.pdf', stored_filename='story.pdf', file_path=self.pdf_path,
+            mime_type='application/pdf', file_size=1,
+        )
+        db.session.add(self.story)
+        db.session.commit()
+
+    def tearDown(self):
+        super().tearDown()
+        self.storage_patch.stop()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_uploads_are_indexed_after_commit(self):
+        with patch.object(story_pages, 'available', return_value=True), \
+                patch.object(background, '_get_executor') as executor:
+            story_pages.queue_story_pages(self.story)
+            db.session.rollback()
+            executor.return_value.submit.assert_not_called()
+
+            story_pages.queue_story_pages(self.story)
+            db.session.commit()
+
+        submitted = executor.return_value.submit.call_args[0]
+        self.assertEqual(submitted[2:], (story_pages._process_job, (self.story.id,)))
+
+    def test_index_sets_page_count_and_failures_are_tried_once(self):
+        with patch.object(story_pages, 'available', return_value=True), \
+                patch.object(story_pages, 'read_page_index', side_effect=ValueError('broken xref')) as read:
+            self.assertFalse(story_pages.ensure_page_index(self.story))
+            self.assertFalse(story_pages.ensure_page_index(self.story))
+        self.assertEqual(read.call_count, 1)
+        self.assertIsNotNone(self.story.pages_indexed_at)
+        self.assertIsNone(self.story.page_count)
+
+        self.story.pages_indexed_at = None
+        with patch.object(story_pages, 'available', return_value=True), \
+                patch.object(story_pages, 'read_page_index', return_value=INDEX):
+            self.assertTrue(story_pages.ensure_page_index(self.story))
+        db.session.expire_all()
+        self.assertEqual(db.session.get(BookStory, self.story.id).page_count, 2)
+
+    def test_page_files_live_outside_public_storage_and_are_removed_with_the_story(self):
+        thumbnail = story_pages.page_file_path(self.story, 2, 'thumbnail')
+        self.assertEqual(
+            os.path.relpath(thumbnail, self.pages_root),
+            os.path.join(str(self.story.id), 'page-0002.w200.jpg'),
+        )
+        with patch.object(story_pages, 'renderer_path', return_value=None):
+            self.assertIsNone(story_pages.resolve_page_file(self.story, 2, 'thumbnail'))
+
+        with open(thumbnail, 'wb') as handle:
+            handle.write(b'jpeg')
+        self.assertEqual(story_pages.resolve_page_file(self.story, 2, 'thumbnail'), thumbnail)
+
+        story_pages.remove_story_pages(self.story)
+        self.assertFalse(os.path.exists(story_pages.pages_directory(self.story)))
+
+    def test_media_refuses_page_files_left_in_public_storage(self):
+        self.app.register_blueprint(media)
+        legacy = os.path.join(self.storage_root, 'school_12', 'books', 'pages', '7')
+        os.makedirs(legacy)
+        with open(os.path.join(legacy, 'page-0001.pdf'), 'wb') as handle:
+            handle.write(b'%PDF-1.4\n')
+        client = self.app.test_client()
+
+        for path in ('school_12/books/pages/7/page-0001.pdf', 'school_12/books/./pages/7/page-0001.pdf',
+                     'school_12/BOOKS/pages/7/page-0001.pdf'):
+            self.assertEqual(client.get('/media/' + path).status_code, 404, path)
+        with open(os.path.join(self.storage_root, 'school_12', 'books', 'cover.png'), 'wb') as handle:
+            handle.write(b'png')
+        self.assertEqual(client.get('/media/school_12/books/cover.png').status_code, 200)
+
+    @unittest.skipUnless(story_pages.available(), 'pypdf is not installed')
+    def test_single_pages_are_cut_from_the_pdf(self):
+        from pypdf import PdfReader
+
+        self.assertTrue(story_pages.ensure_page_index(self.story))
+        self.assertEqual(self.story.page_count, 3)
+        self.assertEqual(self.story.page_index['pages'][1], {'width': 201.0, 'height': 300.0})
+
+        page_path = story_pages.resolve_page_file(self.story, 3, 'pdf')
+        page = PdfReader(page_path)
+        self.assertEqual(len(page.pages), 1)
+        self.assertEqual(float(page.pages[0].mediabox.width), 202.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
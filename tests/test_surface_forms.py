@@ -0,0 +1,73 @@
+import unittest
+
+from sqlalchemy import event
+
+from apps import surface_forms
+from apps.progress_engine import AttemptError, resolve_word_sense_for_book
+from extensions import db
+from models.book import Book
+from models.chapter import Chapter
+from models.word_occurrence import WordOccurrence
+from models.word_sense import WordSense
+from tests.db_case import DatabaseTestCase
+
+
+class SurfaceFormMapTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        surface_forms.invalidate_book()
+
+        book = Book(title='Fox', author='A. Author')
+        db.session.add(book)
+        db.session.flush()
+        self.chapter = Chapter(book_id=book.id, chapter_index=1)
+        self.fox = WordSense(lemma='fox', pos='NOUN', sense_key='')
+        self.run_sense = WordSense(lemma='run', pos='VERB', sense_key='')
+        db.session.add_all([self.chapter, self.fox, self.run_sense])
+        db.session.flush()
+        db.session.add(WordOccurrence(word_sense=self.fox, chapter=self.chapter, surface_form='Foxes '))
+        db.session.commit()
+        self.book_id = book.id
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self.record_statement)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.record_statement)
+        surface_forms.invalidate_book()
+        super().tearDown()
+
+    def record_statement(self, conn, cursor, statement, parameters, context, executemany):
+        if 'word_occurrence' in statement:
+            self.statements.append(statement)
+
+    def test_the_normalized_form_is_stored_and_the_map_is_built_once(self):
+        self.assertEqual(WordOccurrence.query.one().surface_form_normalized, 'foxes')
+        del self.statements[:]
+
+        for word in ('foxes', ' FOXES', 'Foxes'):
+            self.assertEqual(resolve_word_sense_for_book(self.book_id, word).id, self.fox.id)
+        self.assertEqual(len(self.statements), 1)
+        self.assertNotIn('lower(', self.statements[0].lower())
+
+    def test_words_added_since_the_map_was_built_are_still_found(self):
+        resolve_word_sense_for_book(self.book_id, 'foxes')
+        db.session.add(WordOccurrence(word_sense=self.run_sense, chapter=self.chapter, surface_form='Running'))
+        db.session.commit()
+
+        self.assertEqual(resolve_word_sense_for_book(self.book_id, 'running').id, self.run_sense.id)
+        with self.assertRaises(AttemptError):
+            resolve_word_sense_for_book(self.book_id, 'wolves')
+
+    def test_a_sense_merged_away_rebuilds_the_map(self):
+        resolve_word_sense_for_book(self.book_id, 'foxes')
+        occurrence = WordOccurrence.query.one()
+        occurrence.word_sense = self.run_sense
+        db.session.delete(self.fox)
+        db.session.commit()
+
+        self.assertEqual(resolve_word_sense_for_book(self.book_id, 'foxes').id, self.run_sense.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from apps import certificates, reader_passport  # noqa: F401 -- attempts write their tables
+from apps.progress_engine import (
+    SOURCE_BITS,
+    check_word_progress_state,
+    submit_attempt,
+)
+from extensions import db
+from models.book import Book
+from models.chapter import Chapter
+from models.user import User
+from models.word_occurrence import WordOccurrence
+from models.word_progress import STAGE_KNOWN, STAGE_MASTERED, WordProgress, WordProgressEvidence
+from models.word_sense import WordSense
+from tests.db_case import DatabaseTestCase
+
+
+class IncrementalStageTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.user = User(username='reader', email='reader@example.com', password_hashed='x')
+        book = Book(title='Fox', author='A. Author')
+        db.session.add_all([self.user, book])
+        db.session.flush()
+        chapter = Chapter(book_id=book.id, chapter_index=1)
+        sense = WordSense(lemma='fox', pos='NOUN', sense_key='', cefr_level='A1')
+        db.session.add_all([chapter, sense])
+        db.session.flush()
+        db.session.add(WordOccurrence(word_sense_id=sense.id, chapter_id=chapter.id, surface_form='fox'))
+        db.session.commit()
+        self.book_id = book.id
+
+        self.evidence_reads = 0
+        event.listen(db.engine, 'before_cursor_execute', self.count_evidence_reads)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.count_evidence_reads)
+        super().tearDown()
+
+    def count_evidence_reads(self, conn, cursor, statement, parameters, context, executemany):
+        # A word's own log, as opposed to the achievement checks' per-user
+        # joins through word_progress.
+        if 'FROM word_progress_evidence' in statement and 'JOIN' not in statement:
+            self.evidence_reads += 1
+
+    def attempt(self, game, on, hints_used=0):
+        return submit_attempt(self.user.id, self.book_id, 'fox', game, 'practice', True,
+                              hints_used=hints_used, occurred_on=on)
+
+    def replay_mismatches(self):
+        progress = WordProgress.query.one()
+        return check_word_progress_state(progress, WordProgressEvidence.query.all())
+
+    def test_attempts_advance_the_summary_without_reading_the_log(self):
+        today = date.today()
+        self.attempt('bee-genius', today - timedelta(days=1), hints_used=2)
+        self.attempt('bee-genius', today - timedelta(days=1), hints_used=1)
+        self.assertEqual(self.evidence_reads, 0)
+        self.assertEqual(WordProgress.query.one().stage, STAGE_KNOWN)
+
+        result = self.attempt('word-explorer', today)
+        self.assertEqual(result['stage'], STAGE_MASTERED)
+        self.assertEqual(self.evidence_reads, 0)
+
+        progress = WordProgress.query.one()
+        self.assertEqual(progress.evidence_sources, SOURCE_BITS['bee-genius'] | SOURCE_BITS['word-explorer'])
+        self.assertEqual((progress.evidence_count, progress.distinct_days_count), (3, 2))
+        self.assertEqual(self.replay_mismatches(), {})
+
+    def test_backdated_attempts_only_count_a_new_day(self):
+        today = date.today()
+        self.attempt('bee-genius', today, hints_used=1)
+        self.attempt('bee-genius', today - timedelta(days=3), hints_used=1)
+        self.attempt('think-word', today - timedelta(days=3), hints_used=1)
+
+        progress = WordProgress.query.one()
+        self.assertEqual((progress.distinct_days_count, progress.last_evidence_on), (2, today))
+        self.assertEqual(self.replay_mismatches(), {})
+
+    def test_checker_reports_and_fixes_a_drifted_row(self):
+        today = date.today()
+        self.attempt('bee-genius', today - timedelta(days=1))
+        self.attempt('word-explorer', today)
+        progress = WordProgress.query.one()
+        progress.distinct_days_count = 1
+        progress.stage = STAGE_KNOWN
+        db.session.commit()
+
+        evidence = WordProgressEvidence.query.all()
+        mismatches = check_word_progress_state(progress, evidence)
+        self.assertEqual(mismatches, {
+            'distinct_days_count': (1, 2),
+            'stage': (STAGE_KNOWN, STAGE_MASTERED),
+        })
+        self.assertEqual(progress.stage, STAGE_KNOWN)
+
+        check_word_progress_state(progress, evidence, fix=True)
+        db.session.commit()
+        self.assertEqual(self.replay_mismatches(), {})
+        self.assertEqual(WordProgress.query.one().stage, STAGE_MASTERED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+from sqlalchemy.dialects import mysql
+
+from apps.pagination import decode_cursor, encode_cursor, keyset_page
+from apps.word_sense_search import (
+    STATUS_UNRESOLVED,
+    filter_by_status,
+    lemma_search_filter,
+    word_sense_status_counts,
+)
+from extensions import db
+from models.user import User
+from models.word_sense import WordSense
+from tests.db_case import DatabaseTestCase
+
+
+class CursorTest(unittest.TestCase):
+    def test_cursor_round_trips_its_sort_key(self):
+        token = encode_cursor('apple', 12)
+        self.assertEqual(decode_cursor(token, (str, int)), ('apple', 12))
+
+    def test_cursor_with_wrong_shape_is_rejected(self):
+        token = encode_cursor('apple')
+        with self.assertRaises(ValueError):
+            decode_cursor(token, (str, int))
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor!', (str, int))
+
+    def test_missing_cursor_means_first_page(self):
+        self.assertIsNone(decode_cursor(None, (str, int)))
+        self.assertIsNone(decode_cursor('', (str, int)))
+
+
+class LemmaSearchFilterTest(unittest.TestCase):
+    def test_fulltext_path_quotes_the_term_as_a_phrase(self):
+        clause = lemma_search_filter('app', use_fulltext=True)
+        compiled = clause.compile(dialect=mysql.dialect(), compile_kwargs={'literal_binds': True})
+        self.assertIn('MATCH (word_sense.lemma) AGAINST', str(compiled))
+        self.assertIn('\'"app"\'', str(compiled))
+
+    def test_single_character_search_takes_the_prefix_path(self):
+        clause = lemma_search_filter('a', use_fulltext=True)
+        self.assertNotIn('MATCH', str(clause.compile(dialect=mysql.dialect())))
+
+    def test_fallback_is_an_escaped_prefix_match(self):
+        clause = lemma_search_filter('ap_', use_fulltext=False)
+        compiled = clause.compile(compile_kwargs={'literal_binds': True})
+        self.assertIn("LIKE 'ap\\_%'", str(compiled))
+
+
+class WordSenseQueueQueryTest(DatabaseTestCase):
+    """Runs the queue's queries against in-memory SQLite, which exercises the
+    prefix fallback and the keyset walk end to end."""
+
+    tables = [User.__table__, WordSense.__table__]
+
+    def setUp(self):
+        super().setUp()
+        for lemma, level, excluded in [
+            ('apple', 'A1', False),
+            ('apply', None, False),
+            ('banana', 'A2', False),
+            ('app', None, False),
+            ('zeus', None, True),
+        ]:
+            db.session.add(WordSense(lemma=lemma, pos='NOUN', sense_key='',
+                                     cefr_level=level, proper_noun_excluded=excluded))
+        db.session.commit()
+
+    def test_keyset_pages_walk_the_whole_queue_in_lemma_order(self):
+        seen = []
+        cursor = None
+        while True:
+            rows, anchor = keyset_page(WordSense.query, [WordSense.lemma, WordSense.id], 2, after=cursor)
+            seen.extend(row.lemma for row in rows)
+            if anchor is None:
+                break
+            cursor = decode_cursor(encode_cursor(anchor.lemma, anchor.id), (str, int))
+        self.assertEqual(seen, ['app', 'apple', 'apply', 'banana', 'zeus'])
+
+    def test_prefix_search_and_status_filter_combine(self):
+        query = filter_by_status(WordSense.query, STATUS_UNRESOLVED)
+        query = query.filter(lemma_search_filter('app', use_fulltext=False))
+        self.assertEqual(sorted(sense.lemma for sense in query), ['app', 'apply'])
+
+    def test_status_counts_match_the_separate_counts(self):
+        counts = word_sense_status_counts(WordSense.query)
+        self.assertEqual(counts, {
+            'total': 5,
+            'resolved': 2,
+            'proper_noun_excluded': 1,
+            'unresolved': 2,
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()